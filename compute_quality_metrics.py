@@ -6,16 +6,26 @@ Powered by Polars for automatic multi-core parallelism.
 Hardware: 38 CPU cores, 700 GB RAM.
 """
 
+import numpy as np
 import polars as pl
-import json
-import zipfile
+import duckdb
 import os
-import io
+import sys
 import gc
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data-pipeline'))
+import citation_cube
+import citation_graph
+import sleeping_beauty
+from citation_diversity import hhi_diversity
+from ingest import cached_parquet
+from json_writer import stream_json
+
 DATA_DIR = '/media/saerom/saerom-ssd/Dropbox (Penn)/Research/PatentsView'
 OUT_DIR = '/home/saerom/projects/patentworld/public/data/computed'
+PARQUET_DIR = '/tmp/patentview/parquet'
+WAREHOUSE_PATH = '/tmp/patentview/patentworld.duckdb'  # built by data-pipeline/build_warehouse.py
 os.makedirs(OUT_DIR, exist_ok=True)
 
 T0 = time.time()
@@ -23,50 +33,38 @@ def elapsed():
     return f"[{time.time()-T0:.0f}s]"
 
 def read_tsv_zip(filename, columns=None, dtypes=None):
-    path = os.path.join(DATA_DIR, filename)
+    # Streamed once into the shared Parquet cache (no full in-memory decompress),
+    # then only the requested columns are read back.
+    path = cached_parquet(os.path.join(DATA_DIR, filename), PARQUET_DIR)
     print(f"{elapsed()} Reading {filename}...", flush=True)
-    with zipfile.ZipFile(path) as zf:
-        tsv_name = zf.infolist()[0].filename
-        with zf.open(tsv_name) as f:
-            data = f.read()
-    schema_overrides = dtypes or {}
-    df = pl.read_csv(
-        io.BytesIO(data),
-        separator='\t',
-        columns=columns,
-        schema_overrides=schema_overrides,
-        infer_schema_length=10000,
-        null_values=['', 'NULL', 'null', 'NA', 'None'],
-        ignore_errors=True,
-    )
-    del data
+    df = pl.read_parquet(path, columns=columns)
+    null_strings = ['NULL', 'null', 'NA', 'None']
+    df = df.with_columns([
+        pl.when(pl.col(c).is_in(null_strings)).then(None).otherwise(pl.col(c)).alias(c)
+        for c, t in df.schema.items() if t == pl.Utf8
+    ])
+    if dtypes:
+        df = df.with_columns([pl.col(c).cast(t, strict=False) for c, t in dtypes.items()])
+    print(f"  -> {df.height:,} rows, {df.width} columns", flush=True)
+    return df
+
+def read_warehouse(sql):
+    # Integer surrogate keys (patent_key, assignee_key, ...) live in the warehouse
+    print(f"{elapsed()} Warehouse: {' '.join(sql.split())[:80]}...", flush=True)
+    con = duckdb.connect(WAREHOUSE_PATH, read_only=True)
+    df = con.execute(sql).pl()
+    con.close()
     print(f"  -> {df.height:,} rows, {df.width} columns", flush=True)
     return df
 
 def save_json(records, filename):
+    # Streamed in chunks (json_writer): floats rounded to 6 places, NaN/Inf -> null.
+    # DataFrames go through Arrow, so no list of row dicts is ever materialized.
     path = os.path.join(OUT_DIR, filename)
-    # Handle simple lists (e.g., top_states, top_cities)
-    if records and not isinstance(records[0], dict):
-        with open(path, 'w') as f:
-            json.dump(records, f)
-        print(f"  Saved: {filename} ({len(records)} items)", flush=True)
-        return
-    # Clean NaN/Inf for JSON dicts
-    cleaned = []
-    for r in records:
-        row = {}
-        for k, v in r.items():
-            if isinstance(v, float):
-                if v != v or v == float('inf') or v == float('-inf'):
-                    row[k] = None
-                else:
-                    row[k] = round(v, 6)
-            else:
-                row[k] = v
-        cleaned.append(row)
-    with open(path, 'w') as f:
-        json.dump(cleaned, f)
-    print(f"  Saved: {filename} ({len(cleaned)} records)", flush=True)
+    if isinstance(records, pl.DataFrame):
+        records = records.to_arrow()
+    _, n, _ = stream_json(records, path, round_digits=6)
+    print(f"  Saved: {filename} ({n} records)", flush=True)
 
 def compute_quality_agg(df, group_col, filename, min_count=10):
     """Compute quality metrics grouped by (year, group_col)."""
@@ -90,9 +88,8 @@ def compute_quality_agg(df, group_col, filename, min_count=10):
 
     metrics = metrics.rename({group_col: 'group'})
     metrics = metrics.sort(['year', 'group'])
-    records = metrics.to_dicts()
-    save_json(records, filename)
-    return len(records)
+    save_json(metrics, filename)
+    return metrics.height
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -105,7 +102,7 @@ patents = read_tsv_zip('g_patent.tsv.zip',
     dtypes={'patent_id': pl.Utf8, 'num_claims': pl.Float64})
 
 patents = patents.with_columns(
-    pl.col('patent_date').str.to_date('%Y-%m-%d', strict=False).alias('patent_date_parsed')
+    pl.col('patent_date').cast(pl.Date, strict=False).alias('patent_date_parsed')
 ).with_columns(
     pl.col('patent_date_parsed').dt.year().cast(pl.Int16).alias('year')
 ).filter(
@@ -113,12 +110,18 @@ patents = patents.with_columns(
 )
 print(f"  Patents: {patents.height:,}, years {patents['year'].min()}-{patents['year'].max()}", flush=True)
 
+# int32 surrogate key: every citation-scale join below runs on it instead of patent_id strings
+patents = patents.join(
+    read_warehouse("SELECT patent_id, patent_key FROM patent_ids"),
+    on='patent_id', how='left'
+)
+
 applications = read_tsv_zip('g_application.tsv.zip',
     columns=['patent_id', 'filing_date'],
     dtypes={'patent_id': pl.Utf8})
 
 applications = applications.with_columns(
-    pl.col('filing_date').str.to_date('%Y-%m-%d', strict=False).alias('filing_date_parsed')
+    pl.col('filing_date').cast(pl.Date, strict=False).alias('filing_date_parsed')
 )
 
 patents = patents.join(
@@ -170,8 +173,10 @@ print(f"  {elapsed()} Primary CPC section...", flush=True)
 primary_cpc = cpc.filter(pl.col('cpc_sequence') == 0).select(['patent_id', 'cpc_section']).unique(subset=['patent_id'])
 patents = patents.join(primary_cpc, on='patent_id', how='left')
 
-# Build patent_id -> section map for originality/generality
-patent_section_map = primary_cpc.select(['patent_id', 'cpc_section'])
+# Build patent_key -> section map for originality/generality
+patent_section_map = read_warehouse(
+    "SELECT patent_key, CAST(cpc_section AS VARCHAR) AS cpc_section FROM primary_cpc"
+).unique(subset=['patent_key'])
 del primary_cpc, cpc; gc.collect()
 with_section = patents.filter(pl.col('cpc_section').is_not_null()).height
 print(f"  {elapsed()} CPC done. Patents with section: {with_section:,}", flush=True)
@@ -290,7 +295,7 @@ prod_agg = inv_prod.group_by(['year', 'group']).agg([
     pl.col('patents_that_year').mean().alias('avg_patents_per_inventor'),
     pl.col('inventor_id').n_unique().alias('inventor_count'),
 ]).sort(['year', 'group'])
-save_json(prod_agg.to_dicts(), 'inventor_productivity_by_rank.json')
+save_json(prod_agg, 'inventor_productivity_by_rank.json')
 del inv_rank, inv_prod, prod_agg
 
 # 2. SERIAL vs NEW ENTRANT
@@ -324,7 +329,7 @@ exp_agg = exp_prod.group_by(['year', 'group']).agg([
     pl.col('patents_that_year').mean().alias('avg_patents_per_inventor'),
     pl.col('inventor_id').n_unique().alias('inventor_count'),
 ]).sort(['year', 'group'])
-save_json(exp_agg.to_dicts(), 'inventor_productivity_by_experience.json')
+save_json(exp_agg, 'inventor_productivity_by_experience.json')
 del inv_pat_exp, patent_new, inv_first_year, exp_prod, exp_agg
 
 # 3. SPECIALIST vs GENERALIST
@@ -363,7 +368,7 @@ spec_agg = spec_prod.group_by(['year', 'group']).agg([
     pl.col('patents_that_year').mean().alias('avg_patents_per_inventor'),
     pl.col('inventor_id').n_unique().alias('inventor_count'),
 ]).sort(['year', 'group'])
-save_json(spec_agg.to_dicts(), 'inventor_productivity_by_specialization.json')
+save_json(spec_agg, 'inventor_productivity_by_specialization.json')
 del inv_spec, patent_spec, inv_section_count, inv_spec_prod, spec_prod, spec_agg
 
 # Gender productivity
@@ -380,7 +385,7 @@ gen_agg = gen_prod.group_by(['year', 'group']).agg([
     pl.col('patents_that_year').mean().alias('avg_patents_per_inventor'),
     pl.col('inventor_id').n_unique().alias('inventor_count'),
 ]).sort(['year', 'group'])
-save_json(gen_agg.to_dicts(), 'inventor_productivity_by_gender.json')
+save_json(gen_agg, 'inventor_productivity_by_gender.json')
 del inv_gender, gen_prod, gen_agg
 
 # Team size productivity
@@ -394,7 +399,7 @@ team_agg = team_prod.group_by(['year', 'group']).agg([
     pl.col('patents_that_year').mean().alias('avg_patents_per_inventor'),
     pl.col('inventor_id').n_unique().alias('inventor_count'),
 ]).sort(['year', 'group'])
-save_json(team_agg.to_dicts(), 'inventor_productivity_by_team_size.json')
+save_json(team_agg, 'inventor_productivity_by_team_size.json')
 del inv_team, team_prod, team_agg
 del inv_pat, inv_total, inventors; gc.collect()
 print(f"  {elapsed()} Phase C complete.", flush=True)
@@ -418,8 +423,10 @@ primary = primary.rename({
 })
 patents = patents.join(primary, on='patent_id', how='left')
 
-# Build assignee map for self-citation
-assignee_map = primary.select(['patent_id', 'primary_assignee_id'])
+# Build assignee map for self-citation (int keys on both sides)
+assignee_map = read_warehouse(
+    "SELECT patent_key, assignee_key AS primary_assignee_key FROM primary_assignee"
+).unique(subset=['patent_key'])
 del primary, assignees; gc.collect()
 
 top_assignees = patents.group_by('primary_assignee_org').agg(
@@ -434,55 +441,47 @@ print(f"\n{elapsed()} " + "=" * 60)
 print("PHASE E: Citation metrics")
 print("=" * 60, flush=True)
 
-citations = read_tsv_zip('g_us_patent_citation.tsv.zip',
-    columns=['patent_id', 'citation_patent_id'],
-    dtypes={'patent_id': pl.Utf8, 'citation_patent_id': pl.Utf8})
+# CSR citation graph (data-pipeline/citation_graph.py): per-patent metrics are
+# vectorized passes over memory-mapped edge arrays instead of 100M-row joins
+print(f"{elapsed()} Loading citation graph...", flush=True)
+graph = citation_graph.load()
+print(f"  -> {graph.n:,} patents, {graph.fwd.m:,} citations", flush=True)
+citation_metrics = {'patent_key': np.arange(graph.n, dtype=np.int32)}
+
+def join_citation_metrics(df, names):
+    # Attach per-patent_key arrays (NaN -> null) to the patents frame
+    cols = pl.DataFrame({'patent_key': citation_metrics['patent_key'],
+                         **{n: citation_metrics[n] for n in names}}, nan_to_null=True)
+    return df.join(cols, on='patent_key', how='left')
 
 # Forward citations
 print(f"  {elapsed()} Forward citations...", flush=True)
-fwd = citations.group_by('citation_patent_id').agg(
-    pl.count().alias('forward_citations')
-).rename({'citation_patent_id': 'patent_id'})
-patents = patents.join(fwd, on='patent_id', how='left')
+citation_metrics['forward_citations'] = graph.fwd.degree()
+patents = join_citation_metrics(patents, ['forward_citations'])
 patents = patents.with_columns(pl.col('forward_citations').fill_null(0).cast(pl.Int32))
-del fwd
 mean_fwd = patents['forward_citations'].mean()
 print(f"    Mean: {mean_fwd:.2f}", flush=True)
 
 # Backward citations
 print(f"  {elapsed()} Backward citations...", flush=True)
-bwd = citations.group_by('patent_id').agg(
-    pl.count().alias('backward_citations')
-)
-patents = patents.join(bwd, on='patent_id', how='left')
+citation_metrics['backward_citations'] = graph.bwd.degree()
+patents = join_citation_metrics(patents, ['backward_citations'])
 patents = patents.with_columns(pl.col('backward_citations').fill_null(0).cast(pl.Int32))
-del bwd
 mean_bwd = patents['backward_citations'].mean()
 print(f"    Mean: {mean_bwd:.2f}", flush=True)
 
-# Self-citations
+# Self-citations: citing and cited share the primary assignee
 print(f"  {elapsed()} Self-citations...", flush=True)
-cit_with_assignees = citations.join(
-    assignee_map.rename({'primary_assignee_id': 'citing_assignee'}),
-    on='patent_id', how='left'
-).join(
-    assignee_map.rename({'patent_id': 'citation_patent_id', 'primary_assignee_id': 'cited_assignee'}),
-    on='citation_patent_id', how='left'
-)
-cit_with_assignees = cit_with_assignees.with_columns(
-    (pl.col('citing_assignee').is_not_null() &
-     pl.col('cited_assignee').is_not_null() &
-     (pl.col('citing_assignee') == pl.col('cited_assignee'))).cast(pl.Int8).alias('is_self')
-)
-self_agg = cit_with_assignees.group_by('patent_id').agg([
-    pl.col('is_self').sum().alias('self_count'),
-    pl.count().alias('total_count'),
-])
-self_agg = self_agg.with_columns(
-    (pl.col('self_count').cast(pl.Float64) / pl.col('total_count')).alias('self_citation_rate')
-)
-patents = patents.join(self_agg.select(['patent_id', 'self_citation_rate']), on='patent_id', how='left')
-del self_agg, cit_with_assignees, assignee_map
+assignee_of = graph.codes(assignee_map['patent_key'].to_numpy(),
+                          assignee_map['primary_assignee_key'].to_numpy())
+self_count = graph.bwd.count_edges(
+    lambda rows, cols, days: (assignee_of[rows] >= 0) & (assignee_of[rows] == assignee_of[cols])
+)
+total_count = citation_metrics['backward_citations']
+with np.errstate(invalid='ignore', divide='ignore'):
+    citation_metrics['self_citation_rate'] = np.where(total_count > 0, self_count / total_count, np.nan)
+patents = join_citation_metrics(patents, ['self_citation_rate'])
+del self_count, assignee_of, assignee_map
 mean_self = patents['self_citation_rate'].mean()
 print(f"  {elapsed()} Mean self-citation rate: {mean_self:.4f}", flush=True)
 
@@ -492,59 +491,26 @@ print(f"\n{elapsed()} " + "=" * 60)
 print("PHASE F: Originality & Generality")
 print("=" * 60, flush=True)
 
+section_names = sorted(patent_section_map['cpc_section'].drop_nulls().unique().to_list())
+section_of = graph.codes(
+    patent_section_map['patent_key'].to_numpy(),
+    patent_section_map['cpc_section'].replace_strict(
+        section_names, list(range(len(section_names))), default=-1, return_dtype=pl.Int32
+    ).to_numpy(),
+)
+
 # Originality = 1 - HHI of CPC sections of backward citations
 print(f"  {elapsed()} Originality...", flush=True)
-cit_orig = citations.join(
-    patent_section_map.rename({'cpc_section': 'cited_section'}),
-    left_on='citation_patent_id', right_on='patent_id', how='inner'
-)
-# Count per (patent_id, cited_section), compute share^2, sum -> HHI
-orig_counts = cit_orig.group_by(['patent_id', 'cited_section']).agg(pl.count().alias('cnt'))
-orig_with_total = orig_counts.join(
-    orig_counts.group_by('patent_id').agg(pl.col('cnt').sum().alias('total')),
-    on='patent_id', how='left'
-)
-orig_with_total = orig_with_total.with_columns(
-    ((pl.col('cnt').cast(pl.Float64) / pl.col('total')) ** 2).alias('share_sq')
-)
-orig_hhi = orig_with_total.group_by('patent_id').agg([
-    pl.col('share_sq').sum().alias('hhi'),
-    pl.col('cited_section').n_unique().alias('n_sections'),
-])
-orig_hhi = orig_hhi.with_columns(
-    pl.when(pl.col('n_sections') == 1).then(pl.lit(0.0))
-    .otherwise((1.0 - pl.col('hhi')).clip(0.0, 1.0)).alias('originality')
-)
-patents = patents.join(orig_hhi.select(['patent_id', 'originality']), on='patent_id', how='left')
-del orig_counts, orig_with_total, orig_hhi, cit_orig; gc.collect()
+citation_metrics['originality'], _ = hhi_diversity(graph.bwd, section_of)
+patents = join_citation_metrics(patents, ['originality'])
 mean_orig = patents['originality'].mean()
 print(f"  {elapsed()} Mean originality: {mean_orig:.4f}", flush=True)
 
 # Generality = 1 - HHI of CPC sections of forward citations
 print(f"  {elapsed()} Generality...", flush=True)
-cit_gen = citations.join(
-    patent_section_map.rename({'cpc_section': 'citing_section'}),
-    on='patent_id', how='inner'
-).select(['citation_patent_id', 'citing_section']).rename({'citation_patent_id': 'patent_id'})
-
-gen_counts = cit_gen.group_by(['patent_id', 'citing_section']).agg(pl.count().alias('cnt'))
-gen_with_total = gen_counts.join(
-    gen_counts.group_by('patent_id').agg(pl.col('cnt').sum().alias('total')),
-    on='patent_id', how='left'
-)
-gen_with_total = gen_with_total.with_columns(
-    ((pl.col('cnt').cast(pl.Float64) / pl.col('total')) ** 2).alias('share_sq')
-)
-gen_hhi = gen_with_total.group_by('patent_id').agg([
-    pl.col('share_sq').sum().alias('hhi'),
-    pl.col('citing_section').n_unique().alias('n_sections'),
-])
-gen_hhi = gen_hhi.with_columns(
-    pl.when(pl.col('n_sections') == 1).then(pl.lit(0.0))
-    .otherwise((1.0 - pl.col('hhi')).clip(0.0, 1.0)).alias('generality')
-)
-patents = patents.join(gen_hhi.select(['patent_id', 'generality']), on='patent_id', how='left')
-del gen_counts, gen_with_total, gen_hhi, cit_gen, patent_section_map; gc.collect()
+citation_metrics['generality'], _ = hhi_diversity(graph.fwd, section_of)
+patents = join_citation_metrics(patents, ['generality'])
+del section_of, patent_section_map; gc.collect()
 mean_gen = patents['generality'].mean()
 print(f"  {elapsed()} Mean generality: {mean_gen:.4f}", flush=True)
 
@@ -554,45 +520,21 @@ print(f"\n{elapsed()} " + "=" * 60)
 print("PHASE G: Sleeping Beauty")
 print("=" * 60, flush=True)
 
-print(f"  {elapsed()} Computing early/late citations...", flush=True)
-patent_year_map = patents.select(['patent_id', 'year']).rename({'year': 'patent_year'})
-
-cit_years = citations.join(
-    patent_year_map.rename({'patent_id': 'citing_id', 'patent_year': 'citing_year'}),
-    left_on='patent_id', right_on='citing_id', how='inner'
-).join(
-    patent_year_map.rename({'patent_id': 'cited_id', 'patent_year': 'cited_year'}),
-    left_on='citation_patent_id', right_on='cited_id', how='inner'
-)
-cit_years = cit_years.with_columns(
-    (pl.col('citing_year') - pl.col('cited_year')).alias('years_after')
-).filter(
-    pl.col('years_after') >= 0
-)
-
-early_cites = cit_years.filter(pl.col('years_after') <= 10).group_by('citation_patent_id').agg(
-    pl.count().alias('early_cites')
-).rename({'citation_patent_id': 'patent_id'})
-late_cites = cit_years.filter(pl.col('years_after') > 10).group_by('citation_patent_id').agg(
-    pl.count().alias('late_cites')
-).rename({'citation_patent_id': 'patent_id'})
-
-patents = patents.join(early_cites, on='patent_id', how='left')
-patents = patents.join(late_cites, on='patent_id', how='left')
-patents = patents.with_columns([
-    pl.col('early_cites').fill_null(0).cast(pl.Int32),
-    pl.col('late_cites').fill_null(0).cast(pl.Int32),
-])
+print(f"  {elapsed()} Scoring yearly citation histories...", flush=True)
+# Shared definition (data-pipeline/sleeping_beauty.py): Ke et al. beauty
+# coefficient, awakening age and post-awakening burst, all patents at once
+scores = sleeping_beauty.detect(citation_cube.load())
+citation_metrics['beauty_sleeping'] = scores['is_sleeping_beauty']
+del scores
 
+patents = join_citation_metrics(patents, ['beauty_sleeping'])
 patents = patents.with_columns(
     ((pl.col('year') <= 2015) &
-     (pl.col('early_cites') <= 5) &
-     (pl.col('forward_citations') >= 50) &
-     (pl.col('late_cites') > pl.col('early_cites') * 3)).alias('is_sleeping_beauty')
-)
+     pl.col('beauty_sleeping').fill_null(False)).alias('is_sleeping_beauty')
+).drop('beauty_sleeping')
 sb_count = patents.filter(pl.col('is_sleeping_beauty')).height
 print(f"  {elapsed()} Sleeping beauties: {sb_count:,}", flush=True)
-del cit_years, early_cites, late_cites, citations, patent_year_map; gc.collect()
+del citation_metrics, graph; gc.collect()
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -3,14 +3,13 @@
 Chapter 1 – The Innovation Landscape
 Generates: patents_per_year, patents_per_month, claims_per_year, grant_lag, hero_stats
 """
-import duckdb
 from config import (
     PATENT_TSV, APPLICATION_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter1"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Patents per year by type ────────────────────────────────────────────────
 timed_msg("patents_per_year: patent counts by year and type")
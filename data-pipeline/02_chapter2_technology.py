@@ -4,14 +4,13 @@ Chapter 2 – The Technology Revolution
 Generates: wipo_sectors_per_year, wipo_fields_per_year, cpc_sections_per_year,
            cpc_class_change, tech_diversity
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, CPC_TITLE_TSV, WIPO_TSV, OUTPUT_DIR,
-    CPC_SECTION_NAMES, query_to_json, save_json, timed_msg,
+    CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter2"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) WIPO sectors per year ──────────────────────────────────────────────────
 timed_msg("wipo_sectors_per_year: patent counts by WIPO sector and year")
@@ -4,14 +4,13 @@ Chapter 3 – Who Innovates
 Generates: assignee_types_per_year, top_assignees, top_orgs_over_time,
            domestic_vs_foreign, concentration
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter3"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Assignee types per year ────────────────────────────────────────────────
 timed_msg("assignee_types_per_year: Corporate / Individual / Government by year")
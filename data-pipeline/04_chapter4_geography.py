@@ -4,14 +4,13 @@ Chapter 4 – The Geography of Innovation
 Generates: us_states_per_year, us_states_summary, countries_per_year,
            top_cities, state_specialization
 """
-import duckdb
 from config import (
     PATENT_TSV, INVENTOR_TSV, LOCATION_TSV, CPC_CURRENT_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter4"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) US states per year ────────────────────────────────────────────────────
 timed_msg("us_states_per_year: patent counts by US state and year")
@@ -4,14 +4,13 @@ Chapter 5 – The Inventors
 Generates: team_size_per_year, gender_per_year, gender_by_sector,
            prolific_inventors, inventor_entry
 """
-import duckdb
 from config import (
     PATENT_TSV, INVENTOR_TSV, WIPO_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Team size per year ────────────────────────────────────────────────────
 timed_msg("team_size_per_year: avg/median team size, solo %, large team %")
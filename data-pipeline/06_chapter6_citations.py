@@ -4,14 +4,13 @@ Chapter 6 – The Knowledge Network
 Generates: citations_per_year, citation_categories, citation_lag,
            gov_funded_per_year, gov_agencies
 """
-import duckdb
 from config import (
     PATENT_TSV, CITATION_TSV, GOV_INTEREST_TSV, GOV_INTEREST_ORG_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter6"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Citations received per year ───────────────────────────────────────────
 timed_msg("citations_per_year: avg and median citations per patent by grant year")
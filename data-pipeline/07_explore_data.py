@@ -3,15 +3,14 @@
 Explore – Interactive Data for the Explore Page
 Generates: top_assignees_all, top_inventors_all, cpc_class_summary, wipo_field_summary
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV, CPC_CURRENT_TSV, CPC_TITLE_TSV,
     WIPO_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/explore"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Top 500 assignees ────────────────────────────────────────────────────
 timed_msg("top_assignees_all: top 500 organizations")
@@ -4,15 +4,14 @@ Chapter 7 – Innovation Dynamics
 Generates: grant_lag_by_sector, cross_domain, intl_collaboration,
            corp_diversification, innovation_velocity
 """
-import duckdb
 from config import (
     PATENT_TSV, APPLICATION_TSV, CPC_CURRENT_TSV, WIPO_TSV,
     ASSIGNEE_TSV, INVENTOR_TSV, LOCATION_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter7"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Grant lag by WIPO sector and 5-year period ────────────────────────────
 timed_msg("grant_lag_by_sector: average/median grant lag by sector and period")
@@ -3,14 +3,13 @@
 Chapter 3 Deep – Firm-level analyses
 Generates: firm_collaboration_network, firm_citation_impact, firm_tech_evolution
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CITATION_TSV, CPC_CURRENT_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg, CPC_SECTION_NAMES,
+    query_to_json, save_json, timed_msg, CPC_SECTION_NAMES, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter3"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Firm collaboration network ────────────────────────────────────────────
 timed_msg("firm_collaboration_network: ALL orgs with co-patenting ties")
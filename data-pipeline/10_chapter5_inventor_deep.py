@@ -3,44 +3,33 @@
 Chapter 5 Deep – Inventor-level analyses
 Generates: inventor_collaboration_network, inventor_longevity, star_inventor_impact
 """
-import duckdb
 import numpy as np
+
+import coinventor_graph
 from config import (
-    PATENT_TSV, INVENTOR_TSV, CITATION_TSV, OUTPUT_DIR,
-    query_to_json, save_json, timed_msg,
+    PATENT_TSV, INVENTOR_TSV, INVENTOR_IDS, CITATION_TSV, OUTPUT_DIR,
+    query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Inventor collaboration network ────────────────────────────────────────
 timed_msg("inventor_collaboration_network: ALL inventors with co-invention ties")
 
-# Find ALL co-invention edges (no top-N limit).
-# Optimization: first identify patents with 2+ inventors, then self-join only those.
+# Find ALL co-invention edges (no top-N limit) from the per-year co-inventor
+# pair spills (coinventor_graph.py) instead of an inventor self-join.
 EDGE_THRESHOLD = 200
 edges_df = con.execute(f"""
-    WITH multi_inv AS (
-        SELECT patent_id
-        FROM {INVENTOR_TSV()}
-        GROUP BY patent_id
-        HAVING COUNT(DISTINCT inventor_id) >= 2
-    ),
-    filtered AS (
-        SELECT i.patent_id, i.inventor_id
-        FROM {INVENTOR_TSV()} i
-        JOIN multi_inv m ON i.patent_id = m.patent_id
-    )
     SELECT
-        f1.inventor_id AS source,
-        f2.inventor_id AS target,
-        COUNT(DISTINCT f1.patent_id) AS weight
-    FROM filtered f1
-    JOIN filtered f2
-      ON f1.patent_id = f2.patent_id AND f1.inventor_id < f2.inventor_id
-    GROUP BY source, target
-    HAVING weight >= {EDGE_THRESHOLD}
-    ORDER BY weight DESC
+        ia.inventor_id AS source,
+        ib.inventor_id AS target,
+        e.patents AS weight
+    FROM ({coinventor_graph.edges_sql()}) e
+    JOIN {INVENTOR_IDS()} ia ON e.inventor_key_a = ia.inventor_key
+    JOIN {INVENTOR_IDS()} ib ON e.inventor_key_b = ib.inventor_key
+    WHERE e.patents >= {EDGE_THRESHOLD}
+    ORDER BY weight DESC, source, target
 """).fetchdf()
 print(f"  Found {len(edges_df)} edges with weight >= {EDGE_THRESHOLD}")
 
@@ -10,16 +10,15 @@ Generates:
   - quality_by_sector.json
   - breakthrough_patents.json
 """
-import duckdb
 import numpy as np
 from config import (
     PATENT_TSV, APPLICATION_TSV, CPC_CURRENT_TSV, CITATION_TSV,
     INVENTOR_TSV, ASSIGNEE_TSV, WIPO_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, PATENT_MASTER, query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter9"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Quality trends ────────────────────────────────────────────────────────
 timed_msg("quality_trends: main time series of quality indicators by year")
@@ -108,70 +107,22 @@ query_to_json(con, f"""
 # ── b) Originality & Generality ──────────────────────────────────────────────
 timed_msg("originality_generality: HHI-based diversity indices by year")
 
+# Per-patent indices (and classified-citation counts) are patent master columns,
+# computed in one pass over the citation graph; an index needs >= 2 citations.
 query_to_json(con, f"""
-    WITH patent_year AS (
-        SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-        FROM {PATENT_TSV()}
-        WHERE patent_type = 'utility'
-          AND patent_date IS NOT NULL
-          AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1976 AND 2025
-    ),
-    -- Originality: diversity of CPC sections in backward citations
-    backward_sections AS (
-        SELECT
-            c.patent_id,
-            LEFT(cpc.cpc_section, 1) AS section,
-            COUNT(*) AS cnt
-        FROM {CITATION_TSV()} c
-        JOIN {CPC_CURRENT_TSV()} cpc ON c.citation_patent_id = cpc.patent_id AND cpc.cpc_sequence = 0
-        GROUP BY c.patent_id, LEFT(cpc.cpc_section, 1)
-    ),
-    backward_hhi AS (
-        SELECT
-            patent_id,
-            SUM(POWER(CAST(cnt AS DOUBLE) / total, 2)) AS hhi
-        FROM (
-            SELECT bs.patent_id, bs.section, bs.cnt, SUM(bs.cnt) OVER (PARTITION BY bs.patent_id) AS total
-            FROM backward_sections bs
-        ) sub
-        WHERE total >= 2
-        GROUP BY patent_id
-    ),
-    originality AS (
-        SELECT py.year, ROUND(AVG(1.0 - bh.hhi), 4) AS avg_originality,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY 1.0 - bh.hhi) AS median_originality
-        FROM patent_year py
-        JOIN backward_hhi bh ON py.patent_id = bh.patent_id
-        GROUP BY py.year
-    ),
-    -- Generality: diversity of CPC sections in forward citations
-    forward_sections AS (
-        SELECT
-            c.citation_patent_id AS patent_id,
-            LEFT(cpc.cpc_section, 1) AS section,
-            COUNT(*) AS cnt
-        FROM {CITATION_TSV()} c
-        JOIN {CPC_CURRENT_TSV()} cpc ON c.patent_id = cpc.patent_id AND cpc.cpc_sequence = 0
-        GROUP BY c.citation_patent_id, LEFT(cpc.cpc_section, 1)
-    ),
-    forward_hhi AS (
-        SELECT
-            patent_id,
-            SUM(POWER(CAST(cnt AS DOUBLE) / total, 2)) AS hhi
-        FROM (
-            SELECT fs.patent_id, fs.section, fs.cnt, SUM(fs.cnt) OVER (PARTITION BY fs.patent_id) AS total
-            FROM forward_sections fs
-        ) sub
-        WHERE total >= 2
-        GROUP BY patent_id
+    WITH originality AS (
+        SELECT grant_year AS year, ROUND(AVG(originality), 4) AS avg_originality,
+               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY originality) AS median_originality
+        FROM {PATENT_MASTER()}
+        WHERE originality_n >= 2
+        GROUP BY grant_year
     ),
     generality AS (
-        SELECT py.year, ROUND(AVG(1.0 - fh.hhi), 4) AS avg_generality,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY 1.0 - fh.hhi) AS median_generality
-        FROM patent_year py
-        JOIN forward_hhi fh ON py.patent_id = fh.patent_id
-        WHERE py.year <= 2020
-        GROUP BY py.year
+        SELECT grant_year AS year, ROUND(AVG(generality), 4) AS avg_generality,
+               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY generality) AS median_generality
+        FROM {PATENT_MASTER()}
+        WHERE grant_year <= 2020 AND generality_n >= 2
+        GROUP BY grant_year
     )
     SELECT
         COALESCE(o.year, g.year) AS year,
@@ -10,14 +10,13 @@ Generates:
   - inventor_country_flows.json — country-to-country migration flows (top flows)
   - inventor_mobility_trend.json — mobility rate over time
 """
-import duckdb
 from config import (
     PATENT_TSV, INVENTOR_TSV, LOCATION_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter4"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) State-to-state flows ─────────────────────────────────────────────────
 timed_msg("inventor_state_flows: migration between US states")
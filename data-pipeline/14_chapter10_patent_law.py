@@ -7,14 +7,17 @@ Generates data for three visualizations that complement the legal narrative:
   - applications_vs_grants.json  — Filing vs grant activity per year
   - convergence_matrix.json      — CPC section co-occurrence by era
 """
-import duckdb
+import numpy as np
+
+import cooccurrence
+import cpc_incidence
 from config import (
     PATENT_TSV, APPLICATION_TSV, CPC_CURRENT_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, query_to_json, save_json, sql_round, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter10"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) HHI by CPC section per 5-year period ─────────────────────────────────
 timed_msg("hhi_by_section: HHI market concentration per CPC section per 5-year period")
@@ -148,73 +151,26 @@ query_to_json(con, f"""
 # ── c) Technology convergence matrix ─────────────────────────────────────────
 timed_msg("convergence_matrix: CPC section co-occurrence by era")
 
-query_to_json(con, f"""
-    WITH patent_year AS (
-        SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS yr
-        FROM {PATENT_TSV()}
-        WHERE patent_type = 'utility'
-          AND patent_date IS NOT NULL
-          AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1976 AND 2025
-    ),
-    patent_sections AS (
-        SELECT DISTINCT py.patent_id, py.yr,
-               LEFT(cpc.cpc_section, 1) AS section
-        FROM patent_year py
-        JOIN {CPC_CURRENT_TSV()} cpc ON py.patent_id = cpc.patent_id
-        WHERE LEFT(cpc.cpc_section, 1) != 'Y'
-    ),
-    -- Only patents with 2+ distinct sections
-    multi_section AS (
-        SELECT patent_id, yr
-        FROM patent_sections
-        GROUP BY patent_id, yr
-        HAVING COUNT(DISTINCT section) >= 2
-    ),
-    -- Generate all ordered pairs for multi-section patents
-    pairs AS (
-        SELECT
-            ps1.patent_id,
-            ps1.yr,
-            ps1.section AS section_row,
-            ps2.section AS section_col
-        FROM patent_sections ps1
-        JOIN patent_sections ps2
-            ON ps1.patent_id = ps2.patent_id AND ps1.section < ps2.section
-        JOIN multi_section ms ON ps1.patent_id = ms.patent_id
-    ),
-    era_label AS (
-        SELECT *,
-            CASE
-                WHEN yr BETWEEN 1976 AND 1995 THEN '1976-1995'
-                WHEN yr BETWEEN 1996 AND 2010 THEN '1996-2010'
-                WHEN yr BETWEEN 2011 AND 2025 THEN '2011-2025'
-            END AS era
-        FROM pairs
-    ),
-    era_totals AS (
-        SELECT era, COUNT(DISTINCT patent_id) AS era_total
-        FROM era_label
-        GROUP BY era
-    ),
-    pair_counts AS (
-        SELECT
-            el.era,
-            el.section_row,
-            el.section_col,
-            COUNT(DISTINCT el.patent_id) AS patent_count
-        FROM era_label el
-        GROUP BY el.era, el.section_row, el.section_col
-    )
-    SELECT
-        pc.era,
-        pc.section_row,
-        pc.section_col,
-        ROUND(100.0 * pc.patent_count / et.era_total, 2) AS co_occurrence_pct,
-        pc.patent_count
-    FROM pair_counts pc
-    JOIN era_totals et ON pc.era = et.era
-    ORDER BY pc.era, pc.section_row, pc.section_col
-""", f"{OUT}/convergence_matrix.json")
+# Section co-occurrence per era from the patent x section incidence matrix
+# (cooccurrence.py): (X_era.T @ X_era)[i, j] counts the patents with both
+# sections. Shares are of the era's patents with 2+ distinct non-Y sections.
+ERAS = {"1976-1995": (1976, 1995), "1996-2010": (1996, 2010), "2011-2025": (2011, 2025)}
+inc = cpc_incidence.load()
+non_y = [i for i, s in enumerate(inc.labels["section"]) if s != "Y"]
+sections = [inc.labels["section"][i] for i in non_y]
+multi = np.diff(inc.matrix("section")[:, non_y].tocsr().indptr) >= 2
+records = []
+for era, co in inc.co_occurrence("section", ERAS, columns=non_y).items():
+    era_total = int((multi & inc.years(*ERAS[era])).sum())
+    for a, b, cnt in zip(*cooccurrence.pairs(co)):
+        records.append({
+            "era": era,
+            "section_row": sections[a],
+            "section_col": sections[b],
+            "co_occurrence_pct": sql_round(100.0 * cnt / era_total, 2),
+            "patent_count": int(cnt),
+        })
+save_json(records, f"{OUT}/convergence_matrix.json")
 
 con.close()
 print("\n=== Chapter 10: Patent Law & Policy complete ===\n")
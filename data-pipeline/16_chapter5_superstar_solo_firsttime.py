@@ -8,14 +8,13 @@ Outputs:
   - chapter5/solo_inventors.json            — solo inventor share over time + tech areas
   - chapter5/first_time_inventors.json      — share of patents with debut inventors
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, INVENTOR_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 
 # ── #4: Superstar Inventor Concentration ─────────────────────────────────────
 timed_msg("superstar_concentration: top 1%/5% inventor patent share by year")
@@ -5,14 +5,13 @@ Measure time between cited patent grant and citing patent grant.
 
 Output: chapter6/citation_lag_by_section.json
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter6"
-con = duckdb.connect()
+con = get_connection()
 
 # ── Citation lag by CPC section and decade ───────────────────────────────────
 timed_msg("citation_lag_by_section: median citation lag by technology area and decade")
@@ -6,14 +6,13 @@ average into composite index by year and CPC section.
 
 Output: chapter9/composite_quality_index.json
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV, APPLICATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter9"
-con = duckdb.connect()
+con = get_connection()
 
 timed_msg("composite_quality_index: Z-score composite quality by year and CPC section")
 
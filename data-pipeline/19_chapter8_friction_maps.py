@@ -6,14 +6,13 @@ Heatmap: CPC section × 5-year period, colored by median examination duration.
 
 Output: chapter7/friction_map.json
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, APPLICATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter7"
-con = duckdb.connect()
+con = get_connection()
 
 timed_msg("friction_map: examination duration by CPC section and period")
 
@@ -7,14 +7,13 @@ Outputs:
   - chapter5/inventor_mobility.json           — mobile vs non-mobile citation comparison
   - chapter5/inventor_mobility_by_decade.json — mobility rate over time
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV, CITATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 
 # ── Inventor mobility: citation comparison ───────────────────────────────────
 timed_msg("inventor_mobility: mobile vs non-mobile inventor citation comparison")
@@ -5,14 +5,13 @@ LQ = (share of tech X in metro) / (share of tech X nationally)
 
 Output: chapter4/regional_specialization.json
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, INVENTOR_TSV, LOCATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter4"
-con = duckdb.connect()
+con = get_connection()
 
 timed_msg("regional_specialization: Location Quotient per city × CPC section")
 
@@ -7,38 +7,31 @@ Outputs:
   - chapter11/ai_strategies.json     — AI sub-area counts per top assignee
   - chapter11/ai_gpt_diffusion.json  — AI patent co-occurrence with non-AI CPC sections over time
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
+from cpc_taxonomy import PrefixMatcher, cpc_code
 
 OUT = f"{OUTPUT_DIR}/chapter11"
-con = duckdb.connect()
+con = get_connection()
 
-AI_CLASSES_SQL = """
-    (cpc_group LIKE 'G06N%'
-     OR cpc_group LIKE 'G06F18%'
-     OR cpc_subclass = 'G06V'
-     OR cpc_group LIKE 'G10L15%'
-     OR cpc_group LIKE 'G06F40%')
-"""
-
-AI_SUBFIELD_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'G06N3%' THEN 'Neural Networks / Deep Learning'
-        WHEN cpc_group LIKE 'G06N20%' THEN 'Machine Learning'
-        WHEN cpc_group LIKE 'G06N5%' THEN 'Knowledge-Based Systems'
-        WHEN cpc_group LIKE 'G06N7%' THEN 'Probabilistic / Fuzzy'
-        WHEN cpc_group LIKE 'G06N10%' THEN 'Quantum Computing'
-        WHEN cpc_group LIKE 'G06N%' THEN 'Other Computational Models'
-        WHEN cpc_group LIKE 'G06F18%' THEN 'Pattern Recognition'
-        WHEN cpc_subclass = 'G06V' THEN 'Computer Vision'
-        WHEN cpc_group LIKE 'G10L15%' THEN 'Speech Recognition'
-        WHEN cpc_group LIKE 'G06F40%' THEN 'Natural Language Processing'
-        ELSE 'Other AI'
-    END
-"""
+# AI subfields by CPC prefix (first match wins); a code is AI when it matches
+# any of them. The rules are applied once to the distinct CPC codes.
+AI_SUBFIELDS = PrefixMatcher({
+    "Neural Networks / Deep Learning": "G06N3",
+    "Machine Learning": "G06N20",
+    "Knowledge-Based Systems": "G06N5",
+    "Probabilistic / Fuzzy": "G06N7",
+    "Quantum Computing": "G06N10",
+    "Other Computational Models": "G06N",
+    "Pattern Recognition": "G06F18",
+    "Computer Vision": "G06V",
+    "Speech Recognition": "G10L15",
+    "Natural Language Processing": "G06F40",
+})
+con.register("ai_codes", AI_SUBFIELDS.code_table(con, CPC_CURRENT_TSV(), as_col="subfield"))
+AI_CLASSES_SQL = f"{cpc_code()} IN (SELECT cpc_code FROM ai_codes)"
 
 # ── #11: AI Strategies per company ───────────────────────────────────────────
 timed_msg("ai_strategies: AI sub-area patent counts per top company")
@@ -46,11 +39,11 @@ timed_msg("ai_strategies: AI sub-area patent counts per top company")
 query_to_json(con, f"""
     WITH ai_classified AS (
         SELECT DISTINCT cpc.patent_id,
-               {AI_SUBFIELD_SQL} AS subfield
+               codes.subfield
         FROM {CPC_CURRENT_TSV()} cpc
+        JOIN ai_codes codes ON {cpc_code('cpc')} = codes.cpc_code
         JOIN {PATENT_TSV()} p ON cpc.patent_id = p.patent_id
-        WHERE {AI_CLASSES_SQL}
-          AND p.patent_type = 'utility'
+        WHERE p.patent_type = 'utility'
           AND p.patent_date IS NOT NULL
           AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
     ),
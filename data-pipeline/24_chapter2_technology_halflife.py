@@ -1,81 +1,41 @@
 #!/usr/bin/env python3
 """
 Analysis #13 – The Half-Life of Technology
-Measure how quickly patents become obsolete via forward citation decay curves.
+Measure how quickly patents become obsolete via forward citation decay curves
+(citations by grant-year age, from the citation-age cube).
 
 Output: chapter2/technology_halflife.json
 """
-import duckdb
 from config import (
-    PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    PATENT_MASTER,
+    OUTPUT_DIR, save_json, timed_msg, get_connection,
 )
-import numpy as np
+from citation_cube import group_by, half_life
 
 OUT = f"{OUTPUT_DIR}/chapter2"
-con = duckdb.connect()
+con = get_connection()
 
 timed_msg("technology_halflife: citation decay by CPC section")
 
-# Get raw citation decay data per section
-decay_data = con.execute(f"""
-    WITH cited AS (
-        SELECT p.patent_id, CAST(p.patent_date AS DATE) AS grant_date,
-               LEFT(cpc.cpc_section, 1) AS section
-        FROM {PATENT_TSV()} p
-        JOIN {CPC_CURRENT_TSV()} cpc ON p.patent_id = cpc.patent_id AND cpc.cpc_sequence = 0
-        WHERE p.patent_type = 'utility'
-          AND p.patent_date IS NOT NULL
-          AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2010
-          AND LEFT(cpc.cpc_section, 1) != 'Y'
-    ),
-    citing AS (
-        SELECT patent_id, CAST(patent_date AS DATE) AS grant_date
-        FROM {PATENT_TSV()}
-        WHERE patent_date IS NOT NULL
-    ),
-    cite_age AS (
-        SELECT
-            cd.section,
-            LEAST(CAST(DATEDIFF('day', cd.grant_date, cg.grant_date) / 365.25 AS INTEGER), 30) AS years_after,
-            COUNT(*) AS cites
-        FROM {CITATION_TSV()} c
-        JOIN cited cd ON c.citation_patent_id = cd.patent_id
-        JOIN citing cg ON c.patent_id = cg.patent_id
-        WHERE DATEDIFF('day', cd.grant_date, cg.grant_date) > 0
-        GROUP BY cd.section, years_after
-    )
-    SELECT section, years_after, cites
-    FROM cite_age
-    WHERE years_after BETWEEN 0 AND 30
-    ORDER BY section, years_after
-""").fetchdf()
+# Citations by years after grant per section, off the citation-age cube
+# (ages beyond 30 pooled into 30)
+decay_data = group_by(con, f"""
+    SELECT patent_key, cpc_section AS section
+    FROM {PATENT_MASTER()}
+    WHERE grant_year BETWEEN 1976 AND 2010
+      AND cpc_section != 'Y'
+""", ["section"], cap_age=30).rename(columns={"age": "years_after", "citations": "cites"})
 
 # Compute half-life per section
-sections = decay_data['section'].unique()
 results = []
-for section in sorted(sections):
-    sdata = decay_data[decay_data['section'] == section].sort_values('years_after')
-    years = sdata['years_after'].values
-    cites = sdata['cites'].values
-    cum = np.cumsum(cites)
-    total = cum[-1] if len(cum) > 0 else 0
+for section, sdata in decay_data.groupby("section", sort=True):
+    total = sdata['cites'].sum()
     if total == 0:
         continue
-    cum_pct = cum / total
-    # Find half-life: year where 50% of cumulative citations received
-    half_life = None
-    for i, pct in enumerate(cum_pct):
-        if pct >= 0.5:
-            half_life = float(years[i])
-            # Interpolate
-            if i > 0:
-                prev_pct = cum_pct[i-1]
-                half_life = float(years[i-1]) + (0.5 - prev_pct) / (pct - prev_pct)
-            break
+    half = half_life(sdata['years_after'].values, sdata['cites'].values)
     results.append({
         'section': section,
-        'half_life_years': round(half_life, 1) if half_life else None,
+        'half_life_years': round(half, 1) if half else None,
         'total_citations': int(total),
     })
 
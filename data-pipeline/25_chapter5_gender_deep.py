@@ -8,14 +8,13 @@ Outputs:
   - chapter5/gender_team_quality.json   — citation comparison by team gender composition
   - chapter5/gender_section_trend.json  — female share by CPC section over time
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, INVENTOR_TSV, CITATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 
 # ── Gender × Technology distribution ─────────────────────────────────────────
 timed_msg("gender_by_tech: technology distribution by inventor gender")
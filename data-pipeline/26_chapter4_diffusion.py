@@ -6,19 +6,26 @@ Output as city-level patent counts per year per section for map visualization.
 
 Output: chapter4/innovation_diffusion.json
 """
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, INVENTOR_TSV, LOCATION_TSV,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    OUTPUT_DIR, query_to_json_stream, timed_msg, get_connection,
 )
+from cpc_taxonomy import PrefixMatcher, cpc_code
 
 OUT = f"{OUTPUT_DIR}/chapter4"
-con = duckdb.connect()
+con = get_connection()
 
 timed_msg("innovation_diffusion: geographic spread of AI, biotech, clean energy by 5-year period")
 
 # Focus on 3 interesting technology areas: AI (G06N), Biotech (C12), Clean Energy (Y02E → use F03/F24/H02S)
-query_to_json(con, f"""
+TECH_AREAS = PrefixMatcher({
+    "AI": ("G06N", "G06F18", "G06V"),
+    "Biotech & Pharma": ("C12", "A61K"),
+    "Clean Energy": ("H01M", "H02S", "F03D", "F24S"),
+})
+con.register("tech_codes", TECH_AREAS.code_table(con, CPC_CURRENT_TSV(), as_col="tech_area"))
+
+query_to_json_stream(con, f"""
     WITH patent_year AS (
         SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS yr
         FROM {PATENT_TSV()}
@@ -26,19 +33,9 @@ query_to_json(con, f"""
           AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1976 AND 2025
     ),
     tech_patents AS (
-        SELECT DISTINCT cpc.patent_id,
-            CASE
-                WHEN cpc.cpc_group LIKE 'G06N%' OR cpc.cpc_group LIKE 'G06F18%'
-                     OR cpc.cpc_subclass = 'G06V' THEN 'AI'
-                WHEN cpc.cpc_subclass LIKE 'C12%' OR cpc.cpc_subclass LIKE 'A61K%' THEN 'Biotech & Pharma'
-                WHEN cpc.cpc_subclass LIKE 'H01M%' OR cpc.cpc_subclass LIKE 'H02S%'
-                     OR cpc.cpc_subclass LIKE 'F03D%' OR cpc.cpc_subclass LIKE 'F24S%' THEN 'Clean Energy'
-            END AS tech_area
+        SELECT DISTINCT cpc.patent_id, tc.tech_area
         FROM {CPC_CURRENT_TSV()} cpc
-        WHERE cpc.cpc_group LIKE 'G06N%' OR cpc.cpc_group LIKE 'G06F18%' OR cpc.cpc_subclass = 'G06V'
-           OR cpc.cpc_subclass LIKE 'C12%' OR cpc.cpc_subclass LIKE 'A61K%'
-           OR cpc.cpc_subclass LIKE 'H01M%' OR cpc.cpc_subclass LIKE 'H02S%'
-           OR cpc.cpc_subclass LIKE 'F03D%' OR cpc.cpc_subclass LIKE 'F24S%'
+        JOIN tech_codes tc ON {cpc_code('cpc')} = tc.cpc_code
     ),
     with_location AS (
         SELECT tp.patent_id, tp.tech_area, py.yr,
@@ -4,103 +4,139 @@ Analyses #7, #14 – Collaboration Network Temporal Evolution + Six Degrees
 Compute network structure metrics by decade.
 
 Outputs:
-  - chapter3/network_metrics_by_decade.json — node/edge/degree/component metrics per decade
-  - chapter3/bridge_inventors.json          — top betweenness centrality inventors (sampled)
+  - chapter3/network_metrics_by_decade.json — node/edge/degree/component/clustering metrics
+                                              per decade, over the full co-inventor graph
+                                              (coinventor_graph.py)
+  - chapter3/path_lengths_by_decade.json    — mean shortest-path distance and effective (90%)
+                                              diameter of each decade's giant component, with
+                                              95% bootstrap intervals, from batched BFS over
+                                              sampled source inventors
+  - chapter3/path_length_distribution.json  — share of connected pairs at each distance, per decade
+  - chapter3/network_evolution_yearly.json   — nodes, edges, degree and component metrics of
+                                              5-year windows stepped annually, from one
+                                              incremental pass (coinventor_graph.TemporalGraph)
+  - chapter3/bridge_inventors.json          — inventors connecting the most organizations
 """
-import duckdb
+import numpy as np
+
+import coinventor_graph
 from config import (
-    PATENT_TSV, INVENTOR_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    PATENT_TSV, INVENTOR_TSV, ASSIGNEE_TSV, PATENT_YEAR,
+    OUTPUT_DIR, save_json, timed_msg, get_connection,
 )
 
 OUT_CH3 = f"{OUTPUT_DIR}/chapter3"
-con = duckdb.connect()
+EVOLUTION_WINDOW = 5  # grant years per sliding window
+con = get_connection()
 
 # ── Network metrics by decade ────────────────────────────────────────────────
-timed_msg("network_metrics: co-inventor/co-assignee network metrics per decade")
+timed_msg("network_metrics: co-inventor network metrics per decade")
 
-# Compute basic network statistics from co-invention edges per decade
-# Full graph analysis is too expensive; compute summary statistics via SQL
-metrics = con.execute(f"""
-    WITH patent_year AS (
-        SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS yr
-        FROM {PATENT_TSV()}
-        WHERE patent_type = 'utility' AND patent_date IS NOT NULL
-          AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1976 AND 2025
-    ),
-    -- Co-inventor edges (undirected, within same patent)
-    coinventor_edges AS (
-        SELECT DISTINCT
-            CAST(FLOOR(py.yr / 10) * 10 AS INTEGER) AS decade,
-            LEAST(i1.inventor_id, i2.inventor_id) AS inv1,
-            GREATEST(i1.inventor_id, i2.inventor_id) AS inv2
-        FROM {INVENTOR_TSV()} i1
-        JOIN {INVENTOR_TSV()} i2 ON i1.patent_id = i2.patent_id AND i1.inventor_id < i2.inventor_id
-        JOIN patent_year py ON i1.patent_id = py.patent_id
-    ),
-    decade_edges AS (
-        SELECT decade, COUNT(*) AS num_edges
-        FROM coinventor_edges
-        GROUP BY decade
-    ),
-    -- Active inventors per decade
-    decade_nodes AS (
-        SELECT CAST(FLOOR(py.yr / 10) * 10 AS INTEGER) AS decade,
-               COUNT(DISTINCT i.inventor_id) AS num_nodes
-        FROM {INVENTOR_TSV()} i
-        JOIN patent_year py ON i.patent_id = py.patent_id
-        GROUP BY decade
-    ),
-    -- Avg degree approximation: 2 * edges / nodes
-    decade_patents AS (
-        SELECT CAST(FLOOR(yr / 10) * 10 AS INTEGER) AS decade,
-               COUNT(DISTINCT patent_id) AS num_patents
-        FROM patent_year
-        GROUP BY decade
-    ),
-    -- Avg team size per decade
-    team_info AS (
-        SELECT py.patent_id, CAST(FLOOR(py.yr / 10) * 10 AS INTEGER) AS decade,
+# Patents and team sizes per decade (no pairs needed)
+teams = con.execute(f"""
+    WITH team_info AS (
+        SELECT py.patent_id,
+               CAST(FLOOR(py.grant_year / 10) * 10 AS INTEGER) AS decade,
                COUNT(DISTINCT i.inventor_id) AS team_size
         FROM {INVENTOR_TSV()} i
-        JOIN patent_year py ON i.patent_id = py.patent_id
+        JOIN {PATENT_YEAR()} py ON i.patent_id = py.patent_id
         GROUP BY py.patent_id, decade
     ),
-    team_stats AS (
-        SELECT decade, ROUND(AVG(team_size), 2) AS avg_team_size
-        FROM team_info
+    decade_patents AS (
+        SELECT CAST(FLOOR(grant_year / 10) * 10 AS INTEGER) AS decade,
+               COUNT(DISTINCT patent_id) AS num_patents
+        FROM {PATENT_YEAR()}
         GROUP BY decade
     )
-    SELECT
-        dn.decade,
-        CONCAT(CAST(dn.decade AS VARCHAR), 's') AS decade_label,
-        dn.num_nodes,
-        de.num_edges,
-        dp.num_patents,
-        ROUND(2.0 * de.num_edges / dn.num_nodes, 2) AS avg_degree,
-        ts.avg_team_size
-    FROM decade_nodes dn
-    JOIN decade_edges de ON dn.decade = de.decade
-    JOIN decade_patents dp ON dn.decade = dp.decade
-    JOIN team_stats ts ON dn.decade = ts.decade
-    WHERE dn.decade BETWEEN 1980 AND 2020
-    ORDER BY dn.decade
+    SELECT dp.decade,
+           dp.num_patents,
+           ROUND(AVG(ti.team_size), 2) AS avg_team_size
+    FROM decade_patents dp
+    JOIN team_info ti ON dp.decade = ti.decade
+    WHERE dp.decade BETWEEN 1980 AND 2020
+    GROUP BY dp.decade, dp.num_patents
+    ORDER BY dp.decade
 """).fetchdf()
 
+# Graph structure on the full co-inventor network of each decade (CSR graph)
 records = []
-for _, row in metrics.iterrows():
+for _, row in teams.iterrows():
+    decade = int(row['decade'])
+    g = coinventor_graph.load(f"{decade}s")
+    sizes = np.bincount(g.components())
+    sizes = sizes[sizes > 0]
+    avg_clustering, transitivity = g.clustering()
     records.append({
-        'decade': int(row['decade']),
-        'decade_label': row['decade_label'],
-        'num_nodes': int(row['num_nodes']),
-        'num_edges': int(row['num_edges']),
+        'decade': decade,
+        'decade_label': f"{decade}s",
+        'num_nodes': g.n,
+        'num_edges': g.m,
         'num_patents': int(row['num_patents']),
-        'avg_degree': float(row['avg_degree']),
+        'avg_degree': round(2.0 * g.m / g.n, 2) if g.n else 0.0,
         'avg_team_size': float(row['avg_team_size']),
+        'num_components': len(sizes),
+        'giant_component_share': round(float(sizes.max()) / g.n, 4) if g.n else 0.0,
+        'avg_clustering': round(avg_clustering, 4),
+        'transitivity': round(transitivity, 4),
     })
+    print(f"  {decade}s: {g.n:,} inventors, {g.m:,} edges, {len(sizes):,} components")
 
 save_json(records, f"{OUT_CH3}/network_metrics_by_decade.json")
 
+# ── Six degrees: shortest-path lengths by decade ─────────────────────────────
+timed_msg("path_lengths: shortest-path distances between co-inventors per decade")
+
+path_records, dist_records = [], []
+for decade in teams['decade'].astype(int):
+    g = coinventor_graph.load(f"{decade}s")
+    if not g.m:
+        continue
+    sources = g.sample_sources()
+    stats = coinventor_graph.path_lengths(g.distance_counts(sources))
+    path_records.append({
+        'decade': decade,
+        'decade_label': f"{decade}s",
+        'sampled_sources': stats['sources'],
+        'connected_pairs_sampled': stats['connected_pairs'],
+        'mean_distance': round(stats['mean_distance'], 3),
+        'mean_distance_ci_low': round(stats['mean_distance_ci'][0], 3),
+        'mean_distance_ci_high': round(stats['mean_distance_ci'][1], 3),
+        'effective_diameter': round(stats['effective_diameter'], 3),
+        'effective_diameter_ci_low': round(stats['effective_diameter_ci'][0], 3),
+        'effective_diameter_ci_high': round(stats['effective_diameter_ci'][1], 3),
+        'max_distance_observed': stats['max_distance'],
+    })
+    dist_records += [
+        {'decade': decade, 'distance': d, 'share_pct': round(100.0 * share, 4)}
+        for d, share in stats['distribution'].items()
+    ]
+    print(f"  {decade}s: mean distance {stats['mean_distance']:.2f}, "
+          f"effective diameter {stats['effective_diameter']:.2f} ({len(sources):,} sources)")
+
+save_json(path_records, f"{OUT_CH3}/path_lengths_by_decade.json")
+save_json(dist_records, f"{OUT_CH3}/path_length_distribution.json")
+
+# ── Yearly network evolution: sliding windows ────────────────────────────────
+timed_msg(f"network_evolution: {EVOLUTION_WINDOW}-year sliding windows stepped annually")
+
+evolution = []
+for stats in coinventor_graph.sliding_windows(EVOLUTION_WINDOW):
+    evolution.append({
+        'window_start': stats['first_year'],
+        'window_end': stats['last_year'],
+        'num_nodes': stats['num_nodes'],
+        'num_edges': stats['num_edges'],
+        'avg_degree': round(stats['avg_degree'], 2),
+        'max_degree': stats['max_degree'],
+        'isolated_share': round(stats['isolated_share'], 4),
+        'num_components': stats['num_components'],
+        'giant_component_share': round(stats['giant_component_share'], 4),
+    })
+print(f"  {len(evolution)} windows, {evolution[0]['window_start']}-{evolution[-1]['window_end']}"
+      if evolution else "  no windows")
+
+save_json(evolution, f"{OUT_CH3}/network_evolution_yearly.json")
+
 # ── Bridge inventors: most connected across organizations ────────────────────
 timed_msg("bridge_inventors: inventors connecting most distinct organizations")
 
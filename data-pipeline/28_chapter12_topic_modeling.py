@@ -17,10 +17,9 @@ import os
 import sys
 import time
 import numpy as np
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, OUTPUT_DIR,
-    CPC_SECTION_NAMES, save_json, timed_msg, tsv_table,
+    CPC_SECTION_NAMES, save_json, timed_msg, tsv_table, get_connection,
 )
 
 def log(msg):
@@ -29,7 +28,7 @@ def log(msg):
 OUT = f"{OUTPUT_DIR}/chapter12"
 os.makedirs(OUT, exist_ok=True)
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Step 1: Load patent abstracts with metadata ─────────────────────────────
 timed_msg("Loading patent abstracts + metadata")
@@ -263,11 +262,10 @@ embedding = reducer.fit_transform(tfidf_sample)
 elapsed = time.time() - t0
 log(f"  UMAP fitted in {elapsed:.1f}s")
 
-# Build UMAP output
-umap_records = []
+# Build UMAP output (streamed: one record at a time)
 sample_df = df.iloc[sample_indices].reset_index(drop=True)
-for i in range(len(sample_indices)):
-    umap_records.append({
+umap_records = (
+    {
         'patent_id': sample_df.iloc[i]['patent_id'],
         'x': round(float(embedding[i, 0]), 3),
         'y': round(float(embedding[i, 1]), 3),
@@ -275,7 +273,9 @@ for i in range(len(sample_indices)):
         'topic_name': topic_definitions[int(sample_df.iloc[i]['topic'])]['name'],
         'year': int(sample_df.iloc[i]['year']),
         'section': sample_df.iloc[i]['cpc_section'],
-    })
+    }
+    for i in range(len(sample_indices))
+)
 
 save_json(umap_records, f"{OUT}/topic_umap.json")
 
@@ -12,44 +12,51 @@ Sections:
 Generates → public/data/green/
 """
 import sys
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV, LOCATION_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, query_to_json, save_json, timed_msg, get_connection,
 )
+from cpc_taxonomy import PrefixMatcher, cpc_code
 
 def log(msg):
     print(msg, flush=True)
 
 OUT = f"{OUTPUT_DIR}/green"
-con = duckdb.connect()
-
-# Y02/Y04S sub-category mapping
-GREEN_CATEGORY_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'Y02E10%' THEN 'Renewable Energy'
-        WHEN cpc_group LIKE 'Y02E60%' THEN 'Batteries & Storage'
-        WHEN cpc_group LIKE 'Y02E%' THEN 'Other Energy'
-        WHEN cpc_group LIKE 'Y02T%' THEN 'Transportation / EVs'
-        WHEN cpc_group LIKE 'Y02C%' THEN 'Carbon Capture'
-        WHEN cpc_group LIKE 'Y02P%' THEN 'Industrial Production'
-        WHEN cpc_group LIKE 'Y02B%' THEN 'Buildings'
-        WHEN cpc_group LIKE 'Y02W%' THEN 'Waste Management'
-        WHEN cpc_subclass LIKE 'Y04S%' OR cpc_group LIKE 'Y04S%' THEN 'Smart Grids'
-        ELSE 'Other Green'
-    END
-"""
-
-GREEN_FILTER = "(cpc_subclass LIKE 'Y02%' OR cpc_subclass LIKE 'Y04S%' OR cpc_group LIKE 'Y02%' OR cpc_group LIKE 'Y04S%')"
-
-# AI CPC filter (matching chapter 11 methodology)
-AI_FILTER = """
-    (cpc_group LIKE 'G06N%'
-     OR cpc_group LIKE 'G06F18%'
-     OR cpc_subclass = 'G06V'
-     OR cpc_group LIKE 'G10L15%'
-     OR cpc_group LIKE 'G06F40%')
-"""
+con = get_connection()
+
+# Y02/Y04S sub-category mapping (first match wins); a code is green when it
+# matches any category
+GREEN_CATEGORIES = PrefixMatcher({
+    "Renewable Energy": "Y02E10",
+    "Batteries & Storage": "Y02E60",
+    "Other Energy": "Y02E",
+    "Transportation / EVs": "Y02T",
+    "Carbon Capture": "Y02C",
+    "Industrial Production": "Y02P",
+    "Buildings": "Y02B",
+    "Waste Management": "Y02W",
+    "Smart Grids": "Y04S",
+    "Other Green": "Y02",
+})
+
+# AI subfields (matching chapter 11 methodology); a code is AI when it matches any
+AI_SUBFIELDS = PrefixMatcher({
+    "Neural Networks": "G06N3",
+    "Machine Learning": "G06N20",
+    "Knowledge Systems": "G06N5",
+    "Probabilistic": "G06N7",
+    "Pattern Recognition": "G06F18",
+    "Computer Vision": "G06V",
+    "Speech Recognition": "G10L15",
+    "NLP": "G06F40",
+    "Other AI": "G06N",
+})
+
+# Both rule sets are applied once to the distinct CPC codes
+con.register("green_codes", GREEN_CATEGORIES.code_table(con, CPC_CURRENT_TSV(), as_col="category"))
+con.register("ai_codes", AI_SUBFIELDS.code_table(con, CPC_CURRENT_TSV(), as_col="subfield"))
+GREEN_FILTER = f"{cpc_code()} IN (SELECT cpc_code FROM green_codes)"
+AI_FILTER = f"{cpc_code()} IN (SELECT cpc_code FROM ai_codes)"
 
 # ── Section 1: Green patent volume over time ─────────────────────────────────
 timed_msg("Section 1: Green patent volume by year")
@@ -91,16 +98,16 @@ timed_msg("Section 2: Green patents by sub-category over time")
 query_to_json(con, f"""
     SELECT
         YEAR(CAST(p.patent_date AS DATE)) AS year,
-        {GREEN_CATEGORY_SQL} AS category,
+        gc.category,
         COUNT(DISTINCT p.patent_id) AS count
     FROM {PATENT_TSV()} p
     JOIN {CPC_CURRENT_TSV()} c ON p.patent_id = c.patent_id
+    JOIN green_codes gc ON {cpc_code('c')} = gc.cpc_code
     WHERE p.patent_type = 'utility'
       AND p.patent_date IS NOT NULL
       AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-      AND {GREEN_FILTER}
-    GROUP BY year, category
-    ORDER BY year, category
+    GROUP BY year, gc.category
+    ORDER BY year, gc.category
 """, f"{OUT}/green_by_category.json")
 
 # ── Section 3a: Top countries ─────────────────────────────────────────────────
@@ -151,11 +158,10 @@ query_to_json(con, f"""
           AND {GREEN_FILTER}
     ),
     green_with_cat AS (
-        SELECT DISTINCT gp.patent_id,
-            {GREEN_CATEGORY_SQL} AS category
+        SELECT DISTINCT gp.patent_id, codes.category
         FROM green_patents gp
         JOIN {CPC_CURRENT_TSV()} c ON gp.patent_id = c.patent_id
-        WHERE {GREEN_FILTER}
+        JOIN green_codes codes ON {cpc_code('c')} = codes.cpc_code
     ),
     top_orgs AS (
         SELECT a.disambig_assignee_organization AS organization,
@@ -212,30 +218,16 @@ query_to_json(con, f"""
 # Green AI heatmap: green sub-category × AI subfield
 timed_msg("Section 4b: Green × AI heatmap")
 
-AI_SUBFIELD_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'G06N3%' THEN 'Neural Networks'
-        WHEN cpc_group LIKE 'G06N20%' THEN 'Machine Learning'
-        WHEN cpc_group LIKE 'G06N5%' THEN 'Knowledge Systems'
-        WHEN cpc_group LIKE 'G06N7%' THEN 'Probabilistic'
-        WHEN cpc_group LIKE 'G06F18%' THEN 'Pattern Recognition'
-        WHEN cpc_subclass = 'G06V' THEN 'Computer Vision'
-        WHEN cpc_group LIKE 'G10L15%' THEN 'Speech Recognition'
-        WHEN cpc_group LIKE 'G06F40%' THEN 'NLP'
-        ELSE 'Other AI'
-    END
-"""
-
 query_to_json(con, f"""
     WITH green_cpc AS (
-        SELECT patent_id, {GREEN_CATEGORY_SQL} AS green_category
-        FROM {CPC_CURRENT_TSV()}
-        WHERE {GREEN_FILTER}
+        SELECT c.patent_id, codes.category AS green_category
+        FROM {CPC_CURRENT_TSV()} c
+        JOIN green_codes codes ON {cpc_code('c')} = codes.cpc_code
     ),
     ai_cpc AS (
-        SELECT patent_id, {AI_SUBFIELD_SQL} AS ai_subfield
-        FROM {CPC_CURRENT_TSV()}
-        WHERE {AI_FILTER}
+        SELECT c.patent_id, codes.subfield AS ai_subfield
+        FROM {CPC_CURRENT_TSV()} c
+        JOIN ai_codes codes ON {cpc_code('c')} = codes.cpc_code
     )
     SELECT
         gc.green_category,
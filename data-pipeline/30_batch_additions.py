@@ -18,17 +18,16 @@ Generates:
 import sys
 import time
 import numpy as np
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV,
     LOCATION_TSV, CITATION_TSV, APPLICATION_TSV,
-    OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, get_connection,
 )
 
 def log(msg):
     print(msg, flush=True)
 
-con = duckdb.connect()
+con = get_connection()
 
 # AI CPC filter (matching chapter 11)
 AI_FILTER = """
@@ -11,10 +11,9 @@ count (1976-2025).
 import sys
 import time
 import re
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, OUTPUT_DIR,
-    save_json, timed_msg, tsv_table,
+    save_json, timed_msg, tsv_table, get_connection,
 )
 
 
@@ -285,7 +284,7 @@ def _auto_clean(raw: str) -> str:
 # Main
 # ═══════════════════════════════════════════════════════════════════════════════
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── 1. Query top 200 assignees by total utility-patent count ──────────────────
 timed_msg("Top 200 assignees by utility-patent count (1976-2025)")
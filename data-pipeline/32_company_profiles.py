@@ -10,12 +10,15 @@ cpc_distribution.
 """
 import sys
 import time
+import numpy as np
 import orjson
-import duckdb
+
+import citation_graph
+from assignee_flows import flow_matrices, organization_codes
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, INVENTOR_TSV,
-    LOCATION_TSV, CITATION_TSV,
-    OUTPUT_DIR, CPC_SECTION_NAMES, save_json, timed_msg, tsv_table,
+    LOCATION_TSV, CITATION_TSV, PATENT_YEAR,
+    OUTPUT_DIR, CPC_SECTION_NAMES, save_json, sql_round, timed_msg, tsv_table, get_connection,
 )
 
 
@@ -23,7 +26,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 timed_msg("Loading company name mapping")
@@ -280,35 +283,25 @@ for org, year, median_cites in cite_rows:
 # ═══════════════════════════════════════════════════════════════════════════════
 timed_msg("Step 7: Self-citation rate per company-year")
 
+# Organization x organization citation flows per grant year of the citing
+# patent, in one pass over the citation graph (assignee_flows.py)
 t0 = time.time()
-self_cite_rows = con.execute(f"""
-    WITH cite_pairs AS (
-        SELECT
-            bp.organization,
-            bp.grant_year AS year,
-            cit.patent_id AS citing_id,
-            cit.citation_patent_id AS cited_id,
-            a2.disambig_assignee_organization AS cited_org
-        FROM base_patents bp
-        JOIN {CITATION_TSV()} cit ON bp.patent_id = cit.patent_id
-        JOIN {ASSIGNEE_TSV()} a2 ON cit.citation_patent_id = a2.patent_id
-            AND a2.assignee_sequence = 0
-    )
-    SELECT
-        organization,
-        year,
-        COUNT(*) AS total_citations_made,
-        SUM(CASE WHEN organization = cited_org THEN 1 ELSE 0 END) AS self_citations,
-        ROUND(100.0 * SUM(CASE WHEN organization = cited_org THEN 1 ELSE 0 END) / COUNT(*), 2) AS self_cite_rate
-    FROM cite_pairs
-    GROUP BY organization, year
-    ORDER BY organization, year
-""").fetchall()
-log(f"  Self-citation rates done in {time.time()-t0:.1f}s ({len(self_cite_rows):,} rows)")
-
-for org, year, total_cites, self_cites, rate in self_cite_rows:
-    if org in profiles and year in profiles[org]:
-        profiles[org][year]["self_citation_rate"] = float(rate) if rate is not None else 0.0
+graph = citation_graph.load()
+org_codes, org_labels = organization_codes(con, graph.n)
+years = con.execute(f"SELECT patent_key, grant_year FROM {PATENT_YEAR()}").fetchnumpy()
+flows = flow_matrices(graph, org_codes, graph.codes(years["patent_key"], years["grant_year"] - 1976), 50)
+
+code_of = {label: code for code, label in enumerate(org_labels)}
+profiled = [(org, code_of[org]) for org in profiles if org in code_of]
+n_rates = 0
+for year, year_flows in enumerate(flows, start=1976):
+    made = np.asarray(year_flows.sum(axis=1)).ravel()
+    own = year_flows.diagonal()
+    for org, code in profiled:
+        if made[code] and year in profiles[org]:
+            profiles[org][year]["self_citation_rate"] = sql_round(100.0 * own[code] / made[code], 2)
+            n_rates += 1
+log(f"  Self-citation rates done in {time.time()-t0:.1f}s ({n_rates:,} rows)")
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Step 8: International inventor share
@@ -412,27 +405,29 @@ DEFAULT_FIELDS = {
     "cpc_distribution": {},
 }
 
-result = []
-for org in sorted(profiles.keys()):
-    years_data = []
-    for year in sorted(profiles[org].keys()):
-        entry = profiles[org][year]
-        # Fill in defaults for missing fields
-        for field, default in DEFAULT_FIELDS.items():
-            if field not in entry:
-                entry[field] = default
-        years_data.append(entry)
-    result.append({
-        "company": display_name(org),
-        "raw_name": org,
-        "years": years_data,
-    })
-
-log(f"  {len(result)} companies with {sum(len(r['years']) for r in result):,} total year-entries")
+
+def company_records():
+    """One output record per company, built as it is written (streamed)."""
+    for org in sorted(profiles.keys()):
+        years_data = []
+        for year in sorted(profiles[org].keys()):
+            entry = profiles[org][year]
+            # Fill in defaults for missing fields
+            for field, default in DEFAULT_FIELDS.items():
+                if field not in entry:
+                    entry[field] = default
+            years_data.append(entry)
+        yield {
+            "company": display_name(org),
+            "raw_name": org,
+            "years": years_data,
+        }
+
+log(f"  {len(profiles)} companies with {sum(len(y) for y in profiles.values()):,} total year-entries")
 
 # ── Save ─────────────────────────────────────────────────────────────────────
 out_path = f"{OUTPUT_DIR}/company/company_profiles.json"
-save_json(result, out_path)
+save_json(company_records(), out_path)
 
 con.close()
 log("\n=== 32_company_profiles complete ===\n")
@@ -9,11 +9,10 @@ import sys
 import time
 import orjson
 import numpy as np
-import duckdb
 from sklearn.cluster import KMeans
 from config import (
     PATENT_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection,
 )
 
 
@@ -21,7 +20,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 timed_msg("Loading company name mapping")
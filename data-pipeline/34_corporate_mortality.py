@@ -8,10 +8,9 @@ Generates: company/corporate_mortality.json
 import sys
 import time
 import orjson
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection,
 )
 
 
@@ -19,7 +18,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 timed_msg("Loading company name mapping")
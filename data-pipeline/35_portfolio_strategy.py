@@ -12,11 +12,15 @@ import time
 import math
 import json
 import numpy as np
-import duckdb
+import pandas as pd
 from scipy.spatial.distance import jensenshannon
+
+import cpc_incidence
+from assignee_flows import organization_codes, organization_index
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV,
     OUTPUT_DIR, CPC_SECTION_NAMES, save_json, timed_msg, tsv_table,
+    get_connection, TOP_ASSIGNEES_ALL_TIME,
 )
 
 
@@ -24,7 +28,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 mapping_path = f"{OUTPUT_DIR}/company/company_name_mapping.json"
@@ -45,43 +49,33 @@ t0 = time.time()
 
 # Step 1: Identify top 50 assignees by total utility-patent count
 top50_rows = con.execute(f"""
-    SELECT a.disambig_assignee_organization AS organization, COUNT(DISTINCT p.patent_id) AS total
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    WHERE p.patent_type = 'utility'
-      AND a.disambig_assignee_organization IS NOT NULL
-      AND TRIM(a.disambig_assignee_organization) != ''
-    GROUP BY organization
-    ORDER BY total DESC
-    LIMIT 50
+    SELECT organization, total
+    FROM {TOP_ASSIGNEES_ALL_TIME()}
+    WHERE rank <= 50
+    ORDER BY rank
 """).fetchall()
 top50_orgs = [row[0] for row in top50_rows]
 log(f"  Top 50 assignees identified in {time.time()-t0:.1f}s")
 
-# Step 2: Create temp table for top 50 orgs for efficient filtering
-con.execute("CREATE TEMPORARY TABLE top50_orgs AS SELECT unnest($1::VARCHAR[]) AS org", [top50_orgs])
-
-# Step 3: Get patent counts per org per year per CPC subclass
+# Step 2: Patent counts per org per year per CPC subclass, as one sparse
+# product over the patent x subclass incidence matrix (cpc_incidence.py):
+# rows are (org, grant year) groups of the primary assignee's patents
 t0 = time.time()
-subclass_counts = con.execute(f"""
-    SELECT
-        a.disambig_assignee_organization AS organization,
-        YEAR(CAST(p.patent_date AS DATE)) AS year,
-        c.cpc_subclass,
-        COUNT(DISTINCT p.patent_id) AS cnt
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    JOIN {CPC_CURRENT_TSV()} c ON p.patent_id = c.patent_id
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-      AND c.cpc_subclass IS NOT NULL
-      AND a.disambig_assignee_organization IN (SELECT org FROM top50_orgs)
-    GROUP BY organization, year, cpc_subclass
-""").fetchdf()
-log(f"  Subclass counts query: {time.time()-t0:.1f}s ({len(subclass_counts):,} rows)")
-
-# Step 4: Compute Shannon entropy per org per year
+inc = cpc_incidence.load()
+org_codes, org_labels = organization_codes(con, inc.n)
+org = organization_index(org_codes, org_labels, top50_orgs)
+YEARS = np.arange(1976, 2026)
+groups = np.where((org >= 0) & inc.years(), org * len(YEARS) + inc.grant_year - YEARS[0], -1)
+counts = inc.group_counts("subclass", groups, len(top50_orgs) * len(YEARS)).tocoo()
+subclass_counts = pd.DataFrame({
+    'organization': np.array(top50_orgs, dtype=object)[counts.row // len(YEARS)],
+    'year': YEARS[counts.row % len(YEARS)],
+    'cpc_subclass': np.array(inc.labels["subclass"], dtype=object)[counts.col],
+    'cnt': counts.data,
+})
+log(f"  Subclass counts: {time.time()-t0:.1f}s ({len(subclass_counts):,} rows)")
+
+# Step 3: Compute Shannon entropy per org per year
 t0 = time.time()
 diversification_records = []
 
@@ -112,31 +106,13 @@ timed_msg("B2: Technology Pivot Detection — JSD between consecutive 3-year win
 
 t0 = time.time()
 
-# Step 1: Identify top 20 assignees
+# Step 1: Identify top 20 assignees; their subclass counts per year are
+# already part of B1's
 top20_orgs = [row[0] for row in top50_rows[:20]]
-con.execute("DROP TABLE IF EXISTS top20_orgs")
-con.execute("CREATE TEMPORARY TABLE top20_orgs AS SELECT unnest($1::VARCHAR[]) AS org", [top20_orgs])
-
-# Step 2: Get patent counts per org per year per CPC subclass (for top 20)
-window_data = con.execute(f"""
-    SELECT
-        a.disambig_assignee_organization AS organization,
-        YEAR(CAST(p.patent_date AS DATE)) AS year,
-        c.cpc_subclass,
-        COUNT(DISTINCT p.patent_id) AS cnt
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    JOIN {CPC_CURRENT_TSV()} c ON p.patent_id = c.patent_id
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-      AND c.cpc_subclass IS NOT NULL
-      AND a.disambig_assignee_organization IN (SELECT org FROM top20_orgs)
-    GROUP BY organization, year, cpc_subclass
-""").fetchdf()
-log(f"  Window data query: {time.time()-t0:.1f}s ({len(window_data):,} rows)")
+window_data = subclass_counts[subclass_counts['organization'].isin(top20_orgs)]
+log(f"  Window data: {time.time()-t0:.1f}s ({len(window_data):,} rows)")
 
-# Step 3: For each org, compute 3-year window distributions and JSD between consecutive windows
+# Step 2: For each org, compute 3-year window distributions and JSD between consecutive windows
 t0 = time.time()
 pivot_records = []
 
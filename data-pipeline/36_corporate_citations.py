@@ -2,8 +2,13 @@
 """
 Corporate Citation Analyses (C1, C2, C3)
 
+C1 reads organization x organization citation flow matrices built per decade for
+every assignee in one pass over the CSR citation graph (assignee_flows.py).
+
 Generates:
   company/corporate_citation_network.json  — Directed citation flows between top 30 assignees per decade
+  company/company_citation_flows.json      — Per profiled company (top 100) and decade: citations made and
+                                             received, self-citation share, reciprocity, top partners
   company/tech_leadership.json             — Top 5 assignees by forward citations per CPC section per 5-year window
   company/citation_half_life.json          — Citation half-life per assignee for patents >=15 years old
 """
@@ -11,18 +16,25 @@ import sys
 import time
 import json
 import numpy as np
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, CITATION_TSV,
     OUTPUT_DIR, CPC_SECTION_NAMES, save_json, timed_msg, tsv_table,
+    get_connection, TOP_ASSIGNEES_ALL_TIME, PATENT_YEAR,
+)
+import citation_graph
+from assignee_flows import (
+    flow_matrices, named_flows, organization_codes, reciprocity, self_citation_share, top_flows,
 )
+from citation_cube import group_by, half_life
+
+DECADES = list(range(1970, 2030, 10))  # decade of the citing patent's grant
 
 
 def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 mapping_path = f"{OUTPUT_DIR}/company/company_name_mapping.json"
@@ -44,72 +56,91 @@ t0 = time.time()
 
 # Step 1: Identify top 30 assignees by all-time utility patent count
 top30_rows = con.execute(f"""
-    SELECT a.disambig_assignee_organization AS organization, COUNT(DISTINCT p.patent_id) AS total
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    WHERE p.patent_type = 'utility'
-      AND a.disambig_assignee_organization IS NOT NULL
-      AND TRIM(a.disambig_assignee_organization) != ''
-    GROUP BY organization
-    ORDER BY total DESC
-    LIMIT 30
+    SELECT organization, total
+    FROM {TOP_ASSIGNEES_ALL_TIME()}
+    WHERE rank <= 30
+    ORDER BY rank
 """).fetchall()
 top30_orgs = [row[0] for row in top30_rows]
 log(f"  Top 30 assignees identified in {time.time()-t0:.1f}s")
 
-# Step 2: Create temp table with top 30 orgs' patents for efficient join
+# Step 2: Citation flows among all organizations per decade of the citing patent,
+# in one pass over the citation graph (assignee_flows.py)
 t0 = time.time()
-con.execute("CREATE TEMPORARY TABLE top30_orgs AS SELECT unnest($1::VARCHAR[]) AS org", [top30_orgs])
-
-# Build a temp table of patent_id -> organization for top 30 only
-con.execute(f"""
-    CREATE TEMPORARY TABLE top30_patents AS
-    SELECT a.patent_id, a.disambig_assignee_organization AS organization
-    FROM {ASSIGNEE_TSV()} a
-    WHERE a.assignee_sequence = 0
-      AND a.disambig_assignee_organization IN (SELECT org FROM top30_orgs)
-""")
-top30_count = con.execute("SELECT COUNT(*) FROM top30_patents").fetchone()[0]
-log(f"  Top 30 patent set: {top30_count:,} patents in {time.time()-t0:.1f}s")
-
-# Step 3: Join citations through the narrowed patent set
-# citing patent -> top30_patents (source company)
-# cited patent -> top30_patents (target company)
-t0 = time.time()
-network_df = con.execute(f"""
-    SELECT
-        FLOOR(YEAR(CAST(p.patent_date AS DATE)) / 10) * 10 AS decade,
-        src.organization AS source,
-        tgt.organization AS target,
-        COUNT(*) AS citation_count
-    FROM {CITATION_TSV()} cit
-    JOIN top30_patents src ON cit.patent_id = src.patent_id
-    JOIN top30_patents tgt ON cit.citation_patent_id = tgt.patent_id
-    JOIN {PATENT_TSV()} p ON cit.patent_id = p.patent_id
-    WHERE p.patent_date IS NOT NULL
-      AND p.patent_type = 'utility'
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-      AND src.organization != tgt.organization
-    GROUP BY decade, source, target
-    HAVING citation_count >= 5
-    ORDER BY decade, citation_count DESC
-""").fetchdf()
-log(f"  Citation network query: {time.time()-t0:.1f}s ({len(network_df):,} edges)")
-
-# Step 4: Build output records with clean names
+graph = citation_graph.load()
+org_codes, org_labels = organization_codes(con, graph.n)
+code_of = {label: code for code, label in enumerate(org_labels)}
+years = con.execute(f"SELECT patent_key, grant_year FROM {PATENT_YEAR()}").fetchnumpy()
+decade_of = graph.codes(years["patent_key"], (years["grant_year"] - DECADES[0]) // 10)
+flows = flow_matrices(graph, org_codes, decade_of, len(DECADES))
+log(f"  Flow matrices: {len(org_labels):,} organizations x {len(DECADES)} decades in {time.time()-t0:.1f}s")
+
+# Step 3: Flows of 5+ citations between distinct top 30 assignees
+top30_codes = [code_of[org] for org in top30_orgs if org in code_of]
 network_records = []
-for _, row in network_df.iterrows():
-    network_records.append({
-        'decade': int(row['decade']),
-        'source': clean_name(row['source']),
-        'target': clean_name(row['target']),
-        'citation_count': int(row['citation_count']),
-    })
+for decade, decade_flows in zip(DECADES, flows):
+    src, tgt, cnt = top_flows(decade_flows, None, among=top30_codes, min_count=5)
+    network_records += [
+        {
+            'decade': decade,
+            'source': clean_name(org_labels[a]),
+            'target': clean_name(org_labels[b]),
+            'citation_count': int(c),
+        }
+        for a, b, c in zip(src, tgt, cnt)
+    ]
+log(f"  Top 30 network: {len(network_records):,} edges")
 
 network_records.sort(key=lambda r: (r['decade'], -r['citation_count']))
 save_json(network_records, f"{OUTPUT_DIR}/company/corporate_citation_network.json")
 log(f"  C1 complete: {len(network_records):,} records")
 
+# C1b: Citation flows of every profiled company (top 100), per decade
+timed_msg("C1b: Citation flows per profiled company — self-citation, reciprocity, partners")
+
+t0 = time.time()
+profiled = [row[0] for row in con.execute(f"""
+    SELECT organization FROM {TOP_ASSIGNEES_ALL_TIME()} WHERE rank <= 100 ORDER BY rank
+""").fetchall()]
+
+
+def partners(row, code):
+    """Top 5 partners other than *code* in one sparse row of a flow matrix."""
+    idx, cnt = row.indices, row.data
+    keep = idx != code
+    idx, cnt = idx[keep], cnt[keep]
+    order = np.lexsort((idx, -cnt))[:5]
+    return [{'company': clean_name(org_labels[i]), 'citations': int(c)} for i, c in zip(idx[order], cnt[order])]
+
+
+flow_records = []
+for decade, decade_flows in zip(DECADES, flows):
+    # Totals count every citation to an assigned patent; shares and partners
+    # only flows between named organizations
+    made = np.asarray(decade_flows.sum(axis=1)).ravel()
+    received = np.asarray(decade_flows.sum(axis=0)).ravel()
+    named = named_flows(decade_flows, org_labels)
+    self_share = self_citation_share(named)
+    recip, _ = reciprocity(named)
+    cited_by = named.T.tocsr()
+    for org in profiled:
+        code = code_of.get(org)
+        if code is None or not (made[code] or received[code]):
+            continue
+        flow_records.append({
+            'company': clean_name(org),
+            'decade': decade,
+            'citations_made': int(made[code]),
+            'citations_received': int(received[code]),
+            'self_citation_share': round(float(self_share[code]), 4) if np.isfinite(self_share[code]) else None,
+            'reciprocity': round(float(recip[code]), 4) if np.isfinite(recip[code]) else None,
+            'top_cited': partners(named[code], code),
+            'top_citing': partners(cited_by[code], code),
+        })
+
+save_json(flow_records, f"{OUTPUT_DIR}/company/company_citation_flows.json")
+log(f"  C1b complete: {len(flow_records):,} records in {time.time()-t0:.1f}s")
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # C2: Technology Leadership — Top 5 assignees by forward citations received
@@ -204,15 +235,10 @@ t0 = time.time()
 
 # Step 1: Identify top 50 assignees
 top50_rows = con.execute(f"""
-    SELECT a.disambig_assignee_organization AS organization, COUNT(DISTINCT p.patent_id) AS total
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    WHERE p.patent_type = 'utility'
-      AND a.disambig_assignee_organization IS NOT NULL
-      AND TRIM(a.disambig_assignee_organization) != ''
-    GROUP BY organization
-    ORDER BY total DESC
-    LIMIT 50
+    SELECT organization, total
+    FROM {TOP_ASSIGNEES_ALL_TIME()}
+    WHERE rank <= 50
+    ORDER BY rank
 """).fetchall()
 top50_orgs = [row[0] for row in top50_rows]
 
@@ -224,6 +250,7 @@ con.execute(f"""
     CREATE TEMPORARY TABLE halflife_patents AS
     SELECT
         p.patent_id,
+        p.patent_key,
         a.disambig_assignee_organization AS organization,
         YEAR(CAST(p.patent_date AS DATE)) AS grant_year
     FROM {PATENT_TSV()} p
@@ -236,22 +263,11 @@ con.execute(f"""
 hl_count = con.execute("SELECT COUNT(*) FROM halflife_patents").fetchone()[0]
 log(f"  Half-life patent set: {hl_count:,} patents in {time.time()-t0:.1f}s")
 
-# Step 3: For each citation of these patents, compute years-after-grant
+# Step 3: Citations by years after grant per organization, off the citation-age cube
 t0 = time.time()
-citation_lag_df = con.execute(f"""
-    SELECT
-        hp.organization,
-        YEAR(CAST(citing.patent_date AS DATE)) - hp.grant_year AS years_after_grant,
-        COUNT(*) AS citation_count
-    FROM {CITATION_TSV()} cit
-    JOIN halflife_patents hp ON cit.citation_patent_id = hp.patent_id
-    JOIN {PATENT_TSV()} citing ON cit.patent_id = citing.patent_id
-    WHERE citing.patent_date IS NOT NULL
-      AND YEAR(CAST(citing.patent_date AS DATE)) - hp.grant_year >= 0
-      AND YEAR(CAST(citing.patent_date AS DATE)) - hp.grant_year <= 40
-    GROUP BY hp.organization, years_after_grant
-    ORDER BY hp.organization, years_after_grant
-""").fetchdf()
+citation_lag_df = group_by(
+    con, "SELECT patent_key, organization FROM halflife_patents", ["organization"], max_age=40,
+).rename(columns={"age": "years_after_grant", "citations": "citation_count"})
 log(f"  Citation lag query: {time.time()-t0:.1f}s ({len(citation_lag_df):,} rows)")
 
 # Step 4: Compute half-life per organization
@@ -277,30 +293,11 @@ for org in top50_orgs:
     if total_citations == 0:
         continue
 
-    # Build cumulative citation curve
-    cumulative = np.cumsum(counts)
-    half_target = total_citations / 2.0
-
-    # Find the year at which 50% of all citations are accumulated
-    half_life = None
-    for i, cum_val in enumerate(cumulative):
-        if cum_val >= half_target:
-            # Linear interpolation for more precise half-life
-            if i == 0:
-                half_life = float(years[i])
-            else:
-                # Interpolate between years[i-1] and years[i]
-                prev_cum = cumulative[i - 1]
-                frac = (half_target - prev_cum) / (cum_val - prev_cum)
-                half_life = float(years[i - 1]) + frac * float(years[i] - years[i - 1])
-            break
-
-    if half_life is None:
-        half_life = float(years[-1])  # All citations haven't reached 50%
+    half_life_years = half_life(years, counts)
 
     halflife_records.append({
         'company': clean_name(org),
-        'half_life_years': round(half_life, 2),
+        'half_life_years': round(half_life_years, 2),
         'total_citations': int(total_citations),
         'patent_count': int(patent_counts.get(org, 0)),
     })
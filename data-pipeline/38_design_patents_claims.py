@@ -10,17 +10,16 @@ import sys
 import time
 import os
 import orjson
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, INVENTOR_TSV,
     LOCATION_TSV, CITATION_TSV, APPLICATION_TSV,
-    OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, tsv_table,
+    OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, tsv_table, get_connection,
 )
 
 def log(msg):
     print(msg, flush=True)
 
-con = duckdb.connect()
+con = get_connection()
 
 
 # =============================================================================
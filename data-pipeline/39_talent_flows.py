@@ -18,11 +18,11 @@ Generates:
 import sys
 import time
 import json
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, INVENTOR_TSV,
     LOCATION_TSV, CITATION_TSV, APPLICATION_TSV,
     OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, tsv_table,
+    get_connection, TOP_ASSIGNEES,
 )
 
 
@@ -30,7 +30,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 mapping_path = f"{OUTPUT_DIR}/company/company_name_mapping.json"
@@ -49,20 +49,10 @@ timed_msg("Identifying top 50 assignees")
 
 t0 = time.time()
 top50_rows = con.execute(f"""
-    SELECT
-        a.disambig_assignee_organization AS organization,
-        COUNT(DISTINCT p.patent_id) AS total
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a
-        ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND a.disambig_assignee_organization IS NOT NULL
-      AND TRIM(a.disambig_assignee_organization) != ''
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-    GROUP BY organization
-    ORDER BY total DESC
-    LIMIT 50
+    SELECT organization, total
+    FROM {TOP_ASSIGNEES()}
+    WHERE rank <= 50
+    ORDER BY rank
 """).fetchall()
 top50_orgs = [row[0] for row in top50_rows]
 log(f"  Top 50 assignees identified in {time.time()-t0:.1f}s")
@@ -18,11 +18,15 @@ import sys
 import time
 import json
 import numpy as np
-import duckdb
+import pandas as pd
+
+import cpc_incidence
+from assignee_flows import organization_codes, organization_index
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, INVENTOR_TSV,
     LOCATION_TSV, CITATION_TSV, APPLICATION_TSV,
     OUTPUT_DIR, CPC_SECTION_NAMES, query_to_json, save_json, timed_msg, tsv_table,
+    get_connection, TOP_ASSIGNEES,
 )
 
 
@@ -30,7 +34,7 @@ def log(msg):
     print(msg, flush=True)
 
 
-con = duckdb.connect()
+con = get_connection()
 
 # ── Load company name mapping ────────────────────────────────────────────────
 mapping_path = f"{OUTPUT_DIR}/company/company_name_mapping.json"
@@ -49,20 +53,10 @@ timed_msg("Identifying top 50 assignees")
 
 t0 = time.time()
 top50_rows = con.execute(f"""
-    SELECT
-        a.disambig_assignee_organization AS organization,
-        COUNT(DISTINCT p.patent_id) AS total
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a
-        ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND a.disambig_assignee_organization IS NOT NULL
-      AND TRIM(a.disambig_assignee_organization) != ''
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-    GROUP BY organization
-    ORDER BY total DESC
-    LIMIT 50
+    SELECT organization, total
+    FROM {TOP_ASSIGNEES()}
+    WHERE rank <= 50
+    ORDER BY rank
 """).fetchall()
 top50_orgs = [row[0] for row in top50_rows]
 log(f"  Top 50 assignees identified in {time.time()-t0:.1f}s")
@@ -78,25 +72,22 @@ timed_msg("F2: Portfolio Overlap — CPC subclass vectors + cosine similarity +
 
 t0 = time.time()
 
-# Step 1: Get CPC subclass counts per assignee per decade
-subclass_df = con.execute(f"""
-    SELECT
-        a.disambig_assignee_organization AS organization,
-        CAST(FLOOR(YEAR(CAST(p.patent_date AS DATE)) / 10) * 10 AS INTEGER) AS decade,
-        c.cpc_subclass,
-        COUNT(DISTINCT p.patent_id) AS cnt
-    FROM {PATENT_TSV()} p
-    JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-    JOIN {CPC_CURRENT_TSV()} c ON p.patent_id = c.patent_id
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND a.disambig_assignee_organization IN (SELECT org FROM top50)
-      AND c.cpc_subclass IS NOT NULL
-      AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
-    GROUP BY organization, decade, cpc_subclass
-""").fetchdf()
-
-log(f"  Subclass distribution query done in {time.time()-t0:.1f}s ({len(subclass_df):,} rows)")
+# Step 1: Get CPC subclass counts per assignee per decade, as one sparse
+# product over the patent x subclass incidence matrix (cpc_incidence.py)
+inc = cpc_incidence.load()
+org_codes, org_labels = organization_codes(con, inc.n)
+org = organization_index(org_codes, org_labels, top50_orgs)
+DECADES = np.arange(1970, 2030, 10)
+groups = np.where((org >= 0) & inc.years(), org * len(DECADES) + inc.grant_year // 10 - DECADES[0] // 10, -1)
+counts = inc.group_counts("subclass", groups, len(top50_orgs) * len(DECADES)).tocoo()
+subclass_df = pd.DataFrame({
+    'organization': np.array(top50_orgs, dtype=object)[counts.row // len(DECADES)],
+    'decade': DECADES[counts.row % len(DECADES)],
+    'cpc_subclass': np.array(inc.labels["subclass"], dtype=object)[counts.col],
+    'cnt': counts.data,
+})
+
+log(f"  Subclass distribution done in {time.time()-t0:.1f}s ({len(subclass_df):,} rows)")
 
 # Step 2: Also get dominant CPC section per org-decade for industry labelling
 section_df = con.execute(f"""
@@ -21,15 +21,14 @@ Output:
 """
 import json
 import time
-import duckdb
 import numpy as np
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/company"
-con = duckdb.connect()
+con = get_connection()
 
 with open(f"{OUT}/company_name_mapping.json", "r") as f:
     COMPANY_MAP = json.load(f)
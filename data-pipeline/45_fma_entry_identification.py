@@ -3,14 +3,13 @@
 First-Mover Advantage — Entry Identification (Foundation)
 Generates: fma/entry_order.json, fma/qualifying_subclasses.json, fma/first_movers.json, fma/dominant_players.json
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV, CPC_TITLE_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg,
+    OUTPUT_DIR, query_to_json, save_json, timed_msg, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/fma"
-con = duckdb.connect()
+con = get_connection()
 
 # ── a) Build base table: patent × assignee × CPC subclass ────────────────────
 timed_msg("Building base table: patent × primary assignee × primary CPC subclass")
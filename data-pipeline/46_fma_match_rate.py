@@ -4,14 +4,13 @@ First-Mover Advantage — Analysis 1: Match Rate
 How often does the pioneer become the eventual dominant player?
 Generates: fma/match_rate_by_section.json, fma/match_rate_by_decade.json, fma/sankey_selected.json
 """
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, CPC_CURRENT_TSV,
-    OUTPUT_DIR, query_to_json, save_json, timed_msg, CPC_SECTION_NAMES,
+    OUTPUT_DIR, query_to_json, save_json, timed_msg, CPC_SECTION_NAMES, get_connection,
 )
 
 OUT = f"{OUTPUT_DIR}/fma"
-con = duckdb.connect()
+con = get_connection()
 
 # ── Rebuild base tables (self-contained) ──────────────────────────────────────
 timed_msg("Rebuilding base tables for match rate analysis")
@@ -3,29 +3,26 @@
 Biotechnology & Gene Editing Deep Dive — C12N15/, C12N9/, C12Q1/68
 Generates → public/data/biotech/
 """
+from cpc_taxonomy import PrefixMatcher
 from domain_utils import run_domain_pipeline
 
-CPC_FILTER = """
-    (cpc_group LIKE 'C12N15%' OR cpc_group LIKE 'C12N9%' OR cpc_group LIKE 'C12Q1/68%')
-"""
-
-SUBFIELD_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'C12N15/09%' OR cpc_group LIKE 'C12N15/11%' THEN 'Gene Editing & Modification'
-        WHEN cpc_group LIKE 'C12N15/63%' OR cpc_group LIKE 'C12N15/79%' OR cpc_group LIKE 'C12N15/85%' THEN 'Expression Vectors'
-        WHEN cpc_group LIKE 'C12N15/1%' AND NOT (cpc_group LIKE 'C12N15/11%') THEN 'Recombinant DNA'
-        WHEN cpc_group LIKE 'C12N9%' THEN 'Enzyme Engineering'
-        WHEN cpc_group LIKE 'C12Q1/68%' THEN 'Nucleic Acid Detection'
-        WHEN cpc_group LIKE 'C12N15%' THEN 'Other Genetic Engineering'
-        ELSE 'Other Biotech'
-    END
-"""
+SUBFIELDS = PrefixMatcher({
+    "Gene Editing & Modification": ("C12N15/09", "C12N15/11"),
+    "Expression Vectors": ("C12N15/63", "C12N15/79", "C12N15/85"),
+    "Recombinant DNA": "C12N15/1",  # C12N15/11 matched above
+    "Enzyme Engineering": "C12N9",
+    "Nucleic Acid Detection": "C12Q1/68",
+    "Other Genetic Engineering": "C12N15",
+}, default="Other Biotech")
 
-run_domain_pipeline(
+DOMAIN = dict(
     domain_name="Biotech",
     domain_slug="biotech",
     data_dir="biotech",
-    cpc_filter_sql=CPC_FILTER,
-    subfield_sql=SUBFIELD_SQL,
+    domain="Biotech",
+    subfields=SUBFIELDS,
     exclude_sections="'C', 'Y'",
 )
+
+if __name__ == "__main__":
+    run_domain_pipeline(**DOMAIN)
@@ -3,34 +3,31 @@
 Digital Health & Medical Devices Deep Dive — A61B5/, G16H, A61B34/
 Generates → public/data/digihealth/
 """
+from cpc_taxonomy import PrefixMatcher
 from domain_utils import run_domain_pipeline
 
-CPC_FILTER = """
-    (cpc_group LIKE 'A61B5%' OR cpc_subclass = 'G16H' OR cpc_group LIKE 'A61B34%')
-"""
-
-SUBFIELD_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'A61B5/02%' OR cpc_group LIKE 'A61B5/04%' THEN 'Vital Signs Monitoring'
-        WHEN cpc_group LIKE 'A61B5/05%' THEN 'Diagnostic Imaging'
-        WHEN cpc_group LIKE 'A61B5/07%' OR cpc_group LIKE 'A61B5/08%' THEN 'Physiological Signals'
-        WHEN cpc_group LIKE 'A61B5%' THEN 'Other Patient Monitoring'
-        WHEN cpc_group LIKE 'G16H10%' THEN 'Electronic Health Records'
-        WHEN cpc_group LIKE 'G16H20%' THEN 'Clinical Decision Support'
-        WHEN cpc_group LIKE 'G16H30%' THEN 'Medical Imaging Informatics'
-        WHEN cpc_group LIKE 'G16H40%' THEN 'Healthcare IT Infrastructure'
-        WHEN cpc_group LIKE 'G16H50%' THEN 'Biomedical Data Analytics'
-        WHEN cpc_group LIKE 'G16H%' THEN 'Other Health Informatics'
-        WHEN cpc_group LIKE 'A61B34%' THEN 'Surgical Robotics'
-        ELSE 'Other Digital Health'
-    END
-"""
+SUBFIELDS = PrefixMatcher({
+    "Vital Signs Monitoring": ("A61B5/02", "A61B5/04"),
+    "Diagnostic Imaging": "A61B5/05",
+    "Physiological Signals": ("A61B5/07", "A61B5/08"),
+    "Other Patient Monitoring": "A61B5",
+    "Electronic Health Records": "G16H10",
+    "Clinical Decision Support": "G16H20",
+    "Medical Imaging Informatics": "G16H30",
+    "Healthcare IT Infrastructure": "G16H40",
+    "Biomedical Data Analytics": "G16H50",
+    "Other Health Informatics": "G16H",
+    "Surgical Robotics": "A61B34",
+}, default="Other Digital Health")
 
-run_domain_pipeline(
+DOMAIN = dict(
     domain_name="DigiHealth",
     domain_slug="digihealth",
     data_dir="digihealth",
-    cpc_filter_sql=CPC_FILTER,
-    subfield_sql=SUBFIELD_SQL,
+    domain="DigiHealth",
+    subfields=SUBFIELDS,
     exclude_sections="'A', 'G', 'Y'",
 )
+
+if __name__ == "__main__":
+    run_domain_pipeline(**DOMAIN)
@@ -3,33 +3,30 @@
 3D Printing / Additive Manufacturing Deep Dive — B33Y, B29C64/, B22F10/
 Generates → public/data/3dprint/
 """
+from cpc_taxonomy import PrefixMatcher
 from domain_utils import run_domain_pipeline
 
-CPC_FILTER = """
-    (cpc_subclass = 'B33Y' OR cpc_group LIKE 'B29C64%' OR cpc_group LIKE 'B22F10%')
-"""
-
-SUBFIELD_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'B33Y10%' THEN 'AM Processes'
-        WHEN cpc_group LIKE 'B33Y30%' THEN 'AM Equipment'
-        WHEN cpc_group LIKE 'B33Y40%' THEN 'AM Auxiliary Operations'
-        WHEN cpc_group LIKE 'B33Y50%' THEN 'AM Data Handling'
-        WHEN cpc_group LIKE 'B33Y70%' THEN 'AM Materials'
-        WHEN cpc_group LIKE 'B33Y80%' THEN 'AM Products'
-        WHEN cpc_group LIKE 'B29C64%' THEN 'Polymer Additive Manufacturing'
-        WHEN cpc_group LIKE 'B22F10%' THEN 'Metal Additive Manufacturing'
-        ELSE 'Other 3D Printing'
-    END
-"""
+SUBFIELDS = PrefixMatcher({
+    "AM Processes": "B33Y10",
+    "AM Equipment": "B33Y30",
+    "AM Auxiliary Operations": "B33Y40",
+    "AM Data Handling": "B33Y50",
+    "AM Materials": "B33Y70",
+    "AM Products": "B33Y80",
+    "Polymer Additive Manufacturing": "B29C64",
+    "Metal Additive Manufacturing": "B22F10",
+}, default="Other 3D Printing")
 
-run_domain_pipeline(
+DOMAIN = dict(
     domain_name="3DPrint",
     domain_slug="3dprint",
     data_dir="3dprint",
-    cpc_filter_sql=CPC_FILTER,
-    subfield_sql=SUBFIELD_SQL,
+    domain="3D Printing",
+    subfields=SUBFIELDS,
     exclude_sections="'B', 'Y'",
     start_year=1990,
     org_start_year=2005,
 )
+
+if __name__ == "__main__":
+    run_domain_pipeline(**DOMAIN)
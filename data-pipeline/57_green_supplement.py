@@ -15,37 +15,32 @@ Generates the 7 missing JSON files:
 Existing files (green_volume, green_by_category, green_top_companies,
 green_by_country, green_ai_trend, green_ai_heatmap) are NOT regenerated.
 """
+from cpc_taxonomy import PrefixMatcher
 from domain_utils import run_domain_pipeline
 
-GREEN_FILTER = (
-    "(cpc_subclass LIKE 'Y02%' OR cpc_subclass LIKE 'Y04S%' "
-    "OR cpc_group LIKE 'Y02%' OR cpc_group LIKE 'Y04S%')"
-)
+GREEN_CATEGORIES = PrefixMatcher({
+    "Renewable Energy": "Y02E10",
+    "Batteries & Storage": "Y02E60",
+    "Other Energy": "Y02E",
+    "Transportation / EVs": "Y02T",
+    "Carbon Capture": "Y02C",
+    "Industrial Production": "Y02P",
+    "Buildings": "Y02B",
+    "Waste Management": "Y02W",
+    "Smart Grids": "Y04S",
+}, default="Other Green")
 
-GREEN_CATEGORY_SQL = """
-    CASE
-        WHEN cpc_group LIKE 'Y02E10%' THEN 'Renewable Energy'
-        WHEN cpc_group LIKE 'Y02E60%' THEN 'Batteries & Storage'
-        WHEN cpc_group LIKE 'Y02E%' THEN 'Other Energy'
-        WHEN cpc_group LIKE 'Y02T%' THEN 'Transportation / EVs'
-        WHEN cpc_group LIKE 'Y02C%' THEN 'Carbon Capture'
-        WHEN cpc_group LIKE 'Y02P%' THEN 'Industrial Production'
-        WHEN cpc_group LIKE 'Y02B%' THEN 'Buildings'
-        WHEN cpc_group LIKE 'Y02W%' THEN 'Waste Management'
-        WHEN cpc_subclass LIKE 'Y04S%' OR cpc_group LIKE 'Y04S%' THEN 'Smart Grids'
-        ELSE 'Other Green'
-    END
-"""
+DOMAIN = dict(
+    domain_name="Green",
+    domain_slug="green",
+    data_dir="green",
+    domain="Green",
+    subfields=GREEN_CATEGORIES,
+    exclude_sections="'Y'",
+    start_year=1976,
+    org_start_year=2000,
+    top_org_limit=15,
+)
 
 if __name__ == "__main__":
-    run_domain_pipeline(
-        domain_name="Green",
-        domain_slug="green",
-        data_dir="green",
-        cpc_filter_sql=GREEN_FILTER,
-        subfield_sql=GREEN_CATEGORY_SQL,
-        exclude_sections="'Y'",
-        start_year=1976,
-        org_start_year=2000,
-        top_org_limit=15,
-    )
+    run_domain_pipeline(**DOMAIN)
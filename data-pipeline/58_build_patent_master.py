@@ -1,25 +1,234 @@
 #!/usr/bin/env python3
 """
-Build Patent Master Parquet — single patent-level fact table for downstream analyses.
+Build Patent Master Parquet — patent-level fact table for downstream analyses.
 
 Joins g_patent, g_cpc_current, g_inventor_disambiguated, g_assignee_disambiguated,
 g_application, g_location_disambiguated, and g_us_patent_citation into one wide table.
 
-Output: /tmp/patentview/patent_master.parquet  (~9.3M rows × 20 cols)
+All joins run on the warehouse's int32 surrogate keys (patent_key, inventor_key,
+assignee_key) rather than the text IDs; the text IDs are carried along for output.
+Forward-citation totals and windows (FWD_CITE_WINDOWS), originality /
+generality (DIVERSITY_COLUMNS) and the sleeping-beauty scores
+(SLEEPING_BEAUTY_COLUMNS) come from the CSR citation graph (citation_graph.py,
+citation_diversity.py, citation_cube.py, sleeping_beauty.py) instead of
+citation joins. domain_mask holds one bit per deep-dive domain (domains.py),
+classified in the same g_cpc_current scan as scope.
+
+Incremental mode (--incremental) fingerprints every source row per patent_id and
+diffs against the state saved by the previous --incremental or --save-state
+build; a plain full build skips the fingerprints and drops any old state. Only
+patents whose rows changed in any source, plus the patents they cite or are
+cited by (citation counters, diversity and sleeping-beauty scores), are
+recomputed; every other row is copied from the previous master with its
+surrogate keys refreshed. Falls back to a full build when there is no usable
+previous state.
+
+What incremental mode saves: Steps 1-6 and 8 scan only the affected patents'
+rows, and Steps 7-7c score only their rows of the citation graph and cube.
+What it does not: Step 0 still hashes every row of all seven raw tables, the
+citation graph and cube are rebuilt in full whenever the warehouse changed
+(load() checks their fingerprints), the cube and the primary-CPC codes behind
+the diversity scores are still read whole, and Step 9 rewrites every
+partition.
+
+The master is a hive-partitioned dataset (grant_year=YYYY/cpc_section=X/) with
+rows sorted by grant_date inside each partition, so consumers reading it through
+config.PATENT_MASTER() skip every partition and row group outside their window.
+
+Usage:  python 58_build_patent_master.py [--incremental | --save-state]
+Output: /tmp/patentview/patent_master/  (~9.3M rows × 34 cols)
+        /tmp/patentview/patent_master_state.parquet  (per-source fingerprints)
 """
+import os
+import shutil
+import sys
 import time
 import duckdb
+import numpy as np
+import orjson
+import pyarrow as pa
+import citation_cube
+import citation_graph
+import domains
+import sleeping_beauty
+from citation_diversity import cpc_codes, hhi_diversity
 from config import (
     PATENT_TSV, APPLICATION_TSV, CPC_CURRENT_TSV, CITATION_TSV,
-    INVENTOR_TSV, ASSIGNEE_TSV, LOCATION_TSV,
-    timed_msg,
+    INVENTOR_TSV, LOCATION_TSV, PATENT_YEAR, PRIMARY_ASSIGNEE,
+    PATENT_IDS, ASSIGNEE_IDS, PATENT_MASTER, MASTER_DIR, MASTER_PARTITIONS,
+    parquet_table, timed_msg, get_connection, require_warehouse,
 )
 
-MASTER_PATH = "/tmp/patentview/patent_master.parquet"
-con = duckdb.connect()
+STATE_PATH = "/tmp/patentview/patent_master_state.parquet"
+# Bump whenever the master's columns or their definitions change
+MASTER_VERSION = 7
+
+# Forward-citation window columns: name -> horizon in years (citations granted
+# within int(years * 365.25) days of the cited patent's grant). Add an entry for
+# a new window; Step 7 counts all of them in one pass over the citation graph.
+FWD_CITE_WINDOWS = {"fwd_cite_3y": 3, "fwd_cite_5y": 5, "fwd_cite_10y": 10}
+
+# Citation diversity columns (1 - HHI of the cited / citing patents' primary CPC):
+# name -> (adjacency, CPC level, Hall bias correction). Each also gets a
+# <name>_n column with the number of classified citations, so thresholds
+# (>= 2, >= 5, ...) are plain filters downstream.
+DIVERSITY_COLUMNS = {
+    "originality": ("bwd", "section", False),
+    "generality": ("fwd", "section", False),
+}
+
+# Sleeping-beauty columns: name -> sleeping_beauty.detect() output, scored from
+# each patent's yearly forward-citation history (Ke et al. beauty coefficient).
+SLEEPING_BEAUTY_COLUMNS = {
+    "beauty_coefficient": "beauty",
+    "awakening_age": "awakening_age",
+    "sleep_cites": "sleep_cites",
+    "burst_cites": "burst",
+    "burst_age": "burst_age",
+    "is_sleeping_beauty": "is_sleeping_beauty",
+}
+
+# Per-source fingerprints: source -> SQL yielding (patent_id, row) pairs over the
+# raw tables. The whole row is hashed so any changed column marks its patent.
+FINGERPRINTS = {
+    "patent": "SELECT patent_id, t AS row FROM {g_patent} t",
+    "cpc": "SELECT patent_id, t AS row FROM {g_cpc_current} t",
+    "inventor": "SELECT patent_id, t AS row FROM {g_inventor_disambiguated} t",
+    "location": """
+        SELECT i.patent_id, l AS row
+        FROM {g_inventor_disambiguated} i
+        JOIN {g_location_disambiguated} l ON i.location_id = l.location_id
+        WHERE i.inventor_sequence = 0""",
+    "assignee": "SELECT patent_id, t AS row FROM {g_assignee_disambiguated} t",
+    "application": "SELECT patent_id, t AS row FROM {g_application} t",
+}
+# Citations fingerprint both ends ("citing", "cited") from one scan of the
+# citation table: each row is hashed once and counted for both patents.
+CITATION_FINGERPRINTS = """
+    SELECT hash(t)::HUGEINT AS h,
+           UNNEST([{{'source': 'citing', 'patent_id': t.patent_id}},
+                   {{'source': 'cited', 'patent_id': t.citation_patent_id}}], recursive := true)
+    FROM {g_us_patent_citation} t"""
+RAW_TABLES = [
+    "g_patent", "g_cpc_current", "g_inventor_disambiguated", "g_location_disambiguated",
+    "g_assignee_disambiguated", "g_application", "g_us_patent_citation",
+]
+
+
+def state_meta() -> dict:
+    """Everything the fingerprints depend on besides the data itself."""
+    return {"master_version": MASTER_VERSION, "duckdb": duckdb.__version__,
+            "domains": domains.rules_key()}
+
+
+def previous_state_ok() -> bool:
+    """True if the previous master and its fingerprints can seed an incremental build."""
+    if not (os.path.isdir(MASTER_DIR) and os.path.exists(STATE_PATH)):
+        return False
+    try:
+        with open(STATE_PATH + ".key", "rb") as f:
+            return orjson.loads(f.read()) == state_meta()
+    except (OSError, orjson.JSONDecodeError):
+        return False
+
+
+def window_days(years: int) -> int:
+    return int(years * 365.25)
+
+
+def write_partitioned(con, table: str, out_dir: str) -> None:
+    """Write *table* as a hive-partitioned dataset, one file per partition, rows in
+    grant_date order (DuckDB's PARTITION_BY does not preserve ORDER BY)."""
+    cols = list(MASTER_PARTITIONS)
+    for values in con.execute(f"SELECT DISTINCT {', '.join(cols)} FROM {table}").fetchall():
+        parts = [f"{c}={'__HIVE_DEFAULT_PARTITION__' if v is None else v}" for c, v in zip(cols, values)]
+        where = " AND ".join(f"{c} IS NULL" if v is None else f"{c} = '{v}'" for c, v in zip(cols, values))
+        path = os.path.join(out_dir, *parts)
+        os.makedirs(path)
+        con.execute(f"""
+            COPY (
+                SELECT * EXCLUDE ({', '.join(cols)}) FROM {table}
+                WHERE {where}
+                ORDER BY grant_date, patent_key
+            ) TO '{path}/data_0.parquet' (FORMAT PARQUET, COMPRESSION ZSTD)
+        """)
+
+
+incremental = "--incremental" in sys.argv
+# Fingerprints cost a hash of every raw row, so only builds that use them
+# (incremental) or seed the next incremental run (--save-state) compute them
+save_state = incremental or "--save-state" in sys.argv
+if incremental and not previous_state_ok():
+    print("  No usable previous master/state — falling back to a full build")
+    incremental = False
+
+require_warehouse()
+con = get_connection()
 con.execute("SET threads TO 38")
 con.execute("SET memory_limit = '200GB'")
 
+
+def in_scope(col: str) -> str:
+    """SQL predicate restricting *col* (a patent_key) to the patents being rebuilt."""
+    return f"{col} IN (SELECT patent_key FROM affected)" if incremental else "TRUE"
+
+
+# ── Step 0: Source fingerprints + affected patents ────────────────────────────
+if save_state:
+    timed_msg("Step 0: Fingerprint source rows per patent")
+    t0 = time.time()
+
+    raw = {name: parquet_table(name) for name in RAW_TABLES}
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE state AS
+        {" UNION ALL ".join(
+            f"SELECT '{source}' AS source, patent_id, SUM(hash(row)::HUGEINT) AS fingerprint "
+            f"FROM ({sql.format(**raw)}) WHERE patent_id IS NOT NULL GROUP BY patent_id"
+            for source, sql in FINGERPRINTS.items()
+        )}
+        UNION ALL
+        SELECT source, patent_id, SUM(h) AS fingerprint
+        FROM ({CITATION_FINGERPRINTS.format(**raw)})
+        WHERE patent_id IS NOT NULL
+        GROUP BY source, patent_id
+    """)
+    print(f"  fingerprints done in {time.time()-t0:.1f}s")
+
+if incremental:
+    t0 = time.time()
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE changed AS
+        SELECT DISTINCT patent_id FROM (
+            (SELECT * FROM state EXCEPT SELECT * FROM read_parquet('{STATE_PATH}'))
+            UNION ALL
+            (SELECT * FROM read_parquet('{STATE_PATH}') EXCEPT SELECT * FROM state)
+        )
+    """)
+    # A changed citing patent (new/removed citations, new grant date or CPC) also
+    # moves the forward-citation counters, generality and sleeping-beauty scores of
+    # every patent it cites; a changed cited patent (new CPC) moves the originality
+    # of every patent citing it.
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE affected AS
+        SELECT a.patent_id, k.patent_key
+        FROM (
+            SELECT patent_id FROM changed
+            UNION
+            SELECT c.citation_patent_id FROM {CITATION_TSV()} c
+            WHERE c.patent_id IN (SELECT patent_id FROM changed)
+              AND c.citation_patent_id IS NOT NULL
+            UNION
+            SELECT c.patent_id FROM {CITATION_TSV()} c
+            WHERE c.citation_patent_id IN (SELECT patent_id FROM changed)
+              AND c.patent_id IS NOT NULL
+        ) a
+        LEFT JOIN {PATENT_IDS()} k ON a.patent_id = k.patent_id
+    """)
+    n_changed = con.execute("SELECT COUNT(*) FROM changed").fetchone()[0]
+    n_affected = con.execute("SELECT COUNT(*) FROM affected").fetchone()[0]
+    print(f"  {n_changed:,} changed patents, {n_affected:,} to recompute "
+          f"in {time.time()-t0:.1f}s")
+
 # ── Step 1: Base patent table ─────────────────────────────────────────────────
 timed_msg("Step 1: Build base patent table (utility patents 1976-2025)")
 t0 = time.time()
@@ -27,32 +236,38 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE base AS
     SELECT
-        p.patent_id,
-        CAST(p.patent_date AS DATE) AS grant_date,
-        YEAR(CAST(p.patent_date AS DATE)) AS grant_year,
+        py.patent_key,
+        py.patent_id,
+        py.grant_date,
+        py.grant_year,
         p.num_claims
-    FROM {PATENT_TSV()} p
-    WHERE p.patent_type = 'utility'
-      AND p.patent_date IS NOT NULL
-      AND CAST(p.patent_date AS DATE) >= DATE '1976-01-01'
-      AND CAST(p.patent_date AS DATE) <= DATE '2025-12-31'
+    FROM {PATENT_YEAR()} py
+    JOIN {PATENT_TSV()} p ON py.patent_key = p.patent_key
+    WHERE {in_scope('py.patent_key')}
 """)
 cnt = con.execute("SELECT COUNT(*) FROM base").fetchone()[0]
 print(f"  base: {cnt:,} rows in {time.time()-t0:.1f}s")
 
-# ── Step 2: Primary CPC section + scope ───────────────────────────────────────
-timed_msg("Step 2: CPC section, scope, n_sections")
+# ── Step 2: Primary CPC section + scope + domains ─────────────────────────────
+timed_msg("Step 2: CPC section, scope, n_sections, domain_mask")
 t0 = time.time()
 
+# The domain prefix rules are evaluated once per distinct CPC code, not per
+# row; the scan below ORs the matching codes' bits per patent.
+con.register("domain_codes", domains.code_masks(con, CPC_CURRENT_TSV()))
+
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE cpc_agg AS
     SELECT
-        patent_id,
-        MIN(CASE WHEN cpc_sequence = 0 THEN cpc_section END) AS cpc_section,
-        COUNT(DISTINCT cpc_subclass) AS scope,
-        COUNT(DISTINCT cpc_section) AS n_cpc_sections
-    FROM {CPC_CURRENT_TSV()}
-    GROUP BY patent_id
+        c.patent_key,
+        MIN(CASE WHEN c.cpc_sequence = 0 THEN c.cpc_section END) AS cpc_section,
+        COUNT(DISTINCT c.cpc_subclass) AS scope,
+        COUNT(DISTINCT c.cpc_section) AS n_cpc_sections,
+        BIT_OR(dc.domain_mask) AS domain_mask
+    FROM {CPC_CURRENT_TSV()} c
+    LEFT JOIN domain_codes dc ON {domains.cpc_code('c')} = dc.cpc_code
+    WHERE {in_scope('c.patent_key')}
+    GROUP BY c.patent_key
 """)
 print(f"  cpc_agg done in {time.time()-t0:.1f}s")
 
@@ -62,9 +277,10 @@ t0 = time.time()
 
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE team AS
-    SELECT patent_id, COUNT(DISTINCT inventor_id) AS team_size
+    SELECT patent_key, COUNT(DISTINCT inventor_key) AS team_size
     FROM {INVENTOR_TSV()}
-    GROUP BY patent_id
+    WHERE {in_scope('patent_key')}
+    GROUP BY patent_key
 """)
 print(f"  team done in {time.time()-t0:.1f}s")
 
@@ -75,11 +291,12 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE assignee AS
     SELECT
-        patent_id,
-        disambig_assignee_organization AS primary_assignee_org,
+        patent_key,
+        organization AS primary_assignee_org,
+        assignee_key AS primary_assignee_key,
         assignee_id AS primary_assignee_id
-    FROM {ASSIGNEE_TSV()}
-    WHERE assignee_sequence = 0
+    FROM {PRIMARY_ASSIGNEE()}
+    WHERE {in_scope('patent_key')}
 """)
 print(f"  assignee done in {time.time()-t0:.1f}s")
 
@@ -90,13 +307,14 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE inv_loc AS
     SELECT
-        i.patent_id,
+        i.patent_key,
         i.gender_code,
         l.disambig_state,
         l.disambig_country
     FROM {INVENTOR_TSV()} i
     LEFT JOIN {LOCATION_TSV()} l ON i.location_id = l.location_id
     WHERE i.inventor_sequence = 0
+      AND {in_scope('i.patent_key')}
 """)
 print(f"  inv_loc done in {time.time()-t0:.1f}s")
 
@@ -107,47 +325,82 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE lag AS
     SELECT
-        a.patent_id,
+        a.patent_key,
         DATEDIFF('day', CAST(a.filing_date AS DATE), CAST(p.patent_date AS DATE)) AS grant_lag_days
     FROM {APPLICATION_TSV()} a
-    JOIN {PATENT_TSV()} p ON a.patent_id = p.patent_id
+    JOIN {PATENT_TSV()} p ON a.patent_key = p.patent_key
     WHERE a.filing_date IS NOT NULL
       AND p.patent_date IS NOT NULL
       AND CAST(a.filing_date AS DATE) >= DATE '1900-01-01'
+      AND {in_scope('a.patent_key')}
 """)
 print(f"  lag done in {time.time()-t0:.1f}s")
 
-# ── Step 7: Forward citations (total + 5-year window) ─────────────────────────
-timed_msg("Step 7: Forward citations (total + 5-year window) — this is the slow join")
+# ── Step 7: Forward citations (total + windows) ───────────────────────────────
+timed_msg("Step 7: Forward citations (total + windows) from the CSR citation graph")
 t0 = time.time()
 
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE fwd_cites AS
-    SELECT
-        c.citation_patent_id AS patent_id,
-        COUNT(*) AS forward_citations,
-        SUM(CASE
-            WHEN DATEDIFF('day', CAST(cited.patent_date AS DATE),
-                                  CAST(citing.patent_date AS DATE)) <= 1826
-            THEN 1 ELSE 0
-        END) AS fwd_cite_5y
-    FROM {CITATION_TSV()} c
-    JOIN {PATENT_TSV()} citing ON c.patent_id = citing.patent_id
-    JOIN {PATENT_TSV()} cited ON c.citation_patent_id = cited.patent_id
-    WHERE citing.patent_date IS NOT NULL AND cited.patent_date IS NOT NULL
-    GROUP BY c.citation_patent_id
-""")
+# One pass over the date-sorted forward edges counts every window at once;
+# no citation join. An incremental build scores the affected patents only:
+# their rows of the graph and the cube are copied out and the rest skipped.
+graph = citation_graph.load()
+if incremental:
+    keys = con.execute("""
+        SELECT patent_key FROM affected WHERE patent_key IS NOT NULL ORDER BY patent_key
+    """).fetchnumpy()["patent_key"].astype(np.int64)
+    adjacency = {"fwd": graph.fwd.select(keys), "bwd": graph.bwd.select(keys)}
+else:
+    keys = np.arange(graph.n, dtype=np.int64)
+    adjacency = {"fwd": graph.fwd, "bwd": graph.bwd}
+counts = adjacency["fwd"].lag_counts([window_days(y) for y in FWD_CITE_WINDOWS.values()] + [None])
+con.register("fwd_cites", pa.table({
+    "patent_key": keys.astype(np.int32),
+    "forward_citations": counts[None][keys],
+    **{col: counts[window_days(y)][keys] for col, y in FWD_CITE_WINDOWS.items()},
+}))
+del counts
 print(f"  fwd_cites done in {time.time()-t0:.1f}s")
 
+# ── Step 7b: Citation diversity (originality / generality) ────────────────────
+timed_msg("Step 7b: Originality / generality from the CSR citation graph")
+t0 = time.time()
+
+diversity = {"patent_key": keys.astype(np.int32)}
+codes = {}
+for col, (direction, level, bias_correct) in DIVERSITY_COLUMNS.items():
+    if level not in codes:
+        codes[level], _ = cpc_codes(con, graph.n, level)
+    index, n_classified = hhi_diversity(adjacency[direction], codes[level], bias_correct)
+    diversity[col] = pa.array(index[keys], from_pandas=True)  # NaN -> NULL
+    diversity[f"{col}_n"] = n_classified[keys]
+con.register("diversity", pa.table(diversity))
+del codes, index, n_classified
+print(f"  diversity done in {time.time()-t0:.1f}s")
+
+# ── Step 7c: Sleeping beauties (beauty coefficient, awakening, burst) ─────────
+timed_msg("Step 7c: Sleeping-beauty scores from the citation-age cube")
+t0 = time.time()
+
+history = citation_cube.load()
+scores = sleeping_beauty.detect(history[keys] if incremental else history)
+del history
+con.register("beauty", pa.table({
+    "patent_key": keys.astype(np.int32),
+    **{col: scores[key] for col, key in SLEEPING_BEAUTY_COLUMNS.items()},
+}))
+del scores
+print(f"  sleeping beauties done in {time.time()-t0:.1f}s")
+
 # ── Step 8: Backward citations ────────────────────────────────────────────────
 timed_msg("Step 8: Backward citation count")
 t0 = time.time()
 
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE bwd_cites AS
-    SELECT patent_id, COUNT(*) AS backward_citations
+    SELECT patent_key, COUNT(*) AS backward_citations
     FROM {CITATION_TSV()}
-    GROUP BY patent_id
+    WHERE {in_scope('patent_key')}
+    GROUP BY patent_key
 """)
 print(f"  bwd_cites done in {time.time()-t0:.1f}s")
 
@@ -155,49 +408,94 @@ print(f"  bwd_cites done in {time.time()-t0:.1f}s")
 timed_msg("Step 9: Final join → parquet")
 t0 = time.time()
 
+# Unaffected patents keep their previous row; surrogate keys are re-resolved
+# because a warehouse rebuild reassigns them.
+carried = f"""
+    UNION ALL BY NAME
+    SELECT m.* REPLACE (k.patent_key AS patent_key, ak.assignee_key AS primary_assignee_key)
+    FROM {PATENT_MASTER()} m
+    JOIN {PATENT_IDS()} k ON m.patent_id = k.patent_id
+    LEFT JOIN {ASSIGNEE_IDS()} ak ON m.primary_assignee_id = ak.assignee_id
+    WHERE NOT EXISTS (SELECT 1 FROM affected a WHERE a.patent_id = m.patent_id)
+""" if incremental else ""
+
+tmp_dir = MASTER_DIR + ".tmp"
+if os.path.exists(tmp_dir):
+    shutil.rmtree(tmp_dir)
+if os.path.exists(STATE_PATH + ".key"):
+    os.remove(STATE_PATH + ".key")  # master and state must never disagree
+if not save_state and os.path.exists(STATE_PATH):
+    os.remove(STATE_PATH)
+fwd_window_cols = ",\n        ".join(f"COALESCE(fc.{c}, 0) AS {c}" for c in FWD_CITE_WINDOWS)
+diversity_cols = ",\n        ".join(
+    f"dv.{c}, COALESCE(dv.{c}_n, 0) AS {c}_n" for c in DIVERSITY_COLUMNS
+)
+beauty_cols = ",\n        ".join(f"sb.{c}" for c in SLEEPING_BEAUTY_COLUMNS)
 con.execute(f"""
-    COPY (
-        SELECT
-            b.patent_id,
-            b.grant_date,
-            b.grant_year,
-            b.num_claims,
-            ca.cpc_section,
-            ca.scope,
-            ca.n_cpc_sections,
-            CASE WHEN ca.n_cpc_sections > 1 THEN TRUE ELSE FALSE END AS is_multi_section,
-            COALESCE(t.team_size, 1) AS team_size,
-            CASE
-                WHEN COALESCE(t.team_size, 1) = 1 THEN 'Solo'
-                WHEN COALESCE(t.team_size, 1) <= 3 THEN '2-3'
-                WHEN COALESCE(t.team_size, 1) <= 6 THEN '4-6'
-                ELSE '7+'
-            END AS team_size_cat,
-            a.primary_assignee_id,
-            a.primary_assignee_org,
-            il.disambig_state,
-            il.disambig_country,
-            il.gender_code,
-            COALESCE(fc.fwd_cite_5y, 0) AS fwd_cite_5y,
-            COALESCE(fc.forward_citations, 0) AS forward_citations,
-            COALESCE(bc.backward_citations, 0) AS backward_citations,
-            COALESCE(lg.grant_lag_days, 0) AS grant_lag_days
-        FROM base b
-        LEFT JOIN cpc_agg ca ON b.patent_id = ca.patent_id
-        LEFT JOIN team t ON b.patent_id = t.patent_id
-        LEFT JOIN assignee a ON b.patent_id = a.patent_id
-        LEFT JOIN inv_loc il ON b.patent_id = il.patent_id
-        LEFT JOIN fwd_cites fc ON b.patent_id = fc.patent_id
-        LEFT JOIN bwd_cites bc ON b.patent_id = bc.patent_id
-        LEFT JOIN lag lg ON b.patent_id = lg.patent_id
-    ) TO '{MASTER_PATH}' (FORMAT PARQUET, COMPRESSION ZSTD)
+    CREATE OR REPLACE TEMPORARY TABLE master AS
+    SELECT
+        b.patent_key,
+        b.patent_id,
+        b.grant_date,
+        b.grant_year,
+        b.num_claims,
+        ca.cpc_section,
+        ca.scope,
+        ca.n_cpc_sections,
+        CASE WHEN ca.n_cpc_sections > 1 THEN TRUE ELSE FALSE END AS is_multi_section,
+        COALESCE(ca.domain_mask, 0) AS domain_mask,
+        COALESCE(t.team_size, 1) AS team_size,
+        CASE
+            WHEN COALESCE(t.team_size, 1) = 1 THEN 'Solo'
+            WHEN COALESCE(t.team_size, 1) <= 3 THEN '2-3'
+            WHEN COALESCE(t.team_size, 1) <= 6 THEN '4-6'
+            ELSE '7+'
+        END AS team_size_cat,
+        a.primary_assignee_key,
+        a.primary_assignee_id,
+        a.primary_assignee_org,
+        il.disambig_state,
+        il.disambig_country,
+        il.gender_code,
+        {fwd_window_cols},
+        COALESCE(fc.forward_citations, 0) AS forward_citations,
+        COALESCE(bc.backward_citations, 0) AS backward_citations,
+        COALESCE(lg.grant_lag_days, 0) AS grant_lag_days,
+        {diversity_cols},
+        {beauty_cols}
+    FROM base b
+    LEFT JOIN cpc_agg ca ON b.patent_key = ca.patent_key
+    LEFT JOIN team t ON b.patent_key = t.patent_key
+    LEFT JOIN assignee a ON b.patent_key = a.patent_key
+    LEFT JOIN inv_loc il ON b.patent_key = il.patent_key
+    LEFT JOIN fwd_cites fc ON b.patent_key = fc.patent_key
+    LEFT JOIN bwd_cites bc ON b.patent_key = bc.patent_key
+    LEFT JOIN lag lg ON b.patent_key = lg.patent_key
+    LEFT JOIN diversity dv ON b.patent_key = dv.patent_key
+    LEFT JOIN beauty sb ON b.patent_key = sb.patent_key
+    {carried}
+    ORDER BY grant_year, cpc_section, grant_date
 """)
-final_cnt = con.execute(f"SELECT COUNT(*) FROM '{MASTER_PATH}'").fetchone()[0]
-print(f"  Wrote {final_cnt:,} rows to {MASTER_PATH} in {time.time()-t0:.1f}s")
+write_partitioned(con, "master", tmp_dir)
+# Swap the finished dataset in (the old one is still read above when incremental)
+old_dir = MASTER_DIR + ".old"
+if os.path.exists(MASTER_DIR):
+    os.replace(MASTER_DIR, old_dir)
+os.replace(tmp_dir, MASTER_DIR)
+if os.path.exists(old_dir):
+    shutil.rmtree(old_dir)
+final_cnt = con.execute(f"SELECT COUNT(*) FROM {PATENT_MASTER()}").fetchone()[0]
+print(f"  Wrote {final_cnt:,} rows to {MASTER_DIR} in {time.time()-t0:.1f}s")
 
-import os
-size_mb = os.path.getsize(MASTER_PATH) / (1024 * 1024)
-print(f"  File size: {size_mb:,.1f} MB")
+# Fingerprints for the next --incremental run
+if save_state:
+    con.execute(f"COPY state TO '{STATE_PATH}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    with open(STATE_PATH + ".key", "wb") as f:
+        f.write(orjson.dumps(state_meta()))
+
+files = [os.path.join(d, f) for d, _, fs in os.walk(MASTER_DIR) for f in fs]
+size_mb = sum(os.path.getsize(f) for f in files) / (1024 * 1024)
+print(f"  {len(files):,} partition files, {size_mb:,.1f} MB")
 
 con.close()
 print("\n=== 58_build_patent_master complete ===\n")
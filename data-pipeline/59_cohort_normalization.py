@@ -2,7 +2,7 @@
 """
 Cohort Normalization — normalize 5-year forward citations by (grant_year × cpc_section) cohort.
 
-Reads patent_master.parquet, computes cohort means, and outputs multiple JSON files
+Reads the patent master, computes cohort means, and outputs multiple JSON files
 for system-level, heatmap, assignee, inventor-group, geography, and team-size views.
 
 Output (all to public/data/computed/):
@@ -14,12 +14,11 @@ Output (all to public/data/computed/):
   6. cohort_normalized_by_teamsize.json
 """
 import time
-import duckdb
-from config import OUTPUT_DIR, save_json, timed_msg
+from config import OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/computed"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Load master and compute cohort means ──────────────────────────────
@@ -28,7 +27,7 @@ t0 = time.time()
 
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE master AS
-    SELECT * FROM '{MASTER}'
+    SELECT * FROM {MASTER}
     WHERE grant_year BETWEEN 1976 AND 2020
       AND cpc_section IS NOT NULL
       AND cpc_section NOT IN ('Y', 'D')
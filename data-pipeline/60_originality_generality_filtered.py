@@ -7,129 +7,53 @@ generality (1 - HHI of forward citation CPC sections) at three thresholds:
   - All patents (no filter)
   - >=5 citations
   - >=10 citations
+(counts are classified citations; the index needs at least 2)
 
 Output: public/data/computed/originality_generality_filtered.json
 """
 import time
-import duckdb
-from config import (
-    PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
-)
+from config import OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
 OUT = f"{OUTPUT_DIR}/computed"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 
-# ── Step 1: Patent year table ─────────────────────────────────────────────────
-timed_msg("Step 1: Build patent year lookup")
-t0 = time.time()
-
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE patent_year AS
-    SELECT patent_id, grant_year AS year
-    FROM '{MASTER}'
-    WHERE grant_year BETWEEN 1976 AND 2025
-""")
-print(f"  patent_year done in {time.time()-t0:.1f}s")
-
-# ── Step 2: Backward section counts (originality) ─────────────────────────────
-timed_msg("Step 2: Backward citation section counts for originality")
-t0 = time.time()
-
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE bwd_sections AS
-    SELECT
-        c.patent_id,
-        LEFT(cpc.cpc_section, 1) AS section,
-        COUNT(*) AS cnt
-    FROM {CITATION_TSV()} c
-    JOIN {CPC_CURRENT_TSV()} cpc ON c.citation_patent_id = cpc.patent_id AND cpc.cpc_sequence = 0
-    GROUP BY c.patent_id, LEFT(cpc.cpc_section, 1)
-""")
-
-con.execute("""
-    CREATE OR REPLACE TEMPORARY TABLE bwd_hhi AS
-    SELECT
-        patent_id,
-        SUM(cnt) AS total_bwd,
-        SUM(POWER(CAST(cnt AS DOUBLE) / total, 2)) AS hhi
-    FROM (
-        SELECT bs.patent_id, bs.section, bs.cnt,
-               SUM(bs.cnt) OVER (PARTITION BY bs.patent_id) AS total
-        FROM bwd_sections bs
-    ) sub
-    WHERE total >= 2
-    GROUP BY patent_id
-""")
-print(f"  bwd_hhi done in {time.time()-t0:.1f}s")
+# Originality / generality and their classified-citation counts are master
+# columns (58_build_patent_master.py, one pass over the citation graph), so each
+# threshold is just a filter. An index needs at least 2 classified citations.
+THRESHOLDS = [0, 5, 10]
 
-# ── Step 3: Forward section counts (generality) ───────────────────────────────
-timed_msg("Step 3: Forward citation section counts for generality")
-t0 = time.time()
-
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE fwd_sections AS
-    SELECT
-        c.citation_patent_id AS patent_id,
-        LEFT(cpc.cpc_section, 1) AS section,
-        COUNT(*) AS cnt
-    FROM {CITATION_TSV()} c
-    JOIN {CPC_CURRENT_TSV()} cpc ON c.patent_id = cpc.patent_id AND cpc.cpc_sequence = 0
-    GROUP BY c.citation_patent_id, LEFT(cpc.cpc_section, 1)
-""")
-
-con.execute("""
-    CREATE OR REPLACE TEMPORARY TABLE fwd_hhi AS
-    SELECT
-        patent_id,
-        SUM(cnt) AS total_fwd,
-        SUM(POWER(CAST(cnt AS DOUBLE) / total, 2)) AS hhi
-    FROM (
-        SELECT fs.patent_id, fs.section, fs.cnt,
-               SUM(fs.cnt) OVER (PARTITION BY fs.patent_id) AS total
-        FROM fwd_sections fs
-    ) sub
-    WHERE total >= 2
-    GROUP BY patent_id
-""")
-print(f"  fwd_hhi done in {time.time()-t0:.1f}s")
-
-# ── Step 4: Compute at each threshold ─────────────────────────────────────────
-timed_msg("Step 4: Aggregate originality/generality at 3 thresholds")
+# ── Aggregate at each threshold ───────────────────────────────────────────────
+timed_msg(f"Aggregate originality/generality at {len(THRESHOLDS)} thresholds")
 t0 = time.time()
 
 results = []
-for threshold in [0, 5, 10]:
+for threshold in THRESHOLDS:
     label = "all" if threshold == 0 else f"gte{threshold}"
-
-    bwd_filter = f"AND bh.total_bwd >= {threshold}" if threshold > 0 else ""
-    fwd_filter = f"AND fh.total_fwd >= {threshold}" if threshold > 0 else ""
+    min_n = max(threshold, 2)
 
     df = con.execute(f"""
         WITH orig AS (
             SELECT
-                py.year,
-                ROUND(AVG(1.0 - bh.hhi), 4) AS avg_originality,
-                ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY 1.0 - bh.hhi), 4) AS median_originality,
+                grant_year AS year,
+                ROUND(AVG(originality), 4) AS avg_originality,
+                ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY originality), 4) AS median_originality,
                 COUNT(*) AS n_patents
-            FROM patent_year py
-            JOIN bwd_hhi bh ON py.patent_id = bh.patent_id
-            WHERE 1=1 {bwd_filter}
-            GROUP BY py.year
+            FROM {MASTER}
+            WHERE originality_n >= {min_n}
+            GROUP BY grant_year
         ),
         gen AS (
             SELECT
-                py.year,
-                ROUND(AVG(1.0 - fh.hhi), 4) AS avg_generality,
-                ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY 1.0 - fh.hhi), 4) AS median_generality,
+                grant_year AS year,
+                ROUND(AVG(generality), 4) AS avg_generality,
+                ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY generality), 4) AS median_generality,
                 COUNT(*) AS n_patents
-            FROM patent_year py
-            JOIN fwd_hhi fh ON py.patent_id = fh.patent_id
-            WHERE py.year <= 2020 {fwd_filter}
-            GROUP BY py.year
+            FROM {MASTER}
+            WHERE grant_year <= 2020 AND generality_n >= {min_n}
+            GROUP BY grant_year
         )
         SELECT
             COALESCE(o.year, g.year) AS year,
@@ -12,12 +12,16 @@ Output (to public/data/chapter10/):
   - convergence_top_assignees.json
 """
 import time
-import duckdb
-from config import OUTPUT_DIR, save_json, timed_msg
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+import numpy as np
+
+import cooccurrence
+import cpc_incidence
+from config import OUTPUT_DIR, save_json, sql_round, timed_msg, get_connection, PATENT_MASTER
+
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter10"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Load master ───────────────────────────────────────────────────────
@@ -28,7 +32,7 @@ con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE m AS
     SELECT patent_id, grant_year, cpc_section, n_cpc_sections, is_multi_section,
            primary_assignee_org, primary_assignee_id
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1976 AND 2024
       AND cpc_section IS NOT NULL
 """)
@@ -108,77 +112,34 @@ print(f"  Decomposition done in {time.time()-t0:.1f}s")
 timed_msg("Analysis 2: Near vs far convergence (baseline 1976-1985)")
 t0 = time.time()
 
-# Load all CPC assignments per patent for co-occurrence
-from config import CPC_CURRENT_TSV
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE patent_sections AS
-    SELECT DISTINCT patent_id, cpc_section
-    FROM {CPC_CURRENT_TSV()}
-    WHERE cpc_section IS NOT NULL AND cpc_section NOT IN ('Y')
-""")
-
-# Build baseline co-occurrence from 1976-1985
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE baseline_cooccur AS
-    SELECT
-        ps1.cpc_section AS section_a,
-        ps2.cpc_section AS section_b,
-        COUNT(DISTINCT ps1.patent_id) AS co_count
-    FROM patent_sections ps1
-    JOIN patent_sections ps2 ON ps1.patent_id = ps2.patent_id AND ps1.cpc_section < ps2.cpc_section
-    JOIN '{MASTER}' m ON ps1.patent_id = m.patent_id
-    WHERE m.grant_year BETWEEN 1976 AND 1985
-    GROUP BY ps1.cpc_section, ps2.cpc_section
-""")
+# Non-Y section co-occurrence of the 1976-1985 baseline and of every grant
+# year, as sparse products on the patent x section incidence matrix
+# (cooccurrence.py) instead of a self-join of per-patent CPC sections
+inc = cpc_incidence.load()
+non_y = [i for i, s in enumerate(inc.labels["section"]) if s != "Y"]
+YEARS = range(1976, 2025)
+co = inc.co_occurrence("section", {"baseline": (1976, 1985), **{y: (y, y) for y in YEARS}},
+                       columns=non_y)
 
-# Near = top quartile co-occurrence, Far = bottom quartile
-# Pre-compute quantiles since DuckDB doesn't support PERCENTILE_CONT as window function
-q75, q25 = con.execute("""
-    SELECT
-        QUANTILE_CONT(co_count, 0.75),
-        QUANTILE_CONT(co_count, 0.25)
-    FROM baseline_cooccur
-""").fetchone()
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE pair_distance AS
-    SELECT *,
-        CASE
-            WHEN co_count >= {q75} THEN 'near'
-            WHEN co_count <= {q25} THEN 'far'
-            ELSE 'mid'
-        END AS distance_type
-    FROM baseline_cooccur
-""")
+# Near = top quartile baseline co-occurrence, Far = bottom quartile
+a, b, base = cooccurrence.pairs(co.pop("baseline"))
+q75, q25 = np.quantile(base, [0.75, 0.25]) if len(base) else (np.inf, -np.inf)
+distance_type = {(i, j): "near" if c >= q75 else "far" if c <= q25 else "mid"
+                 for i, j, c in zip(a, b, base)}
 
-# Multi-section patent co-occurrence over time
-near_far = con.execute(f"""
-    WITH yearly_cooccur AS (
-        SELECT
-            m.grant_year AS year,
-            ps1.cpc_section AS section_a,
-            ps2.cpc_section AS section_b,
-            COUNT(DISTINCT ps1.patent_id) AS co_count
-        FROM patent_sections ps1
-        JOIN patent_sections ps2 ON ps1.patent_id = ps2.patent_id AND ps1.cpc_section < ps2.cpc_section
-        JOIN '{MASTER}' m ON ps1.patent_id = m.patent_id
-        WHERE m.grant_year BETWEEN 1976 AND 2024
-        GROUP BY m.grant_year, ps1.cpc_section, ps2.cpc_section
-    ),
-    yearly_total AS (
-        SELECT year, SUM(co_count) AS total_co FROM yearly_cooccur GROUP BY year
-    )
-    SELECT
-        yc.year,
-        pd.distance_type,
-        ROUND(CAST(SUM(yc.co_count) AS DOUBLE) / yt.total_co * 100, 4) AS share_pct
-    FROM yearly_cooccur yc
-    JOIN pair_distance pd ON yc.section_a = pd.section_a AND yc.section_b = pd.section_b
-    JOIN yearly_total yt ON yc.year = yt.year
-    WHERE pd.distance_type IN ('near', 'far')
-    GROUP BY yc.year, pd.distance_type, yt.total_co
-    ORDER BY yc.year, pd.distance_type
-""").fetchdf()
-save_json(near_far.to_dict(orient="records"), f"{OUT}/convergence_near_far.json")
+# Share of each year's pairwise co-occurrence falling on near / far pairs
+near_far = []
+for year in YEARS:
+    a, b, cnt = cooccurrence.pairs(co[year])
+    shares = {}
+    for i, j, c in zip(a, b, cnt):
+        kind = distance_type.get((i, j))
+        if kind in ("near", "far"):
+            shares[kind] = shares.get(kind, 0) + int(c)
+    near_far += [{"year": year, "distance_type": kind,
+                  "share_pct": sql_round(shares[kind] / int(cnt.sum()) * 100, 4)}
+                 for kind in sorted(shares)]
+save_json(near_far, f"{OUT}/convergence_near_far.json")
 print(f"  Near/far done in {time.time()-t0:.1f}s")
 
 # ── Analysis 3: Top-10 assignee share of multi-section patents ────────────────
@@ -12,15 +12,14 @@ Output: public/data/chapter5/exploration_exploitation_trajectory.json
 import json
 import time
 import math
-import duckdb
 from config import (
     PATENT_TSV, CPC_CURRENT_TSV, CITATION_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER,
 )
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Load existing exploration scores if available ─────────────────────
@@ -30,7 +29,7 @@ t0 = time.time()
 # Identify top 10 firms by patent count in master
 top10_rows = con.execute(f"""
     SELECT primary_assignee_org AS firm, COUNT(*) AS total
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE primary_assignee_org IS NOT NULL AND TRIM(primary_assignee_org) != ''
     GROUP BY primary_assignee_org
     ORDER BY total DESC
@@ -47,7 +46,7 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE firm_patents AS
     SELECT m.patent_id, m.grant_year, m.primary_assignee_org AS firm
-    FROM '{MASTER}' m
+    FROM {MASTER} m
     WHERE m.primary_assignee_org IN ({firm_sql})
       AND m.grant_year BETWEEN 1976 AND 2024
 """)
@@ -10,15 +10,14 @@ Output: public/data/chapter5/inventor_mobility_event_study.json
 """
 import time
 import numpy as np
-import duckdb
 from config import (
     PATENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER,
 )
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 con.execute("SET memory_limit = '200GB'")
 
@@ -38,7 +37,7 @@ con.execute(f"""
         m.scope,
         m.primary_assignee_org AS assignee
     FROM {INVENTOR_TSV()} i
-    JOIN '{MASTER}' m ON i.patent_id = m.patent_id
+    JOIN {MASTER} m ON i.patent_id = m.patent_id
     WHERE m.primary_assignee_org IS NOT NULL
       AND TRIM(m.primary_assignee_org) != ''
       AND m.grant_year BETWEEN 1980 AND 2020
@@ -148,7 +147,7 @@ t0 = time.time()
 firm_quality = con.execute(f"""
     SELECT primary_assignee_org AS firm,
            AVG(fwd_cite_5y) AS mean_quality
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1990 AND 2020
       AND primary_assignee_org IS NOT NULL
     GROUP BY primary_assignee_org
@@ -10,12 +10,11 @@ Output: public/data/chapter3/team_size_coefficients.json
 """
 import time
 import numpy as np
-import duckdb
-from config import OUTPUT_DIR, save_json, timed_msg
+from config import OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter3"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Load and prepare data ─────────────────────────────────────────────
@@ -33,7 +32,7 @@ df = con.execute(f"""
             fwd_cite_5y,
             primary_assignee_org,
             is_multi_section
-        FROM '{MASTER}'
+        FROM {MASTER}
         WHERE grant_year BETWEEN 1976 AND 2020
           AND cpc_section IS NOT NULL
           AND cpc_section NOT IN ('Y', 'D')
@@ -10,12 +10,11 @@ Output: public/data/chapter2/blockbuster_lorenz.json
 """
 import time
 import numpy as np
-import duckdb
-from config import OUTPUT_DIR, save_json, timed_msg
+from config import OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter2"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Identify blockbusters ─────────────────────────────────────────────
@@ -37,7 +36,7 @@ con.execute(f"""
             WHEN grant_year < 2010 THEN '2000-2009'
             ELSE '2010-2020'
         END AS decade
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1976 AND 2020
       AND cpc_section IS NOT NULL
       AND cpc_section NOT IN ('Y')
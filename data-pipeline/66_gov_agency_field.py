@@ -11,16 +11,15 @@ Output (to public/data/chapter1/):
   - gov_agency_breadth_depth.json
 """
 import time
-import duckdb
 from config import (
     GOV_INTEREST_TSV, GOV_INTEREST_ORG_TSV,
     CPC_CURRENT_TSV, CITATION_TSV, PATENT_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER,
 )
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter1"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 # ── Step 1: Join gov interest with master ─────────────────────────────────────
@@ -48,7 +47,7 @@ con.execute(f"""
         m.n_cpc_sections
     FROM {GOV_INTEREST_TSV()} gi
     JOIN {GOV_INTEREST_ORG_TSV()} gio ON gi.patent_id = gio.patent_id
-    JOIN '{MASTER}' m ON gi.patent_id = m.patent_id
+    JOIN {MASTER} m ON gi.patent_id = m.patent_id
     WHERE gio.{agency_col} IS NOT NULL
       AND TRIM(gio.{agency_col}) != ''
       AND m.cpc_section IS NOT NULL
@@ -63,7 +62,7 @@ t0 = time.time()
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE cohort_mean AS
     SELECT grant_year, cpc_section, AVG(fwd_cite_5y) AS cm
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1976 AND 2020 AND cpc_section IS NOT NULL
     GROUP BY grant_year, cpc_section
 """)
@@ -10,12 +10,11 @@ Compute a z-scored composite interdisciplinarity index per year:
 Output: public/data/chapter10/interdisciplinarity_unified.json
 """
 import time
-import duckdb
-from config import OUTPUT_DIR, save_json, timed_msg
+from config import OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter10"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 timed_msg("Computing interdisciplinarity trend")
@@ -29,7 +28,7 @@ result = con.execute(f"""
             AVG(CAST(n_cpc_sections AS DOUBLE)) AS mean_cpc_sections,
             AVG(CASE WHEN is_multi_section THEN 1.0 ELSE 0.0 END) * 100 AS multi_section_pct,
             COUNT(*) AS patent_count
-        FROM '{MASTER}'
+        FROM {MASTER}
         WHERE grant_year BETWEEN 1976 AND 2024
           AND cpc_section IS NOT NULL
         GROUP BY grant_year
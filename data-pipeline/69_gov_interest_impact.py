@@ -10,12 +10,11 @@ Compare government-funded patents vs non-funded:
 Output: public/data/chapter1/gov_impact_comparison.json
 """
 import time
-import duckdb
-from config import GOV_INTEREST_TSV, OUTPUT_DIR, save_json, timed_msg
+from config import GOV_INTEREST_TSV, OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter1"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 timed_msg("Step 1: Cohort percentiles")
@@ -29,7 +28,7 @@ con.execute(f"""
         PERCENTILE_CONT(0.90) WITHIN GROUP (ORDER BY fwd_cite_5y) AS p90,
         PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY fwd_cite_5y) AS p99,
         COUNT(*) AS cohort_size
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1980 AND 2020
       AND cpc_section IS NOT NULL AND cpc_section != 'Y'
       AND fwd_cite_5y IS NOT NULL
@@ -48,7 +47,7 @@ con.execute(f"""
         m.cpc_section,
         m.fwd_cite_5y,
         CASE WHEN gi.patent_id IS NOT NULL THEN 'Government-Funded' ELSE 'Non-Funded' END AS funding_status
-    FROM '{MASTER}' m
+    FROM {MASTER} m
     LEFT JOIN (SELECT DISTINCT patent_id FROM {GOV_INTEREST_TSV()}) gi ON m.patent_id = gi.patent_id
     WHERE m.grant_year BETWEEN 1980 AND 2020
       AND m.cpc_section IS NOT NULL AND m.cpc_section != 'Y'
@@ -10,12 +10,11 @@ Metrics: patent count, mean claims, mean scope — 2008-2020.
 Output: public/data/chapter10/alice_event_study.json
 """
 import time
-import duckdb
-from config import CPC_CURRENT_TSV, OUTPUT_DIR, save_json, timed_msg
+from config import CPC_CURRENT_TSV, OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter10"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 timed_msg("Step 1: Identify software patents via CPC subclasses")
@@ -46,7 +45,7 @@ con.execute(f"""
             WHEN m.cpc_section IN ('A', 'C', 'F') THEN 'Control (A/C/F)'
             ELSE NULL
         END AS group_label
-    FROM '{MASTER}' m
+    FROM {MASTER} m
     LEFT JOIN software_patents sp ON m.patent_id = sp.patent_id
     WHERE m.grant_year BETWEEN 2008 AND 2020
 """)
@@ -1,20 +1,24 @@
 #!/usr/bin/env python3
 """
-71: Bridge Inventor Centrality — Section 13e (Partially Feasible)
+71: Bridge Inventor Centrality — Section 13e
 
-Scope to top-5K most prolific inventors (full network too large for betweenness).
-Build co-invention network among these inventors, compute degree centrality
-(betweenness too expensive), then compare citation impact by centrality bin.
+For the top-5K most prolific inventors, take degree and sampled Brandes
+betweenness on the full co-inventor network (coinventor_graph.py, all years),
+then compare citation impact by betweenness quintile.
 
 Output: public/data/chapter5/bridge_centrality.json
 """
 import time
-import duckdb
-from config import INVENTOR_TSV, OUTPUT_DIR, save_json, timed_msg
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+import numpy as np
+import pyarrow as pa
+
+import coinventor_graph
+from config import INVENTOR_TSV, OUTPUT_DIR, save_json, timed_msg, get_connection, PATENT_MASTER
+
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/chapter5"
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 
 timed_msg("Step 1: Find top-5K most prolific inventors")
@@ -22,68 +26,48 @@ t0 = time.time()
 
 con.execute(f"""
     CREATE OR REPLACE TEMPORARY TABLE top_inventors AS
-    SELECT inventor_id, COUNT(DISTINCT patent_id) AS patent_count
+    SELECT inventor_id, inventor_key, COUNT(DISTINCT patent_id) AS patent_count
     FROM {INVENTOR_TSV()}
-    GROUP BY inventor_id
+    GROUP BY inventor_id, inventor_key
     ORDER BY patent_count DESC
     LIMIT 5000
 """)
 print(f"  Top 5K inventors identified in {time.time()-t0:.1f}s")
 
-timed_msg("Step 2: Build co-invention edges among top-5K")
-t0 = time.time()
-
-con.execute(f"""
-    CREATE OR REPLACE TEMPORARY TABLE coinvention AS
-    SELECT
-        a.inventor_id AS inv_a,
-        b.inventor_id AS inv_b,
-        COUNT(DISTINCT a.patent_id) AS shared_patents
-    FROM {INVENTOR_TSV()} a
-    JOIN {INVENTOR_TSV()} b ON a.patent_id = b.patent_id AND a.inventor_id < b.inventor_id
-    WHERE a.inventor_id IN (SELECT inventor_id FROM top_inventors)
-      AND b.inventor_id IN (SELECT inventor_id FROM top_inventors)
-    GROUP BY a.inventor_id, b.inventor_id
-""")
-edge_cnt = con.execute("SELECT COUNT(*) FROM coinvention").fetchone()[0]
-print(f"  Co-invention edges: {edge_cnt:,} in {time.time()-t0:.1f}s")
-
-timed_msg("Step 3: Compute degree centrality")
+timed_msg("Step 2: Degree + sampled betweenness on the full co-inventor network")
 t0 = time.time()
 
-con.execute("""
-    CREATE OR REPLACE TEMPORARY TABLE degree AS
-    SELECT inventor_id, SUM(degree) AS degree
-    FROM (
-        SELECT inv_a AS inventor_id, COUNT(*) AS degree FROM coinvention GROUP BY inv_a
-        UNION ALL
-        SELECT inv_b AS inventor_id, COUNT(*) AS degree FROM coinvention GROUP BY inv_b
-    )
-    GROUP BY inventor_id
-""")
-print(f"  Degree centrality done in {time.time()-t0:.1f}s")
+# Brandes betweenness from sampled pivots over every inventor (coinventor_graph.py)
+g = coinventor_graph.load("all")
+con.register("centrality", pa.table({
+    "inventor_key": np.asarray(g.inventor_key),
+    "degree": g.degree(),
+    "betweenness": g.betweenness(),
+}))
+print(f"  {g.n:,} inventors, {g.m:,} edges: centrality done in {time.time()-t0:.1f}s")
 
-timed_msg("Step 4: Compute citation impact by centrality bin")
+timed_msg("Step 3: Compute citation impact by centrality bin")
 t0 = time.time()
 
 result = con.execute(f"""
     WITH inventor_quality AS (
         SELECT
             i.inventor_id,
-            COALESCE(d.degree, 0) AS degree,
+            COALESCE(c.degree, 0) AS degree,
+            COALESCE(c.betweenness, 0) AS betweenness,
             AVG(m.fwd_cite_5y) AS mean_raw_citations,
             COUNT(DISTINCT i.patent_id) AS patent_count
         FROM {INVENTOR_TSV()} i
-        JOIN '{MASTER}' m ON i.patent_id = m.patent_id
-        LEFT JOIN degree d ON i.inventor_id = d.inventor_id
-        WHERE i.inventor_id IN (SELECT inventor_id FROM top_inventors)
-          AND m.grant_year BETWEEN 1980 AND 2020
+        JOIN {MASTER} m ON i.patent_id = m.patent_id
+        JOIN top_inventors t ON i.inventor_id = t.inventor_id
+        LEFT JOIN centrality c ON t.inventor_key = c.inventor_key
+        WHERE m.grant_year BETWEEN 1980 AND 2020
           AND m.fwd_cite_5y IS NOT NULL
-        GROUP BY i.inventor_id, d.degree
+        GROUP BY i.inventor_id, c.degree, c.betweenness
     ),
     binned AS (
         SELECT *,
-            NTILE(5) OVER (ORDER BY degree) AS centrality_quintile
+            NTILE(5) OVER (ORDER BY betweenness, degree) AS centrality_quintile
         FROM inventor_quality
     )
     SELECT
@@ -97,6 +81,7 @@ result = con.execute(f"""
         END AS centrality_label,
         COUNT(*) AS n_inventors,
         ROUND(AVG(degree), 1) AS mean_degree,
+        ROUND(AVG(betweenness), 1) AS mean_betweenness,
         ROUND(AVG(mean_raw_citations), 3) AS mean_citations,
         ROUND(AVG(patent_count), 1) AS mean_patent_count
     FROM binned
@@ -110,5 +95,3 @@ print(result.to_string(index=False))
 
 con.close()
 print("\n=== 71_bridge_inventor_centrality complete ===\n")
-print("NOTE: Uses degree centrality (not betweenness) due to network size constraints.")
-print("Full betweenness centrality for 5K-node network would require NetworkX and significant compute time.")
@@ -2,7 +2,7 @@
 """
 ACT 6 Cross-Domain Comparison — builds overview data for all 12 deep-dive domains.
 
-Uses patent_master.parquet + g_cpc_current to compute:
+Uses the patent master (domain_mask, see domains.py) to compute:
   1. act6_comparison.json   — per-domain summary (total, recent 5yr, CAGR, share, quality)
   2. act6_timeseries.json   — annual patent counts per domain (for small-multiples)
   3. act6_quality.json      — quality metrics per domain (citations, claims, scope, team)
@@ -10,45 +10,21 @@ Uses patent_master.parquet + g_cpc_current to compute:
 
 Generates → public/data/act6/
 """
-import duckdb
 import math
-from config import CPC_CURRENT_TSV, OUTPUT_DIR, save_json, timed_msg, query_to_json
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+import numpy as np
+
+import cooccurrence
+from config import OUTPUT_DIR, save_json, timed_msg, query_to_json, get_connection, PATENT_MASTER
+from domains import DOMAINS, has_domain
+
+MASTER = PATENT_MASTER()
 OUT = f"{OUTPUT_DIR}/act6"
 
-# ── Domain CPC filters (same as scripts 47-57 + AI from 12) ───────────────────
-DOMAINS = {
-    "3D Printing":   {"slug": "3dprint",  "filter": "(cpc_subclass = 'B33Y' OR cpc_group LIKE 'B33Y%' OR cpc_group LIKE 'B29C64%' OR cpc_group LIKE 'B22F10%')"},
-    "AgTech":        {"slug": "agtech",   "filter": "(cpc_subclass IN ('A01B','A01C','A01G','A01H') OR cpc_group LIKE 'G06Q50/02%')"},
-    "AI":            {"slug": "ai",       "filter": "(cpc_group LIKE 'G06N%' OR cpc_group LIKE 'G06F18%' OR cpc_subclass = 'G06V' OR cpc_group LIKE 'G10L15%' OR cpc_group LIKE 'G06F40%')"},
-    "AV":            {"slug": "av",       "filter": "(cpc_group LIKE 'B60W60%' OR cpc_group LIKE 'G05D1%' OR cpc_group LIKE 'G06V20/56%')"},
-    "Biotech":       {"slug": "biotech",  "filter": "(cpc_group LIKE 'C12N15%' OR cpc_group LIKE 'C12N9%' OR cpc_group LIKE 'C12Q1/68%')"},
-    "Blockchain":    {"slug": "blockchain","filter": "(cpc_group LIKE 'H04L9/0643%' OR cpc_group LIKE 'G06Q20/0655%')"},
-    "Cyber":         {"slug": "cyber",    "filter": "(cpc_group LIKE 'G06F21%' OR cpc_group LIKE 'H04L9%' OR cpc_group LIKE 'H04L63%')"},
-    "DigiHealth":    {"slug": "digihealth","filter": "(cpc_group LIKE 'A61B5%' OR cpc_subclass = 'G16H' OR cpc_group LIKE 'A61B34%')"},
-    "Green":         {"slug": "green",    "filter": "(cpc_subclass LIKE 'Y02%' OR cpc_subclass LIKE 'Y04S%' OR cpc_group LIKE 'Y02%' OR cpc_group LIKE 'Y04S%')"},
-    "Quantum":       {"slug": "quantum",  "filter": "(cpc_group LIKE 'G06N10%' OR cpc_group LIKE 'H01L39%')"},
-    "Semiconductor": {"slug": "semi",     "filter": "(cpc_subclass IN ('H01L','H10N','H10K'))"},
-    "Space":         {"slug": "space",    "filter": "(cpc_subclass = 'B64G' OR cpc_group LIKE 'H04B7/185%')"},
-}
-
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 con.execute("SET memory_limit = '200GB'")
 
-# ── Step 0: Build domain patent sets ──────────────────────────────────────────
-timed_msg("Building domain patent sets")
-for name, info in DOMAINS.items():
-    slug = info["slug"]
-    filt = info["filter"]
-    con.execute(f"""
-        CREATE OR REPLACE TEMPORARY TABLE dom_{slug} AS
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {filt}
-    """)
-    cnt = con.execute(f"SELECT COUNT(*) FROM dom_{slug}").fetchone()[0]
-    print(f"  {name}: {cnt:,} patents")
-
 # ── Step 1: Domain summaries (comparison.json) ────────────────────────────────
 timed_msg("Computing domain summaries")
 rows = []
@@ -57,8 +33,8 @@ for name, info in DOMAINS.items():
     r = con.execute(f"""
         WITH dm AS (
             SELECT m.patent_id, m.grant_year, m.fwd_cite_5y, m.num_claims, m.scope, m.team_size
-            FROM '{MASTER}' m
-            JOIN dom_{slug} d ON m.patent_id = d.patent_id
+            FROM {MASTER} m
+            WHERE {has_domain(name, 'm.domain_mask')}
         ),
         total_count AS (SELECT COUNT(*) AS n FROM dm),
         recent AS (SELECT COUNT(*) AS n FROM dm WHERE grant_year BETWEEN 2020 AND 2024),
@@ -72,7 +48,7 @@ for name, info in DOMAINS.items():
             SELECT COUNT(*) AS domain_n FROM dm WHERE grant_year = 2024
         ),
         total_system AS (
-            SELECT COUNT(*) AS sys_n FROM '{MASTER}' WHERE grant_year = 2024
+            SELECT COUNT(*) AS sys_n FROM {MASTER} WHERE grant_year = 2024
         ),
         quality AS (
             SELECT
@@ -117,9 +93,9 @@ for name, info in DOMAINS.items():
     slug = info["slug"]
     result = con.execute(f"""
         SELECT m.grant_year AS year, COUNT(*) AS count
-        FROM '{MASTER}' m
-        JOIN dom_{slug} d ON m.patent_id = d.patent_id
-        WHERE m.grant_year BETWEEN 1976 AND 2025
+        FROM {MASTER} m
+        WHERE {has_domain(name, 'm.domain_mask')}
+          AND m.grant_year BETWEEN 1976 AND 2025
         GROUP BY m.grant_year
         ORDER BY m.grant_year
     """).fetchall()
@@ -141,9 +117,9 @@ for name, info in DOMAINS.items():
             ROUND(AVG(m.num_claims), 2) AS mean_claims,
             ROUND(AVG(m.scope), 2) AS mean_scope,
             ROUND(AVG(m.team_size), 2) AS mean_team_size
-        FROM '{MASTER}' m
-        JOIN dom_{slug} d ON m.patent_id = d.patent_id
-        WHERE m.grant_year BETWEEN 1990 AND 2024
+        FROM {MASTER} m
+        WHERE {has_domain(name, 'm.domain_mask')}
+          AND m.grant_year BETWEEN 1990 AND 2024
         GROUP BY period
         ORDER BY period
     """).fetchall()
@@ -161,41 +137,32 @@ save_json(quality_rows, f"{OUT}/act6_quality.json")
 timed_msg("Computing co-classification spillover matrix")
 
 # Get total patent count in master
-total_patents = con.execute(f"SELECT COUNT(*) FROM '{MASTER}'").fetchone()[0]
+total_patents = con.execute(f"SELECT COUNT(*) FROM {MASTER}").fetchone()[0]
+
+# Domain sizes (diagonal) and pairwise co-occurrence from one pass over the
+# domain masks: the incidence of each distinct mask (domain i is bit i),
+# weighted by its patent count (cooccurrence.py)
+masks = con.execute(f"""
+    SELECT domain_mask, COUNT(*) AS n FROM {MASTER} WHERE domain_mask <> 0 GROUP BY domain_mask
+""").fetchnumpy()
+co = cooccurrence.co_occurrence(cooccurrence.mask_incidence(masks["domain_mask"], len(DOMAINS)),
+                                {"all": np.ones(len(masks["n"]), dtype=bool)},
+                                weights=masks["n"])["all"]
+lift = cooccurrence.lift(co, total_patents).toarray()
+co = co.toarray()
 
-# Domain sizes
-domain_sizes = {}
-for name, info in DOMAINS.items():
-    slug = info["slug"]
-    n = con.execute(f"""
-        SELECT COUNT(*) FROM '{MASTER}' m JOIN dom_{slug} d ON m.patent_id = d.patent_id
-    """).fetchone()[0]
-    domain_sizes[name] = n
-
-# Pairwise co-occurrence
 domain_names = list(DOMAINS.keys())
 spillover_rows = []
 
 for i in range(len(domain_names)):
     for j in range(i + 1, len(domain_names)):
-        a_name = domain_names[i]
-        b_name = domain_names[j]
-        a_slug = DOMAINS[a_name]["slug"]
-        b_slug = DOMAINS[b_name]["slug"]
-
-        observed = con.execute(f"""
-            SELECT COUNT(*) FROM dom_{a_slug} a JOIN dom_{b_slug} b ON a.patent_id = b.patent_id
-        """).fetchone()[0]
-
-        expected = (domain_sizes[a_name] * domain_sizes[b_name]) / total_patents if total_patents > 0 else 0
-        lift = observed / expected if expected > 0 else 0
-
+        expected = (co[i, i] * co[j, j]) / total_patents if total_patents > 0 else 0
         spillover_rows.append({
-            "domain_a": a_name,
-            "domain_b": b_name,
-            "observed": observed,
-            "expected": round(expected, 1),
-            "lift": round(lift, 3),
+            "domain_a": domain_names[i],
+            "domain_b": domain_names[j],
+            "observed": int(co[i, j]),
+            "expected": round(float(expected), 1),
+            "lift": round(float(lift[i, j]), 3) if expected > 0 else 0,
         })
 
 save_json(spillover_rows, f"{OUT}/act6_spillover.json")
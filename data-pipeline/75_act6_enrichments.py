@@ -12,15 +12,18 @@ Sections:
 
 Generates → multiple domain-specific JSON files
 """
-import duckdb
+import numpy as np
+
+import cpc_incidence
 from config import (
     CPC_CURRENT_TSV, PATENT_TSV, ASSIGNEE_TSV,
-    OUTPUT_DIR, save_json, timed_msg,
+    OUTPUT_DIR, save_json, sql_round, timed_msg, get_connection, PATENT_MASTER,
 )
+from domains import has_domain
 
-MASTER = "/tmp/patentview/patent_master.parquet"
+MASTER = PATENT_MASTER()
 
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads TO 38")
 con.execute("SET memory_limit = '200GB'")
 
@@ -29,18 +32,13 @@ con.execute("SET memory_limit = '200GB'")
 # ══════════════════════════════════════════════════════════════════════════════
 timed_msg("5d: AI GPT KPI (CPC section diversity + HHI)")
 
-AI_FILTER = "(cpc_group LIKE 'G06N%' OR cpc_group LIKE 'G06F18%' OR cpc_subclass = 'G06V' OR cpc_group LIKE 'G10L15%' OR cpc_group LIKE 'G06F40%')"
-
 result = con.execute(f"""
-    WITH ai_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {AI_FILTER}
-    ),
-    ai_sections AS (
-        SELECT ap.patent_id, m.grant_year, cpc.cpc_section
-        FROM ai_patents ap
-        JOIN '{MASTER}' m ON ap.patent_id = m.patent_id
-        JOIN {CPC_CURRENT_TSV()} cpc ON ap.patent_id = cpc.patent_id
-        WHERE m.grant_year BETWEEN 2000 AND 2025
+    WITH ai_sections AS (
+        SELECT m.patent_id, m.grant_year, cpc.cpc_section
+        FROM {MASTER} m
+        JOIN {CPC_CURRENT_TSV()} cpc ON m.patent_id = cpc.patent_id
+        WHERE {has_domain('AI', 'm.domain_mask')}
+          AND m.grant_year BETWEEN 2000 AND 2025
           AND cpc.cpc_section NOT IN ('G', 'Y')
     ),
     yearly_sections AS (
@@ -84,55 +82,26 @@ save_json(rows, f"{OUTPUT_DIR}/chapter11/ai_gpt_kpi.json")
 # ══════════════════════════════════════════════════════════════════════════════
 timed_msg("5g: Green EV-Battery coupling lift")
 
-result = con.execute(f"""
-    WITH green_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()}
-        WHERE cpc_subclass LIKE 'Y02%' OR cpc_group LIKE 'Y02%'
-    ),
-    ev_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()}
-        WHERE cpc_group LIKE 'B60L%' OR cpc_group LIKE 'B60W%'
-    ),
-    battery_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()}
-        WHERE cpc_group LIKE 'H01M%' OR cpc_group LIKE 'H02J%'
-    ),
-    green_with_year AS (
-        SELECT gp.patent_id, m.grant_year
-        FROM green_patents gp
-        JOIN '{MASTER}' m ON gp.patent_id = m.patent_id
-        WHERE m.grant_year BETWEEN 2000 AND 2025
-    ),
-    yearly_stats AS (
-        SELECT
-            gwy.grant_year AS year,
-            COUNT(DISTINCT gwy.patent_id) AS total_green,
-            COUNT(DISTINCT CASE WHEN ev.patent_id IS NOT NULL THEN gwy.patent_id END) AS green_ev,
-            COUNT(DISTINCT CASE WHEN bat.patent_id IS NOT NULL THEN gwy.patent_id END) AS green_battery,
-            COUNT(DISTINCT CASE WHEN ev.patent_id IS NOT NULL AND bat.patent_id IS NOT NULL THEN gwy.patent_id END) AS green_ev_battery
-        FROM green_with_year gwy
-        LEFT JOIN ev_patents ev ON gwy.patent_id = ev.patent_id
-        LEFT JOIN battery_patents bat ON gwy.patent_id = bat.patent_id
-        GROUP BY gwy.grant_year
-    )
-    SELECT
-        year,
-        total_green,
-        green_ev,
-        green_battery,
-        green_ev_battery,
-        CASE WHEN total_green > 0 AND green_ev > 0 AND green_battery > 0
-             THEN ROUND(
-                 (CAST(green_ev_battery AS DOUBLE) / total_green)
-                 / ((CAST(green_ev AS DOUBLE) / total_green) * (CAST(green_battery AS DOUBLE) / total_green)),
-                 3)
-             ELSE NULL END AS lift
-    FROM yearly_stats
-    ORDER BY year
-""").fetchall()
+# Patent flags are column slices of the patent x CPC incidence matrices
+# (cpc_incidence.py); per-year counts are bincounts over grant years
+inc = cpc_incidence.load()
+green = inc.has_any("class", ["Y02"]) & inc.years(2000, 2025)
+ev = inc.has_any("subclass", ["B60L", "B60W"])
+battery = inc.has_any("subclass", ["H01M", "H02J"])
+green_year = inc.grant_year[green] - 2000
+yearly = [np.bincount(green_year[flag[green]], minlength=26)
+          for flag in (np.ones(inc.n, dtype=bool), ev, battery, ev & battery)]
 
-rows = [{"year": r[0], "total_green": r[1], "green_ev": r[2], "green_battery": r[3],
-         "green_ev_battery": r[4], "lift": r[5]} for r in result]
+rows = []
+for i in np.flatnonzero(yearly[0]):
+    total_green, green_ev, green_battery, green_ev_battery = (int(y[i]) for y in yearly)
+    lift = None
+    if green_ev > 0 and green_battery > 0:
+        lift = sql_round((green_ev_battery / total_green)
+                     / ((green_ev / total_green) * (green_battery / total_green)), 3)
+    rows.append({"year": 2000 + int(i), "total_green": total_green, "green_ev": green_ev,
+                 "green_battery": green_battery, "green_ev_battery": green_ev_battery,
+                 "lift": lift})
 save_json(rows, f"{OUTPUT_DIR}/green/green_ev_battery_coupling.json")
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -151,14 +120,14 @@ result = con.execute(f"""
     ),
     quantum_assignees AS (
         SELECT DISTINCT m.primary_assignee_id, MIN(m.grant_year) AS first_quantum_year
-        FROM '{MASTER}' m
+        FROM {MASTER} m
         JOIN quantum_patents qp ON m.patent_id = qp.patent_id
         WHERE m.primary_assignee_id IS NOT NULL
         GROUP BY m.primary_assignee_id
     ),
     semi_history AS (
         SELECT DISTINCT m.primary_assignee_id, MIN(m.grant_year) AS first_semi_year
-        FROM '{MASTER}' m
+        FROM {MASTER} m
         JOIN semi_patents sp ON m.patent_id = sp.patent_id
         WHERE m.primary_assignee_id IS NOT NULL
         GROUP BY m.primary_assignee_id
@@ -196,11 +165,7 @@ save_json(rows, f"{OUTPUT_DIR}/quantum/quantum_semiconductor_dependence.json")
 # ══════════════════════════════════════════════════════════════════════════════
 timed_msg("5i: Systems complexity (3D-printing, Space, AV)")
 
-SYSTEMS_DOMAINS = {
-    "3D Printing": "(cpc_subclass = 'B33Y' OR cpc_group LIKE 'B33Y%' OR cpc_group LIKE 'B29C64%' OR cpc_group LIKE 'B22F10%')",
-    "Space":       "(cpc_subclass = 'B64G' OR cpc_group LIKE 'H04B7/185%')",
-    "AV":          "(cpc_group LIKE 'B60W60%' OR cpc_group LIKE 'G05D1%' OR cpc_group LIKE 'G06V20/56%')",
-}
+SYSTEMS_DOMAINS = ["3D Printing", "Space", "AV"]
 
 # System baseline
 baseline = con.execute(f"""
@@ -208,7 +173,7 @@ baseline = con.execute(f"""
         FLOOR(grant_year / 5) * 5 AS period,
         ROUND(AVG(team_size), 3) AS sys_team_size,
         ROUND(AVG(num_claims), 3) AS sys_claims
-    FROM '{MASTER}'
+    FROM {MASTER}
     WHERE grant_year BETWEEN 1990 AND 2024
     GROUP BY period
     ORDER BY period
@@ -216,19 +181,16 @@ baseline = con.execute(f"""
 baseline_dict = {int(r[0]): {"sys_team_size": r[1], "sys_claims": r[2]} for r in baseline}
 
 complexity_rows = []
-for domain_name, filt in SYSTEMS_DOMAINS.items():
+for domain_name in SYSTEMS_DOMAINS:
     result = con.execute(f"""
-        WITH dom AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {filt}
-        )
         SELECT
             FLOOR(m.grant_year / 5) * 5 AS period,
             ROUND(AVG(m.team_size), 3) AS mean_team_size,
             ROUND(AVG(m.num_claims), 3) AS mean_claims,
             COUNT(*) AS patent_count
-        FROM '{MASTER}' m
-        JOIN dom d ON m.patent_id = d.patent_id
-        WHERE m.grant_year BETWEEN 1990 AND 2024
+        FROM {MASTER} m
+        WHERE {has_domain(domain_name, 'm.domain_mask')}
+          AND m.grant_year BETWEEN 1990 AND 2024
         GROUP BY period
         ORDER BY period
     """).fetchall()
@@ -242,8 +204,8 @@ for domain_name, filt in SYSTEMS_DOMAINS.items():
             "mean_team_size": r[1],
             "mean_claims": r[2],
             "patent_count": r[3],
-            "team_size_index": round(r[1] / bl["sys_team_size"], 3) if bl["sys_team_size"] else None,
-            "claims_index": round(r[2] / bl["sys_claims"], 3) if bl["sys_claims"] else None,
+            "team_size_index": sql_round(r[1] / bl["sys_team_size"], 3) if bl["sys_team_size"] else None,
+            "claims_index": sql_round(r[2] / bl["sys_claims"], 3) if bl["sys_claims"] else None,
         })
 
 save_json(complexity_rows, f"{OUTPUT_DIR}/act6/systems_complexity.json")
@@ -253,19 +215,14 @@ save_json(complexity_rows, f"{OUTPUT_DIR}/act6/systems_complexity.json")
 # ══════════════════════════════════════════════════════════════════════════════
 timed_msg("5c: Blockchain hype cycle (one-and-done entrants)")
 
-BLOCKCHAIN_FILTER = "(cpc_group LIKE 'H04L9/0643%' OR cpc_group LIKE 'G06Q20/0655%')"
-
 result = con.execute(f"""
-    WITH bc_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {BLOCKCHAIN_FILTER}
-    ),
-    assignee_years AS (
+    WITH assignee_years AS (
         SELECT
             m.primary_assignee_id,
             m.grant_year
-        FROM '{MASTER}' m
-        JOIN bc_patents bp ON m.patent_id = bp.patent_id
-        WHERE m.primary_assignee_id IS NOT NULL
+        FROM {MASTER} m
+        WHERE {has_domain('Blockchain', 'm.domain_mask')}
+          AND m.primary_assignee_id IS NOT NULL
           AND m.grant_year BETWEEN 2010 AND 2024
     ),
     assignee_profile AS (
@@ -299,8 +256,6 @@ save_json(rows, f"{OUTPUT_DIR}/blockchain/blockchain_hype_cycle.json")
 # ══════════════════════════════════════════════════════════════════════════════
 timed_msg("5f: Digital Health regulatory split (med-device vs Big Tech)")
 
-DH_FILTER = "(cpc_group LIKE 'A61B5%' OR cpc_subclass = 'G16H' OR cpc_group LIKE 'A61B34%')"
-
 # Big tech assignees in digital health
 BIG_TECH = [
     'Apple Inc.', 'Google LLC', 'Alphabet Inc.', 'Microsoft Corporation',
@@ -321,14 +276,11 @@ big_tech_str = ", ".join(f"'{b}'" for b in BIG_TECH)
 med_device_str = ", ".join(f"'{m}'" for m in MED_DEVICE)
 
 result = con.execute(f"""
-    WITH dh_patents AS (
-        SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {DH_FILTER}
-    ),
-    dh_with_year AS (
+    WITH dh_with_year AS (
         SELECT m.patent_id, m.grant_year, m.primary_assignee_org
-        FROM '{MASTER}' m
-        JOIN dh_patents dp ON m.patent_id = dp.patent_id
-        WHERE m.grant_year BETWEEN 2000 AND 2025
+        FROM {MASTER} m
+        WHERE {has_domain('DigiHealth', 'm.domain_mask')}
+          AND m.grant_year BETWEEN 2000 AND 2025
     ),
     classified AS (
         SELECT
@@ -0,0 +1,137 @@
+"""
+PatentWorld Data Pipeline - Assignee citation flows
+
+flow_matrices() folds the backward CSR citation graph into one sparse
+organization x organization matrix per time window, in a single streaming pass
+over the edges: F[i, j] counts the citations made by patents whose primary
+assignee is organization i to patents whose primary assignee is j, for citing
+patents granted in the window. Every organization is covered at once, so
+questions about any set of companies become slices of F instead of another
+join of g_us_patent_citation against a temp table of their patents.
+
+Organizations are coded by organization_codes(); primary assignees without an
+organization name (individuals) share the code labelled "" so that row sums
+still count every citation made to an assigned patent. That blank code is not
+one organization: named_flows() zeroes its row and column before statistics
+that pair organizations (self-citation share, reciprocity, top partners).
+organization_index() maps the codes to positions in a list of selected
+organizations.
+
+Vectorized queries on a flow matrix:
+  top_flows()              largest source -> target flows (optionally among a subset)
+  self_citation_share()    diagonal over row sum, per organization
+  reciprocity()            share of each organization's outgoing non-self
+                           citations returned by the cited organization
+                           (sum_j min(F_ij, F_ji) / sum_j F_ij), plus the overall share
+"""
+import numpy as np
+
+from citation_graph import CHUNK_EDGES
+from config import PRIMARY_ASSIGNEE
+
+
+def organization_codes(con, n: int) -> tuple:
+    """(codes, labels): int32[n] organization code of each patent_key's primary
+    assignee (-1 if unassigned) and the organization name of each code."""
+    res = con.execute(f"""
+        SELECT patent_key, COALESCE(organization, '') AS organization
+        FROM {PRIMARY_ASSIGNEE()}
+        WHERE patent_key IS NOT NULL
+    """).fetchnumpy()
+    labels, inverse = np.unique(res["organization"].astype(str), return_inverse=True)
+    codes = np.full(n, -1, dtype=np.int32)
+    codes[res["patent_key"]] = inverse
+    return codes, labels.tolist()
+
+
+def organization_index(codes: np.ndarray, labels: list, orgs: list) -> np.ndarray:
+    """int64[n] position in *orgs* of each patent_key's primary assignee
+    organization (from organization_codes()), -1 if it is not one of *orgs*."""
+    position = {org: i for i, org in enumerate(orgs)}
+    # one extra -1 entry at the end, picked by the -1 code of unassigned patents
+    lut = np.array([position.get(label, -1) for label in labels] + [-1], dtype=np.int64)
+    return lut[codes]
+
+
+def named_flows(flows, labels: list):
+    """*flows* without the row and column of the blank organization ("", the
+    primary assignees without an organization name), i.e. only the flows
+    between named organizations."""
+    import scipy.sparse as sp
+    if "" not in labels:
+        return flows
+    keep = np.ones(flows.shape[0])
+    keep[labels.index("")] = 0
+    out = (sp.diags(keep) @ flows @ sp.diags(keep)).tocsr().astype(flows.dtype)
+    out.eliminate_zeros()
+    return out
+
+
+def flow_matrices(graph, codes: np.ndarray, windows: np.ndarray, n_windows: int,
+                  chunk_edges: int = CHUNK_EDGES) -> list:
+    """scipy.sparse CSR int64[n_codes, n_codes] citation flows per window.
+
+    *windows* gives the window of each citing patent_key (-1 = not counted);
+    citations to or from patents without a code are left out.
+    """
+    import scipy.sparse as sp
+    n_codes = max(int(codes.max()) + 1, 1)
+    cells, counts = [], []
+    for r0, r1 in graph.bwd.row_chunks(chunk_edges):
+        rows, cols, _ = graph.bwd.edges(r0, r1)
+        src, tgt, win = codes[rows], codes[cols], windows[rows]
+        ok = (src >= 0) & (tgt >= 0) & (win >= 0)
+        cell, cnt = np.unique((win[ok].astype(np.int64) * n_codes + src[ok]) * n_codes + tgt[ok],
+                              return_counts=True)
+        cells.append(cell)
+        counts.append(cnt)
+    cell = np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+    cell, inverse = np.unique(cell, return_inverse=True)
+    count = np.bincount(inverse, weights=np.concatenate(counts) if counts else None,
+                        minlength=len(cell)).astype(np.int64)
+    win, pair = cell // (n_codes * n_codes), cell % (n_codes * n_codes)
+    bounds = np.searchsorted(win, np.arange(n_windows + 1))
+    return [sp.csr_matrix((count[lo:hi], (pair[lo:hi] // n_codes, pair[lo:hi] % n_codes)),
+                          shape=(n_codes, n_codes))
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def top_flows(flows, k: int, among=None, exclude_self: bool = True, min_count: int = 1) -> tuple:
+    """(source, target, count) of the *k* largest flows (count >= *min_count*),
+    largest first, ties by source and target code. *among* restricts both ends to
+    a set of organization codes; k=None keeps every flow."""
+    coo = flows.tocoo()
+    keep = coo.data >= min_count
+    if exclude_self:
+        keep &= coo.row != coo.col
+    if among is not None:
+        member = np.zeros(flows.shape[0], dtype=bool)
+        member[np.asarray(among)] = True
+        keep &= member[coo.row] & member[coo.col]
+    src, tgt, cnt = coo.row[keep], coo.col[keep], coo.data[keep]
+    order = np.lexsort((tgt, src, -cnt))[:k]
+    return src[order], tgt[order], cnt[order]
+
+
+def self_citation_share(flows) -> np.ndarray:
+    """float64[n_codes] citations to the organization's own patents over all
+    citations it made (NaN where it made none)."""
+    made = np.asarray(flows.sum(axis=1)).ravel().astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return flows.diagonal() / made
+
+
+def reciprocity(flows) -> tuple:
+    """(per_org, overall): float64[n_codes] reciprocated share of each
+    organization's non-self citations (NaN where it made none) and the same
+    share over all flows."""
+    import scipy.sparse as sp
+    coo = flows.tocoo()
+    keep = coo.row != coo.col
+    off = sp.csr_matrix((coo.data[keep], (coo.row[keep], coo.col[keep])), shape=flows.shape)
+    mutual = off.minimum(off.T)
+    out = np.asarray(off.sum(axis=1)).ravel().astype(np.float64)
+    back = np.asarray(mutual.sum(axis=1)).ravel().astype(np.float64)
+    total = out.sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return back / out, float(back.sum() / total) if total else float("nan")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Build the persistent DuckDB warehouse shared by all pipeline scripts.
+
+Loads every raw PatentsView table from the Parquet cache into typed tables
+(low-cardinality text columns as ENUMs, rows sorted by patent_id so zone maps
+prune point lookups), then materializes the derived tables that scripts used to
+rebuild as temp tables (patent_year, primary_assignee, primary_cpc, top_assignees,
+top_assignees_all_time).
+
+Text identifiers get dense 0-based INTEGER surrogate keys from ID dictionaries
+(patent_ids, inventor_ids, assignee_ids — also the reverse lookups): every table
+carrying patent_id / citation_patent_id / inventor_id / assignee_id gains a
+matching patent_key / citation_patent_key / inventor_key / assignee_key column,
+so large joins (citations!) hash int32 instead of strings. Patent keys follow
+patent_id sort order.
+
+Scripts pick the warehouse up automatically via config.get_connection() /
+tsv_table(); a warehouse whose source zips changed is ignored until rebuilt.
+
+Usage:  python build_warehouse.py [--force]
+Output: /tmp/patentview/patentworld.duckdb
+"""
+import os
+import sys
+import time
+import duckdb
+from config import (
+    WAREHOUSE_PATH, WAREHOUSE_ENUM_COLUMNS, DERIVED_TABLES,
+    parquet_table, derived_refs, derived_sql, warehouse_sources, warehouse_tables, timed_msg,
+)
+
+
+# ID dictionaries: name -> (key column, id column, source columns collected)
+ID_DICTIONARIES = {
+    "patent_ids": ("patent_key", "patent_id", ["patent_id", "citation_patent_id"]),
+    "inventor_ids": ("inventor_key", "inventor_id", ["inventor_id"]),
+    "assignee_ids": ("assignee_key", "assignee_id", ["assignee_id"]),
+}
+
+# Text ID column -> (surrogate key column added next to it, dictionary)
+KEY_COLUMNS = {
+    "patent_id": ("patent_key", "patent_ids"),
+    "citation_patent_id": ("citation_patent_key", "patent_ids"),
+    "inventor_id": ("inventor_key", "inventor_ids"),
+    "assignee_id": ("assignee_key", "assignee_ids"),
+}
+
+
+def _build_id_dictionaries(con, sources: dict) -> None:
+    """Assign dense 0-based INTEGER keys to every distinct ID, in ID sort order."""
+    for dict_name, (key_col, id_col, source_cols) in ID_DICTIONARIES.items():
+        selects = [
+            f"SELECT {c} AS id FROM {src} WHERE {c} IS NOT NULL"
+            for src, cols in sources.values() for c in source_cols if c in cols
+        ]
+        if not selects:
+            continue
+        t0 = time.time()
+        con.execute(f"""
+            CREATE TABLE {dict_name} AS
+            SELECT CAST(ROW_NUMBER() OVER (ORDER BY id) - 1 AS INTEGER) AS {key_col},
+                   id AS {id_col}
+            FROM (SELECT DISTINCT id FROM ({" UNION ALL ".join(selects)}))
+            ORDER BY {key_col}
+        """)
+        cnt = con.execute(f"SELECT COUNT(*) FROM {dict_name}").fetchone()[0]
+        print(f"  {dict_name}: {cnt:,} keys in {time.time()-t0:.1f}s")
+
+
+def _keyed_select(src: str, cols: list, enums: dict) -> str:
+    """SELECT over *src* with ENUM casts and a surrogate key next to each ID column."""
+    select, joins = [], []
+    for c in cols:
+        select.append(f"CAST(s.{c} AS {enums[c]}) AS {c}" if c in enums else f"s.{c}")
+        if c in KEY_COLUMNS:
+            key_col, dict_name = KEY_COLUMNS[c]
+            dict_key, dict_id, _ = ID_DICTIONARIES[dict_name]
+            alias = f"k_{c}"
+            select.append(f"{alias}.{dict_key} AS {key_col}")
+            joins.append(f"LEFT JOIN {dict_name} {alias} ON s.{c} = {alias}.{dict_id}")
+    order = f" ORDER BY s.{'patent_id' if 'patent_id' in cols else cols[0]}"
+    return f"SELECT {', '.join(select)} FROM {src} s {' '.join(joins)}{order}"
+
+
+def _enum_types(con, sources: dict) -> dict:
+    """Create one ENUM type per enum column, covering its values in every table."""
+    enums = {}
+    for col in WAREHOUSE_ENUM_COLUMNS:
+        selects = [
+            f"SELECT DISTINCT CAST({col} AS VARCHAR) AS v FROM {src} WHERE {col} IS NOT NULL"
+            for src, cols in sources.values() if col in cols
+        ]
+        if not selects:
+            continue
+        values = [r[0] for r in con.execute(" UNION ".join(selects) + " ORDER BY v").fetchall()]
+        type_name = f"{col}_enum"
+        con.execute(f"CREATE TYPE {type_name} AS ENUM ({', '.join(map(repr, values))})")
+        enums[col] = type_name
+        print(f"  {type_name}: {len(values):,} values")
+    return enums
+
+
+def build_warehouse(path: str = WAREHOUSE_PATH) -> None:
+    """(Re)build the warehouse at *path* from the current Parquet cache."""
+    keys = warehouse_sources()
+    tmp_path = path + ".tmp"
+    for p in (tmp_path, tmp_path + ".wal"):
+        if os.path.exists(p):
+            os.remove(p)
+
+    con = duckdb.connect(tmp_path)
+    con.execute("SET threads TO 38")
+    con.execute("SET memory_limit = '200GB'")
+    con.execute("SET preserve_insertion_order = false")
+
+    # ── Step 1: Resolve raw sources ─────────────────────────────────────────
+    timed_msg("Step 1: Resolve raw sources (Parquet cache)")
+    sources = {}
+    for name in keys:
+        src = parquet_table(name)
+        cols = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {src}").fetchall()]
+        sources[name] = (src, cols)
+
+    # ── Step 2: ENUM types ──────────────────────────────────────────────────
+    timed_msg("Step 2: Dictionary-encode low-cardinality columns")
+    enums = _enum_types(con, sources)
+
+    # ── Step 3: ID dictionaries (surrogate keys) ────────────────────────────
+    timed_msg("Step 3: ID dictionaries (int32 surrogate keys)")
+    _build_id_dictionaries(con, sources)
+
+    # ── Step 4: Typed base tables ───────────────────────────────────────────
+    timed_msg("Step 4: Load typed base tables")
+    for name, (src, cols) in sources.items():
+        t0 = time.time()
+        con.execute(f"CREATE TABLE {name} AS {_keyed_select(src, cols, enums)}")
+        cnt = con.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        print(f"  {name}: {cnt:,} rows in {time.time()-t0:.1f}s")
+
+    # ── Step 5: Derived tables ──────────────────────────────────────────────
+    timed_msg("Step 5: Derived tables")
+    for name in DERIVED_TABLES:
+        if not derived_refs(name) <= sources.keys():
+            print(f"  {name}: skipped (source table missing)")
+            continue
+        t0 = time.time()
+        derived = f"({derived_sql(name, table=lambda ref: ref)})"
+        cols = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {derived}").fetchall()]
+        con.execute(f"CREATE TABLE {name} AS {_keyed_select(derived, cols, {})}")
+        cnt = con.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        print(f"  {name}: {cnt:,} rows in {time.time()-t0:.1f}s")
+
+    # ── Step 6: Source fingerprints + swap in ───────────────────────────────
+    con.execute("CREATE TABLE _sources (name VARCHAR, zip_size BIGINT, zip_mtime_ns BIGINT)")
+    con.executemany(
+        "INSERT INTO _sources VALUES (?, ?, ?)",
+        [(name, k["zip_size"], k["zip_mtime_ns"]) for name, k in keys.items()],
+    )
+    con.execute("CHECKPOINT")
+    con.close()
+    os.replace(tmp_path, path)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"\n  Wrote {path} ({size_mb:,.0f} MB)")
+
+
+if __name__ == "__main__":
+    # Fresh sources and every derived table they allow (new ones need a rebuild)
+    missing = [name for name in DERIVED_TABLES
+               if derived_refs(name) <= warehouse_sources().keys() and name not in warehouse_tables()]
+    if "--force" not in sys.argv and warehouse_tables() and not missing:
+        print(f"Warehouse {WAREHOUSE_PATH} is up to date (use --force to rebuild)")
+        sys.exit(0)
+    t0 = time.time()
+    build_warehouse()
+    print(f"\n=== build_warehouse complete in {time.time()-t0:.1f}s ===\n")
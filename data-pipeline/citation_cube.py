@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+PatentWorld Data Pipeline - Citation-age cube
+
+"Citations received t years after grant" underlies half-lives, decay curves,
+citation lags and sleeping beauties. This stage materializes it once, from the
+forward CSR citation graph (Adjacency.age_matrix), as a sparse cube of
+(patent_key, age) -> citations, so those analyses become group-bys on a small
+sorted Parquet file instead of citation joins.
+
+Age is the citing minus the cited patent's grant year (0 = cited in its grant
+year); citations with an unknown grant date or a negative age are left out.
+
+Layout:
+  cube.parquet   patent_key INTEGER, age SMALLINT, citations INTEGER
+                 (non-zero cells only, sorted by patent_key, age; ZSTD)
+  cube.key       graph fingerprint plus the cube's [n_patents, n_ages] shape
+
+Query it in SQL through config.CITATION_CUBE(), aggregate it by any patent
+grouping with group_by(), or load() it as a scipy.sparse CSR matrix.
+
+Usage:  python citation_cube.py [--force]
+Output: /tmp/patentview/citation_cube/
+"""
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import orjson
+
+import citation_graph
+from config import CITATION_CUBE, CITATION_CUBE_DIR, timed_msg
+
+CUBE_VERSION = 1
+
+
+def cube_key() -> dict:
+    return {"version": CUBE_VERSION, "graph": citation_graph.graph_key()}
+
+
+def _read_key(path: str):
+    try:
+        with open(os.path.join(path, "cube.key"), "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def is_fresh(path: str = CITATION_CUBE_DIR) -> bool:
+    key = _read_key(path)
+    return key is not None and {k: key.get(k) for k in ("version", "graph")} == cube_key()
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+def build(path: str = CITATION_CUBE_DIR) -> None:
+    """(Re)build the cube at *path* from the citation graph."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    graph = citation_graph.load()
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    timed_msg("Citation cube: citations by patent and age")
+    t0 = time.time()
+    ages = graph.fwd.age_matrix()
+    table = pa.table({
+        "patent_key": np.repeat(np.arange(ages.shape[0], dtype=np.int32), np.diff(ages.indptr)),
+        "age": ages.indices.astype(np.int16),
+        "citations": ages.data.astype(np.int32),
+    })
+    pq.write_table(table, os.path.join(tmp_path, "cube.parquet"), compression="zstd")
+    print(f"  {table.num_rows:,} cells over {ages.shape[1]} ages in {time.time()-t0:.1f}s")
+
+    with open(os.path.join(tmp_path, "cube.key"), "wb") as f:
+        f.write(orjson.dumps(dict(cube_key(), shape=list(ages.shape))))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    size_mb = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1024 * 1024)
+    print(f"\n  Wrote {path} ({size_mb:,.0f} MB)")
+
+
+def load(path: str = CITATION_CUBE_DIR, rebuild: bool = False):
+    """The cube as a scipy.sparse CSR int32[n_patents, n_ages], built first if
+    missing or stale."""
+    import pyarrow.parquet as pq
+    import scipy.sparse as sp
+    if rebuild or not is_fresh(path):
+        build(path)
+    n, n_ages = _read_key(path)["shape"]
+    table = pq.read_table(os.path.join(path, "cube.parquet"))
+    keys = table.column("patent_key").to_numpy()
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=n))])
+    return sp.csr_matrix((table.column("citations").to_numpy(),
+                          table.column("age").to_numpy().astype(np.int32), indptr),
+                         shape=(n, n_ages))
+
+
+# ── Aggregation ──────────────────────────────────────────────────────────────
+def group_by(con, patents: str, by, max_age: int = None, cap_age: int = None):
+    """Citations by (*by*, age) for the patents selected by *patents*.
+
+    *patents* is SQL yielding patent_key plus the grouping columns named in *by*
+    (e.g. cpc_section or grant_year from the patent master, an assignee
+    organization). Ages above *max_age* are dropped; ages above *cap_age*
+    are pooled into cap_age. Returns a DataFrame: *by* columns, age, citations,
+    patents (cited patents contributing to the cell), sorted by *by* and age.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    age = f"LEAST(c.age, {int(cap_age)})" if cap_age is not None else "c.age"
+    cols = "".join(f"g.{col}, " for col in by)
+    where = f"WHERE c.age <= {int(max_age)}" if max_age is not None else ""
+    return con.execute(f"""
+        SELECT {cols}{age} AS age,
+               SUM(c.citations)::BIGINT AS citations,
+               COUNT(DISTINCT c.patent_key) AS patents
+        FROM ({patents}) g
+        JOIN {CITATION_CUBE()} c ON c.patent_key = g.patent_key
+        {where}
+        GROUP BY ALL
+        ORDER BY ALL
+    """).fetchdf()
+
+
+def half_life(ages, citations):
+    """Years until half of a citation curve's total is received, interpolated
+    linearly between the bracketing ages; None for an empty curve."""
+    ages = np.asarray(ages, dtype=np.float64)
+    cum = np.cumsum(np.asarray(citations, dtype=np.float64))
+    if not len(cum) or cum[-1] <= 0:
+        return None
+    half = cum[-1] / 2.0
+    i = int(np.searchsorted(cum, half, side="left"))
+    if i == 0:
+        return float(ages[0])
+    frac = (half - cum[i - 1]) / (cum[i] - cum[i - 1])
+    return float(ages[i - 1] + frac * (ages[i] - ages[i - 1]))
+
+
+if __name__ == "__main__":
+    if "--force" not in sys.argv and is_fresh():
+        print(f"Citation cube {CITATION_CUBE_DIR} is up to date (use --force to rebuild)")
+        sys.exit(0)
+    t0 = time.time()
+    build()
+    print(f"\n=== citation_cube complete in {time.time()-t0:.1f}s ===\n")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+PatentWorld Data Pipeline - CSR citation graph
+
+Builds the US patent citation graph once from the warehouse (int32 patent_key
+surrogates) as compressed-sparse-row adjacency arrays, stored as .npy files and
+opened with np.memmap. Degree, windowed and neighbor-attribute metrics then run
+as vectorized passes over the edge arrays instead of re-joining
+g_us_patent_citation (100M+ rows) against patent-level tables in every script.
+
+Layout (n = patent keys in patent_ids, m = citation rows with both keys):
+  grant_day.npy     int32[n]    grant date, days since 1970-01-01 (NO_DAY if not in g_patent)
+  fwd_indptr.npy    int64[n+1]  forward: cited patent -> citing patents
+  fwd_indices.npy   int32[m]    citing patent_key, in grant-date order within each row
+  fwd_day.npy       int32[m]    grant day of the citing patent
+  bwd_indptr.npy / bwd_indices.npy / bwd_day.npy
+                                backward: citing patent -> cited patents (same layout)
+  graph.key         warehouse source fingerprints the graph was built from
+
+Every citation row is an edge (duplicate rows included), matching COUNT(*)
+over g_us_patent_citation. load() rebuilds the graph when the warehouse changed.
+
+Usage:  python citation_graph.py [--force]
+Output: /tmp/patentview/citation_graph/
+"""
+import copy
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import orjson
+
+from config import (
+    CITATION_GRAPH_DIR, CITATION_TSV, PATENT_IDS, PATENT_TSV,
+    arrow_batches, get_connection, require_warehouse, timed_msg, warehouse_sources,
+)
+
+GRAPH_VERSION = 1
+NO_DAY = np.iinfo(np.int32).min    # grant_day / edge day of patents missing from g_patent
+CHUNK_EDGES = 1 << 24              # edges per vectorized pass
+
+# adjacency prefix -> (row key column, neighbor key column) in g_us_patent_citation
+DIRECTIONS = {
+    "fwd": ("citation_patent_key", "patent_key"),
+    "bwd": ("patent_key", "citation_patent_key"),
+}
+
+
+def grant_years(grant_day: np.ndarray) -> np.ndarray:
+    """int16 grant year per patent from grant days, -1 where unknown."""
+    known = grant_day != NO_DAY
+    years = np.full(len(grant_day), -1, dtype=np.int16)
+    years[known] = grant_day[known].astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970
+    return years
+
+
+# ── Adjacency ────────────────────────────────────────────────────────────────
+class Adjacency:
+    """One CSR direction: row patent -> neighbor patents, with neighbor grant days."""
+
+    def __init__(self, path: str, prefix: str, grant_day: np.ndarray):
+        self.prefix = prefix
+        self.forward = prefix == "fwd"
+        self.indptr = np.load(os.path.join(path, f"{prefix}_indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(path, f"{prefix}_indices.npy"), mmap_mode="r")
+        self.day = np.load(os.path.join(path, f"{prefix}_day.npy"), mmap_mode="r")
+        self.grant_day = grant_day
+        self.n = len(self.indptr) - 1
+        self.m = len(self.indices)
+
+    def degree(self) -> np.ndarray:
+        """Edges per patent (forward: citations received; backward: citations made)."""
+        return np.diff(self.indptr).astype(np.int32)
+
+    def select(self, keys) -> "Adjacency":
+        """In-memory copy holding only the edges of the rows in *keys* (every
+        other row empty), so per-patent passes over it read those edges only."""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        starts = np.asarray(self.indptr[keys], dtype=np.int64)
+        lengths = np.asarray(self.indptr[keys + 1], dtype=np.int64) - starts
+        degree = np.zeros(self.n, dtype=np.int64)
+        degree[keys] = lengths
+        sub = copy.copy(self)
+        sub.indptr = np.concatenate([[0], np.cumsum(degree)])
+        edge = np.repeat(starts - sub.indptr[keys], lengths) + np.arange(sub.indptr[-1])
+        sub.indices, sub.day = self.indices[edge], self.day[edge]
+        sub.m = len(edge)
+        return sub
+
+    def row_chunks(self, chunk_edges: int = CHUNK_EDGES):
+        """Yield (r0, r1) row ranges holding about *chunk_edges* edges each."""
+        targets = np.arange(0, self.m, chunk_edges)
+        bounds = np.unique(np.concatenate([
+            [0], np.searchsorted(self.indptr, targets, side="right") - 1, [self.n],
+        ]))
+        yield from zip(bounds[:-1], bounds[1:])
+
+    def edges(self, r0: int, r1: int) -> tuple:
+        """(rows, cols, days) of every edge in rows [r0, r1), as in-memory arrays."""
+        e0, e1 = self.indptr[r0], self.indptr[r1]
+        rows = np.repeat(np.arange(r0, r1, dtype=np.int32), np.diff(self.indptr[r0:r1 + 1]))
+        return rows, np.asarray(self.indices[e0:e1]), np.asarray(self.day[e0:e1])
+
+    def lag_days(self, rows: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Citing minus cited grant day per edge (int64; meaningless where has_days is False)."""
+        own = self.grant_day[rows].astype(np.int64)
+        return days - own if self.forward else own - days
+
+    def has_days(self, rows: np.ndarray, days: np.ndarray) -> np.ndarray:
+        return (days != NO_DAY) & (self.grant_day[rows] != NO_DAY)
+
+    def lag_years(self, years: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> tuple:
+        """(known, lag): citing minus cited grant year per edge (int32), and where
+        both years are known. *years* is grant_years(grant_day)."""
+        known = (years[rows] >= 0) & (years[cols] >= 0)
+        lag = years[cols].astype(np.int32) - years[rows] if self.forward \
+            else years[rows].astype(np.int32) - years[cols]
+        return known, lag
+
+    def count_edges(self, predicate, chunk_edges: int = CHUNK_EDGES) -> np.ndarray:
+        """Per-patent count of edges where predicate(rows, cols, days) is True."""
+        out = np.zeros(self.n, dtype=np.int32)
+        for r0, r1 in self.row_chunks(chunk_edges):
+            rows, cols, days = self.edges(r0, r1)
+            mask = predicate(rows, cols, days)
+            out[r0:r1] = np.bincount(rows[mask] - r0, minlength=r1 - r0)
+        return out
+
+    def window_counts(self, lo_days: int = 0, hi_days: int = None,
+                      chunk_edges: int = CHUNK_EDGES) -> np.ndarray:
+        """Per-patent count of edges whose citation lag (citing - cited grant date,
+        in days) lies in [lo_days, hi_days); hi_days=None means no upper bound."""
+        def in_window(rows, cols, days):
+            lag = self.lag_days(rows, days)
+            mask = self.has_days(rows, days) & (lag >= lo_days)
+            return mask if hi_days is None else mask & (lag < hi_days)
+        return self.count_edges(in_window, chunk_edges)
+
+    def lag_counts(self, horizons, unit: str = "days", min_lag: int = None,
+                   chunk_edges: int = CHUNK_EDGES) -> dict:
+        """Per-patent edge counts for every horizon in one pass over the edges.
+
+        Returns {h: int32[n]} counting edges with citation lag <= h (h=None: no
+        upper bound). The lag is citing minus cited grant date in days, or the
+        grant-year difference for unit="years"; edges with an unknown date never
+        count, and edges with lag < *min_lag* are dropped.
+        """
+        if unit not in ("days", "years"):
+            raise ValueError(f"unit must be 'days' or 'years', not {unit!r}")
+        bounds = sorted(h for h in horizons if h is not None)
+        n_buckets = len(bounds) + 1           # last bucket: beyond every finite horizon
+        years = grant_years(self.grant_day) if unit == "years" else None
+        cum = np.zeros((self.n, n_buckets), dtype=np.int32)
+        for r0, r1 in self.row_chunks(chunk_edges):
+            rows, cols, days = self.edges(r0, r1)
+            if years is None:
+                ok = self.has_days(rows, days)
+                lag = self.lag_days(rows, days)
+            else:
+                ok, lag = self.lag_years(years, rows, cols)
+            if min_lag is not None:
+                ok &= lag >= min_lag
+            bucket = np.searchsorted(bounds, lag[ok], side="left")   # first bound >= lag
+            flat = (rows[ok] - r0).astype(np.int64) * n_buckets + bucket
+            cum[r0:r1] = np.bincount(flat, minlength=(r1 - r0) * n_buckets).reshape(r1 - r0, n_buckets)
+        np.cumsum(cum, axis=1, out=cum)
+        return {h: cum[:, n_buckets - 1 if h is None else bounds.index(h)].copy() for h in horizons}
+
+    def age_matrix(self, chunk_edges: int = CHUNK_EDGES):
+        """scipy.sparse CSR int32[n, n_ages]: edges per patent by citation age in
+        years (citing minus cited grant year, 0 = same year). Edges with an
+        unknown date or a negative age are dropped; n_ages spans the grant years."""
+        import scipy.sparse as sp
+        years = grant_years(self.grant_day)
+        known_years = years[years >= 0]
+        n_ages = int(known_years.max()) - int(known_years.min()) + 1 if len(known_years) else 1
+        row_nnz = np.zeros(self.n, dtype=np.int64)
+        ages, counts = [], []
+        for r0, r1 in self.row_chunks(chunk_edges):
+            rows, cols, _ = self.edges(r0, r1)
+            ok, lag = self.lag_years(years, rows, cols)
+            ok &= lag >= 0
+            cells, cnt = np.unique((rows[ok] - r0).astype(np.int64) * n_ages + lag[ok], return_counts=True)
+            row_nnz[r0:r1] = np.bincount(cells // n_ages, minlength=r1 - r0)
+            ages.append((cells % n_ages).astype(np.int32))
+            counts.append(cnt.astype(np.int32))
+        indptr = np.concatenate([[0], np.cumsum(row_nnz)])
+        data = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int32)
+        indices = np.concatenate(ages) if ages else np.zeros(0, dtype=np.int32)
+        return sp.csr_matrix((data, indices, indptr), shape=(self.n, n_ages))
+
+    def iter_neighbor_histograms(self, codes: np.ndarray, n_codes: int,
+                                 chunk_edges: int = CHUNK_EDGES):
+        """Yield (r0, r1, hist): hist[i, c] counts neighbors of patent r0+i whose
+        code (codes[neighbor_key], -1 = none) is c. Dense per chunk of rows."""
+        for r0, r1 in self.row_chunks(chunk_edges):
+            rows, cols, _ = self.edges(r0, r1)
+            c = codes[cols]
+            ok = c >= 0
+            flat = (rows[ok] - r0).astype(np.int64) * n_codes + c[ok]
+            hist = np.bincount(flat, minlength=(r1 - r0) * n_codes)
+            yield r0, r1, hist.reshape(r1 - r0, n_codes).astype(np.int32)
+
+    def neighbor_histogram(self, codes: np.ndarray, n_codes: int,
+                           chunk_edges: int = CHUNK_EDGES) -> np.ndarray:
+        """Dense int32[n, n_codes] neighbor-code counts (small code sets only)."""
+        out = np.zeros((self.n, n_codes), dtype=np.int32)
+        for r0, r1, hist in self.iter_neighbor_histograms(codes, n_codes, chunk_edges):
+            out[r0:r1] = hist
+        return out
+
+
+class CitationGraph:
+    """Memory-mapped forward/backward citation adjacency over patent keys."""
+
+    def __init__(self, path: str = CITATION_GRAPH_DIR):
+        self.path = path
+        self.grant_day = np.load(os.path.join(path, "grant_day.npy"), mmap_mode="r")
+        self.n = len(self.grant_day)
+        self.fwd = Adjacency(path, "fwd", self.grant_day)
+        self.bwd = Adjacency(path, "bwd", self.grant_day)
+
+    def grant_year(self) -> np.ndarray:
+        """int16[n] grant year, -1 where the grant date is unknown."""
+        return grant_years(self.grant_day)
+
+    def codes(self, keys, values, dtype=np.int32) -> np.ndarray:
+        """Dense per-patent array from (patent_key, value) pairs; -1 elsewhere."""
+        out = np.full(self.n, -1, dtype=dtype)
+        out[np.asarray(keys, dtype=np.int64)] = values
+        return out
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+def graph_key() -> dict:
+    return {"version": GRAPH_VERSION, "sources": warehouse_sources()}
+
+
+def is_fresh(path: str = CITATION_GRAPH_DIR) -> bool:
+    try:
+        with open(os.path.join(path, "graph.key"), "rb") as f:
+            return orjson.loads(f.read()) == graph_key()
+    except (OSError, orjson.JSONDecodeError):
+        return False
+
+
+def _write_adjacency(con, out_dir: str, prefix: str, n: int) -> int:
+    """Stream the edges of one direction, sorted by (row, neighbor day, neighbor), to .npy."""
+    row_col, nbr_col = DIRECTIONS[prefix]
+    where = f"WHERE c.{row_col} IS NOT NULL AND c.{nbr_col} IS NOT NULL"
+    m = con.execute(f"SELECT COUNT(*) FROM {CITATION_TSV()} c {where}").fetchone()[0]
+    indices = np.lib.format.open_memmap(os.path.join(out_dir, f"{prefix}_indices.npy"), "w+", np.int32, (m,))
+    day = np.lib.format.open_memmap(os.path.join(out_dir, f"{prefix}_day.npy"), "w+", np.int32, (m,))
+    counts = np.zeros(n, dtype=np.int64)
+    pos = 0
+    for batch in arrow_batches(con, f"""
+        SELECT c.{row_col} AS r, c.{nbr_col} AS k, d.day
+        FROM {CITATION_TSV()} c
+        JOIN graph_days d ON d.patent_key = c.{nbr_col}
+        {where}
+        ORDER BY r, d.day, k
+    """):
+        r = batch.column("r").to_numpy()
+        if not len(r):
+            continue
+        size = len(r)
+        indices[pos:pos + size] = batch.column("k").to_numpy()
+        day[pos:pos + size] = batch.column("day").to_numpy()
+        counts[r[0]:r[-1] + 1] += np.bincount(r - r[0])
+        pos += size
+    indices.flush()
+    day.flush()
+    np.save(os.path.join(out_dir, f"{prefix}_indptr.npy"), np.concatenate([[0], np.cumsum(counts)]))
+    return pos
+
+
+def build(path: str = CITATION_GRAPH_DIR) -> None:
+    """(Re)build the CSR graph at *path* from the warehouse."""
+    import pyarrow as pa
+    require_warehouse()
+    con = get_connection()
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    timed_msg("Citation graph: grant days")
+    n = con.execute(f"SELECT COUNT(*) FROM {PATENT_IDS()}").fetchone()[0]
+    res = con.execute(f"""
+        SELECT patent_key, DATEDIFF('day', DATE '1970-01-01', CAST(patent_date AS DATE)) AS day
+        FROM {PATENT_TSV()}
+        WHERE patent_key IS NOT NULL AND patent_date IS NOT NULL
+    """).fetchnumpy()
+    grant_day = np.full(n, NO_DAY, dtype=np.int32)
+    grant_day[res["patent_key"]] = res["day"]
+    np.save(os.path.join(tmp_path, "grant_day.npy"), grant_day)
+    con.register("graph_days", pa.table({"patent_key": np.arange(n, dtype=np.int32), "day": grant_day}))
+    print(f"  {n:,} patent keys, {int((grant_day != NO_DAY).sum()):,} with a grant date")
+
+    for prefix in DIRECTIONS:
+        timed_msg(f"Citation graph: {prefix} adjacency")
+        t0 = time.time()
+        m = _write_adjacency(con, tmp_path, prefix, n)
+        print(f"  {m:,} edges in {time.time()-t0:.1f}s")
+    con.close()
+
+    with open(os.path.join(tmp_path, "graph.key"), "wb") as f:
+        f.write(orjson.dumps(graph_key()))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    size_mb = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1024 * 1024)
+    print(f"\n  Wrote {path} ({size_mb:,.0f} MB)")
+
+
+def load(path: str = CITATION_GRAPH_DIR, rebuild: bool = False) -> CitationGraph:
+    """Open the memory-mapped graph, building it first if missing or stale."""
+    if rebuild or not is_fresh(path):
+        build(path)
+    return CitationGraph(path)
+
+
+if __name__ == "__main__":
+    if "--force" not in sys.argv and is_fresh():
+        print(f"Citation graph {CITATION_GRAPH_DIR} is up to date (use --force to rebuild)")
+        sys.exit(0)
+    t0 = time.time()
+    build()
+    print(f"\n=== citation_graph complete in {time.time()-t0:.1f}s ===\n")
@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+"""
+PatentWorld Data Pipeline - Co-inventor network
+
+Builds the co-invention graph of every time window (WINDOWS: each grant decade
+plus the whole 1976-2025 span) from g_inventor_disambiguated: inventors are
+nodes, and two inventors share an edge weighted by the number of utility patents
+they co-invented in the window.
+
+Edges never come from an inventor self-join. Each grant year's (patent,
+inventor) rows are grouped into sorted per-patent teams, teams of equal size are
+expanded into pairs as one block, and batches of about PAIR_CHUNK pairs are
+deduplicated in NumPy and spilled to one Parquet file per year. Every pair also
+carries a Newman (2001) collaboration strength, the sum of 1 / (team size - 1)
+over its patents, so large teams count for less. Every team adds its pairs by
+default, like the inventor self-join did; build(max_team=N) (--max-team N)
+builds a graph in which teams of more than N members (consortia,
+mega-collaborations) add no edges, recorded in graph.key. Any year range is then a
+GROUP BY over the spills: edges_sql() for SQL analyses, or config.COINVENTOR_PAIRS()
+for the per-year rows.
+
+Each window is stored in CSR form over compact node ids and opened with
+np.memmap, so the full ~4M-inventor network is analysed with vectorized array
+passes instead of SQL self-joins or NetworkX:
+
+  components()    connected components by array union-find (root hooking +
+                  pointer jumping), hence the giant-component share
+  triangles()     per-node triangle counts from sparse row-block products, each
+                  block sized to CLUSTER_BUDGET intermediate cells; clustering()
+                  turns them into average local clustering and transitivity
+  betweenness()   Brandes betweenness estimated from sampled pivot sources
+                  (Brandes & Pich 2007), one vectorized BFS per pivot, spread
+                  over worker processes that share the memory-mapped graph
+  distance_counts()  shortest-path distance distributions from sampled sources
+                  by bit-parallel multi-source BFS (64 sources per uint64 word,
+                  one pull pass over the edges per level), in parallel batches;
+                  path_lengths() turns them into mean distance and effective
+                  diameter with bootstrap confidence intervals
+
+TemporalGraph keeps the graph of a sliding range of grant years up to date by
+adding the newest and removing the oldest year's pairs, so sliding_windows()
+publishes yearly series (e.g. 5-year windows stepped annually) in one pass
+over the spills instead of rebuilding a graph per window.
+
+Layout (per window, n = active inventors, m = distinct co-inventor pairs):
+  <window>/inventor_key.npy  int32[n]     warehouse inventor_key per node (sorted)
+  <window>/indptr.npy        int64[n+1]
+  <window>/indices.npy       int32[2m]    neighbor node ids, both directions, sorted per row
+  <window>/weight.npy        int32[2m]    patents co-invented by the pair
+  <window>/strength.npy      float32[2m]  collaboration strength of the pair
+  inventors.parquet          grant_year, inventor_key, patents (inventorships per year)
+  pairs/<year>.parquet       grant_year, inventor_key_a < inventor_key_b, patents,
+                             strength (sorted by inventor_key_a, inventor_key_b)
+  graph.key                  warehouse source fingerprints the graph was built from
+
+Usage:  python coinventor_graph.py [--force] [--max-team N]
+Output: /tmp/patentview/coinventor_graph/
+"""
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import orjson
+
+from config import (
+    COINVENTOR_GRAPH_DIR, COINVENTOR_PAIRS, INVENTOR_TSV, PATENT_YEAR,
+    get_connection, require_warehouse, timed_msg, warehouse_sources,
+)
+
+GRAPH_VERSION = 3
+# window name -> (first, last) grant year
+WINDOWS = {
+    **{f"{d}s": (max(d, 1976), min(d + 9, 2025)) for d in range(1970, 2030, 10)},
+    "all": (1976, 2025),
+}
+MAX_TEAM = None               # teams larger than this add no pairs (None: every team does)
+PAIR_CHUNK = 1 << 24          # pairs expanded per deduplication batch
+CLUSTER_BUDGET = 1 << 27      # intermediate cells per triangle-count block
+PIVOTS = 256                  # sampled betweenness sources
+PATH_SOURCES = 2048           # sampled BFS sources for path lengths
+BOOTSTRAP = 1000              # resamples for path-length confidence intervals
+CHUNK_EDGES = 1 << 24         # edges per BFS pull pass
+WORKERS = min(os.cpu_count() or 1, 32)
+
+
+# ── Pair generation ──────────────────────────────────────────────────────────
+def _teams(patent: np.ndarray) -> tuple:
+    """(starts, sizes) of the runs of equal *patent* values."""
+    starts = np.flatnonzero(np.r_[True, patent[1:] != patent[:-1]]) if len(patent) else np.zeros(0, np.int64)
+    return starts, np.diff(np.r_[starts, len(patent)])
+
+
+def _paired(sizes: np.ndarray, max_team: int = None) -> np.ndarray:
+    """Teams of *sizes* that expand into pairs: 2 or more members, at most *max_team*."""
+    return (sizes >= 2) if max_team is None else (sizes >= 2) & (sizes <= max_team)
+
+
+def team_pairs(patent: np.ndarray, member: np.ndarray, max_team: int = MAX_TEAM) -> tuple:
+    """(u, v, size) for every pair of members of the same patent, u < v, with the
+    size of the team it came from.
+
+    *patent* and *member* are parallel arrays sorted by (patent, member); teams
+    of equal size are expanded together as one (teams x size) block. Teams of
+    more than *max_team* members (if given) yield no pairs.
+    """
+    starts, sizes = _teams(patent)
+    us, vs, ks = [], [], []
+    for k in np.unique(sizes[_paired(sizes, max_team)]):
+        teams = member[starts[sizes == k][:, None] + np.arange(k)]
+        a, b = np.triu_indices(k, 1)
+        us.append(teams[:, a].ravel())
+        vs.append(teams[:, b].ravel())
+        ks.append(np.full(len(teams) * len(a), k, dtype=np.int32))
+    if not us:
+        empty = np.zeros(0, dtype=member.dtype)
+        return empty, empty, np.zeros(0, dtype=np.int32)
+    return np.concatenate(us), np.concatenate(vs), np.concatenate(ks)
+
+
+def _dedupe(pair: np.ndarray, patents: np.ndarray, strength: np.ndarray) -> tuple:
+    """Sum *patents* and *strength* over equal *pair* codes (returned sorted)."""
+    pair, inverse = np.unique(pair, return_inverse=True)
+    return (pair, np.bincount(inverse, weights=patents, minlength=len(pair)).astype(np.int32),
+            np.bincount(inverse, weights=strength, minlength=len(pair)).astype(np.float64))
+
+
+def weighted_pairs(patent: np.ndarray, member: np.ndarray, n_members: int,
+                   max_team: int = MAX_TEAM, chunk: int = PAIR_CHUNK) -> tuple:
+    """(u, v, patents, strength): distinct co-member pairs (u < v, sorted) with the
+    patents they share and their summed 1 / (size - 1) collaboration strength.
+
+    Teams are expanded in batches of whole patents producing about *chunk*
+    pairs, each deduplicated before the next, so memory follows the number of
+    distinct pairs rather than the raw pair count.
+    """
+    starts, sizes = _teams(patent)
+    counted = np.where(_paired(sizes, max_team), sizes * (sizes - 1) // 2, 0)
+    cuts = np.searchsorted(np.cumsum(counted), np.arange(chunk, counted.sum(), chunk), side="right")
+    bounds = np.concatenate([[0], starts[cuts[cuts < len(starts)]], [len(patent)]])
+    parts = []
+    for r0, r1 in zip(bounds[:-1], bounds[1:]):
+        u, v, k = team_pairs(patent[r0:r1], member[r0:r1], max_team)
+        parts.append(_dedupe(u.astype(np.int64) * n_members + v, np.ones(len(u)), 1.0 / (k - 1.0)))
+    pair, patents, strength = (_dedupe(*(np.concatenate(c) for c in zip(*parts)))
+                               if len(parts) > 1 else parts[0])
+    return (pair // n_members).astype(np.int32), (pair % n_members).astype(np.int32), patents, strength
+
+
+def _connect(parent: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Component roots after adding edges (u, v) to the flat labelling *parent*
+    (parent[parent] == parent, each label the smallest id of its component), by
+    array union-find: hook roots onto the smaller root, then pointer-jump."""
+    parent = parent.copy()
+    while True:
+        pu, pv = parent[u], parent[v]
+        split = pu != pv
+        if not split.any():
+            return parent
+        u, v, pu, pv = u[split], v[split], pu[split], pv[split]
+        np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))  # hook roots
+        while True:                                                   # compress
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+def _neighbors(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> tuple:
+    """(src, nbr) for every edge out of *rows*."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    src = np.repeat(rows, counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return src, np.asarray(indices[offsets])
+
+
+# ── Graph ────────────────────────────────────────────────────────────────────
+class CoinventorGraph:
+    """One memory-mapped window of the undirected, weighted co-inventor graph."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.inventor_key = np.load(os.path.join(path, "inventor_key.npy"), mmap_mode="r")
+        self.indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(path, "indices.npy"), mmap_mode="r")
+        self.weight = np.load(os.path.join(path, "weight.npy"), mmap_mode="r")
+        self.strength = np.load(os.path.join(path, "strength.npy"), mmap_mode="r")
+        self.n = len(self.inventor_key)
+        self.m = len(self.indices) // 2
+
+    def degree(self) -> np.ndarray:
+        """Distinct co-inventors per node."""
+        return np.diff(self.indptr).astype(np.int32)
+
+    def nodes(self, inventor_keys) -> np.ndarray:
+        """Node ids of *inventor_keys* (-1 where the inventor is not in the window)."""
+        keys = np.asarray(inventor_keys)
+        pos = np.minimum(np.searchsorted(self.inventor_key, keys), max(self.n - 1, 0))
+        return np.where((self.n > 0) & (self.inventor_key[pos] == keys), pos, -1)
+
+    def components(self) -> np.ndarray:
+        """int32[n] component root (the smallest node id in the component)."""
+        u, v = self.edges()
+        return _connect(np.arange(self.n, dtype=np.int32), u, v)
+
+    def edges(self) -> tuple:
+        """(u, v) node ids of every edge once, u < v, sorted."""
+        rows = np.repeat(np.arange(self.n, dtype=np.int32), np.diff(self.indptr))
+        upper = rows < self.indices
+        return rows[upper], np.asarray(self.indices)[upper]
+
+    def adjacency(self):
+        """scipy.sparse CSR int32[n, n] 0/1 adjacency (weights dropped)."""
+        import scipy.sparse as sp
+        return sp.csr_matrix((np.ones(len(self.indices), dtype=np.int32),
+                              np.asarray(self.indices), np.asarray(self.indptr)), shape=(self.n, self.n))
+
+    def triangles(self, budget: int = CLUSTER_BUDGET) -> np.ndarray:
+        """int64[n] triangles through each node.
+
+        Row block B of the adjacency A gives (B @ A) * B = common neighbors per
+        edge; its size is bounded by the wedges through the block's rows, so
+        blocks are cut where that count reaches *budget*.
+        """
+        adj = self.adjacency()
+        wedges = adj @ self.degree().astype(np.int64)
+        cuts = np.searchsorted(np.cumsum(wedges), np.arange(budget, wedges.sum(), budget), side="right")
+        bounds = np.unique(np.concatenate([[0], cuts, [self.n]]))
+        out = np.zeros(self.n, dtype=np.int64)
+        for r0, r1 in zip(bounds[:-1], bounds[1:]):
+            block = adj[r0:r1]
+            common = (block @ adj).multiply(block)
+            out[r0:r1] = np.asarray(common.sum(axis=1)).ravel() // 2
+        return out
+
+    def clustering(self, budget: int = CLUSTER_BUDGET) -> tuple:
+        """(average local clustering, transitivity). Nodes with fewer than two
+        neighbors count as 0 in the average, as in NetworkX."""
+        tri = self.triangles(budget)
+        deg = self.degree().astype(np.float64)
+        pairs = deg * (deg - 1) / 2
+        local = np.divide(tri, pairs, out=np.zeros(self.n), where=pairs > 0)
+        average = float(local.mean()) if self.n else 0.0
+        transitivity = float(tri.sum() / pairs.sum()) if pairs.sum() else 0.0
+        return average, transitivity
+
+    def betweenness(self, pivots: int = PIVOTS, workers: int = WORKERS, seed: int = 0) -> np.ndarray:
+        """float64[n] estimated betweenness (unnormalized, undirected).
+
+        Dependencies are accumulated from *pivots* sources drawn uniformly from
+        the nodes with an edge and scaled by (nodes with an edge) / pivots.
+        """
+        candidates = np.flatnonzero(self.degree() > 0)
+        if not len(candidates):
+            return np.zeros(self.n)
+        rng = np.random.default_rng(seed)
+        sources = rng.choice(candidates, size=min(pivots, len(candidates)), replace=False)
+        batches = [b for b in np.array_split(sources, max(workers, 1) * 4) if len(b)]
+        total = sum(self._map(_dependencies, batches, workers))
+        return total * (len(candidates) / len(sources)) / 2
+
+    def row_chunks(self, chunk_edges: int = CHUNK_EDGES):
+        """Yield (r0, r1) row ranges holding about *chunk_edges* edges each."""
+        targets = np.arange(0, len(self.indices), chunk_edges)
+        bounds = np.unique(np.concatenate([
+            [0], np.searchsorted(self.indptr, targets, side="right") - 1, [self.n],
+        ]))
+        yield from zip(bounds[:-1], bounds[1:])
+
+    def distance_counts(self, sources, workers: int = WORKERS) -> np.ndarray:
+        """int64[len(sources), D+1]: nodes at shortest-path distance d from each source
+        (column 0 is the source itself; unreachable nodes are not counted)."""
+        sources = np.asarray(sources, dtype=np.int64)
+        batches = [sources[i:i + 64] for i in range(0, len(sources), 64)]
+        counts = self._map(_bfs_counts, batches, workers)
+        depth = max((c.shape[1] for c in counts), default=1)
+        return np.concatenate([np.pad(c, ((0, 0), (0, depth - c.shape[1]))) for c in counts]) \
+            if counts else np.zeros((0, 1), dtype=np.int64)
+
+    def sample_sources(self, k: int = PATH_SOURCES, seed: int = 0) -> np.ndarray:
+        """Up to *k* distinct nodes drawn uniformly from the giant component."""
+        roots = self.components()
+        giant = np.flatnonzero(roots == np.bincount(roots).argmax())
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(giant, size=min(k, len(giant)), replace=False))
+
+    def _map(self, fn, batches, workers: int) -> list:
+        """[fn(graph, batch) for batch in batches], in forked worker processes
+        that each open the memory-mapped graph when workers > 1."""
+        if workers <= 1 or len(batches) <= 1:
+            return [fn(self, b) for b in batches]
+        with ProcessPoolExecutor(min(workers, len(batches)), mp_context=get_context("fork"),
+                                 initializer=_init_worker, initargs=(self.path,)) as pool:
+            return list(pool.map(_worker_call, [(fn, b) for b in batches]))
+
+
+def _dependencies(g: CoinventorGraph, sources) -> np.ndarray:
+    """Summed Brandes dependencies delta_s(v) over *sources* (level-synchronous BFS)."""
+    indptr, indices = np.asarray(g.indptr), g.indices
+    total = np.zeros(g.n)
+    for s in sources:
+        dist = np.full(g.n, -1, dtype=np.int32)
+        sigma = np.zeros(g.n)
+        dist[s], sigma[s] = 0, 1.0
+        levels = [np.array([s], dtype=np.int64)]
+        while True:
+            src, nbr = _neighbors(indptr, indices, levels[-1])
+            nxt = np.unique(nbr[dist[nbr] < 0])
+            if not len(nxt):
+                break
+            dist[nxt] = len(levels)
+            onward = dist[nbr] == len(levels)
+            sigma[nxt] = np.bincount(np.searchsorted(nxt, nbr[onward]),
+                                     weights=sigma[src[onward]], minlength=len(nxt))
+            levels.append(nxt)
+        delta = np.zeros(g.n)
+        for depth in range(len(levels) - 1, 0, -1):
+            src, nbr = _neighbors(indptr, indices, levels[depth])
+            back = dist[nbr] == depth - 1
+            w, v = src[back], nbr[back]
+            prev = levels[depth - 1]
+            delta[prev] += np.bincount(np.searchsorted(prev, v),
+                                       weights=sigma[v] / sigma[w] * (1.0 + delta[w]), minlength=len(prev))
+        delta[s] = 0.0
+        total += delta
+    return total
+
+
+_worker_graph = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_graph
+    _worker_graph = CoinventorGraph(path)
+
+
+def _worker_call(task):
+    fn, batch = task
+    return fn(_worker_graph, batch)
+
+
+# ── Path lengths ─────────────────────────────────────────────────────────────
+def _bit_counts(words: np.ndarray, k: int) -> np.ndarray:
+    """Per-bit popcount over *words* (uint64) for bits 0..k-1."""
+    nz = words[words != 0].astype("<u8")
+    if not len(nz):
+        return np.zeros(k, dtype=np.int64)
+    bits = np.unpackbits(nz.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return bits.sum(axis=0, dtype=np.int64)[:k]
+
+
+def _bfs_counts(g: CoinventorGraph, sources) -> np.ndarray:
+    """Nodes per BFS level for up to 64 *sources* at once (one bit per source)."""
+    indptr = np.asarray(g.indptr)
+    k = len(sources)
+    seen = np.zeros(g.n, dtype=np.uint64)
+    seen[sources] = np.left_shift(np.uint64(1), np.arange(k, dtype=np.uint64))
+    frontier = seen.copy()
+    chunks = [(r0, r1, r0 + np.flatnonzero(np.diff(indptr[r0:r1 + 1])))
+              for r0, r1 in g.row_chunks()]
+    levels = [np.ones(k, dtype=np.int64)]
+    while True:
+        reach = np.zeros(g.n, dtype=np.uint64)
+        for r0, r1, rows in chunks:
+            if not len(rows):
+                continue
+            e0 = indptr[r0]
+            words = frontier[g.indices[e0:indptr[r1]]]
+            reach[rows] = np.bitwise_or.reduceat(words, indptr[rows] - e0)
+        frontier = reach & ~seen
+        seen |= frontier
+        counts = _bit_counts(frontier, k)
+        if not counts.any():
+            return np.stack(levels, axis=1)
+        levels.append(counts)
+
+
+def effective_diameter(hist: np.ndarray, q: float = 0.9) -> float:
+    """Distance within which a fraction *q* of connected pairs lie, interpolated
+    linearly between integer distances (as in SNAP). hist[d] = pairs at distance d."""
+    cum = np.cumsum(hist[1:], dtype=np.float64)
+    if not len(cum) or cum[-1] == 0:
+        return float("nan")
+    cum /= cum[-1]
+    d = int(np.searchsorted(cum, q, side="left"))   # cum[d] >= q, distance d + 1
+    prev = cum[d - 1] if d else 0.0
+    return float(d + (q - prev) / (cum[d] - prev))
+
+
+def path_lengths(counts: np.ndarray, n_boot: int = BOOTSTRAP, seed: int = 0) -> dict:
+    """Distance distribution, mean distance and effective diameter from per-source
+    distance counts, with 95% bootstrap intervals over the sampled sources."""
+    hist = counts.sum(axis=0)
+    depth = np.arange(counts.shape[1])
+    stats = lambda h: (float((h[1:] * depth[1:]).sum() / h[1:].sum()), effective_diameter(h))
+    mean, eff = stats(hist)
+    rng = np.random.default_rng(seed)
+    boot = np.array([stats(counts[rng.integers(0, len(counts), len(counts))].sum(axis=0))
+                     for _ in range(n_boot)])
+    lo, hi = np.nanpercentile(boot, [2.5, 97.5], axis=0)
+    pairs = hist[1:].sum()
+    return {
+        "sources": len(counts),
+        "connected_pairs": int(pairs),
+        "mean_distance": mean,
+        "mean_distance_ci": (float(lo[0]), float(hi[0])),
+        "effective_diameter": eff,
+        "effective_diameter_ci": (float(lo[1]), float(hi[1])),
+        "max_distance": int(np.flatnonzero(hist)[-1]),
+        "distribution": {int(d): float(hist[d] / pairs) for d in depth[1:] if hist[d]},
+    }
+
+
+# ── Sliding windows ──────────────────────────────────────────────────────────
+class TemporalGraph:
+    """The co-inventor graph of a contiguous range of grant years, updated in
+    place: add_year() appends the next year, remove_year() drops the oldest.
+
+    Nodes are the inventors of the "all" window; a node is active while it has
+    patents in range. Each edge counts the years in range that contain it, so a
+    year only touches the degrees of pairs that appear or disappear. Components
+    come from a union-find queue made of two stacks: added years are unioned into
+    one labelling, and when the oldest year must go, the years held there are
+    re-unioned newest to oldest into one labelling per suffix, of which popping
+    keeps the rest. Every year is unioned at most twice, and a window's
+    components merge the two labellings in one pass over the nodes.
+    """
+
+    def __init__(self, path: str = COINVENTOR_GRAPH_DIR):
+        import pyarrow.parquet as pq
+        self.path = path
+        g = CoinventorGraph(os.path.join(path, "all"))
+        self.inventor_key, self.n = np.asarray(g.inventor_key), g.n
+        self._u, self._v = g.edges()
+        self._codes = self._u.astype(np.int64) * self.n + self._v
+        table = pq.read_table(os.path.join(path, "inventors.parquet"))
+        self._act_year = table.column("grant_year").to_numpy()
+        self._act_node = np.searchsorted(self.inventor_key, table.column("inventor_key").to_numpy())
+        self._act_patents = table.column("patents").to_numpy()
+        self.first = self.last = None
+        self.n_nodes = self.n_edges = 0
+        self.patents = np.zeros(self.n, dtype=np.int32)        # patents in range per node
+        self.degree = np.zeros(self.n, dtype=np.int32)
+        self.pair_years = np.zeros(len(self._codes), dtype=np.int16)
+        self._batches = {}
+        self._identity = np.arange(self.n, dtype=np.int32)
+        self._newer, self._newer_years = self._identity, []
+        self._older = []                                        # suffix labellings, oldest last
+
+    def _batch(self, year: int) -> np.ndarray:
+        """Edge ids of the pairs co-inventing in *year*."""
+        if year not in self._batches:
+            import pyarrow.parquet as pq
+            file = os.path.join(self.path, "pairs", f"{year}.parquet")
+            ids = np.zeros(0, dtype=np.int64)
+            if os.path.exists(file):
+                table = pq.read_table(file, columns=["inventor_key_a", "inventor_key_b"])
+                u = np.searchsorted(self.inventor_key, table.column("inventor_key_a").to_numpy())
+                v = np.searchsorted(self.inventor_key, table.column("inventor_key_b").to_numpy())
+                ids = np.searchsorted(self._codes, u.astype(np.int64) * self.n + v)
+            self._batches[year] = ids
+        return self._batches[year]
+
+    def _labels(self, years, labels: np.ndarray) -> np.ndarray:
+        ids = np.concatenate([self._batch(y) for y in years]) if years else np.zeros(0, dtype=np.int64)
+        return _connect(labels, self._u[ids], self._v[ids])
+
+    def _activity(self, year: int, sign: int) -> None:
+        lo, hi = np.searchsorted(self._act_year, [year, year + 1])
+        nodes = self._act_node[lo:hi]
+        was = self.patents[nodes] > 0
+        self.patents[nodes] += sign * self._act_patents[lo:hi]
+        self.n_nodes += int((self.patents[nodes] > 0).sum() - was.sum())
+
+    def add_year(self, year: int) -> None:
+        if self.last is not None and year != self.last + 1:
+            raise ValueError(f"Expected grant year {self.last + 1}, got {year}")
+        ids = self._batch(year)
+        self.pair_years[ids] += 1
+        new = ids[self.pair_years[ids] == 1]
+        self.degree += np.bincount(self._u[new], minlength=self.n).astype(np.int32)
+        self.degree += np.bincount(self._v[new], minlength=self.n).astype(np.int32)
+        self.n_edges += len(new)
+        self._activity(year, 1)
+        self._newer = self._labels([year], self._newer)
+        self._newer_years.append(year)
+        self.first = year if self.first is None else self.first
+        self.last = year
+
+    def remove_year(self) -> None:
+        """Drop the oldest year in range."""
+        if self.first is None:
+            raise ValueError("No grant year in range")
+        year = self.first
+        if not self._older:
+            labels = self._identity
+            for y in reversed(self._newer_years):
+                labels = self._labels([y], labels)
+                self._older.append(labels)
+            self._newer, self._newer_years = self._identity, []
+        self._older.pop()
+        ids = self._batch(year)
+        self.pair_years[ids] -= 1
+        gone = ids[self.pair_years[ids] == 0]
+        self.degree -= np.bincount(self._u[gone], minlength=self.n).astype(np.int32)
+        self.degree -= np.bincount(self._v[gone], minlength=self.n).astype(np.int32)
+        self.n_edges -= len(gone)
+        self._activity(year, -1)
+        del self._batches[year]
+        self.first = year + 1 if year < self.last else None
+        self.last = self.last if self.first is not None else None
+
+    def components(self) -> np.ndarray:
+        """int32[n] component root of every node (inactive nodes are their own root)."""
+        if not self._older:
+            return self._newer
+        moved = np.flatnonzero(self._newer != self._identity)
+        return _connect(self._older[-1], moved, self._newer[moved])
+
+    def stats(self) -> dict:
+        """Node, edge, degree and component statistics of the current range."""
+        active = self.patents > 0
+        sizes = np.bincount(self.components()[active], minlength=1)
+        deg = self.degree[active]
+        n = self.n_nodes
+        return {
+            "first_year": self.first,
+            "last_year": self.last,
+            "num_nodes": n,
+            "num_edges": self.n_edges,
+            "avg_degree": 2.0 * self.n_edges / n if n else 0.0,
+            "max_degree": int(deg.max()) if n else 0,
+            "isolated_share": float((deg == 0).mean()) if n else 0.0,
+            "num_components": int((sizes > 0).sum()),
+            "giant_component_share": float(sizes.max()) / n if n else 0.0,
+        }
+
+
+def sliding_windows(width: int = 5, first: int = 1976, last: int = 2025,
+                    path: str = COINVENTOR_GRAPH_DIR):
+    """Yield TemporalGraph.stats() of every *width*-year window [y - width + 1, y]
+    for y from first + width - 1 to *last*, stepping one year at a time."""
+    graph = TemporalGraph(path)
+    for year in range(first, last + 1):
+        graph.add_year(year)
+        if year - first >= width:
+            graph.remove_year()
+        if year - first >= width - 1:
+            yield graph.stats()
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+def graph_key(max_team: int = MAX_TEAM) -> dict:
+    return {"version": GRAPH_VERSION, "windows": WINDOWS, "max_team": max_team,
+            "sources": warehouse_sources()}
+
+
+def is_fresh(path: str = COINVENTOR_GRAPH_DIR, max_team: int = MAX_TEAM) -> bool:
+    try:
+        with open(os.path.join(path, "graph.key"), "rb") as f:
+            return orjson.loads(f.read()) == orjson.loads(orjson.dumps(graph_key(max_team)))
+    except (OSError, orjson.JSONDecodeError):
+        return False
+
+
+def edges_sql(first: int = 1976, last: int = 2025, path: str = COINVENTOR_GRAPH_DIR) -> str:
+    """SQL for the weighted co-inventor edges of grant years [first, last]:
+    inventor_key_a < inventor_key_b, patents, strength."""
+    return f"""
+        SELECT inventor_key_a, inventor_key_b,
+               SUM(patents)::INTEGER AS patents, SUM(strength) AS strength
+        FROM {COINVENTOR_PAIRS(path)}
+        WHERE grant_year BETWEEN {int(first)} AND {int(last)}
+        GROUP BY inventor_key_a, inventor_key_b
+    """
+
+
+def _write_pairs(pairs_dir: str, year: int, patent: np.ndarray, inventor: np.ndarray, n_keys: int,
+                 max_team: int = MAX_TEAM) -> int:
+    """Spill one grant year's weighted pairs to pairs/<year>.parquet."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    u, v, patents, strength = weighted_pairs(patent, inventor, n_keys, max_team)
+    pq.write_table(pa.table({
+        "grant_year": np.full(len(u), year, dtype=np.int16),
+        "inventor_key_a": u,
+        "inventor_key_b": v,
+        "patents": patents,
+        "strength": strength,
+    }), os.path.join(pairs_dir, f"{year}.parquet"), compression="zstd")
+    return len(u)
+
+
+def _write_inventorships(path: str, years: np.ndarray, inventor: np.ndarray, n_keys: int) -> None:
+    """Patents per (grant year, inventor) to inventors.parquet."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    cell, patents = np.unique(years.astype(np.int64) * n_keys + inventor, return_counts=True)
+    pq.write_table(pa.table({
+        "grant_year": (cell // n_keys).astype(np.int16),
+        "inventor_key": (cell % n_keys).astype(np.int32),
+        "patents": patents.astype(np.int32),
+    }), os.path.join(path, "inventors.parquet"), compression="zstd")
+
+
+def _write_window(con, out_dir: str, nodes: np.ndarray, path: str, first: int, last: int) -> int:
+    """Build one window's CSR over *nodes* (sorted inventor keys) from the pair spills."""
+    res = con.execute(edges_sql(first, last, path)).fetchnumpy()
+    n = len(nodes)
+    u = np.searchsorted(nodes, res["inventor_key_a"]).astype(np.int32)
+    v = np.searchsorted(nodes, res["inventor_key_b"]).astype(np.int32)
+    weight, strength = res["patents"], res["strength"]
+    del res
+    rows, cols = np.concatenate([u, v]), np.concatenate([v, u])
+    order = np.lexsort((cols, rows))
+    os.makedirs(out_dir)
+    np.save(os.path.join(out_dir, "inventor_key.npy"), nodes.astype(np.int32))
+    np.save(os.path.join(out_dir, "indptr.npy"),
+            np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))]).astype(np.int64))
+    np.save(os.path.join(out_dir, "indices.npy"), cols[order])
+    np.save(os.path.join(out_dir, "weight.npy"), np.concatenate([weight, weight])[order].astype(np.int32))
+    np.save(os.path.join(out_dir, "strength.npy"), np.concatenate([strength, strength])[order].astype(np.float32))
+    return len(u)
+
+
+def build(path: str = COINVENTOR_GRAPH_DIR, max_team: int = MAX_TEAM) -> None:
+    """(Re)build the pair spills and every window of the co-inventor graph at
+    *path* from the warehouse, leaving out teams of more than *max_team*."""
+    require_warehouse()
+    con = get_connection()
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    pairs_dir = os.path.join(tmp_path, "pairs")
+    os.makedirs(pairs_dir)
+
+    timed_msg("Co-inventor pairs by grant year")
+    t0 = time.time()
+    res = con.execute(f"""
+        SELECT DISTINCT py.grant_year, i.patent_key, i.inventor_key
+        FROM {INVENTOR_TSV()} i
+        JOIN {PATENT_YEAR()} py ON i.patent_key = py.patent_key
+        WHERE i.inventor_key IS NOT NULL
+        ORDER BY py.grant_year, i.patent_key, i.inventor_key
+    """).fetchnumpy()
+    years, patent, inventor = res["grant_year"], res["patent_key"], res["inventor_key"]
+    del res
+    n_keys = int(inventor.max()) + 1 if len(inventor) else 1
+    _write_inventorships(tmp_path, years, inventor, n_keys)
+    total = 0
+    for year in np.unique(years):
+        lo, hi = np.searchsorted(years, [year, year + 1])
+        total += _write_pairs(pairs_dir, int(year), patent[lo:hi], inventor[lo:hi], n_keys, max_team)
+    print(f"  {len(patent):,} inventorships, {total:,} yearly co-inventor pairs in {time.time()-t0:.1f}s")
+    del patent
+
+    for window, (first, last) in WINDOWS.items():
+        timed_msg(f"Co-inventor graph: {window} ({first}-{last})")
+        t0 = time.time()
+        lo, hi = np.searchsorted(years, [first, last + 1])
+        nodes = np.unique(inventor[lo:hi])
+        m = _write_window(con, os.path.join(tmp_path, window), nodes, tmp_path, first, last)
+        print(f"  {len(nodes):,} inventors, {m:,} co-inventor pairs in {time.time()-t0:.1f}s")
+    con.close()
+
+    with open(os.path.join(tmp_path, "graph.key"), "wb") as f:
+        f.write(orjson.dumps(graph_key(max_team)))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    size_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(path) for f in fs) / (1024 * 1024)
+    print(f"\n  Wrote {path} ({size_mb:,.0f} MB)")
+
+
+def load(window: str = "all", path: str = COINVENTOR_GRAPH_DIR, rebuild: bool = False,
+         max_team: int = MAX_TEAM) -> CoinventorGraph:
+    """Open one window of the memory-mapped graph, building it first if missing,
+    stale or built with another *max_team*."""
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window {window!r} (expected one of {list(WINDOWS)})")
+    if rebuild or not is_fresh(path, max_team):
+        build(path, max_team)
+    return CoinventorGraph(os.path.join(path, window))
+
+
+if __name__ == "__main__":
+    max_team = int(sys.argv[sys.argv.index("--max-team") + 1]) if "--max-team" in sys.argv else MAX_TEAM
+    if "--force" not in sys.argv and is_fresh(max_team=max_team):
+        print(f"Co-inventor graph {COINVENTOR_GRAPH_DIR} is up to date (use --force to rebuild)")
+        sys.exit(0)
+    t0 = time.time()
+    build(max_team=max_team)
+    print(f"\n=== coinventor_graph complete in {time.time()-t0:.1f}s ===\n")
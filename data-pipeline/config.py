@@ -2,46 +2,245 @@
 PatentWorld Data Pipeline - Configuration
 
 DuckDB cannot read these zip files directly (sniffing fails).
-Strategy: unzip each needed file to /tmp/patentview/ on first use, then read the raw TSV.
+Strategy: stream each needed *.tsv.zip once into a typed, zstd-compressed Parquet
+file under /tmp/patentview/parquet/ (see ingest.py), then hand DuckDB read_parquet().
+The Parquet cache is keyed on the source zip's size/mtime, so a new PatentsView
+release is picked up automatically; set PATENTWORLD_REBUILD_PARQUET=1 to force it.
+
+If the persistent warehouse (patentworld.duckdb, built by build_warehouse.py) is
+present and fresh, table expressions resolve to its typed tables instead, and
+get_connection() attaches it read-only as `wh`.
 """
+import hashlib
+import math
 import os
-import subprocess
+import string
+import sys
 import time
 import orjson
+from ingest import cached_parquet, source_key
+from json_writer import arrow_json_column, arrow_records, copy_json, float_nullable_ints, stream_json, write_json_bytes
+from output_cache import (
+    DISABLED as OUTPUT_CACHE_DISABLED, OutputCache, data_digest, main_script, normalize_sql,
+    script_files, script_version,
+)
 
 # ── Paths ──────────────────────────────────────────────────────────────────────
 DATA_DIR = "/media/saerom/saerom-ssd/Penn Dropbox/Saerom (Ronnie) Lee/Research/PatentsView"
 OUTPUT_DIR = "/home/saerom/projects/patentworld/public/data"
 TEMP_DIR = "/tmp/patentview"
+PARQUET_DIR = os.path.join(TEMP_DIR, "parquet")
+WAREHOUSE_PATH = os.path.join(TEMP_DIR, "patentworld.duckdb")
+WAREHOUSE_ALIAS = "wh"
+# Patent master (58_build_patent_master.py): hive-partitioned grant_year=/cpc_section=
+MASTER_DIR = os.path.join(TEMP_DIR, "patent_master")
+MASTER_PARTITIONS = {"grant_year": "SMALLINT", "cpc_section": "VARCHAR"}
+# Content-addressed query_to_json cache (output_cache.py)
+JSON_CACHE_DIR = os.path.join(TEMP_DIR, "json_cache")
+# CSR citation graph (citation_graph.py): memory-mapped .npy adjacency arrays
+CITATION_GRAPH_DIR = os.path.join(TEMP_DIR, "citation_graph")
+# Citation-age cube (citation_cube.py): patent_key × years since grant -> citations
+CITATION_CUBE_DIR = os.path.join(TEMP_DIR, "citation_cube")
+# Co-inventor network (coinventor_graph.py): per-year pair spills, per-window CSR .npy arrays
+COINVENTOR_GRAPH_DIR = os.path.join(TEMP_DIR, "coinventor_graph")
+# Patent x CPC incidence (cpc_incidence.py): CSR .npz per level (subclass / class / section)
+CPC_INCIDENCE_DIR = os.path.join(TEMP_DIR, "cpc_incidence")
+
+# Force re-conversion of every cached Parquet table (once per process).
+REBUILD_PARQUET = os.environ.get("PATENTWORLD_REBUILD_PARQUET", "") == "1"
+
+# Per-stage DuckDB resource slice handed down by run_all.py (a script's own
+# SET threads / memory_limit still wins).
+STAGE_THREADS = os.environ.get("PATENTWORLD_THREADS")
+STAGE_MEMORY_LIMIT = os.environ.get("PATENTWORLD_MEMORY_LIMIT")
 
 os.makedirs(TEMP_DIR, exist_ok=True)
+os.makedirs(PARQUET_DIR, exist_ok=True)
+
+# Tables already force-rebuilt in this process (REBUILD_PARQUET applies once)
+_rebuilt = set()
+
+
+def _parquet_path(name: str, rebuild: bool = False) -> str:
+    """Return path to the cached Parquet copy of *name*, (re)building it if stale."""
+    force = rebuild or (REBUILD_PARQUET and name not in _rebuilt)
+    path = cached_parquet(os.path.join(DATA_DIR, f"{name}.tsv.zip"), PARQUET_DIR, rebuild=force)
+    if force:
+        _rebuilt.add(name)
+    return path
+
+
+def parquet_table(name: str, rebuild: bool = False) -> str:
+    """Return a DuckDB read_parquet expression for the given raw table.
+
+    The raw zip is streamed to Parquet on first use; pass *rebuild* to force it.
+    """
+    path = _parquet_path(name, rebuild=rebuild)
+    return f"read_parquet('{path}')"
+
+
+# ── Persistent warehouse ──────────────────────────────────────────────────────
+# Raw tables loaded into the warehouse by build_warehouse.py
+WAREHOUSE_SOURCES = [
+    "g_patent", "g_application", "g_cpc_current", "g_cpc_title",
+    "g_wipo_technology", "g_assignee_disambiguated", "g_inventor_disambiguated",
+    "g_location_disambiguated", "g_us_patent_citation", "g_foreign_citation",
+    "g_gov_interest", "g_gov_interest_org",
+]
+
+# Low-cardinality text columns stored as (alphabetically ordered) ENUMs
+WAREHOUSE_ENUM_COLUMNS = ["patent_type", "cpc_section", "gender_code", "disambig_country"]
+
+# Derived tables that many scripts used to rebuild as temp tables.
+# {g_...} placeholders resolve to the raw table expressions.
+DERIVED_TABLES = {
+    "patent_year": """
+        SELECT
+            patent_id,
+            CAST(patent_date AS DATE) AS grant_date,
+            CAST(YEAR(CAST(patent_date AS DATE)) AS SMALLINT) AS grant_year
+        FROM {g_patent}
+        WHERE patent_type = 'utility'
+          AND patent_date IS NOT NULL
+          AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1976 AND 2025
+    """,
+    "primary_assignee": """
+        SELECT
+            patent_id,
+            assignee_id,
+            disambig_assignee_organization AS organization,
+            assignee_type
+        FROM {g_assignee_disambiguated}
+        WHERE assignee_sequence = 0
+    """,
+    "primary_cpc": """
+        SELECT patent_id, cpc_section, cpc_class, cpc_subclass, cpc_group
+        FROM {g_cpc_current}
+        WHERE cpc_sequence = 0
+    """,
+    # Top assignees by utility-patent count (1976-2025); filter on rank <= N
+    "top_assignees": """
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY COUNT(DISTINCT p.patent_id) DESC, a.disambig_assignee_organization) AS rank,
+            a.disambig_assignee_organization AS organization,
+            COUNT(DISTINCT p.patent_id) AS total
+        FROM {g_patent} p
+        JOIN {g_assignee_disambiguated} a
+            ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
+        WHERE p.patent_type = 'utility'
+          AND p.patent_date IS NOT NULL
+          AND a.disambig_assignee_organization IS NOT NULL
+          AND TRIM(a.disambig_assignee_organization) != ''
+          AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1976 AND 2025
+        GROUP BY a.disambig_assignee_organization
+        QUALIFY rank <= 1000
+    """,
+    # Same ranking over every utility patent, whatever its grant date
+    "top_assignees_all_time": """
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY COUNT(DISTINCT p.patent_id) DESC, a.disambig_assignee_organization) AS rank,
+            a.disambig_assignee_organization AS organization,
+            COUNT(DISTINCT p.patent_id) AS total
+        FROM {g_patent} p
+        JOIN {g_assignee_disambiguated} a
+            ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
+        WHERE p.patent_type = 'utility'
+          AND a.disambig_assignee_organization IS NOT NULL
+          AND TRIM(a.disambig_assignee_organization) != ''
+        GROUP BY a.disambig_assignee_organization
+        QUALIFY rank <= 1000
+    """,
+}
+
+# Memoized set of tables in a fresh warehouse (empty if missing or stale)
+_warehouse = None
+
 
+def warehouse_sources() -> dict:
+    """Source fingerprints the warehouse would be built from (zips present on disk)."""
+    keys = {}
+    for name in WAREHOUSE_SOURCES:
+        zip_path = os.path.join(DATA_DIR, f"{name}.tsv.zip")
+        if os.path.exists(zip_path):
+            keys[name] = source_key(zip_path)
+    return keys
 
-def _tsv_path(name: str) -> str:
-    """Return path to unzipped TSV, extracting from zip if needed."""
-    tsv_path = os.path.join(TEMP_DIR, f"{name}.tsv")
-    zip_path = os.path.join(DATA_DIR, f"{name}.tsv.zip")
-    if not os.path.exists(tsv_path):
-        print(f"  Extracting {name}.tsv.zip -> {tsv_path} ...")
-        t0 = time.time()
-        subprocess.run(
-            ["unzip", "-o", "-d", TEMP_DIR, zip_path],
-            check=True, capture_output=True,
-        )
-        elapsed = time.time() - t0
-        size_mb = os.path.getsize(tsv_path) / (1024 * 1024)
-        print(f"  Extracted in {elapsed:.1f}s ({size_mb:,.0f} MB)")
-    return tsv_path
 
+def warehouse_tables() -> set:
+    """Return the table names of a fresh warehouse, or an empty set."""
+    global _warehouse
+    if _warehouse is not None:
+        return _warehouse
+    _warehouse = set()
+    if not os.path.exists(WAREHOUSE_PATH):
+        return _warehouse
+    import duckdb
+    con = duckdb.connect(WAREHOUSE_PATH, read_only=True)
+    recorded = {
+        name: {"zip_size": size, "zip_mtime_ns": mtime}
+        for name, size, mtime in con.execute("SELECT name, zip_size, zip_mtime_ns FROM _sources").fetchall()
+    }
+    tables = {row[0] for row in con.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    con.close()
+    if recorded == warehouse_sources():
+        _warehouse = tables
+    else:
+        print(f"  Warehouse {WAREHOUSE_PATH} is stale (run build_warehouse.py); using Parquet cache")
+    return _warehouse
 
-def tsv_table(name: str) -> str:
-    """Return a DuckDB read_csv expression for the given table name."""
-    path = _tsv_path(name)
-    # Force patent_id to VARCHAR to avoid INT64 detection issues (e.g., RE32443)
-    return f"read_csv_auto('{path}', delim='\\t', quote='\"', header=true, ignore_errors=true, max_line_size=10000000, types={{'patent_id': 'VARCHAR'}})"
 
+def tsv_table(name: str, rebuild: bool = False) -> str:
+    """Return a DuckDB table expression for the given raw table name.
 
-# ── Shorthand table references (call these to get the read_csv expression) ──
+    Resolves to the warehouse table when available (connection from
+    get_connection()), otherwise to the Parquet cache.
+    """
+    if not rebuild and name in warehouse_tables():
+        return f"{WAREHOUSE_ALIAS}.{name}"
+    return parquet_table(name, rebuild=rebuild)
+
+
+def derived_refs(name: str) -> set:
+    """Raw table names referenced by derived table *name*."""
+    return {field for _, field, _, _ in string.Formatter().parse(DERIVED_TABLES[name]) if field}
+
+
+def derived_sql(name: str, table=tsv_table) -> str:
+    """Return the SELECT defining derived table *name*, with raw tables resolved via *table*."""
+    return DERIVED_TABLES[name].format(**{ref: table(ref) for ref in derived_refs(name)})
+
+
+def warehouse_table(name: str) -> str:
+    """Return a table expression for a derived table (inline subquery if no warehouse)."""
+    if name in warehouse_tables():
+        return f"{WAREHOUSE_ALIAS}.{name}"
+    return f"({derived_sql(name)})"
+
+
+def require_warehouse() -> None:
+    """Exit with a hint unless a fresh warehouse is available (integer-key joins need it)."""
+    if not warehouse_tables():
+        print(f"  ERROR: {WAREHOUSE_PATH} is missing or stale — run build_warehouse.py first")
+        sys.exit(1)
+
+
+def get_connection():
+    """Return an in-memory DuckDB connection with the warehouse attached read-only.
+
+    Temp tables and COPY still work as usual; only the attached `wh` catalog is read-only.
+    """
+    import duckdb
+    con = duckdb.connect()
+    if STAGE_THREADS:
+        con.execute(f"SET threads TO {int(STAGE_THREADS)}")
+    if STAGE_MEMORY_LIMIT:
+        con.execute(f"SET memory_limit = '{STAGE_MEMORY_LIMIT}'")
+    if warehouse_tables():
+        con.execute(f"ATTACH '{WAREHOUSE_PATH}' AS {WAREHOUSE_ALIAS} (READ_ONLY)")
+    return con
+
+
+# ── Shorthand table references (call these to get the table expression) ──────
 def PATENT_TSV(): return tsv_table("g_patent")
 def APPLICATION_TSV(): return tsv_table("g_application")
 def CPC_CURRENT_TSV(): return tsv_table("g_cpc_current")
@@ -55,6 +254,32 @@ def FOREIGN_CITATION_TSV(): return tsv_table("g_foreign_citation")
 def GOV_INTEREST_TSV(): return tsv_table("g_gov_interest")
 def GOV_INTEREST_ORG_TSV(): return tsv_table("g_gov_interest_org")
 
+# ── Shorthand derived-table references ────────────────────────────────────────
+def PATENT_YEAR(): return warehouse_table("patent_year")
+def PRIMARY_ASSIGNEE(): return warehouse_table("primary_assignee")
+def PRIMARY_CPC(): return warehouse_table("primary_cpc")
+def TOP_ASSIGNEES(): return warehouse_table("top_assignees")
+def TOP_ASSIGNEES_ALL_TIME(): return warehouse_table("top_assignees_all_time")
+
+# ── ID dictionaries (surrogate key <-> text ID; warehouse only) ───────────────
+def PATENT_IDS(): return f"{WAREHOUSE_ALIAS}.patent_ids"
+def INVENTOR_IDS(): return f"{WAREHOUSE_ALIAS}.inventor_ids"
+def ASSIGNEE_IDS(): return f"{WAREHOUSE_ALIAS}.assignee_ids"
+
+# ── Patent master (filters on grant_year / cpc_section prune whole partitions) ─
+def PATENT_MASTER(path: str = MASTER_DIR):
+    types = ", ".join(f"'{c}': {t}" for c, t in MASTER_PARTITIONS.items())
+    glob = "/".join([path] + ["*"] * len(MASTER_PARTITIONS) + ["*.parquet"])
+    return f"read_parquet('{glob}', hive_partitioning = true, hive_types = {{{types}}})"
+
+# ── Citation-age cube (rows sorted by patent_key, age) ────────────────────────
+def CITATION_CUBE(path: str = CITATION_CUBE_DIR):
+    return f"read_parquet('{os.path.join(path, 'cube.parquet')}')"
+
+# ── Co-inventor pairs (per grant year; inventor_key_a < inventor_key_b) ───────
+def COINVENTOR_PAIRS(path: str = COINVENTOR_GRAPH_DIR):
+    return f"read_parquet('{os.path.join(path, 'pairs', '*.parquet')}')"
+
 # ── CPC Section Names ─────────────────────────────────────────────────────────
 CPC_SECTION_NAMES = {
     "A": "Human Necessities",
@@ -84,13 +309,50 @@ def ensure_dir(path: str) -> None:
     os.makedirs(os.path.dirname(path) if "." in os.path.basename(path) else path, exist_ok=True)
 
 
-def save_json(data, filepath: str) -> None:
-    """Serialize *data* to compact JSON via orjson and write to *filepath*."""
+def save_json(data, filepath: str, sidecars=None) -> None:
+    """Serialize *data* to compact JSON via orjson and write to *filepath*.
+
+    Lists and dicts are dumped in one go; any other iterable of records (a
+    generator, DataFrame.iter_rows(named=True), Arrow batches) is streamed to
+    disk chunk by chunk (see json_writer). *sidecars* ("gz", "br") adds
+    precompressed copies; default from PATENTWORLD_JSON_SIDECARS.
+
+    An unchanged file is left alone, so its mtime (and every fingerprint built
+    from it) stays stable across re-runs.
+    """
+    if isinstance(data, (list, tuple, dict)):
+        _write_json_bytes(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY), filepath, sidecars)
+        return
+    ensure_dir(filepath)
+    changed, n_records, n_bytes = stream_json(data, filepath, sidecars=sidecars)
+    print(f"  -> {'Saved' if changed else 'Unchanged'} {filepath} "
+          f"({n_bytes / 1024:,.1f} KB, {n_records:,} records streamed)")
+
+
+def _write_json_bytes(body: bytes, filepath: str, sidecars=None) -> None:
     ensure_dir(filepath)
-    with open(filepath, "wb") as f:
-        f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
-    size_kb = os.path.getsize(filepath) / 1024
-    print(f"  -> Saved {filepath} ({size_kb:,.1f} KB)")
+    changed = write_json_bytes(body, filepath, sidecars)
+    size_kb = len(body) / 1024
+    print(f"  -> {'Saved' if changed else 'Unchanged'} {filepath} ({size_kb:,.1f} KB)")
+
+
+def cache_inputs() -> list:
+    """Pipeline artifacts (besides the source zips) that query results may depend on."""
+    return [
+        MASTER_DIR, CITATION_GRAPH_DIR, CITATION_CUBE_DIR, COINVENTOR_GRAPH_DIR, CPC_INCIDENCE_DIR,
+        f"{OUTPUT_DIR}/company/company_name_mapping.json",
+    ]
+
+
+def _output_cache_key(sql: str, filepath: str) -> tuple:
+    """(key, entry metadata) for one query_to_json call."""
+    data = data_digest(DATA_DIR, cache_inputs())
+    rel_path = os.path.relpath(os.path.abspath(filepath), os.path.abspath(OUTPUT_DIR))
+    parts = [normalize_sql(sql), rel_path, data, script_version()]
+    key = hashlib.sha256("\0".join(parts).encode()).hexdigest()
+    meta = {"path": rel_path, "data": data, "script": main_script(),
+            "script_version": script_version(), "script_files": script_files()}
+    return key, meta
 
 
 def _clean_value(v):
@@ -110,20 +372,127 @@ def _clean_value(v):
     return v
 
 
+def sql_round(x: float, digits: int = 0) -> float:
+    """Round like SQL ROUND: half away from zero on x * 10**digits (Python's
+    round() rounds half to even on the exact binary value)."""
+    scale = 10.0 ** digits
+    return math.copysign(math.floor(abs(x) * scale + 0.5), x) / scale
+
+
+def arrow_batches(con, sql: str):
+    """Execute *sql* and return a RecordBatchReader over the result."""
+    res = con.execute(sql)
+    return res.to_arrow_reader() if hasattr(res, "to_arrow_reader") else res.fetch_record_batch()
+
+
 def query_to_json(con, sql: str, filepath: str):
-    """Execute *sql* on DuckDB connection, convert to list[dict], save as JSON."""
+    """Execute *sql* on DuckDB connection, convert to list[dict], save as JSON.
+
+    Memoized by output_cache: when the SQL, output path, source data and script
+    are unchanged, the stored JSON is reused and the query is not run.
+    """
+    cache = OutputCache(JSON_CACHE_DIR)
+    key, meta = _output_cache_key(sql, filepath)
+    body = None if OUTPUT_CACHE_DISABLED else cache.get(key)
+    if body is not None:
+        print(f"  Query cached ({key[:12]})")
+        _write_json_bytes(body, filepath)
+        return orjson.loads(body)
+
     t0 = time.time()
-    result = con.execute(sql).fetchdf()
+    records = []
+    for batch in float_nullable_ints(arrow_batches(con, sql).read_all()).to_batches():
+        records += arrow_records(batch)
     elapsed = time.time() - t0
-    print(f"  Query completed in {elapsed:.1f}s  ({len(result):,} rows)")
-    records = [
-        {k: _clean_value(v) for k, v in row.items()}
-        for row in result.to_dict(orient="records")
-    ]
-    save_json(records, filepath)
+    print(f"  Query completed in {elapsed:.1f}s  ({len(records):,} rows)")
+    body = orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY)
+    _write_json_bytes(body, filepath)
+    cache.put(key, body, meta)
     return records
 
 
+def query_to_json_split(con, sql: str, key: str, filepaths: dict) -> dict:
+    """query_to_json() for one query feeding several outputs: the rows whose
+    *key* column equals k (the column itself dropped) go to filepaths[k], in
+    query order; a key without rows gets an empty list.
+
+    Memoized per output file; the query runs unless every output is cached.
+    Returns {k: records}.
+    """
+    cache = OutputCache(JSON_CACHE_DIR)
+    keys = {k: _output_cache_key(sql, path) for k, path in filepaths.items()}
+    bodies = {k: None if OUTPUT_CACHE_DISABLED else cache.get(ck) for k, (ck, _) in keys.items()}
+    if all(body is not None for body in bodies.values()):
+        print(f"  Query cached ({len(bodies)} outputs)")
+        for k, body in bodies.items():
+            _write_json_bytes(body, filepaths[k])
+        return {k: orjson.loads(body) for k, body in bodies.items()}
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    t0 = time.time()
+    table = arrow_batches(con, sql).read_all()
+    keys_col = pa.array(arrow_json_column(table.column(key)))
+    unknown = set(pc.unique(keys_col).to_pylist()) - set(filepaths)
+    if unknown:
+        raise KeyError(f"{key} values without an output file: {sorted(map(str, unknown))}")
+    out = {}
+    for k in filepaths:
+        # Per output, like one query_to_json() call each
+        part = float_nullable_ints(table.filter(pc.equal(keys_col, k)).drop_columns([key]))
+        out[k] = [rec for batch in part.to_batches() for rec in arrow_records(batch)]
+    n_rows = table.num_rows
+    print(f"  Query completed in {time.time()-t0:.1f}s  ({n_rows:,} rows, {len(out)} outputs)")
+    for k, records in out.items():
+        body = orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY)
+        _write_json_bytes(body, filepaths[k])
+        cache.put(keys[k][0], body, keys[k][1])
+    return out
+
+
+def query_to_json_stream(con, sql: str, filepath: str, sidecars=None) -> int:
+    """query_to_json() for large results the caller does not need back: Arrow
+    batches are serialized straight to *filepath*, never held as one list.
+    Returns the number of rows written (None on a cache hit)."""
+    cache = OutputCache(JSON_CACHE_DIR)
+    key, meta = _output_cache_key(sql, filepath)
+    obj = None if OUTPUT_CACHE_DISABLED else cache.lookup(key)
+    ensure_dir(filepath)
+    if obj is not None:
+        print(f"  Query cached ({key[:12]})")
+        changed = copy_json(obj, filepath, sidecars)
+        size_kb = os.path.getsize(filepath) / 1024
+        print(f"  -> {'Saved' if changed else 'Unchanged'} {filepath} ({size_kb:,.1f} KB)")
+        return None
+
+    import pyarrow as pa
+    t0 = time.time()
+    # The result is materialized once (DuckDB spills it to disk if need be) so
+    # the integer columns holding a NULL anywhere are known before the first
+    # batch is written; those are cast to DOUBLE, as float_nullable_ints() does
+    # for the other query_to_json variants.
+    con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _json_stream AS {sql}")
+    try:
+        schema = arrow_batches(con, "SELECT * FROM _json_stream LIMIT 0").schema
+        cols = {f.name: '"' + f.name.replace('"', '""') + '"' for f in schema}
+        ints = [f.name for f in schema if pa.types.is_integer(f.type)]
+        nulls = con.execute(
+            f"SELECT {', '.join(f'COUNT(*) - COUNT({cols[c]})' for c in ints)} FROM _json_stream"
+        ).fetchone() if ints else ()
+        for c, n_null in zip(ints, nulls):
+            if n_null:
+                cols[c] = f"CAST({cols[c]} AS DOUBLE) AS {cols[c]}"
+        changed, n_records, n_bytes = stream_json(
+            arrow_batches(con, f"SELECT {', '.join(cols.values())} FROM _json_stream"),
+            filepath, sidecars=sidecars)
+    finally:
+        con.execute("DROP TABLE IF EXISTS _json_stream")
+    print(f"  Query completed in {time.time()-t0:.1f}s  ({n_records:,} rows)")
+    print(f"  -> {'Saved' if changed else 'Unchanged'} {filepath} ({n_bytes / 1024:,.1f} KB)")
+    cache.put_file(key, filepath, meta)
+    return n_records
+
+
 def timed_msg(label: str):
     """Print a section header."""
     print(f"\n{'─'*60}")
@@ -0,0 +1,99 @@
+"""
+PatentWorld Data Pipeline - Sparse co-occurrence engine
+
+Co-classification counts come from sparse products on an incidence matrix
+instead of SQL self-joins of CPC rows per patent, which grow quadratically in
+the number of codes a patent carries. For a patent x code incidence matrix X
+(cpc_incidence levels, or mask_incidence() of the master's domain_mask) and the
+rows X_b of a bucket b (a grant year, an era, any patent subset):
+
+  C_b = X_b.T @ X_b    C_b[i, j] = patents carrying both i and j,
+                       C_b[i, i] = patents carrying i
+
+co_occurrence() computes C_b for every bucket at once, spread over a thread
+pool (scipy's sparse products release the GIL). With row weights w it is
+X_b.T @ diag(w_b) @ X_b, so pre-aggregated rows (e.g. GROUP BY domain_mask
+with a count) stand for that many patents. The pair statistics are then
+elementwise on the stored pairs of C_b:
+
+  lift()       C[i, j] * n / (C[i, i] * C[j, j]), observed over the count
+               expected if i and j were independent among n patents
+  jaccard()    C[i, j] / (C[i, i] + C[j, j] - C[i, j])
+  pairs()      (i, j, count) of the co-occurring pairs i < j
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+WORKERS = min(8, os.cpu_count() or 1)
+
+
+def mask_incidence(masks: np.ndarray, n_bits: int):
+    """CSR uint8[len(masks), n_bits] incidence of bitmasks (e.g. domain_mask):
+    column i is set where bit i is."""
+    import scipy.sparse as sp
+    masks = np.asarray(masks, dtype=np.int64)
+    rows = [np.flatnonzero((masks >> bit) & 1) for bit in range(n_bits)]
+    cols = np.repeat(np.arange(n_bits), [len(r) for r in rows])
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    return sp.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, cols)),
+                         shape=(len(masks), n_bits))
+
+
+def co_occurrence(x, buckets: dict, workers: int = WORKERS, weights: np.ndarray = None) -> dict:
+    """{bucket: CSR int64[codes, codes]} = X_b.T @ X_b for *buckets*
+    {name: bool[n] mask or row indices into *x*}; buckets may overlap.
+    *weights* (int[n]) counts each row that many times."""
+    import scipy.sparse as sp
+    x = x.tocsr()
+
+    def product(rows):
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else rows
+        xb = x[rows].astype(np.int64)
+        if weights is None:
+            return (xb.T @ xb).tocsr()
+        w = sp.diags(np.asarray(weights, dtype=np.int64)[rows], dtype=np.int64)
+        return (xb.T @ w @ xb).tocsr()
+
+    if workers <= 1 or len(buckets) <= 1:
+        return {name: product(rows) for name, rows in buckets.items()}
+    with ThreadPoolExecutor(min(workers, len(buckets))) as pool:
+        return dict(zip(buckets, pool.map(product, buckets.values())))
+
+
+def lift(co, n: int):
+    """CSR float64 lift of every stored pair of *co* among *n* patents."""
+    co = co.tocoo()
+    diag = co.tocsr().diagonal().astype(np.float64)
+    expected = diag[co.row] * diag[co.col] / n if n else np.zeros(len(co.data))
+    out = np.divide(co.data, expected, out=np.zeros(len(co.data)), where=expected > 0)
+    return _like(co, out)
+
+
+def jaccard(co):
+    """CSR float64 Jaccard similarity of every stored pair of *co*."""
+    co = co.tocoo()
+    diag = co.tocsr().diagonal().astype(np.float64)
+    union = diag[co.row] + diag[co.col] - co.data
+    out = np.divide(co.data, union, out=np.zeros(len(co.data)), where=union > 0)
+    return _like(co, out)
+
+
+def pairs(co, among=None) -> tuple:
+    """(a, b, count) of the pairs a < b with count > 0 in *co*, in (a, b)
+    order, optionally only among the code indices *among*."""
+    co = co.tocoo()
+    keep = (co.row < co.col) & (co.data > 0)
+    if among is not None:
+        member = np.zeros(co.shape[0], dtype=bool)
+        member[list(among)] = True
+        keep &= member[co.row] & member[co.col]
+    a, b, cnt = co.row[keep], co.col[keep], co.data[keep]
+    order = np.lexsort((b, a))
+    return a[order], b[order], cnt[order]
+
+
+def _like(coo, data: np.ndarray):
+    import scipy.sparse as sp
+    return sp.csr_matrix((data, (coo.row, coo.col)), shape=coo.shape)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+PatentWorld Data Pipeline - Patent x CPC incidence matrices
+
+Builds the patent_key x CPC subclass incidence matrix once from g_cpc_current
+as a scipy CSR matrix (1 where the patent carries at least one code in the
+subclass), with class and section roll-ups. Scope, section counts, portfolio
+vectors and co-classification counts then become row sums, sparse slices and
+sparse products instead of another DISTINCT / self-join over g_cpc_current:
+
+  X[rows]                      patents of a cohort (e.g. grant-year window)
+  G @ X       (group_counts)   patents per group (assignee x period) and code
+  X_w.T @ X_w (co_occurrence)  patents carrying both codes, per time window
+                               (cooccurrence.py: lift, Jaccard, pairs)
+
+Layout (n = patent keys in patent_ids):
+  subclass.npz / class.npz / section.npz
+                     CSR uint8[n, codes of the level], sorted indices
+  labels.json        code labels per level, sorted ("A01B", "A01", "A")
+  grant_year.npy     int16[n] grant year of utility patents 1976-2025
+                     (patent_year), -1 for every other patent key
+  incidence.key      warehouse source fingerprints the matrices were built from
+
+Usage:  python cpc_incidence.py [--force]
+Output: /tmp/patentview/cpc_incidence/
+"""
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import orjson
+
+import cooccurrence
+from config import (
+    CPC_CURRENT_TSV, CPC_INCIDENCE_DIR, PATENT_IDS, PATENT_YEAR,
+    arrow_batches, get_connection, require_warehouse, timed_msg, warehouse_sources,
+)
+
+INCIDENCE_VERSION = 1
+# level -> label length; coarser levels are roll-ups of the subclass matrix
+LEVELS = {"subclass": 4, "class": 3, "section": 1}
+
+
+# ── Incidence ────────────────────────────────────────────────────────────────
+class CpcIncidence:
+    """Patent x CPC code incidence matrices, loaded per level on first use."""
+
+    def __init__(self, path: str = CPC_INCIDENCE_DIR):
+        self.path = path
+        with open(os.path.join(path, "labels.json"), "rb") as f:
+            self.labels = orjson.loads(f.read())
+        self.grant_year = np.load(os.path.join(path, "grant_year.npy"))
+        self.n = len(self.grant_year)
+        self._matrices = {}
+
+    def matrix(self, level: str = "subclass"):
+        """CSR uint8[n, len(labels[level])] incidence of *level*."""
+        import scipy.sparse as sp
+        if level not in self._matrices:
+            self._matrices[level] = sp.load_npz(os.path.join(self.path, f"{level}.npz")).tocsr()
+        return self._matrices[level]
+
+    def index(self, level: str, codes) -> np.ndarray:
+        """Column of each code label of *level* (ValueError if unknown)."""
+        labels = self.labels[level]
+        cols = np.searchsorted(labels, codes)
+        for code, col in zip(codes, cols):
+            if col >= len(labels) or labels[col] != code:
+                raise ValueError(f"Unknown CPC {level}: {code!r}")
+        return cols
+
+    def scope(self, level: str = "subclass") -> np.ndarray:
+        """int32[n] distinct codes of *level* per patent."""
+        return np.diff(self.matrix(level).indptr).astype(np.int32)
+
+    def has_any(self, level: str, codes) -> np.ndarray:
+        """bool[n] patents carrying any of *codes* of *level* (codes absent
+        from the warehouse match nothing)."""
+        labels = self.labels[level]
+        cols = [i for i in np.searchsorted(labels, codes) if i < len(labels) and labels[i] in codes]
+        return np.diff(self.matrix(level)[:, cols].tocsr().indptr) > 0
+
+    def years(self, first: int = 1976, last: int = 2025) -> np.ndarray:
+        """bool[n] utility patents granted in [first, last]."""
+        return (self.grant_year >= first) & (self.grant_year <= last)
+
+    def group_counts(self, level: str, groups: np.ndarray, n_groups: int):
+        """CSR int64[n_groups, codes]: patents of each group carrying each code,
+        G @ X with G the group indicator of *groups* (int[n] group of each
+        patent_key, -1 = none)."""
+        import scipy.sparse as sp
+        rows = np.flatnonzero(groups >= 0)
+        member = sp.csr_matrix((np.ones(len(rows), dtype=np.int64), (groups[rows], rows)),
+                               shape=(n_groups, self.n))
+        return (member @ self.matrix(level)).tocsr()
+
+    def co_occurrence(self, level: str, windows: dict, mask: np.ndarray = None,
+                      columns=None, workers: int = cooccurrence.WORKERS) -> dict:
+        """{window: CSR int64[codes, codes]} for *windows* {name: (first, last)}
+        grant-year ranges: X_w.T @ X_w over the window's patents (and *mask*),
+        i.e. patents carrying both codes; the diagonal counts each code. With
+        *columns*, only those codes of *level* (indices into labels) count.
+        Windows are computed in parallel (cooccurrence.py)."""
+        x = self.matrix(level)
+        if columns is not None:
+            x = x[:, columns]
+        buckets = {name: self.years(first, last) if mask is None else self.years(first, last) & mask
+                   for name, (first, last) in windows.items()}
+        return cooccurrence.co_occurrence(x, buckets, workers)
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+def incidence_key() -> dict:
+    return {"version": INCIDENCE_VERSION, "sources": warehouse_sources()}
+
+
+def is_fresh(path: str = CPC_INCIDENCE_DIR) -> bool:
+    try:
+        with open(os.path.join(path, "incidence.key"), "rb") as f:
+            return orjson.loads(f.read()) == incidence_key()
+    except (OSError, orjson.JSONDecodeError):
+        return False
+
+
+def _rollup(x, labels: list, length: int) -> tuple:
+    """(CSR uint8 incidence, labels) of the *length*-character prefixes of
+    *labels*: a patent has a coarse code if it has any code under it."""
+    import scipy.sparse as sp
+    coarse, parent = np.unique([label[:length] for label in labels], return_inverse=True)
+    up = sp.csr_matrix((np.ones(len(labels), dtype=np.int32), (np.arange(len(labels)), parent)),
+                       shape=(len(labels), len(coarse)))
+    out = (x.astype(np.int32) @ up).tocsr()
+    out.data = np.ones(len(out.data), dtype=np.uint8)
+    out.sort_indices()
+    return out, coarse.tolist()
+
+
+def build(path: str = CPC_INCIDENCE_DIR) -> None:
+    """(Re)build the incidence matrices at *path* from the warehouse."""
+    import pyarrow as pa
+    import scipy.sparse as sp
+    require_warehouse()
+    con = get_connection()
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    timed_msg("CPC incidence: grant years")
+    n = con.execute(f"SELECT COUNT(*) FROM {PATENT_IDS()}").fetchone()[0]
+    res = con.execute(f"""
+        SELECT patent_key, grant_year FROM {PATENT_YEAR()} WHERE patent_key IS NOT NULL
+    """).fetchnumpy()
+    grant_year = np.full(n, -1, dtype=np.int16)
+    grant_year[res["patent_key"]] = res["grant_year"]
+    np.save(os.path.join(tmp_path, "grant_year.npy"), grant_year)
+
+    timed_msg("CPC incidence: patent x subclass")
+    t0 = time.time()
+    labels = [r[0] for r in con.execute(f"""
+        SELECT DISTINCT cpc_subclass FROM {CPC_CURRENT_TSV()}
+        WHERE cpc_subclass IS NOT NULL ORDER BY cpc_subclass
+    """).fetchall()]
+    con.register("subclass_codes", pa.table({
+        "cpc_subclass": pa.array(labels, pa.string()),
+        "code": np.arange(len(labels), dtype=np.int32),
+    }))
+    counts = np.zeros(n, dtype=np.int64)
+    indices = []
+    for batch in arrow_batches(con, f"""
+        SELECT DISTINCT c.patent_key AS r, s.code
+        FROM {CPC_CURRENT_TSV()} c
+        JOIN subclass_codes s ON c.cpc_subclass = s.cpc_subclass
+        WHERE c.patent_key IS NOT NULL
+        ORDER BY r, s.code
+    """):
+        r = batch.column("r").to_numpy()
+        if not len(r):
+            continue
+        indices.append(batch.column("code").to_numpy())
+        counts[r[0]:r[-1] + 1] += np.bincount(r - r[0])
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+    x = sp.csr_matrix((np.ones(len(indices), dtype=np.uint8), indices,
+                       np.concatenate([[0], np.cumsum(counts)])), shape=(n, len(labels)))
+    con.close()
+    print(f"  {x.nnz:,} patent-subclass pairs, {len(labels):,} subclasses in {time.time()-t0:.1f}s")
+
+    timed_msg("CPC incidence: class / section roll-ups")
+    all_labels = {"subclass": labels}
+    sp.save_npz(os.path.join(tmp_path, "subclass.npz"), x, compressed=False)
+    for level, length in LEVELS.items():
+        if level == "subclass":
+            continue
+        rolled, all_labels[level] = _rollup(x, labels, length)
+        sp.save_npz(os.path.join(tmp_path, f"{level}.npz"), rolled, compressed=False)
+        print(f"  {level}: {rolled.nnz:,} pairs, {len(all_labels[level])} codes")
+    with open(os.path.join(tmp_path, "labels.json"), "wb") as f:
+        f.write(orjson.dumps(all_labels))
+
+    with open(os.path.join(tmp_path, "incidence.key"), "wb") as f:
+        f.write(orjson.dumps(incidence_key()))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    size_mb = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1024 * 1024)
+    print(f"\n  Wrote {path} ({size_mb:,.0f} MB)")
+
+
+def load(path: str = CPC_INCIDENCE_DIR, rebuild: bool = False) -> CpcIncidence:
+    """Open the incidence matrices, building them first if missing or stale."""
+    if rebuild or not is_fresh(path):
+        build(path)
+    return CpcIncidence(path)
+
+
+if __name__ == "__main__":
+    if "--force" not in sys.argv and is_fresh():
+        print(f"CPC incidence {CPC_INCIDENCE_DIR} is up to date (use --force to rebuild)")
+        sys.exit(0)
+    t0 = time.time()
+    build()
+    print(f"\n=== cpc_incidence complete in {time.time()-t0:.1f}s ===\n")
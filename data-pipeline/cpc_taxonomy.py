@@ -0,0 +1,222 @@
+"""
+PatentWorld Data Pipeline - CPC symbol taxonomy and prefix matcher
+
+parse() splits CPC symbols ("G06N3/08", "Y02E10/50", "G06V") into integer
+section / class / subclass / main group / subgroup codes, vectorized with
+pyarrow.compute, and encode() packs them into one int64 key per symbol whose
+order is the CPC hierarchy: every rule prefix - a section ("Y"), class
+("Y02"), subclass ("G06N"), main group ("G05D1") or main group plus leading
+subgroup digits ("A61B5/02") - covers one contiguous key range.
+
+PrefixMatcher compiles an ordered set of {category: prefixes} rules into the
+disjoint key intervals those ranges cut the hierarchy into, each carrying the
+category that wins there, so classifying a symbol is one binary search:
+  - "first" mode: the first category whose prefixes cover the symbol, like a
+    SQL CASE of LIKE branches (ids(), labels())
+  - "all" mode: a bitmask with bit i set for every category i that covers it,
+    like the OR of several LIKE filters (masks())
+register() exposes a matcher to DuckDB as a vectorized scalar UDF on CPC
+symbols, and code_table() applies it to the distinct codes of a CPC table
+once, for the usual pattern of joining CPC rows to a small lookup table. A CPC
+row is classified by its cpc_code(): the cpc_group, or the cpc_subclass where
+the group is NULL or empty, so subclass rules match those rows too.
+
+Matching follows the hierarchy: a main group prefix matches that main group
+only (G05D1 covers G05D1/xx but not G05D16/xx), while subgroup digits are
+leading digits (G06F21/3 covers G06F21/30 .. G06F21/39xx). A subclass prefix
+is equivalent to cpc_subclass = 'X'.
+"""
+import re
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SECTIONS = "ABCDEFGHY"
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SUBGROUP_DIGITS = 6
+
+# Key = ((((section * 100 + class) * 26 + subclass) * 10^4 + group) * 10^6
+#        + subgroup digits, left-aligned); span of each level below
+_GROUP_SPAN = 10 ** SUBGROUP_DIGITS
+_SUBCLASS_SPAN = 10_000 * _GROUP_SPAN
+_CLASS_SPAN = len(LETTERS) * _SUBCLASS_SPAN
+_SECTION_SPAN = 100 * _CLASS_SPAN
+
+_SYMBOL = (r"^(?P<section>[A-HY])(?P<cls>\d{2})(?P<subclass>[A-Z])"
+           r"(?P<group>\d{0,4})(?:/(?P<subgroup>\d{1,6}))?$")
+_PREFIX = re.compile(r"^([A-HY])(?:(\d{2})(?:([A-Z])(?:(\d{1,4})(?:/(\d{0,6}))?)?)?)?$")
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+def _as_arrow(symbols):
+    if isinstance(symbols, (pa.Array, pa.ChunkedArray)):
+        return symbols
+    return pa.array(symbols, pa.string())
+
+
+def _code(field, values: str = None, pad: int = 0) -> np.ndarray:
+    """int64 code of one extracted field: its position in *values*, or its
+    digits (right-padded with zeros to *pad* characters) as an integer."""
+    if values is not None:
+        codes = pc.index_in(field, value_set=pa.array(list(values)))
+    else:
+        if pad:
+            field = pc.utf8_rpad(field, width=pad, padding="0")
+        codes = pc.cast(pc.if_else(pc.equal(field, ""), "0", field), pa.int64())
+    return pc.fill_null(codes, 0).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def parse(symbols) -> dict:
+    """Integer codes of CPC *symbols* (any array-like of str / None; spaces are
+    ignored): section (index in SECTIONS), class, subclass (letter index),
+    group (main group), subgroup (first 6 digits, left-aligned: "08" -> 80000)
+    and valid (False for NULL or malformed symbols, whose codes are 0)."""
+    arr = pc.replace_substring(_as_arrow(symbols), " ", "")
+    parts = pc.extract_regex(arr, _SYMBOL)
+    return {
+        "section": _code(pc.struct_field(parts, "section"), SECTIONS),
+        "class": _code(pc.struct_field(parts, "cls")),
+        "subclass": _code(pc.struct_field(parts, "subclass"), LETTERS),
+        "group": _code(pc.struct_field(parts, "group")),
+        "subgroup": _code(pc.struct_field(parts, "subgroup"), pad=SUBGROUP_DIGITS),
+        "valid": pc.fill_null(pc.is_valid(parts), False).to_numpy(zero_copy_only=False),
+    }
+
+
+def encode(codes: dict) -> np.ndarray:
+    """int64 hierarchy key of each parsed symbol (-1 where not valid)."""
+    key = (((codes["section"] * 100 + codes["class"]) * len(LETTERS) + codes["subclass"])
+           * 10_000 + codes["group"]) * _GROUP_SPAN + codes["subgroup"]
+    return np.where(codes["valid"], key, -1)
+
+
+def keys(symbols) -> np.ndarray:
+    """encode(parse(symbols))."""
+    return encode(parse(symbols))
+
+
+def prefix_range(prefix: str) -> tuple:
+    """[lo, hi) key range of the symbols starting with the CPC rule *prefix*."""
+    m = _PREFIX.match(prefix.replace(" ", ""))
+    if not m:
+        raise ValueError(f"Not a CPC prefix: {prefix!r}")
+    section, cls, subclass, group, subgroup = m.groups()
+    lo = SECTIONS.index(section) * _SECTION_SPAN
+    span = _SECTION_SPAN
+    if cls is not None:
+        lo, span = lo + int(cls) * _CLASS_SPAN, _CLASS_SPAN
+    if subclass is not None:
+        lo, span = lo + LETTERS.index(subclass) * _SUBCLASS_SPAN, _SUBCLASS_SPAN
+    if group is not None:
+        lo, span = lo + int(group) * _GROUP_SPAN, _GROUP_SPAN
+    if subgroup:
+        lo += int(subgroup.ljust(SUBGROUP_DIGITS, "0"))
+        span = 10 ** (SUBGROUP_DIGITS - len(subgroup))
+    return lo, lo + span
+
+
+def cpc_code(alias: str = None) -> str:
+    """SQL expression of the code a CPC row is classified by: its cpc_group,
+    or its cpc_subclass where the group is NULL or empty."""
+    p = f"{alias}." if alias else ""
+    return f"COALESCE(NULLIF({p}cpc_group, ''), {p}cpc_subclass)"
+
+
+# ── Matcher ──────────────────────────────────────────────────────────────────
+class PrefixMatcher:
+    """Ordered CPC prefix rules {category: prefix or tuple of prefixes},
+    compiled to sorted interval bounds with the value of each interval.
+
+    mode="first": value = index of the first covering category, -1 if none;
+    labels() maps it to the category name, or *default* where none matches.
+    mode="all": value = int64 bitmask of every covering category (bit i for
+    the i-th category), 0 if none.
+    """
+
+    def __init__(self, rules: dict, default: str = None, mode: str = "first"):
+        if mode not in ("first", "all"):
+            raise ValueError(f"Unknown mode: {mode!r}")
+        self.rules = {c: (p,) if isinstance(p, str) else tuple(p) for c, p in rules.items()}
+        self.categories = list(self.rules)
+        self.default = default
+        self.mode = mode
+        ranges = [(*prefix_range(p), i)
+                  for i, prefixes in enumerate(self.rules.values()) for p in prefixes]
+        lo, hi, cat = (np.array(x, dtype=np.int64) for x in zip(*ranges)) if ranges else \
+            (np.zeros(0, dtype=np.int64),) * 3
+        bounds = np.unique(np.concatenate([lo, hi]))
+        starts = bounds[:-1, None]
+        cover = (lo <= starts) & (starts < hi)  # elementary interval x rule
+        if mode == "first":
+            first = np.where(cover, cat, len(self.categories)).min(axis=1, initial=len(self.categories))
+            values = np.where(first < len(self.categories), first, -1)
+        else:
+            values = np.bitwise_or.reduce(np.where(cover, np.int64(1) << cat, 0), axis=1)
+        # values padded with "none" on both sides: a key below the first bound
+        # (or a -1 key) lands on index 0, one past the last bound on the end
+        self.bounds = bounds
+        self.values = np.concatenate([[self._none], values, [self._none]]).astype(np.int64)
+
+    @property
+    def _none(self) -> int:
+        return -1 if self.mode == "first" else 0
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Value of each hierarchy key (see encode(); -1 keys match nothing)."""
+        i = np.searchsorted(self.bounds, keys, side="right")
+        return np.where(keys >= 0, self.values[i], self._none)
+
+    def ids(self, symbols) -> np.ndarray:
+        """int32 category index of each symbol ("first" mode), -1 if none."""
+        return self.lookup(keys(symbols)).astype(np.int32)
+
+    def masks(self, symbols) -> np.ndarray:
+        """int64 category bitmask of each symbol ("all" mode)."""
+        return self.lookup(keys(symbols))
+
+    def labels(self, symbols) -> list:
+        """Category name of each symbol ("first" mode), *default* if none."""
+        names = self.categories + [self.default]
+        return [names[i] for i in self._indices(symbols)]
+
+    def _indices(self, symbols) -> np.ndarray:
+        """ids() with "no match" as len(categories), the index of *default*."""
+        ids = self.ids(symbols)
+        return np.where(ids >= 0, ids, len(self.categories))
+
+    def _arrow(self, symbols):
+        """Arrow result of the UDF: category names ("first") or masks ("all")."""
+        if self.mode == "all":
+            return pa.array(self.masks(symbols), pa.int64())
+        names = pa.array(self.categories + [self.default], pa.string())
+        return names.take(pa.array(self._indices(symbols)))
+
+    def register(self, con, name: str) -> None:
+        """Register *name*(VARCHAR) as a DuckDB UDF evaluating the matcher on
+        CPC symbols: the category name (VARCHAR, *default* or NULL if none) in
+        "first" mode, the bitmask (BIGINT) in "all" mode."""
+        con.create_function(name, self._arrow, ["VARCHAR"],
+                            "BIGINT" if self.mode == "all" else "VARCHAR",
+                            type="arrow", null_handling="special")
+
+    def code_table(self, con, cpc_table: str, as_col: str = "category"):
+        """Arrow table (cpc_code, *as_col*) of the distinct codes (cpc_code())
+        of *cpc_table* matching at least one rule, with their category name
+        ("first" mode) or bitmask ("all" mode); join CPC rows to it on
+        cpc_code()."""
+        codes = con.execute(f"""
+            SELECT DISTINCT {cpc_code()} AS cpc_code FROM {cpc_table}
+            WHERE {cpc_code()} IS NOT NULL
+        """).fetchnumpy()["cpc_code"]
+        codes = pa.array(codes, pa.string())
+        value = self.lookup(keys(codes))
+        hit = value >= 0 if self.mode == "first" else value != 0
+        result = pa.array(np.array(self.categories, dtype=object)[value[hit]], pa.string()) \
+            if self.mode == "first" else pa.array(value[hit], pa.int64())
+        return pa.table({"cpc_code": codes.filter(pa.array(hit)), as_col: result})
+
+    def key(self) -> dict:
+        """JSON-serializable fingerprint of the rules."""
+        return {"mode": self.mode, "default": self.default,
+                "rules": {c: sorted(p) for c, p in self.rules.items()}}
@@ -1,23 +1,59 @@
 #!/usr/bin/env python3
 """
 Shared utility for deep-dive domain pipeline scripts.
-Each domain script defines its CPC filter and subfield mapping,
-then calls run_domain_pipeline() to generate all standard analyses.
+Each domain script names its domain (registered with its CPC rules in
+domains.py) and defines its subfield rules (a cpc_taxonomy.PrefixMatcher) in a
+DOMAIN dict of
+run_domain_pipeline() arguments, then calls run_domain_pipeline() to generate
+all standard analyses. Domain patents are read from the patent master's
+domain_mask column rather than re-derived from g_cpc_current.
+
+run_domain_batch() runs the analyses for any number of domains at once: each
+analysis is one query over all of them, grouped by domain id (the domain's
+position in the batch), whose rows are split into the same per-domain JSON
+files. Raw tables are scanned once per batch rather than once per domain, so
+all domain scripts together cost little more than one; run_domain_pipeline()
+is a batch of one.
+
+Usage:  python domain_utils.py [SCRIPT ...]   (default: every DOMAIN_SCRIPTS entry)
+Output: the per-domain JSON files of each script's data_dir
 """
-import duckdb
+import importlib
+import sys
+
+import numpy as np
+import pyarrow as pa
+
 from config import (
-    PATENT_TSV, CPC_CURRENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV,
-    LOCATION_TSV, CITATION_TSV, ASSIGNEE_TYPE_MAP,
-    OUTPUT_DIR, query_to_json, timed_msg,
+    CPC_CURRENT_TSV, ASSIGNEE_TSV, INVENTOR_TSV, LOCATION_TSV,
+    PATENT_YEAR, PATENT_MASTER, OUTPUT_DIR, query_to_json_split, save_json,
+    timed_msg, get_connection,
 )
+from domains import code_masks, cpc_code, domain_bit
+from cpc_taxonomy import PrefixMatcher
+
+# Scripts defining a DOMAIN dict of run_domain_pipeline() arguments
+DOMAIN_SCRIPTS = [
+    "47_semiconductors", "48_quantum_computing", "49_biotechnology",
+    "50_autonomous_vehicles", "51_space_technology", "52_cybersecurity",
+    "53_agricultural_technology", "54_digital_health", "55_3d_printing",
+    "56_blockchain", "57_green_supplement",
+]
+
+SPEC_DEFAULTS = {
+    "exclude_sections": "'Y'",
+    "start_year": 1976,
+    "org_start_year": 2000,
+    "top_org_limit": 15,
+}
 
 
 def run_domain_pipeline(
     domain_name: str,
     domain_slug: str,
     data_dir: str,
-    cpc_filter_sql: str,
-    subfield_sql: str,
+    domain: str,
+    subfields: PrefixMatcher,
     exclude_sections: str = "'Y'",
     start_year: int = 1976,
     org_start_year: int = 2000,
@@ -31,371 +67,399 @@ def run_domain_pipeline(
     domain_name : str  — Human-readable domain name (e.g., "Semiconductor")
     domain_slug : str  — File prefix (e.g., "semi")
     data_dir : str     — Output subdirectory under public/data/ (e.g., "semiconductors")
-    cpc_filter_sql : str — SQL WHERE clause fragment to identify domain patents
-    subfield_sql : str — SQL CASE expression mapping CPC codes to subfields
+    domain : str       — Domain name in domains.DOMAINS (e.g., "Semiconductor")
+    subfields : PrefixMatcher — first-match CPC rules mapping codes to subfields,
+                 with the subfield of unmatched domain codes as its default
     exclude_sections : str — CPC sections to exclude from diffusion analysis (comma-separated, quoted)
     start_year : int   — Analysis start year (default 1976)
     org_start_year : int — Start year for org ranking analysis (default 2000)
     top_org_limit : int — Number of orgs in rankings (default 15)
     """
-    OUT = f"{OUTPUT_DIR}/{data_dir}"
-    con = duckdb.connect()
-    slug = domain_slug
+    run_domain_batch([dict(
+        domain_name=domain_name, domain_slug=domain_slug, data_dir=data_dir,
+        domain=domain, subfields=subfields, exclude_sections=exclude_sections,
+        start_year=start_year, org_start_year=org_start_year, top_org_limit=top_org_limit,
+    )])
+
+
+def load_domains(scripts=DOMAIN_SCRIPTS) -> list:
+    """The DOMAIN dicts of the given domain scripts (imported, not run)."""
+    return [importlib.import_module(script).DOMAIN for script in scripts]
+
+
+def _median(values: np.ndarray, counts: np.ndarray) -> float:
+    """PERCENTILE_CONT(0.5) of *values* (sorted) repeated *counts* times."""
+    cum = np.cumsum(counts)
+    pos = 0.5 * (cum[-1] - 1)
+    lo, hi = values[np.searchsorted(cum, [np.floor(pos), np.ceil(pos)], side="right")]
+    return float(lo + (pos - np.floor(pos)) * (hi - lo))
+
+
+def run_domain_batch(specs: list) -> None:
+    """Run the standard deep-dive analyses for every domain in *specs* (dicts of
+    run_domain_pipeline() arguments; omitted optional ones take its defaults).
+    Top-N rankings break count ties by name, so a domain's files do not depend
+    on the batch it ran in."""
+    specs = [{**SPEC_DEFAULTS, **s} for s in specs]
+    label = specs[0]["domain_name"] if len(specs) == 1 else f"{len(specs)} domains"
+    con = get_connection()
+
+    def outputs(suffix: str) -> dict:
+        return {i: f"{OUTPUT_DIR}/{s['data_dir']}/{s['domain_slug']}_{suffix}.json"
+                for i, s in enumerate(specs)}
+
+    def per_domain(template: str) -> str:
+        """CASE over domain_id with one branch per domain, *template* formatted
+        with that domain's spec."""
+        branches = " ".join(f"WHEN {i} THEN ({template.format(**s)})" for i, s in enumerate(specs))
+        return f"CASE domain_id {branches} END"
+
+    # ── Shared tables ───────────────────────────────────────────────────────
+    # Domain patents (utility, 1976-2025) with the master columns the quality
+    # indicators need, and the CPC rows matching each domain's rules, with
+    # their subfield; then the primary assignee and first inventor of every
+    # domain patent, so each raw table is scanned once for the whole batch
+    timed_msg(f"{label}: domain patents")
+    con.register("domain_specs", pa.table({
+        "domain_id": np.arange(len(specs), dtype=np.int32),
+        "bit": np.array([domain_bit(s["domain"]) for s in specs], dtype=np.int32),
+        "start_year": np.array([s["start_year"] for s in specs], dtype=np.int32),
+        "top_org_limit": np.array([s["top_org_limit"] for s in specs], dtype=np.int32),
+    }))
+    # Subfield of every distinct CPC code of each domain, from its matcher
+    codes = code_masks(con, CPC_CURRENT_TSV())
+    code = codes.column("cpc_code").to_numpy(zero_copy_only=False)
+    mask = codes.column("domain_mask").to_numpy()
+    subfields = []
+    for i, s in enumerate(specs):
+        in_domain = code[(mask & domain_bit(s["domain"])) != 0]
+        subfields.append(pa.table({
+            "domain_id": np.full(len(in_domain), i, dtype=np.int32),
+            "cpc_code": pa.array(in_domain, pa.string()),
+            "subfield": pa.array(s["subfields"].labels(in_domain), pa.string()),
+        }))
+    con.register("domain_subfields", pa.concat_tables(subfields))
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE domain_patents AS
+        SELECT s.domain_id, s.start_year, m.patent_id, m.grant_year AS year,
+               m.num_claims, m.backward_citations, m.scope, m.team_size
+        FROM {PATENT_MASTER()} m
+        JOIN domain_specs s ON (m.domain_mask & s.bit) <> 0
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE domain_cpc AS
+        SELECT DISTINCT ds.domain_id, cpc.patent_id, ds.subfield
+        FROM {CPC_CURRENT_TSV()} cpc
+        JOIN domain_subfields ds ON {cpc_code('cpc')} = ds.cpc_code
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE domain_assignee AS
+        SELECT patent_id, disambig_assignee_organization AS organization, assignee_type
+        FROM {ASSIGNEE_TSV()}
+        WHERE assignee_sequence = 0
+          AND patent_id IN (SELECT patent_id FROM domain_patents)
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE domain_inventor AS
+        SELECT patent_id, disambig_inventor_name_first, disambig_inventor_name_last, location_id
+        FROM {INVENTOR_TSV()}
+        WHERE inventor_sequence = 0
+          AND patent_id IN (SELECT patent_id FROM domain_patents)
+    """)
+    counts = con.execute("""
+        SELECT COUNT(dp.patent_id)
+        FROM domain_specs s LEFT JOIN domain_patents dp ON s.domain_id = dp.domain_id
+        GROUP BY s.domain_id ORDER BY s.domain_id
+    """).fetchall()
+    for s, (n,) in zip(specs, counts):
+        print(f"  {s['domain_name']}: {n:,} patents")
 
     # ── 1) Annual patent counts + share ─────────────────────────────────────
-    timed_msg(f"{domain_name}: annual patent counts")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT cpc.patent_id
-            FROM {CPC_CURRENT_TSV()} cpc
-            WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT p.patent_id, YEAR(CAST(p.patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()} p
-            WHERE p.patent_type = 'utility'
-              AND p.patent_date IS NOT NULL
-              AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        ),
-        total_by_year AS (
-            SELECT year, COUNT(*) AS total_patents FROM patent_year GROUP BY year
+    timed_msg(f"{label}: annual patent counts")
+    query_to_json_split(con, f"""
+        WITH total_by_year AS (
+            SELECT grant_year AS year, COUNT(*) AS total_patents
+            FROM {PATENT_YEAR()}
+            GROUP BY grant_year
         ),
         domain_by_year AS (
-            SELECT py.year, COUNT(*) AS domain_patents
-            FROM patent_year py
-            JOIN domain_patents dp ON py.patent_id = dp.patent_id
-            GROUP BY py.year
+            SELECT domain_id, year, COUNT(*) AS domain_patents
+            FROM domain_patents
+            GROUP BY domain_id, year
         )
         SELECT
+            s.domain_id,
             t.year,
             t.total_patents,
             COALESCE(d.domain_patents, 0) AS domain_patents,
             ROUND(100.0 * COALESCE(d.domain_patents, 0) / t.total_patents, 3) AS domain_pct
-        FROM total_by_year t
-        LEFT JOIN domain_by_year d ON t.year = d.year
-        ORDER BY t.year
-    """, f"{OUT}/{slug}_per_year.json")
+        FROM domain_specs s
+        JOIN total_by_year t ON t.year BETWEEN s.start_year AND 2025
+        LEFT JOIN domain_by_year d ON s.domain_id = d.domain_id AND t.year = d.year
+        ORDER BY s.domain_id, t.year
+    """, "domain_id", outputs("per_year"))
 
     # ── 2) Sub-category breakdown ───────────────────────────────────────────
-    timed_msg(f"{domain_name}: subfield breakdown")
-    query_to_json(con, f"""
-        WITH classified AS (
-            SELECT DISTINCT cpc.patent_id,
-                   {subfield_sql} AS subfield
-            FROM {CPC_CURRENT_TSV()} cpc
-            WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility'
-              AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        )
-        SELECT py.year, c.subfield, COUNT(DISTINCT c.patent_id) AS count
-        FROM classified c
-        JOIN patent_year py ON c.patent_id = py.patent_id
-        GROUP BY py.year, c.subfield
-        ORDER BY py.year, c.subfield
-    """, f"{OUT}/{slug}_by_subfield.json")
+    timed_msg(f"{label}: subfield breakdown")
+    query_to_json_split(con, """
+        SELECT c.domain_id, dp.year, c.subfield, COUNT(DISTINCT c.patent_id) AS count
+        FROM domain_cpc c
+        JOIN domain_patents dp ON c.domain_id = dp.domain_id AND c.patent_id = dp.patent_id
+        WHERE dp.year >= dp.start_year
+        GROUP BY c.domain_id, dp.year, c.subfield
+        ORDER BY c.domain_id, dp.year, c.subfield
+    """, "domain_id", outputs("by_subfield"))
 
     # ── 3) Top 50 assignees ─────────────────────────────────────────────────
-    timed_msg(f"{domain_name}: top assignees")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility'
-              AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        )
+    timed_msg(f"{label}: top assignees")
+    query_to_json_split(con, """
         SELECT
-            a.disambig_assignee_organization AS organization,
+            dp.domain_id,
+            a.organization,
             COUNT(DISTINCT dp.patent_id) AS domain_patents,
-            MIN(py.year) AS first_year,
-            MAX(py.year) AS last_year
+            MIN(dp.year) AS first_year,
+            MAX(dp.year) AS last_year
         FROM domain_patents dp
-        JOIN {ASSIGNEE_TSV()} a ON dp.patent_id = a.patent_id AND a.assignee_sequence = 0
-        JOIN patent_year py ON dp.patent_id = py.patent_id
-        WHERE a.disambig_assignee_organization IS NOT NULL
-          AND a.disambig_assignee_organization != ''
-        GROUP BY a.disambig_assignee_organization
-        ORDER BY domain_patents DESC
-        LIMIT 50
-    """, f"{OUT}/{slug}_top_assignees.json")
+        JOIN domain_assignee a ON dp.patent_id = a.patent_id
+        WHERE dp.year >= dp.start_year
+          AND a.organization IS NOT NULL
+          AND a.organization != ''
+        GROUP BY dp.domain_id, a.organization
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY dp.domain_id
+            ORDER BY COUNT(DISTINCT dp.patent_id) DESC, a.organization) <= 50
+        ORDER BY dp.domain_id, domain_patents DESC, a.organization
+    """, "domain_id", outputs("top_assignees"))
 
     # ── 4) Org rankings over time ───────────────────────────────────────────
-    timed_msg(f"{domain_name}: org rankings over time")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility'
-              AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN {start_year} AND 2025
+    timed_msg(f"{label}: org rankings over time")
+    query_to_json_split(con, """
+        WITH ranked AS (
+            SELECT dp.domain_id, a.organization,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY dp.domain_id
+                       ORDER BY COUNT(DISTINCT dp.patent_id) DESC, a.organization) AS rank
+            FROM domain_patents dp
+            JOIN domain_assignee a ON dp.patent_id = a.patent_id
+            WHERE a.organization IS NOT NULL
+              AND a.organization != ''
+            GROUP BY dp.domain_id, a.organization
         ),
         top_orgs AS (
-            SELECT a.disambig_assignee_organization AS organization, COUNT(DISTINCT dp.patent_id) AS total
-            FROM domain_patents dp
-            JOIN {ASSIGNEE_TSV()} a ON dp.patent_id = a.patent_id AND a.assignee_sequence = 0
-            WHERE a.disambig_assignee_organization IS NOT NULL
-              AND a.disambig_assignee_organization != ''
-            GROUP BY a.disambig_assignee_organization
-            ORDER BY total DESC
-            LIMIT {top_org_limit}
+            SELECT r.domain_id, r.organization
+            FROM ranked r JOIN domain_specs s ON r.domain_id = s.domain_id
+            WHERE r.rank <= s.top_org_limit
         )
         SELECT
-            py.year,
-            a.disambig_assignee_organization AS organization,
+            dp.domain_id,
+            dp.year,
+            a.organization,
             COUNT(DISTINCT dp.patent_id) AS count
         FROM domain_patents dp
-        JOIN patent_year py ON dp.patent_id = py.patent_id
-        JOIN {ASSIGNEE_TSV()} a ON dp.patent_id = a.patent_id AND a.assignee_sequence = 0
-        WHERE a.disambig_assignee_organization IN (SELECT organization FROM top_orgs)
-        GROUP BY py.year, a.disambig_assignee_organization
-        ORDER BY py.year, a.disambig_assignee_organization
-    """, f"{OUT}/{slug}_org_over_time.json")
+        JOIN domain_assignee a ON dp.patent_id = a.patent_id
+        JOIN top_orgs t ON dp.domain_id = t.domain_id AND a.organization = t.organization
+        WHERE dp.year >= dp.start_year
+        GROUP BY dp.domain_id, dp.year, a.organization
+        ORDER BY dp.domain_id, dp.year, a.organization
+    """, "domain_id", outputs("org_over_time"))
 
     # ── 5) Top 50 inventors ─────────────────────────────────────────────────
-    timed_msg(f"{domain_name}: top inventors")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility'
-              AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        )
+    timed_msg(f"{label}: top inventors")
+    query_to_json_split(con, """
         SELECT
+            dp.domain_id,
             i.disambig_inventor_name_first AS first_name,
             i.disambig_inventor_name_last AS last_name,
             COUNT(DISTINCT dp.patent_id) AS domain_patents,
-            MIN(py.year) AS first_year,
-            MAX(py.year) AS last_year
+            MIN(dp.year) AS first_year,
+            MAX(dp.year) AS last_year
         FROM domain_patents dp
-        JOIN {INVENTOR_TSV()} i ON dp.patent_id = i.patent_id AND i.inventor_sequence = 0
-        JOIN patent_year py ON dp.patent_id = py.patent_id
-        WHERE i.disambig_inventor_name_last IS NOT NULL
+        JOIN domain_inventor i ON dp.patent_id = i.patent_id
+        WHERE dp.year >= dp.start_year
+          AND i.disambig_inventor_name_last IS NOT NULL
           AND i.disambig_inventor_name_last != ''
-        GROUP BY i.disambig_inventor_name_first, i.disambig_inventor_name_last
-        ORDER BY domain_patents DESC
-        LIMIT 50
-    """, f"{OUT}/{slug}_top_inventors.json")
+        GROUP BY dp.domain_id, i.disambig_inventor_name_first, i.disambig_inventor_name_last
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY dp.domain_id
+            ORDER BY COUNT(DISTINCT dp.patent_id) DESC, last_name, first_name) <= 50
+        ORDER BY dp.domain_id, domain_patents DESC, last_name, first_name
+    """, "domain_id", outputs("top_inventors"))
 
     # ── 6) Geography (countries + states) ───────────────────────────────────
-    timed_msg(f"{domain_name}: geography")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility'
-              AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        ),
-        with_location AS (
-            SELECT dp.patent_id, py.year,
+    timed_msg(f"{label}: geography")
+    query_to_json_split(con, f"""
+        WITH with_location AS (
+            SELECT dp.domain_id, dp.patent_id, dp.year,
                    l.disambig_country AS country, l.disambig_state AS state
             FROM domain_patents dp
-            JOIN patent_year py ON dp.patent_id = py.patent_id
-            JOIN {INVENTOR_TSV()} i ON dp.patent_id = i.patent_id AND i.inventor_sequence = 0
+            JOIN domain_inventor i ON dp.patent_id = i.patent_id
             JOIN {LOCATION_TSV()} l ON i.location_id = l.location_id
-            WHERE l.disambig_country IS NOT NULL
+            WHERE dp.year >= dp.start_year
+              AND l.disambig_country IS NOT NULL
         )
-        SELECT country, state,
+        SELECT domain_id, country, state,
                COUNT(DISTINCT patent_id) AS domain_patents,
                MIN(year) AS first_year, MAX(year) AS last_year
         FROM with_location
-        GROUP BY country, state
-        ORDER BY domain_patents DESC
-        LIMIT 100
-    """, f"{OUT}/{slug}_geography.json")
+        GROUP BY domain_id, country, state
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY domain_id ORDER BY COUNT(DISTINCT patent_id) DESC, country, state) <= 100
+        ORDER BY domain_id, domain_patents DESC, country, state
+    """, "domain_id", outputs("geography"))
 
     # ── 7) Quality indicators ───────────────────────────────────────────────
-    timed_msg(f"{domain_name}: quality indicators")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_base AS (
-            SELECT p.patent_id, YEAR(CAST(p.patent_date AS DATE)) AS year, p.num_claims
-            FROM {PATENT_TSV()} p
-            WHERE p.patent_type = 'utility'
-              AND p.patent_date IS NOT NULL
-              AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN {start_year} AND 2025
-        ),
-        domain_base AS (
-            SELECT pb.* FROM patent_base pb JOIN domain_patents dp ON pb.patent_id = dp.patent_id
-        ),
-        backward AS (
-            SELECT c.patent_id, COUNT(*) AS backward_cites
-            FROM {CITATION_TSV()} c
-            JOIN domain_patents dp ON c.patent_id = dp.patent_id
-            GROUP BY c.patent_id
-        ),
-        scope AS (
-            SELECT cpc.patent_id, COUNT(DISTINCT LEFT(cpc.cpc_subclass, 4)) AS patent_scope
-            FROM {CPC_CURRENT_TSV()} cpc
-            JOIN domain_patents dp ON cpc.patent_id = dp.patent_id
-            GROUP BY cpc.patent_id
-        ),
-        team AS (
-            SELECT i.patent_id, COUNT(DISTINCT i.inventor_id) AS num_inventors
-            FROM {INVENTOR_TSV()} i
-            JOIN domain_patents dp ON i.patent_id = dp.patent_id
-            GROUP BY i.patent_id
-        )
+    # Claims, backward citations, scope and team size are master columns
+    timed_msg(f"{label}: quality indicators")
+    query_to_json_split(con, """
         SELECT
-            db.year,
+            domain_id,
+            year,
             COUNT(*) AS patent_count,
-            ROUND(AVG(db.num_claims), 2) AS avg_claims,
-            ROUND(AVG(COALESCE(b.backward_cites, 0)), 2) AS avg_backward_cites,
-            ROUND(AVG(COALESCE(s.patent_scope, 1)), 2) AS avg_scope,
-            ROUND(AVG(COALESCE(t.num_inventors, 1)), 2) AS avg_team_size
-        FROM domain_base db
-        LEFT JOIN backward b ON db.patent_id = b.patent_id
-        LEFT JOIN scope s ON db.patent_id = s.patent_id
-        LEFT JOIN team t ON db.patent_id = t.patent_id
-        GROUP BY db.year
-        ORDER BY db.year
-    """, f"{OUT}/{slug}_quality.json")
+            ROUND(AVG(num_claims), 2) AS avg_claims,
+            ROUND(AVG(backward_citations), 2) AS avg_backward_cites,
+            ROUND(AVG(COALESCE(scope, 1)), 2) AS avg_scope,
+            ROUND(AVG(team_size), 2) AS avg_team_size
+        FROM domain_patents
+        WHERE year >= start_year
+        GROUP BY domain_id, year
+        ORDER BY domain_id, year
+    """, "domain_id", outputs("quality"))
 
     # ── 8) Team size comparison (domain vs non-domain) ──────────────────────
-    timed_msg(f"{domain_name}: team size comparison")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        ),
-        patent_team AS (
-            SELECT
-                p.patent_id,
-                YEAR(CAST(p.patent_date AS DATE)) AS year,
-                COUNT(DISTINCT i.inventor_id) AS team_size,
-                CASE WHEN dp.patent_id IS NOT NULL THEN '{domain_name}' ELSE 'Non-{domain_name}' END AS category
-            FROM {PATENT_TSV()} p
-            JOIN {INVENTOR_TSV()} i ON p.patent_id = i.patent_id
-            LEFT JOIN domain_patents dp ON p.patent_id = dp.patent_id
-            WHERE p.patent_type = 'utility'
-              AND p.patent_date IS NOT NULL
-              AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1990 AND 2025
-            GROUP BY p.patent_id, year, category
+    # One team-size histogram per year over all patents, with one domain
+    # column per batch domain; non-domain = all - domain
+    timed_msg(f"{label}: team size comparison")
+    in_domain = ",\n            ".join(
+        f"COUNT(*) FILTER (WHERE (m.domain_mask & {domain_bit(s['domain'])}) <> 0) AS d{i}"
+        for i, s in enumerate(specs)
+    )
+    hist = con.execute(f"""
+        WITH patent_team AS (
+            SELECT patent_id, COUNT(DISTINCT inventor_id) AS team_size
+            FROM {INVENTOR_TSV()}
+            GROUP BY patent_id
         )
-        SELECT year, category,
-               COUNT(*) AS patent_count,
-               AVG(team_size) AS avg_team_size,
-               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY team_size) AS median_team_size
-        FROM patent_team
-        GROUP BY year, category
-        ORDER BY year, category
-    """, f"{OUT}/{slug}_team_comparison.json")
+        SELECT
+            m.grant_year AS year,
+            t.team_size,
+            COUNT(*) AS n,
+            {in_domain}
+        FROM {PATENT_MASTER()} m
+        JOIN patent_team t ON m.patent_id = t.patent_id
+        WHERE m.grant_year BETWEEN 1990 AND 2025
+        GROUP BY m.grant_year, t.team_size
+        ORDER BY m.grant_year, t.team_size
+    """).fetchnumpy()
+    years = np.unique(hist["year"])
+    for i, (s, path) in enumerate(zip(specs, outputs("team_comparison").values())):
+        rows = []
+        for year in years:
+            sel = hist["year"] == year
+            sizes = hist["team_size"][sel].astype(np.int64)
+            dom = hist[f"d{i}"][sel].astype(np.int64)
+            for category, counts in sorted([(s["domain_name"], dom),
+                                            (f"Non-{s['domain_name']}", hist["n"][sel] - dom)]):
+                if counts.sum() == 0:
+                    continue
+                rows.append({
+                    "year": int(year),
+                    "category": category,
+                    "patent_count": int(counts.sum()),
+                    "avg_team_size": float((sizes * counts).sum() / counts.sum()),
+                    "median_team_size": _median(sizes, counts),
+                })
+        save_json(rows, path)
 
     # ── 9) Assignee type distribution ───────────────────────────────────────
-    timed_msg(f"{domain_name}: assignee type distribution")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
-        )
+    timed_msg(f"{label}: assignee type distribution")
+    query_to_json_split(con, """
         SELECT
-            YEAR(CAST(p.patent_date AS DATE)) AS year,
+            dp.domain_id,
+            dp.year,
             CASE
                 WHEN a.assignee_type IN (2, 3) THEN 'Corporate'
                 WHEN a.assignee_type IN (6, 7) THEN 'Government'
                 WHEN a.assignee_type IN (4, 5) THEN 'Individual'
                 ELSE 'University/Other'
             END AS assignee_category,
-            COUNT(DISTINCT p.patent_id) AS count
+            COUNT(DISTINCT dp.patent_id) AS count
         FROM domain_patents dp
-        JOIN {PATENT_TSV()} p ON dp.patent_id = p.patent_id
-        JOIN {ASSIGNEE_TSV()} a ON p.patent_id = a.patent_id AND a.assignee_sequence = 0
-        WHERE p.patent_type = 'utility'
-          AND p.patent_date IS NOT NULL
-          AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN 1990 AND 2025
-        GROUP BY year, assignee_category
-        ORDER BY year, assignee_category
-    """, f"{OUT}/{slug}_assignee_type.json")
+        JOIN domain_assignee a ON dp.patent_id = a.patent_id
+        WHERE dp.year BETWEEN 1990 AND 2025
+        GROUP BY dp.domain_id, dp.year, assignee_category
+        ORDER BY dp.domain_id, dp.year, assignee_category
+    """, "domain_id", outputs("assignee_type"))
 
     # ── 10) Strategy/portfolio table ────────────────────────────────────────
-    timed_msg(f"{domain_name}: strategy portfolio")
-    query_to_json(con, f"""
+    timed_msg(f"{label}: strategy portfolio")
+    query_to_json_split(con, """
         WITH classified AS (
-            SELECT DISTINCT cpc.patent_id,
-                   {subfield_sql} AS subfield
-            FROM {CPC_CURRENT_TSV()} cpc
-            JOIN {PATENT_TSV()} p ON cpc.patent_id = p.patent_id
-            WHERE {cpc_filter_sql}
-              AND p.patent_type = 'utility'
-              AND p.patent_date IS NOT NULL
-              AND YEAR(CAST(p.patent_date AS DATE)) BETWEEN {start_year} AND 2025
+            SELECT c.domain_id, c.patent_id, c.subfield, a.organization
+            FROM domain_cpc c
+            JOIN domain_patents dp ON c.domain_id = dp.domain_id AND c.patent_id = dp.patent_id
+            JOIN domain_assignee a ON c.patent_id = a.patent_id
+            WHERE dp.year >= dp.start_year
         ),
         top_orgs AS (
-            SELECT a.disambig_assignee_organization AS organization, COUNT(DISTINCT c.patent_id) AS total
-            FROM classified c
-            JOIN {ASSIGNEE_TSV()} a ON c.patent_id = a.patent_id AND a.assignee_sequence = 0
-            WHERE a.disambig_assignee_organization IS NOT NULL
-              AND a.disambig_assignee_organization != ''
-            GROUP BY a.disambig_assignee_organization
-            ORDER BY total DESC
-            LIMIT 20
+            SELECT domain_id, organization
+            FROM classified
+            WHERE organization IS NOT NULL
+              AND organization != ''
+            GROUP BY domain_id, organization
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY domain_id ORDER BY COUNT(DISTINCT patent_id) DESC, organization) <= 20
         )
         SELECT
-            a.disambig_assignee_organization AS organization,
+            c.domain_id,
+            c.organization,
             c.subfield,
             COUNT(DISTINCT c.patent_id) AS patent_count
         FROM classified c
-        JOIN {ASSIGNEE_TSV()} a ON c.patent_id = a.patent_id AND a.assignee_sequence = 0
-        WHERE a.disambig_assignee_organization IN (SELECT organization FROM top_orgs)
-        GROUP BY a.disambig_assignee_organization, c.subfield
-        ORDER BY a.disambig_assignee_organization, patent_count DESC
-    """, f"{OUT}/{slug}_strategies.json")
+        JOIN top_orgs t ON c.domain_id = t.domain_id AND c.organization = t.organization
+        GROUP BY c.domain_id, c.organization, c.subfield
+        ORDER BY c.domain_id, c.organization, patent_count DESC, c.subfield
+    """, "domain_id", outputs("strategies"))
 
     # ── 11) Cross-domain diffusion ──────────────────────────────────────────
-    timed_msg(f"{domain_name}: cross-domain diffusion")
-    query_to_json(con, f"""
-        WITH domain_patents AS (
-            SELECT DISTINCT patent_id FROM {CPC_CURRENT_TSV()} WHERE {cpc_filter_sql}
+    timed_msg(f"{label}: cross-domain diffusion")
+    query_to_json_split(con, f"""
+        WITH recent AS (
+            SELECT domain_id, patent_id, year
+            FROM domain_patents
+            WHERE year BETWEEN 1990 AND 2025
         ),
-        patent_year AS (
-            SELECT patent_id, YEAR(CAST(patent_date AS DATE)) AS year
-            FROM {PATENT_TSV()}
-            WHERE patent_type = 'utility' AND patent_date IS NOT NULL
-              AND YEAR(CAST(patent_date AS DATE)) BETWEEN 1990 AND 2025
+        patent_sections AS (
+            SELECT DISTINCT patent_id, LEFT(cpc_section, 1) AS co_section
+            FROM {CPC_CURRENT_TSV()}
+            WHERE patent_id IN (SELECT patent_id FROM recent)
         ),
         other_sections AS (
-            SELECT DISTINCT dp.patent_id, py.year,
-                   LEFT(cpc.cpc_section, 1) AS co_section
-            FROM domain_patents dp
-            JOIN patent_year py ON dp.patent_id = py.patent_id
-            JOIN {CPC_CURRENT_TSV()} cpc ON dp.patent_id = cpc.patent_id
-            WHERE LEFT(cpc.cpc_section, 1) NOT IN ({exclude_sections})
+            SELECT r.domain_id, r.patent_id, r.year, ps.co_section
+            FROM recent r
+            JOIN patent_sections ps ON r.patent_id = ps.patent_id
+            WHERE {per_domain("co_section NOT IN ({exclude_sections})")}
         ),
         total_by_year AS (
-            SELECT py.year, COUNT(DISTINCT dp.patent_id) AS total_domain
-            FROM domain_patents dp
-            JOIN patent_year py ON dp.patent_id = py.patent_id
-            GROUP BY py.year
+            SELECT domain_id, year, COUNT(DISTINCT patent_id) AS total_domain
+            FROM recent
+            GROUP BY domain_id, year
         )
         SELECT
+            os.domain_id,
             os.year,
             os.co_section AS section,
             COUNT(DISTINCT os.patent_id) AS domain_patents_with_section,
             tby.total_domain,
             ROUND(100.0 * COUNT(DISTINCT os.patent_id) / tby.total_domain, 2) AS pct_of_domain
         FROM other_sections os
-        JOIN total_by_year tby ON os.year = tby.year
-        GROUP BY os.year, os.co_section, tby.total_domain
-        ORDER BY os.year, os.co_section
-    """, f"{OUT}/{slug}_diffusion.json")
+        JOIN total_by_year tby ON os.domain_id = tby.domain_id AND os.year = tby.year
+        GROUP BY os.domain_id, os.year, os.co_section, tby.total_domain
+        ORDER BY os.domain_id, os.year, os.co_section
+    """, "domain_id", outputs("diffusion"))
 
     con.close()
-    print(f"\n=== {domain_name} pipeline complete ===\n")
+    print(f"\n=== {label} pipeline complete ===\n")
+
+
+if __name__ == "__main__":
+    run_domain_batch(load_domains(sys.argv[1:] or DOMAIN_SCRIPTS))
@@ -0,0 +1,77 @@
+"""
+PatentWorld Data Pipeline - Deep-dive domain registry and classifier
+
+The 12 deep-dive technology domains (chapters 47-57, AI from chapter 11) are
+defined once here as CPC prefix rules: a g_cpc_current row belongs to a domain
+when its cpc_code() - the cpc_group, or the cpc_subclass where the group is
+NULL or empty - falls under one of the domain's prefixes: a subclass ("G06V"),
+main group ("G05D1") or main group plus subgroup digits ("H04L9/0643"),
+matched along the CPC hierarchy by cpc_taxonomy.
+
+MATCHER compiles every domain's rules into one interval table whose values are
+domain bitmasks; code_masks() applies it to the distinct codes of a CPC table,
+giving a small lookup table to join CPC rows against on cpc_code().
+58_build_patent_master.py ORs those masks over each patent's CPC rows, in the
+same scan that computes scope, into the master's domain_mask column, so a
+domain's patents are a plain integer filter there (has_domain) instead of
+another DISTINCT over g_cpc_current.
+"""
+import pyarrow as pa
+
+from cpc_taxonomy import PrefixMatcher, cpc_code
+
+# name -> slug (file prefix), data_dir (output subdirectory), bit in
+# domain_mask, and CPC prefix rules. Bits are the registry order. Adding a
+# domain or changing a rule changes rules_key(), which makes the next master
+# build a full one.
+DOMAINS = {
+    "3D Printing":   {"slug": "3dprint", "data_dir": "3dprint", "bit": 0,
+                      "cpc": ("B33Y", "B29C64", "B22F10")},
+    "AgTech":        {"slug": "agtech", "data_dir": "agtech", "bit": 1,
+                      "cpc": ("A01B", "A01C", "A01G", "A01H", "G06Q50/02")},
+    "AI":            {"slug": "ai", "data_dir": "chapter11", "bit": 2,
+                      "cpc": ("G06N", "G06F18", "G06V", "G10L15", "G06F40")},
+    "AV":            {"slug": "av", "data_dir": "av", "bit": 3,
+                      "cpc": ("B60W60", "G05D1", "G06V20/56")},
+    "Biotech":       {"slug": "biotech", "data_dir": "biotech", "bit": 4,
+                      "cpc": ("C12N15", "C12N9", "C12Q1/68")},
+    "Blockchain":    {"slug": "blockchain", "data_dir": "blockchain", "bit": 5,
+                      "cpc": ("H04L9/0643", "G06Q20/0655")},
+    "Cyber":         {"slug": "cyber", "data_dir": "cyber", "bit": 6,
+                      "cpc": ("G06F21", "H04L9", "H04L63")},
+    "DigiHealth":    {"slug": "digihealth", "data_dir": "digihealth", "bit": 7,
+                      "cpc": ("G16H", "A61B5", "A61B34")},
+    "Green":         {"slug": "green", "data_dir": "green", "bit": 8,
+                      "cpc": ("Y02", "Y04S")},
+    "Quantum":       {"slug": "quantum", "data_dir": "quantum", "bit": 9,
+                      "cpc": ("G06N10", "H01L39")},
+    "Semiconductor": {"slug": "semi", "data_dir": "semiconductors", "bit": 10,
+                      "cpc": ("H01L", "H10N", "H10K")},
+    "Space":         {"slug": "space", "data_dir": "space", "bit": 11,
+                      "cpc": ("B64G", "H04B7/185")},
+}
+assert [d["bit"] for d in DOMAINS.values()] == list(range(len(DOMAINS)))
+
+MATCHER = PrefixMatcher({name: d["cpc"] for name, d in DOMAINS.items()}, mode="all")
+
+
+def rules_key() -> dict:
+    """JSON-serializable fingerprint of the registry (bits and rules)."""
+    return {name: [d["bit"], sorted(d["cpc"])] for name, d in DOMAINS.items()}
+
+
+def domain_bit(name: str) -> int:
+    return 1 << DOMAINS[name]["bit"]
+
+
+def has_domain(name: str, col: str = "domain_mask") -> str:
+    """SQL predicate: the patent whose mask is *col* belongs to domain *name*."""
+    return f"({col} & {domain_bit(name)}) <> 0"
+
+
+def code_masks(con, cpc_table: str):
+    """Arrow table (cpc_code, domain_mask) of the distinct codes (cpc_code())
+    in *cpc_table* that belong to at least one domain; join CPC rows to it on
+    cpc_code() to get each row's mask."""
+    codes = MATCHER.code_table(con, cpc_table, as_col="domain_mask")
+    return codes.set_column(1, "domain_mask", codes.column(1).cast(pa.int32()))
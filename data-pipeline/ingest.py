@@ -0,0 +1,224 @@
+"""
+PatentWorld Data Pipeline - Streaming ingestion
+
+Streams each PatentsView *.tsv.zip member through a chunked Arrow CSV reader
+straight into row-group-sized Parquet writes. Nothing is extracted to disk and
+peak memory is bounded by one row group, regardless of the table size.
+
+Column types are sniffed from the first block; every later block is parsed as
+text and cast leniently, so a stray malformed value becomes NULL instead of
+aborting a 30-minute conversion (same spirit as DuckDB's ignore_errors=true).
+Every value lost that way is counted per column and reported as a warning.
+"""
+import os
+import re
+import time
+import zipfile
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+BLOCK_SIZE = 64 << 20          # bytes of raw TSV parsed per batch
+ROW_GROUP_SIZE = 1_000_000     # rows per Parquet row group
+
+# Identifier columns always stay strings (reissue IDs like RE32443, UUIDs).
+STRING_COLUMNS = {
+    "patent_id", "citation_patent_id", "application_id",
+    "inventor_id", "assignee_id", "location_id",
+}
+
+# Values that must match before a text column is cast to a sniffed type.
+_VALID_PATTERNS = {
+    "int": r"^[+-]?\d+$",
+    "float": r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^(?i:nan|[+-]?inf)$",
+    "date": r"^\d{4}-\d{2}-\d{2}$",
+    "bool": r"^(?i:true|false)$",
+}
+
+# Tables whose Parquet cache has already been validated in this process
+_checked = set()
+
+
+def _parse_options() -> pacsv.ParseOptions:
+    return pacsv.ParseOptions(
+        delimiter="\t",
+        quote_char='"',
+        double_quote=True,
+        newlines_in_values=True,
+        invalid_row_handler=lambda row: "skip",
+    )
+
+
+def _open_member(zf: zipfile.ZipFile):
+    """Open the (single) TSV member of a PatentsView zip as a stream."""
+    names = [n for n in zf.namelist() if n.endswith(".tsv")] or zf.namelist()
+    return zf.open(names[0])
+
+
+def sniff_schema(zip_path: str) -> pa.Schema:
+    """Infer column types from the first block of the TSV inside *zip_path*."""
+    with zipfile.ZipFile(zip_path) as zf, _open_member(zf) as f:
+        reader = pacsv.open_csv(
+            f,
+            read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE),
+            parse_options=_parse_options(),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in STRING_COLUMNS},
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+        schema = reader.schema
+    fields = []
+    for field in schema:
+        typ = field.type
+        # All-empty first block, or something we cannot cast leniently
+        if pa.types.is_null(typ) or pa.types.is_timestamp(typ) or pa.types.is_time(typ):
+            typ = pa.string()
+        fields.append(pa.field(field.name, typ))
+    return pa.schema(fields)
+
+
+def _type_pattern(typ: pa.DataType):
+    if pa.types.is_integer(typ):
+        return _VALID_PATTERNS["int"]
+    if pa.types.is_floating(typ):
+        return _VALID_PATTERNS["float"]
+    if pa.types.is_date(typ):
+        return _VALID_PATTERNS["date"]
+    if pa.types.is_boolean(typ):
+        return _VALID_PATTERNS["bool"]
+    return None
+
+
+def _cast_lenient(arr: pa.Array, typ: pa.DataType) -> pa.Array:
+    """Cast a text column to *typ*, turning unparseable or out-of-range values
+    into NULL. Fully vectorized: values are validated by pattern, range
+    (integers) and round trip (dates) before one cast."""
+    if pa.types.is_string(typ):
+        return arr
+    try:
+        return pc.cast(arr, typ)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    pattern = _type_pattern(typ)
+    if pattern is None:
+        return pc.cast(arr, typ)
+    ok = pc.fill_null(pc.match_substring_regex(arr, pattern), False)
+    if pa.types.is_integer(typ):
+        # Overflow: exact range check in decimal; longer digit strings than
+        # decimal128 holds overflow every integer type anyway
+        arr = pc.replace_substring_regex(arr, r"^\+", "")
+        ok = pc.and_(ok, pc.less_equal(pc.utf8_length(arr), 38))
+        info = np.iinfo(typ.to_pandas_dtype())
+        dec = pa.decimal128(38, 0)
+        value = pc.cast(pc.if_else(ok, arr, None), dec)
+        ok = pc.and_(ok, pc.and_(pc.greater_equal(value, pa.scalar(int(info.min), dec)),
+                                 pc.less_equal(value, pa.scalar(int(info.max), dec))))
+    elif pa.types.is_date(typ):
+        # Impossible days (2001-02-30): strptime rolls them over, so keep
+        # only values that format back to themselves
+        parsed = pc.strptime(pc.if_else(ok, arr, None), format="%Y-%m-%d", unit="s",
+                             error_is_null=True)
+        ok = pc.and_(ok, pc.equal(pc.strftime(parsed, format="%Y-%m-%d"), arr))
+    return pc.cast(pc.if_else(pc.fill_null(ok, False), arr, None), typ)
+
+
+def iter_batches(zip_path: str, schema: pa.Schema = None, columns=None, lost: dict = None):
+    """Yield typed RecordBatches of the TSV inside *zip_path*, one block at a time.
+    Values set to NULL because they do not fit their column's sniffed type are
+    counted per column into *lost*, if given."""
+    if schema is None:
+        schema = sniff_schema(zip_path)
+    if columns is not None:
+        schema = pa.schema([schema.field(c) for c in columns])
+    with zipfile.ZipFile(zip_path) as zf, _open_member(zf) as f:
+        reader = pacsv.open_csv(
+            f,
+            read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE),
+            parse_options=_parse_options(),
+            convert_options=pacsv.ConvertOptions(
+                column_types={field.name: pa.string() for field in schema},
+                include_columns=schema.names,
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            arrays = []
+            for field in schema:
+                text = batch.column(field.name)
+                arrays.append(_cast_lenient(text, field.type))
+                if lost is not None and arrays[-1].null_count > text.null_count:
+                    lost[field.name] = lost.get(field.name, 0) + arrays[-1].null_count - text.null_count
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def zip_to_parquet(zip_path: str, parquet_path: str,
+                   row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """Stream *zip_path* into a zstd Parquet file. Returns the number of rows."""
+    schema = sniff_schema(zip_path)
+    tmp_path = parquet_path + ".tmp"
+    n_rows = 0
+    pending, pending_rows = [], 0
+    lost = {}
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for batch in iter_batches(zip_path, schema, lost=lost):
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= row_group_size:
+                writer.write_table(pa.Table.from_batches(pending, schema),
+                                   row_group_size=row_group_size)
+                n_rows += pending_rows
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema),
+                               row_group_size=row_group_size)
+            n_rows += pending_rows
+    for col, n in lost.items():
+        print(f"  WARNING: {os.path.basename(zip_path)}: {n:,} {col} values do not parse as "
+              f"{schema.field(col).type} (sniffed from the first block) and were set to NULL",
+              flush=True)
+    os.replace(tmp_path, parquet_path)
+    return n_rows
+
+
+def source_key(zip_path: str) -> dict:
+    """Fingerprint of a source zip used to invalidate the Parquet cache."""
+    st = os.stat(zip_path)
+    return {"zip_size": st.st_size, "zip_mtime_ns": st.st_mtime_ns}
+
+
+def cached_parquet(zip_path: str, parquet_dir: str, rebuild: bool = False) -> str:
+    """Return the Parquet copy of *zip_path* in *parquet_dir*, (re)building it if stale."""
+    name = re.sub(r"\.tsv\.zip$", "", os.path.basename(zip_path))
+    pq_path = os.path.join(parquet_dir, f"{name}.parquet")
+    key_path = pq_path + ".key"
+    if pq_path in _checked and not rebuild:
+        return pq_path
+
+    key = source_key(zip_path)
+    stale = rebuild or not os.path.exists(pq_path)
+    if not stale:
+        try:
+            with open(key_path, "rb") as f:
+                stale = orjson.loads(f.read()) != key
+        except (OSError, orjson.JSONDecodeError):
+            stale = True
+
+    if stale:
+        os.makedirs(parquet_dir, exist_ok=True)
+        print(f"  Streaming {os.path.basename(zip_path)} -> {pq_path} ...", flush=True)
+        t0 = time.time()
+        n_rows = zip_to_parquet(zip_path, pq_path)
+        with open(key_path, "wb") as f:
+            f.write(orjson.dumps(key))
+        size_mb = os.path.getsize(pq_path) / (1024 * 1024)
+        print(f"  Converted {n_rows:,} rows in {time.time()-t0:.1f}s ({size_mb:,.0f} MB)", flush=True)
+
+    _checked.add(pq_path)
+    return pq_path
@@ -0,0 +1,251 @@
+"""
+PatentWorld Data Pipeline - Streaming JSON writer
+
+save_json() on a list serializes the whole output into one blob next to the
+records it came from. stream_json() instead takes any iterable of records (a
+generator, DataFrame.iter_rows(named=True), ...) or Arrow RecordBatches (a
+RecordBatchReader, a Table, or an iterable of batches) and writes the JSON array
+chunk by chunk to a temporary file, so peak memory is one chunk of records plus
+one chunk of bytes, whatever the size of the output.
+
+Both paths can emit precompressed sidecars for the static host:
+  <file>.gz  gzip -9 with a zeroed header mtime (same content -> same bytes)
+  <file>.br  brotli (optional dependency: pip install brotli)
+Enable them per call (sidecars=("gz", "br")) or for every output with
+PATENTWORLD_JSON_SIDECARS=gz,br. Outputs whose content did not change are left
+untouched, sidecars included, so mtimes and downstream fingerprints stay stable.
+"""
+import filecmp
+import gzip
+import itertools
+import math
+import os
+
+import orjson
+
+from output_cache import write_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_ROWS = 10_000            # records serialized per write
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+SIDECARS = tuple(s for s in os.environ.get("PATENTWORLD_JSON_SIDECARS", "").replace(" ", "").split(",") if s)
+_SIDECAR_KINDS = ("gz", "br")
+
+_DUMPS_OPTION = orjson.OPT_SERIALIZE_NUMPY
+_DAY_NS = 86_400 * 10**9
+
+
+# ── Arrow -> JSON-safe records ───────────────────────────────────────────────
+def arrow_json_column(col) -> list:
+    """One Arrow column as JSON-safe Python values, converted columnarly with the
+    same conventions as config._clean_value (NaN/inf -> null, dates/timestamps ->
+    str, durations -> whole days, DECIMAL/HUGEINT -> float)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    t = col.type
+    if pa.types.is_dictionary(t):  # ENUM
+        t = t.value_type
+        col = col.cast(t)
+    if pa.types.is_decimal(t):
+        t = pa.float64()
+        col = col.cast(t)
+    if pa.types.is_floating(t):
+        col = pc.if_else(pc.is_finite(col), col, pa.scalar(None, t))
+    elif pa.types.is_date(t) or (pa.types.is_timestamp(t) and t.tz is None):
+        text = pc.strftime(col.cast(pa.timestamp("us")), "%Y-%m-%d %H:%M:%S")
+        col = pc.replace_substring_regex(text, r"\.0{6}$", "")  # as str(pd.Timestamp)
+    elif pa.types.is_duration(t):
+        col = pc.divide(col.cast(pa.duration("ns")).cast(pa.int64()), _DAY_NS)
+    elif pa.types.is_interval(t):  # DuckDB INTERVAL: months count as 30 days
+        return [None if v is None else int(v.months * 30 + v.days + v.nanoseconds / _DAY_NS)
+                for v in col.to_pylist()]
+    elif pa.types.is_timestamp(t):
+        import pandas as pd
+        return [None if v is None else str(pd.Timestamp(v)) for v in col.to_pylist()]
+    return col.to_pylist()
+
+
+def float_nullable_ints(table):
+    """*table* with every integer column that holds a NULL cast to float64, as
+    fetchdf() typed it (NULLs as NaN), so those columns keep serializing as 1.0."""
+    import pyarrow as pa
+    for i, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table
+
+
+def arrow_records(batch) -> list:
+    """Arrow RecordBatch -> list[dict], one column at a time (no pandas, no per-cell cleaning)."""
+    columns = [arrow_json_column(batch.column(i)) for i in range(batch.num_columns)]
+    return [dict(zip(batch.schema.names, row)) for row in zip(*columns)]
+
+
+def _is_arrow(obj) -> bool:
+    return type(obj).__module__.startswith("pyarrow")
+
+
+def _record_chunks(source, chunk_rows: int):
+    """Yield lists of records from an iterable of records or of Arrow batches."""
+    if _is_arrow(source) and hasattr(source, "to_batches"):  # pa.Table
+        source = source.to_batches(max_chunksize=chunk_rows)
+    it = iter(source)
+    first = next(it, None)
+    if first is None:
+        return
+    it = itertools.chain([first], it)
+    if _is_arrow(first):  # RecordBatchReader / iterable of RecordBatches
+        for batch in it:
+            for start in range(0, batch.num_rows, chunk_rows):
+                yield arrow_records(batch.slice(start, chunk_rows))
+        return
+    while chunk := list(itertools.islice(it, chunk_rows)):
+        yield chunk
+
+
+def round_record(rec, digits: int):
+    """Round float values of a dict record to *digits*; NaN/inf become None."""
+    if not isinstance(rec, dict):
+        return rec
+    return {
+        k: (None if not math.isfinite(v) else round(v, digits)) if isinstance(v, float) else v
+        for k, v in rec.items()
+    }
+
+
+# ── Sidecars ─────────────────────────────────────────────────────────────────
+def _sidecar_kinds(sidecars) -> tuple:
+    kinds = SIDECARS if sidecars is None else tuple(sidecars)
+    unknown = set(kinds) - set(_SIDECAR_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown JSON sidecar type(s): {sorted(unknown)} (expected gz, br)")
+    if "br" in kinds and brotli is None:
+        print("  WARNING: brotli not installed; skipping .br sidecars (pip install brotli)")
+        kinds = tuple(k for k in kinds if k != "br")
+    return kinds
+
+
+def compress(body: bytes, kind: str) -> bytes:
+    if kind == "gz":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def write_json_bytes(body: bytes, path: str, sidecars=None) -> bool:
+    """Write *body* (and its sidecars) unless *path* already holds these bytes."""
+    changed = write_if_changed(path, body)
+    for kind in _sidecar_kinds(sidecars):
+        if changed or not os.path.exists(f"{path}.{kind}"):
+            with open(f"{path}.{kind}", "wb") as f:
+                f.write(compress(body, kind))
+    return changed
+
+
+class _Sink:
+    """A temp file, optionally compressed, that is either committed or discarded."""
+
+    def __init__(self, path: str, kind: str = None):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.gz = gzip.GzipFile(filename="", mode="wb", fileobj=self.file,
+                                compresslevel=GZIP_LEVEL, mtime=0) if kind == "gz" else None
+        self.br = brotli.Compressor(quality=BROTLI_QUALITY) if kind == "br" else None
+
+    def write(self, data: bytes) -> None:
+        if self.gz is not None:
+            self.gz.write(data)
+        elif self.br is not None:
+            self.file.write(self.br.process(data))
+        else:
+            self.file.write(data)
+
+    def close(self) -> None:
+        if self.gz is not None:
+            self.gz.close()
+        elif self.br is not None:
+            self.file.write(self.br.finish())
+        self.file.close()
+
+    def commit(self) -> None:
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self) -> None:
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def _open_sinks(path: str, sidecars) -> list:
+    return [_Sink(path)] + [_Sink(f"{path}.{kind}", kind) for kind in _sidecar_kinds(sidecars)]
+
+
+def _finish(sinks: list, path: str) -> bool:
+    """Close *sinks* and move them into place unless *path* already holds the same
+    content (and every sidecar exists). Returns whether anything was written."""
+    for sink in sinks:
+        sink.close()
+    main = sinks[0]
+    unchanged = os.path.exists(path) and filecmp.cmp(main.tmp_path, path, shallow=False)
+    for sink in sinks:
+        if unchanged and (sink is main or os.path.exists(sink.path)):
+            sink.discard()
+        else:
+            sink.commit()
+    return not unchanged
+
+
+def _abort(sinks: list) -> None:
+    for sink in sinks:
+        sink.file.close()
+        sink.discard()
+
+
+def stream_json(source, path: str, round_digits: int = None, sidecars=None,
+                chunk_rows: int = CHUNK_ROWS) -> tuple:
+    """Write the records of *source* to *path* as one JSON array, chunk by chunk.
+
+    *round_digits* rounds the float values of dict records (NaN/inf -> null);
+    otherwise values are written as orjson serializes them (NaN -> null).
+    Returns (changed, n_records, n_bytes).
+    """
+    sinks = _open_sinks(path, sidecars)
+    n_records, n_bytes = 0, 0
+    try:
+        def emit(data: bytes) -> None:
+            nonlocal n_bytes
+            n_bytes += len(data)
+            for sink in sinks:
+                sink.write(data)
+
+        emit(b"[")
+        for chunk in _record_chunks(source, chunk_rows):
+            if round_digits is not None:
+                chunk = [round_record(r, round_digits) for r in chunk]
+            body = orjson.dumps(chunk, option=_DUMPS_OPTION)[1:-1]
+            emit(b"," + body if n_records else body)
+            n_records += len(chunk)
+        emit(b"]")
+    except BaseException:
+        _abort(sinks)
+        raise
+    return _finish(sinks, path), n_records, n_bytes
+
+
+def copy_json(src: str, path: str, sidecars=None, block_size: int = 1 << 20) -> bool:
+    """Copy the JSON file *src* to *path* (plus sidecars) in blocks, unless unchanged."""
+    sinks = _open_sinks(path, sidecars)
+    try:
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                for sink in sinks:
+                    sink.write(block)
+    except BaseException:
+        _abort(sinks)
+        raise
+    return _finish(sinks, path)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+PatentWorld Data Pipeline - Content-addressed output cache
+
+Memoizes query_to_json(): each call is keyed by a hash of
+  - the normalized SQL (comments and whitespace outside string literals dropped),
+  - the output path (relative to OUTPUT_DIR),
+  - the data fingerprint (every source zip in DATA_DIR plus the pipeline
+    artifacts in config.cache_inputs(), by size and mtime),
+  - the script version (source of __main__ and every local module it imported).
+On a hit the query is not executed; the stored JSON bytes are written back only if
+the output file is missing or differs, and the parsed records are returned.
+
+JSON bodies are stored once per content hash under objects/, and entries/ maps
+each key to its object. save_json() writes only when the content changed, so
+unchanged outputs keep their mtime and downstream fingerprints stay stable.
+
+Set PATENTWORLD_NO_CACHE=1 to bypass lookups (results are still stored).
+
+Usage:  python output_cache.py stats
+        python output_cache.py gc [--max-age-days N]   # default 30
+        python output_cache.py clear
+Cache:  /tmp/patentview/json_cache/
+"""
+import hashlib
+import os
+import re
+import shutil
+import sys
+import time
+
+import orjson
+
+DISABLED = os.environ.get("PATENTWORLD_NO_CACHE", "") == "1"
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_SQL_TOKEN = re.compile(r"('(?:[^']|'')*')|--[^\n]*|\s+")
+
+# Memoized per process: fingerprints do not change while a script runs
+_data_digest = None
+_script_version = None
+
+
+def normalize_sql(sql: str) -> str:
+    """Drop comments and collapse whitespace, leaving string literals untouched."""
+    return _SQL_TOKEN.sub(lambda m: m.group(1) or " ", sql).strip()
+
+
+def path_key(path: str):
+    """size/mtime fingerprint of a file, or of every file under a directory."""
+    if os.path.isdir(path):
+        return sorted(
+            (os.path.relpath(os.path.join(d, f), path), path_key(os.path.join(d, f)))
+            for d, _, files in os.walk(path) for f in files
+        )
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def data_digest(data_dir: str, extra_inputs) -> str:
+    """Fingerprint of every source zip in *data_dir* plus *extra_inputs*."""
+    global _data_digest
+    if _data_digest is None:
+        zips = sorted(f for f in os.listdir(data_dir) if f.endswith(".tsv.zip")) \
+            if os.path.isdir(data_dir) else []
+        state = {
+            "zips": {z: path_key(os.path.join(data_dir, z)) for z in zips},
+            "inputs": {p: path_key(p) for p in extra_inputs},
+        }
+        _data_digest = hashlib.sha256(orjson.dumps(state, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return _data_digest
+
+
+def file_sha(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def main_script() -> str:
+    main = sys.modules.get("__main__")
+    return os.path.abspath(getattr(main, "__file__", "") or "<interactive>")
+
+
+def script_files() -> list:
+    """The running script and every loaded module that lives in data-pipeline/, sorted."""
+    return sorted({main_script()} | {
+        os.path.abspath(m.__file__) for m in list(sys.modules.values())
+        if getattr(m, "__file__", None) and os.path.dirname(os.path.abspath(m.__file__)) == PIPELINE_DIR
+    })
+
+
+def files_version(files) -> str:
+    """Hash of the paths and contents of *files* (missing files are skipped)."""
+    h = hashlib.sha256()
+    for path in files:
+        if os.path.exists(path):
+            h.update(path.encode())
+            h.update(file_sha(path).encode())
+    return h.hexdigest()
+
+
+def script_version() -> str:
+    """files_version() of script_files()."""
+    global _script_version
+    if _script_version is None:
+        _script_version = files_version(script_files())
+    return _script_version
+
+
+# ── Store ─────────────────────────────────────────────────────────────────────
+class OutputCache:
+    """entries/<key>.json -> objects/<sha[:2]>/<sha>.json under *root*."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.entries = os.path.join(root, "entries")
+        self.objects = os.path.join(root, "objects")
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.entries, f"{key}.json")
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self.objects, sha[:2], f"{sha}.json")
+
+    def lookup(self, key: str):
+        """Path of the stored JSON object for *key*, or None."""
+        try:
+            with open(self._entry_path(key), "rb") as f:
+                entry = orjson.loads(f.read())
+            obj = self._object_path(entry["object"])
+        except (OSError, orjson.JSONDecodeError, KeyError):
+            return None
+        if not os.path.exists(obj):
+            return None
+        entry["last_used"] = time.time()
+        _atomic_write(self._entry_path(key), orjson.dumps(entry))
+        return obj
+
+    def get(self, key: str):
+        """Stored JSON bytes for *key*, or None."""
+        obj = self.lookup(key)
+        if obj is None:
+            return None
+        try:
+            with open(obj, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key: str, body: bytes, meta: dict) -> None:
+        sha = hashlib.sha256(body).hexdigest()
+        obj = self._object_path(sha)
+        if not os.path.exists(obj):
+            _atomic_write(obj, body)
+        self._put_entry(key, sha, meta)
+
+    def put_file(self, key: str, path: str, meta: dict) -> None:
+        """put() for an output already on disk, hashed and copied without loading it."""
+        sha = file_sha(path)
+        obj = self._object_path(sha)
+        if not os.path.exists(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            tmp_path = f"{obj}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, obj)
+        self._put_entry(key, sha, meta)
+
+    def _put_entry(self, key: str, sha: str, meta: dict) -> None:
+        entry = dict(meta, object=sha, created=time.time(), last_used=time.time())
+        _atomic_write(self._entry_path(key), orjson.dumps(entry))
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.entries):
+            return
+        for name in os.listdir(self.entries):
+            path = os.path.join(self.entries, name)
+            try:
+                with open(path, "rb") as f:
+                    yield path, orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                yield path, None
+
+    def _iter_objects(self):
+        if not os.path.isdir(self.objects):
+            return
+        for d, _, files in os.walk(self.objects):
+            for name in files:
+                yield os.path.join(d, name)
+
+    def stats(self) -> dict:
+        entries = sum(1 for _ in self._iter_entries())
+        objects = list(self._iter_objects())
+        size = sum(os.path.getsize(p) for p in objects)
+        return {"entries": entries, "objects": len(objects), "size_mb": size / (1024 * 1024)}
+
+    def gc(self, current_data: str, max_age_days: float = 30) -> dict:
+        """Evict entries built from other data, by a changed script version (the
+        script or any pipeline module it loaded), or unused for *max_age_days*;
+        then delete objects no entry references."""
+        cutoff = time.time() - max_age_days * 86400
+        versions = {}
+        removed, live = 0, set()
+        for path, entry in self._iter_entries():
+            stale = entry is None or entry.get("data") != current_data \
+                or entry.get("last_used", 0) < cutoff
+            if not stale:
+                files = tuple(entry.get("script_files") or ())
+                if files not in versions:
+                    versions[files] = files_version(files) if files else None
+                stale = versions[files] is None or versions[files] != entry.get("script_version")
+            if stale:
+                os.remove(path)
+                removed += 1
+            else:
+                live.add(entry["object"])
+        orphans = 0
+        for path in self._iter_objects():
+            if os.path.basename(path)[:-len(".json")] not in live:
+                os.remove(path)
+                orphans += 1
+        return {"entries_removed": removed, "objects_removed": orphans}
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _atomic_write(path: str, body: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def write_if_changed(path: str, body: bytes) -> bool:
+    """Write *body* to *path* unless it already holds exactly these bytes."""
+    try:
+        if os.path.getsize(path) == len(body):
+            with open(path, "rb") as f:
+                if f.read() == body:
+                    return False
+    except OSError:
+        pass
+    with open(path, "wb") as f:
+        f.write(body)
+    return True
+
+
+if __name__ == "__main__":
+    from config import JSON_CACHE_DIR, DATA_DIR, cache_inputs
+
+    cache = OutputCache(JSON_CACHE_DIR)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "stats":
+        s = cache.stats()
+        print(f"  {JSON_CACHE_DIR}: {s['entries']:,} entries, {s['objects']:,} objects, "
+              f"{s['size_mb']:,.1f} MB")
+    elif cmd == "gc":
+        max_age = float(sys.argv[sys.argv.index("--max-age-days") + 1]) \
+            if "--max-age-days" in sys.argv else 30
+        r = cache.gc(data_digest(DATA_DIR, cache_inputs()), max_age)
+        print(f"  Removed {r['entries_removed']:,} stale entries, "
+              f"{r['objects_removed']:,} unreferenced objects")
+    elif cmd == "clear":
+        cache.clear()
+        print(f"  Cleared {JSON_CACHE_DIR}")
+    else:
+        sys.exit("Usage: python output_cache.py [stats | gc [--max-age-days N] | clear]")
@@ -1,13 +1,12 @@
-import duckdb
 import os
 import sys
 import time
 import orjson
 
 sys.path.insert(0, '/home/saerom/projects/patentworld/data-pipeline')
-from config import tsv_table, save_json, query_to_json, OUTPUT_DIR, TEMP_DIR
+from config import tsv_table, save_json, query_to_json, OUTPUT_DIR, TEMP_DIR, get_connection
 
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads = 38")
 con.execute("SET memory_limit = '200GB'")
 
@@ -1,13 +1,12 @@
-import duckdb
 import os
 import sys
 import time
 import math
 
 sys.path.insert(0, '/home/saerom/projects/patentworld/data-pipeline')
-from config import tsv_table, save_json, query_to_json, OUTPUT_DIR
+from config import tsv_table, save_json, query_to_json, OUTPUT_DIR, get_connection
 
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads = 10")
 con.execute("SET memory_limit = '100GB'")
 
@@ -1,12 +1,11 @@
-import duckdb
 import os
 import sys
 import time
 
 sys.path.insert(0, '/home/saerom/projects/patentworld/data-pipeline')
-from config import tsv_table, save_json, query_to_json, OUTPUT_DIR
+from config import tsv_table, save_json, query_to_json, OUTPUT_DIR, get_connection
 
-con = duckdb.connect()
+con = get_connection()
 con.execute("SET threads = 8")
 con.execute("SET memory_limit = '80GB'")
 
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Run the whole data pipeline as a dependency-aware, parallel DAG (replaces run_all.sh).
+
+Every numbered script (plus build_warehouse.py, citation_graph.py,
+citation_cube.py, coinventor_graph.py and cpc_incidence.py) is a stage, except
+the deep-dive domain scripts 47-57: domain_utils.py runs those as one batch
+stage (BATCHES below), scanning the raw tables once for all domains.
+Its inputs are read off the source of the script and of any local module it imports:
+  - raw PatentsView tables, via the config shorthands (PATENT_TSV(), PATENT_YEAR(), ...)
+    and direct tsv_table("g_...") calls;
+  - pipeline artifacts (ARTIFACTS below), which also add an edge from the
+    artifact's producer (31 → 32–44, 58 → 59–75, build_warehouse → everything).
+
+Independent stages run concurrently under a global core / memory budget. A stage
+asks for the `SET threads` / `memory_limit` it sets itself, or else the default
+slice, which get_connection() applies through PATENTWORLD_THREADS /
+PATENTWORLD_MEMORY_LIMIT. Ready stages start in order of their longest path to
+the end of the DAG (estimated from the previous run), so the critical path
+starts first; when the top stage does not fit yet it gets a reservation and
+smaller stages only backfill around it (EASY backfilling). A stage whose code and inputs are unchanged since its last
+successful run is skipped.
+
+Usage:  python run_all.py [--cores N] [--memory-gb N] [--force] [--dry-run] [STAGE ...]
+        STAGE is a script number or name prefix (58, 59, 4, build_warehouse);
+        a batched script selects its batch stage (47 -> domain_utils).
+        Upstream stages are included automatically.
+Logs:   /tmp/patentview/logs/<stage>.log
+State:  /tmp/patentview/run_all_state.json
+"""
+import glob
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import time
+
+import orjson
+from config import (
+    DATA_DIR, OUTPUT_DIR, TEMP_DIR, WAREHOUSE_PATH, WAREHOUSE_SOURCES, MASTER_DIR, CITATION_GRAPH_DIR,
+    CITATION_CUBE_DIR, COINVENTOR_GRAPH_DIR, CPC_INCIDENCE_DIR, derived_refs, timed_msg,
+)
+from domain_utils import DOMAIN_SCRIPTS
+from ingest import source_key
+from output_cache import path_key
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(TEMP_DIR, "logs")
+STATE_PATH = os.path.join(TEMP_DIR, "run_all_state.json")
+
+# Resource slice for stages that do not SET their own
+DEFAULT_THREADS = 8
+DEFAULT_MEMORY_GB = 64
+DEFAULT_ESTIMATE_S = 60  # duration guess for stages that never ran
+
+# Pipeline artifacts: name -> (producer stage, path, marker identifying consumers)
+ARTIFACTS = {
+    "warehouse": ("build_warehouse", WAREHOUSE_PATH, "get_connection("),
+    "company_name_mapping": ("31_company_name_mapping",
+                             f"{OUTPUT_DIR}/company/company_name_mapping.json",
+                             "company_name_mapping.json"),
+    "patent_master": ("58_build_patent_master", MASTER_DIR, "PATENT_MASTER("),
+    "citation_graph": ("citation_graph", CITATION_GRAPH_DIR, "citation_graph.load("),
+    "citation_cube": ("citation_cube", CITATION_CUBE_DIR, "CITATION_CUBE"),
+    "coinventor_graph": ("coinventor_graph", COINVENTOR_GRAPH_DIR, "COINVENTOR_PAIRS"),
+    "cpc_incidence": ("cpc_incidence", CPC_INCIDENCE_DIR, "cpc_incidence.load("),
+}
+
+# Batch stages: stage -> numbered scripts it runs in one process. The scripts
+# are not stages of their own (each still runs alone by hand); their sources
+# count towards the batch stage's fingerprint.
+BATCHES = {
+    "domain_utils": DOMAIN_SCRIPTS,
+}
+
+# Ordering-only edges (stage prefix -> prefixes it must run after)
+RUN_AFTER = {
+    "46": ["45"],  # writes into 45's fma/ directory
+}
+
+# Modules whose source counts towards every importer's fingerprint but is not
+# scanned for table / artifact references (config names every table).
+NO_SCAN = {"config", "ingest"}
+
+THREADS_RE = re.compile(r"SET threads\s*(?:TO|=)\s*(\d+)", re.I)
+MEMORY_RE = re.compile(r"memory_limit\s*=\s*'(\d+)\s*GB'", re.I)
+IMPORT_RE = re.compile(r"^\s*(?:from|import)\s+(\w+)", re.M)
+TSV_CALL_RE = re.compile(r"tsv_table\(\s*[\"'](g_\w+)[\"']")
+SHORTHAND_RE = re.compile(r'^def (\w+)\(\): return (tsv_table|warehouse_table)\("(\w+)"\)', re.M)
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _shorthand_tables() -> dict:
+    """config shorthand name -> raw tables it reads."""
+    out = {}
+    for fn, kind, name in SHORTHAND_RE.findall(_read(os.path.join(PIPELINE_DIR, "config.py"))):
+        out[fn] = {name} if kind == "tsv_table" else derived_refs(name)
+    return out
+
+
+def _local_modules(source: str, seen: set) -> list:
+    """Local modules imported (transitively) by *source*, in discovery order."""
+    mods = []
+    for mod in IMPORT_RE.findall(source):
+        path = os.path.join(PIPELINE_DIR, f"{mod}.py")
+        if mod in seen or not os.path.exists(path):
+            continue
+        seen.add(mod)
+        mods.append(mod)
+        mods += _local_modules(_read(path), seen)
+    return mods
+
+
+class Stage:
+    """One pipeline script with its detected inputs and resource demand."""
+
+    def __init__(self, name: str, shorthands: dict):
+        self.name = name
+        self.script = f"{name}.py"
+        members = BATCHES.get(name, [])
+        source = "".join(_read(os.path.join(PIPELINE_DIR, f"{m}.py")) for m in [name] + members)
+        self.modules = members + _local_modules(source, {name, *members})
+        scanned = source + "".join(
+            _read(os.path.join(PIPELINE_DIR, f"{m}.py")) for m in self.modules if m not in NO_SCAN
+        )
+        self.tables = set(TSV_CALL_RE.findall(scanned))
+        for fn, tables in shorthands.items():
+            if re.search(rf"\b{fn}\(\)", scanned):
+                self.tables |= tables
+        if name == "build_warehouse":
+            self.tables |= set(WAREHOUSE_SOURCES)
+        self.inputs = {a for a, (producer, _, marker) in ARTIFACTS.items()
+                       if producer != name and marker in scanned}
+        self.outputs = {a for a, (producer, _, _) in ARTIFACTS.items() if producer == name}
+        threads = [int(t) for t in THREADS_RE.findall(scanned)]
+        memory = [int(m) for m in MEMORY_RE.findall(scanned)]
+        self.threads = max(threads) if threads else DEFAULT_THREADS
+        self.memory_gb = max(memory) if memory else DEFAULT_MEMORY_GB
+        self.deps = set()
+
+    def fingerprint(self) -> str:
+        """Hash of the stage's code and the current state of all its inputs."""
+        h = hashlib.sha1()
+        for path in [self.script] + [f"{m}.py" for m in self.modules]:
+            with open(os.path.join(PIPELINE_DIR, path), "rb") as f:
+                h.update(f.read())
+        inputs = {
+            "tables": {t: _table_key(t) for t in sorted(self.tables)},
+            "artifacts": {a: path_key(ARTIFACTS[a][1]) for a in sorted(self.inputs)},
+        }
+        h.update(orjson.dumps(inputs, option=orjson.OPT_SORT_KEYS))
+        return h.hexdigest()
+
+    def outputs_exist(self) -> bool:
+        return all(os.path.exists(ARTIFACTS[a][1]) for a in self.outputs)
+
+
+def _table_key(name: str):
+    zip_path = os.path.join(DATA_DIR, f"{name}.tsv.zip")
+    return source_key(zip_path) if os.path.exists(zip_path) else None
+
+
+# ── DAG construction ──────────────────────────────────────────────────────────
+def discover_stages() -> dict:
+    """All stages keyed by name, with dependency edges filled in."""
+    shorthands = _shorthand_tables()
+    batched = {m for members in BATCHES.values() for m in members}
+    names = ["build_warehouse", "citation_graph", "citation_cube", "coinventor_graph", "cpc_incidence"] + \
+        list(BATCHES) + sorted(
+            name for name in (os.path.basename(p)[:-3]
+                              for p in glob.glob(os.path.join(PIPELINE_DIR, "[0-9][0-9]_*.py")))
+            if name not in batched
+        )
+    stages = {name: Stage(name, shorthands) for name in names}
+    for stage in stages.values():
+        stage.deps = {ARTIFACTS[a][0] for a in stage.inputs if ARTIFACTS[a][0] in stages}
+        for prefix, afters in RUN_AFTER.items():
+            if stage.name.startswith(f"{prefix}_"):
+                stage.deps |= {s for a in afters for s in select(stages, [a])}
+    return stages
+
+
+def select(stages: dict, targets: list) -> set:
+    """Stage names matching *targets* (script number or name prefix); a
+    batched script matches its batch stage."""
+    out = set()
+    for t in targets:
+        prefix = f"{int(t):02d}_" if t.isdigit() else t
+        matches = {n for n in stages if n.startswith(prefix)}
+        matches |= {b for b, members in BATCHES.items()
+                    if b in stages and any(m.startswith(prefix) for m in members)}
+        if not matches:
+            sys.exit(f"  ERROR: no stage matches {t!r}")
+        out |= matches
+    return out
+
+
+def with_upstream(stages: dict, names: set) -> set:
+    todo, out = list(names), set()
+    while todo:
+        n = todo.pop()
+        if n not in out:
+            out.add(n)
+            todo += stages[n].deps
+    return out
+
+
+def topo_order(stages: dict, names: set) -> list:
+    order, seen = [], set()
+
+    def visit(n):
+        if n in seen:
+            return
+        seen.add(n)
+        for d in sorted(stages[n].deps & names):
+            visit(d)
+        order.append(n)
+
+    for n in sorted(names):
+        visit(n)
+    return order
+
+
+def upward_rank(stages: dict, order: list, durations: dict) -> dict:
+    """Longest estimated path from each stage to the end of the DAG."""
+    rank = {}
+    for n in reversed(order):
+        succ = [rank[m] for m in order if n in stages[m].deps and m in rank]
+        rank[n] = durations.get(n, DEFAULT_ESTIMATE_S) + max(succ, default=0)
+    return rank
+
+
+# ── State ─────────────────────────────────────────────────────────────────────
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {"fingerprints": {}, "durations": {}}
+
+
+def save_state(state: dict) -> None:
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    os.replace(tmp_path, STATE_PATH)
+
+
+# ── Scheduler ─────────────────────────────────────────────────────────────────
+def run(stages: dict, order: list, cores: int, memory_gb: int, force: bool) -> dict:
+    """Run *order* under the budget. Returns name -> (status, start, end) relative to t0."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    state = load_state()
+    rank = upward_rank(stages, order, state["durations"])
+    t0 = time.time()
+    results, running, fps = {}, {}, {}
+    pending = list(order)
+    free_cores, free_mem = cores, memory_gb
+
+    def demand(stage):
+        return min(stage.threads, cores), min(stage.memory_gb, memory_gb)
+
+    def estimate(n):
+        return state["durations"].get(n, DEFAULT_ESTIMATE_S)
+
+    def reservation(threads, mem, now):
+        """(time a stage needing *threads*/*mem* can start, cores/memory spare then)."""
+        avail_cores, avail_mem = free_cores, free_mem
+        for n, (_, start, _, _) in sorted(running.items(), key=lambda kv: kv[1][1] + estimate(kv[0])):
+            r_threads, r_mem = demand(stages[n])
+            avail_cores += r_threads
+            avail_mem += r_mem
+            if threads <= avail_cores and mem <= avail_mem:
+                return max(now, start + estimate(n)), avail_cores - threads, avail_mem - mem
+        return now, 0, 0
+
+    while pending or running:
+        # Resolve stages whose dependencies are settled
+        ready = []
+        for n in list(pending):
+            deps = stages[n].deps & set(order)
+            if any(results.get(d, ("",))[0] in ("failed", "blocked") for d in deps):
+                results[n] = ("blocked", time.time() - t0, time.time() - t0)
+                pending.remove(n)
+                print(f"  [blocked] {n}", flush=True)
+            elif all(d in results for d in deps):
+                ready.append(n)
+
+        reserved = None
+        now = time.time() - t0
+        for n in sorted(ready, key=lambda n: -rank[n]):
+            stage = stages[n]
+            fp = fps[n] = fps.get(n) or stage.fingerprint()
+            if not force and state["fingerprints"].get(n) == fp and stage.outputs_exist():
+                now = time.time() - t0
+                results[n] = ("skipped", now, now)
+                pending.remove(n)
+                print(f"  [skip]    {n} (inputs unchanged)", flush=True)
+                continue
+            threads, mem = demand(stage)
+            if threads > free_cores or mem > free_mem:
+                if reserved is None:
+                    reserved = reservation(threads, mem, now)
+                continue
+            if reserved is not None:
+                # Backfill only if done before the reservation, or small enough to share it
+                shadow, spare_cores, spare_mem = reserved
+                if now + estimate(n) > shadow:
+                    if threads > spare_cores or mem > spare_mem:
+                        continue
+                    reserved = (shadow, spare_cores - threads, spare_mem - mem)
+            env = dict(os.environ, PATENTWORLD_THREADS=str(threads),
+                       PATENTWORLD_MEMORY_LIMIT=f"{mem}GB")
+            log = open(os.path.join(LOG_DIR, f"{n}.log"), "wb")
+            proc = subprocess.Popen([sys.executable, stage.script], cwd=PIPELINE_DIR,
+                                    stdout=log, stderr=subprocess.STDOUT, env=env)
+            running[n] = (proc, time.time() - t0, log, fp)
+            pending.remove(n)
+            free_cores -= threads
+            free_mem -= mem
+            print(f"  [start]   {n} ({threads} threads, {mem} GB)", flush=True)
+
+        time.sleep(0.2)
+        for n, (proc, start, log, fp) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            log.close()
+            end = time.time() - t0
+            threads, mem = demand(stages[n])
+            free_cores += threads
+            free_mem += mem
+            del running[n]
+            if proc.returncode == 0:
+                results[n] = ("ok", start, end)
+                state["fingerprints"][n] = fp
+                state["durations"][n] = round(end - start, 1)
+                save_state(state)
+                print(f"  [done]    {n} in {end - start:.1f}s", flush=True)
+            else:
+                results[n] = ("failed", start, end)
+                state["fingerprints"].pop(n, None)
+                save_state(state)
+                print(f"  [FAILED]  {n} (exit {proc.returncode}, see {LOG_DIR}/{n}.log)", flush=True)
+    return results
+
+
+def critical_path(stages: dict, results: dict) -> list:
+    """Chain of stages that determined the wall time (latest-finishing dependency each step)."""
+    if not results:
+        return []
+    n = max(results, key=lambda k: results[k][2])
+    path = [n]
+    while True:
+        deps = [d for d in stages[n].deps if d in results]
+        if not deps:
+            break
+        n = max(deps, key=lambda d: results[d][2])
+        path.append(n)
+    return path[::-1]
+
+
+def print_summary(stages: dict, order: list, results: dict, wall: float) -> None:
+    timed_msg("Timing summary")
+    print(f"  {'stage':<42} {'status':<8} {'start':>8} {'secs':>8}")
+    for n in sorted(order, key=lambda n: results[n][1]):
+        status, start, end = results[n]
+        print(f"  {n:<42} {status:<8} {start:>8.1f} {end - start:>8.1f}")
+    serial = sum(end - start for _, start, end in results.values())
+    path = critical_path(stages, results)
+    cp = sum(results[n][2] - results[n][1] for n in path)
+    print(f"\n  Wall time {wall:.1f}s | serial sum {serial:.1f}s | "
+          f"critical path {cp:.1f}s ({len(path)} stages)")
+    for n in path:
+        status, start, end = results[n]
+        print(f"    {start:>8.1f}s  +{end - start:>7.1f}s  {n} [{status}]")
+
+
+def _total_memory_gb() -> int:
+    return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1 << 30) * 0.9)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def option(flag, default):
+        if flag in args:
+            i = args.index(flag)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return int(value)
+        return default
+
+    cores = option("--cores", os.cpu_count())
+    memory_gb = option("--memory-gb", _total_memory_gb())
+    force = "--force" in args
+    dry_run = "--dry-run" in args
+    targets = [a for a in args if not a.startswith("--")]
+
+    stages = discover_stages()
+    names = with_upstream(stages, select(stages, targets)) if targets else set(stages)
+    order = topo_order(stages, names)
+
+    timed_msg(f"PatentWorld pipeline: {len(order)} stages, {cores} cores, {memory_gb} GB")
+    if dry_run:
+        state = load_state()
+        for n in order:
+            s = stages[n]
+            fresh = state["fingerprints"].get(n) == s.fingerprint() and s.outputs_exist()
+            deps = ", ".join(sorted(d.split("_")[0] for d in s.deps & names)) or "-"
+            print(f"  {n:<42} {'skip' if fresh and not force else 'run':<5} "
+                  f"{s.threads:>3} thr {s.memory_gb:>4} GB  after: {deps}")
+        sys.exit(0)
+
+    t0 = time.time()
+    results = run(stages, order, cores, memory_gb, force)
+    print_summary(stages, order, results, time.time() - t0)
+    failed = [n for n, (status, _, _) in results.items() if status in ("failed", "blocked")]
+    if failed:
+        print(f"\n  {len(failed)} stage(s) failed or blocked: {', '.join(sorted(failed))}")
+        sys.exit(1)
+    print("\n=== Pipeline Complete ===\n")
@@ -0,0 +1,281 @@
+"""Cross-checks of coinventor_graph against brute force on small random graphs."""
+import itertools
+import os
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+import coinventor_graph as cg
+
+
+def random_edges(n: int, m: int, seed: int) -> tuple:
+    """(u, v) of up to *m* distinct undirected edges u < v among *n* nodes."""
+    rng = np.random.default_rng(seed)
+    u, v = rng.integers(0, n, m), rng.integers(0, n, m)
+    code = np.unique(np.minimum(u, v) * n + np.maximum(u, v))
+    code = code[code // n != code % n]
+    return code // n, code % n
+
+
+def write_graph(path: str, n: int, u: np.ndarray, v: np.ndarray) -> cg.CoinventorGraph:
+    """Store edges (u, v) in the on-disk CSR layout and open it."""
+    rows, cols = np.concatenate([u, v]), np.concatenate([v, u])
+    order = np.lexsort((cols, rows))
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "inventor_key.npy"), np.arange(n, dtype=np.int32))
+    np.save(os.path.join(path, "indptr.npy"),
+            np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))]).astype(np.int64))
+    np.save(os.path.join(path, "indices.npy"), cols[order].astype(np.int32))
+    np.save(os.path.join(path, "weight.npy"), np.ones(len(rows), dtype=np.int32))
+    np.save(os.path.join(path, "strength.npy"), np.ones(len(rows), dtype=np.float32))
+    return cg.CoinventorGraph(path)
+
+
+def neighbor_sets(n: int, u, v) -> list:
+    adj = [set() for _ in range(n)]
+    for a, b in zip(u.tolist(), v.tolist()):
+        adj[a].add(b)
+        adj[b].add(a)
+    return adj
+
+
+def brandes(adj: list) -> np.ndarray:
+    """Exact undirected betweenness (Brandes 2001), one BFS per source."""
+    n = len(adj)
+    bc = np.zeros(n)
+    for s in range(n):
+        stack, preds = [], [[] for _ in range(n)]
+        sigma, dist = [0] * n, [-1] * n
+        sigma[s], dist[s] = 1, 0
+        queue = [s]
+        for w in queue:
+            stack.append(w)
+            for x in adj[w]:
+                if dist[x] < 0:
+                    dist[x] = dist[w] + 1
+                    queue.append(x)
+                if dist[x] == dist[w] + 1:
+                    sigma[x] += sigma[w]
+                    preds[x].append(w)
+        delta = [0.0] * n
+        for w in reversed(stack):
+            for p in preds[w]:
+                delta[p] += sigma[p] / sigma[w] * (1 + delta[w])
+            if w != s:
+                bc[w] += delta[w]
+    return bc / 2
+
+
+@pytest.fixture(params=[(40, 60, 0), (120, 150, 1), (200, 900, 2)], ids=["sparse", "forest", "dense"])
+def toy(request, tmp_path):
+    n, m, seed = request.param
+    u, v = random_edges(n, m, seed)
+    return write_graph(str(tmp_path / "g"), n, u, v), n, u, v
+
+
+def test_components_match_csgraph(toy):
+    g, n, u, v = toy
+    roots = g.components()
+    _, labels = connected_components(sp.coo_matrix((np.ones(len(u)), (u, v)), shape=(n, n)), directed=False)
+    # Same partition, each labelled by its smallest node id
+    first = {}
+    for node, label in enumerate(labels):
+        first.setdefault(label, node)
+    assert roots.tolist() == [first[label] for label in labels]
+
+
+@pytest.mark.parametrize("budget", [cg.CLUSTER_BUDGET, 7])
+def test_triangles_and_clustering_match_brute_force(toy, budget):
+    g, n, u, v = toy
+    adj = neighbor_sets(n, u, v)
+    tri = np.zeros(n, dtype=np.int64)
+    for a, b in zip(u.tolist(), v.tolist()):
+        for c in adj[a] & adj[b]:
+            if c > b:
+                tri[[a, b, c]] += 1
+    assert g.triangles(budget).tolist() == tri.tolist()
+
+    deg = np.array([len(s) for s in adj], dtype=np.float64)
+    pairs = deg * (deg - 1) / 2
+    local = [t / p if p else 0.0 for t, p in zip(tri, pairs)]
+    average, transitivity = g.clustering(budget)
+    assert average == pytest.approx(np.mean(local))
+    assert transitivity == pytest.approx(tri.sum() / pairs.sum())
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_betweenness_with_every_pivot_is_exact(toy, workers):
+    g, n, u, v = toy
+    exact = brandes(neighbor_sets(n, u, v))
+    assert g.betweenness(pivots=n, workers=workers) == pytest.approx(exact)
+
+
+def test_sampled_betweenness_is_scaled_to_every_source(toy):
+    g, n, u, v = toy
+    # Averaged over seeds, the pivot estimate approaches the exact values
+    exact = brandes(neighbor_sets(n, u, v))
+    mean = np.mean([g.betweenness(pivots=n // 2, workers=1, seed=s) for s in range(40)], axis=0)
+    assert mean.sum() == pytest.approx(exact.sum(), rel=0.1)
+
+
+def test_empty_graph(tmp_path):
+    g = write_graph(str(tmp_path / "g"), 5, np.zeros(0, np.int64), np.zeros(0, np.int64))
+    assert g.components().tolist() == [0, 1, 2, 3, 4]
+    assert g.triangles().tolist() == [0] * 5
+    assert g.clustering() == (0.0, 0.0)
+    assert g.betweenness().tolist() == [0.0] * 5
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_distance_counts_match_shortest_paths(toy, workers):
+    from scipy.sparse.csgraph import shortest_path
+    g, n, u, v = toy
+    # More than 64 sources, so several bit-parallel batches
+    sources = np.arange(0, n, 2)[:100]
+    dist = shortest_path(sp.coo_matrix((np.ones(len(u)), (u, v)), shape=(n, n)),
+                         directed=False, unweighted=True, indices=sources)
+    counts = g.distance_counts(sources, workers=workers)
+    finite = dist[np.isfinite(dist)].astype(np.int64)
+    assert counts.shape == (len(sources), finite.max() + 1)
+    for row, d in zip(counts, dist):
+        d = d[np.isfinite(d)].astype(np.int64)
+        assert row.tolist() == np.bincount(d, minlength=counts.shape[1]).tolist()
+
+
+def test_row_chunks_cover_every_row(toy):
+    g, n, u, v = toy
+    chunks = list(g.row_chunks(chunk_edges=50))
+    assert chunks[0][0] == 0 and chunks[-1][1] == n
+    assert all(r1 == r0 for (_, r1), (r0, _) in zip(chunks, chunks[1:]))
+
+
+def test_path_lengths_summary():
+    counts = np.array([[1, 2, 1, 1], [1, 3, 1, 0]])
+    stats = cg.path_lengths(counts, n_boot=50)
+    assert stats["connected_pairs"] == 8
+    assert stats["mean_distance"] == pytest.approx((5 + 2 * 2 + 3) / 8)
+    assert stats["max_distance"] == 3
+    assert stats["distribution"] == {1: 5 / 8, 2: 2 / 8, 3: 1 / 8}
+    # 90% of pairs lie within 2 + (0.9 - 7/8) / (1/8) hops
+    assert stats["effective_diameter"] == pytest.approx(2 + (0.9 - 7 / 8) / (1 / 8))
+    lo, hi = stats["mean_distance_ci"]
+    assert lo <= stats["mean_distance"] <= hi
+
+
+def test_effective_diameter_interpolates():
+    assert cg.effective_diameter(np.array([4, 50, 50])) == pytest.approx(1 + 0.4 / 0.5)
+    assert cg.effective_diameter(np.array([4, 10])) == pytest.approx(0.9)
+    assert np.isnan(cg.effective_diameter(np.array([4])))
+
+
+def random_teams(n_patents: int, n_members: int, seed: int, largest: int = 12) -> tuple:
+    """(patent, member) rows sorted by (patent, member), teams of 1..largest."""
+    rng = np.random.default_rng(seed)
+    teams = [np.sort(rng.choice(n_members, rng.integers(1, largest + 1), replace=False))
+             for _ in range(n_patents)]
+    patent = np.repeat(np.arange(n_patents), [len(t) for t in teams])
+    return patent, np.concatenate(teams)
+
+
+def naive_pairs(patent, member, max_team=None) -> dict:
+    """{(u, v): [patents, strength]} by enumerating every team's pairs."""
+    out = {}
+    for p in np.unique(patent):
+        team = member[patent == p].tolist()
+        if max_team is not None and len(team) > max_team:
+            continue
+        for a, b in itertools.combinations(team, 2):
+            cell = out.setdefault((a, b), [0, 0.0])
+            cell[0] += 1
+            cell[1] += 1.0 / (len(team) - 1)
+    return out
+
+
+@pytest.mark.parametrize("max_team", [None, 5])
+def test_team_pairs_match_combinations(max_team):
+    patent, member = random_teams(200, 50, 0)
+    u, v, k = cg.team_pairs(patent, member, max_team)
+    expected = []
+    for p in np.unique(patent):
+        team = member[patent == p].tolist()
+        if max_team is None or len(team) <= max_team:
+            expected += [(a, b, len(team)) for a, b in itertools.combinations(team, 2)]
+    assert sorted(zip(u.tolist(), v.tolist(), k.tolist())) == sorted(expected)
+    assert (u < v).all()
+
+
+@pytest.mark.parametrize("max_team, chunk", [(None, cg.PAIR_CHUNK), (None, 10), (6, 10)])
+def test_weighted_pairs_match_naive(max_team, chunk):
+    patent, member = random_teams(300, 40, 1)
+    u, v, patents, strength = cg.weighted_pairs(patent, member, 40, max_team, chunk)
+    expected = naive_pairs(patent, member, max_team)
+    assert list(zip(u.tolist(), v.tolist())) == sorted(expected)
+    assert patents.tolist() == [expected[p][0] for p in sorted(expected)]
+    assert strength == pytest.approx([expected[p][1] for p in sorted(expected)])
+
+
+def test_team_pairs_without_pairs():
+    u, v, k = cg.team_pairs(np.array([0, 1, 2]), np.array([4, 5, 6]))
+    assert len(u) == len(v) == len(k) == 0
+
+
+def write_spills(path: str, first: int, last: int, seed: int) -> tuple:
+    """Pair spills, inventorships and the "all" window of random teams granted
+    in [first, last]; returns the (year, patent, inventor) rows."""
+    import duckdb
+    rng = np.random.default_rng(seed)
+    patent, inventor = random_teams(150, 60, seed, largest=4)
+    years = np.sort(rng.integers(first, last + 1, patent.max() + 1))[patent]
+    os.makedirs(os.path.join(path, "pairs"))
+    cg._write_inventorships(path, years, inventor, 60)
+    for year in np.unique(years):
+        rows = years == year
+        cg._write_pairs(os.path.join(path, "pairs"), int(year), patent[rows], inventor[rows], 60)
+    cg._write_window(duckdb.connect(), os.path.join(path, "all"), np.unique(inventor), path, first, last)
+    return years, patent, inventor
+
+
+def window_stats(years, patent, inventor, first: int, last: int) -> dict:
+    """TemporalGraph.stats() of grant years [first, last], rebuilt from scratch."""
+    rows = (years >= first) & (years <= last)
+    nodes = np.unique(inventor[rows])
+    edges = set(naive_pairs(patent[rows], inventor[rows]))
+    u = np.searchsorted(nodes, [a for a, _ in edges]).astype(np.int64)
+    v = np.searchsorted(nodes, [b for _, b in edges]).astype(np.int64)
+    n = len(nodes)
+    deg = np.bincount(np.concatenate([u, v]), minlength=n)
+    _, labels = connected_components(sp.coo_matrix((np.ones(len(u)), (u, v)), shape=(n, n)), directed=False)
+    sizes = np.bincount(labels)
+    return {
+        "first_year": first, "last_year": last, "num_nodes": n, "num_edges": len(edges),
+        "avg_degree": 2.0 * len(edges) / n, "max_degree": int(deg.max()),
+        "isolated_share": float((deg == 0).mean()), "num_components": len(sizes),
+        "giant_component_share": float(sizes.max()) / n,
+    }
+
+
+@pytest.mark.parametrize("width", [1, 3, 5])
+def test_sliding_windows_match_rebuilt_windows(tmp_path, width):
+    years, patent, inventor = write_spills(str(tmp_path), 1990, 2001, seed=3)
+    got = list(cg.sliding_windows(width, 1990, 2001, path=str(tmp_path)))
+    assert [s["last_year"] for s in got] == list(range(1990 + width - 1, 2002))
+    for stats in got:
+        assert stats == pytest.approx(window_stats(years, patent, inventor,
+                                                   stats["last_year"] - width + 1, stats["last_year"]))
+
+
+def test_temporal_graph_drains_and_rejects_gaps(tmp_path):
+    write_spills(str(tmp_path), 1990, 1995, seed=4)
+    graph = cg.TemporalGraph(str(tmp_path))
+    for year in range(1990, 1996):
+        graph.add_year(year)
+    with pytest.raises(ValueError):
+        graph.add_year(1997)
+    for _ in range(6):
+        graph.remove_year()
+    assert (graph.n_nodes, graph.n_edges, graph.first) == (0, 0, None)
+    assert not graph.degree.any() and not graph.pair_years.any()
+    with pytest.raises(ValueError):
+        graph.remove_year()
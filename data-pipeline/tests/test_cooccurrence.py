@@ -0,0 +1,79 @@
+"""Cross-checks of the sparse co-occurrence engine against naive pair counting."""
+import itertools
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import cooccurrence
+
+N_CODES = 7
+
+
+@pytest.fixture
+def toy():
+    """Random patent code lists as a CSR incidence matrix, plus the lists."""
+    rng = np.random.default_rng(0)
+    codes = [sorted(rng.choice(N_CODES, rng.integers(0, 4), replace=False).tolist()) for _ in range(250)]
+    rows = np.repeat(np.arange(len(codes)), [len(c) for c in codes])
+    x = sp.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, np.concatenate(codes).astype(int))),
+                      shape=(len(codes), N_CODES))
+    return x, codes
+
+
+def naive_counts(codes, rows, weights=None) -> np.ndarray:
+    counts = np.zeros((N_CODES, N_CODES), dtype=np.int64)
+    for r in rows:
+        for a, b in itertools.product(codes[r], repeat=2):
+            counts[a, b] += 1 if weights is None else weights[r]
+    return counts
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_co_occurrence_matches_naive_counts(toy, workers):
+    x, codes = toy
+    rng = np.random.default_rng(1)
+    buckets = {"mask": rng.random(len(codes)) < 0.5, "rows": np.arange(0, len(codes), 3),
+               "empty": np.zeros(len(codes), dtype=bool)}
+    weights = rng.integers(1, 5, len(codes))
+    for w in (None, weights):
+        got = cooccurrence.co_occurrence(x, buckets, workers=workers, weights=w)
+        for name, rows in buckets.items():
+            rows = np.flatnonzero(rows) if rows.dtype == bool else rows
+            assert got[name].dtype == np.int64
+            assert got[name].toarray().tolist() == naive_counts(codes, rows, w).tolist()
+
+
+def test_weighted_rows_equal_repeated_rows(toy):
+    x, codes = toy
+    weights = np.random.default_rng(2).integers(0, 4, len(codes))
+    repeated = np.repeat(np.arange(len(codes)), weights)
+    weighted = cooccurrence.co_occurrence(x, {"b": np.arange(len(codes))}, weights=weights)["b"]
+    plain = cooccurrence.co_occurrence(x[repeated], {"b": np.arange(len(repeated))})["b"]
+    assert (weighted != plain).nnz == 0
+
+
+def test_mask_incidence_matches_bits():
+    masks = np.array([0, 1, 6, 5, 127, 64])
+    x = cooccurrence.mask_incidence(masks, 7).toarray()
+    assert x.tolist() == [[(m >> bit) & 1 for bit in range(7)] for m in masks.tolist()]
+
+
+def test_lift_jaccard_and_pairs(toy):
+    x, codes = toy
+    n = len(codes)
+    co = cooccurrence.co_occurrence(x, {"all": np.arange(n)})["all"]
+    c = naive_counts(codes, range(n)).astype(np.float64)
+    diag = np.diag(c)
+    lift, jaccard = cooccurrence.lift(co, n).toarray(), cooccurrence.jaccard(co).toarray()
+    for a, b in itertools.product(range(N_CODES), repeat=2):
+        if c[a, b]:
+            assert lift[a, b] == pytest.approx(c[a, b] * n / (diag[a] * diag[b]))
+            assert jaccard[a, b] == pytest.approx(c[a, b] / (diag[a] + diag[b] - c[a, b]))
+    a, b, cnt = cooccurrence.pairs(co)
+    expected = [(i, j, int(c[i, j])) for i in range(N_CODES) for j in range(i + 1, N_CODES) if c[i, j]]
+    assert list(zip(a.tolist(), b.tolist(), cnt.tolist())) == expected
+    among = {1, 4, 5}
+    a, b, cnt = cooccurrence.pairs(co, among=among)
+    assert list(zip(a.tolist(), b.tolist(), cnt.tolist())) == \
+        [p for p in expected if p[0] in among and p[1] in among]
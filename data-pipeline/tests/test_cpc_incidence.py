@@ -0,0 +1,91 @@
+"""Cross-checks of cpc_incidence roll-ups and queries against per-patent code sets."""
+import os
+
+import numpy as np
+import orjson
+import pytest
+import scipy.sparse as sp
+
+import cpc_incidence
+
+SUBCLASSES = ["A01B", "A01C", "A61K", "B60L", "G06F", "G06N", "G16H", "H01M", "Y02E", "Y02T"]
+
+
+@pytest.fixture
+def toy(tmp_path):
+    """Random patents (code sets, grant years) stored in the on-disk layout."""
+    rng = np.random.default_rng(0)
+    n = 300
+    codes = [set(rng.choice(SUBCLASSES, rng.integers(0, 5), replace=False).tolist()) for _ in range(n)]
+    grant_year = np.where(rng.random(n) < 0.9, rng.integers(1976, 2026, n), -1).astype(np.int16)
+    rows = np.repeat(np.arange(n), [len(c) for c in codes])
+    cols = np.searchsorted(SUBCLASSES, [code for c in codes for code in sorted(c)])
+    x = sp.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, cols)), shape=(n, len(SUBCLASSES)))
+    labels = {"subclass": SUBCLASSES}
+    sp.save_npz(os.path.join(tmp_path, "subclass.npz"), x, compressed=False)
+    for level, length in cpc_incidence.LEVELS.items():
+        if level != "subclass":
+            rolled, labels[level] = cpc_incidence._rollup(x, SUBCLASSES, length)
+            sp.save_npz(os.path.join(tmp_path, f"{level}.npz"), rolled, compressed=False)
+    with open(os.path.join(tmp_path, "labels.json"), "wb") as f:
+        f.write(orjson.dumps(labels))
+    np.save(os.path.join(tmp_path, "grant_year.npy"), grant_year)
+    return cpc_incidence.CpcIncidence(str(tmp_path)), codes, grant_year
+
+
+def level_codes(codes: set, level: str) -> set:
+    return {c[:cpc_incidence.LEVELS[level]] for c in codes}
+
+
+@pytest.mark.parametrize("level", list(cpc_incidence.LEVELS))
+def test_rollups_match_code_prefixes(toy, level):
+    inc, codes, _ = toy
+    labels = inc.labels[level]
+    assert labels == sorted({c[:cpc_incidence.LEVELS[level]] for c in SUBCLASSES})
+    x = inc.matrix(level)
+    assert x.dtype == np.uint8 and x.has_sorted_indices
+    got = [{labels[j] for j in x.indices[x.indptr[i]:x.indptr[i + 1]]} for i in range(inc.n)]
+    assert got == [level_codes(c, level) for c in codes]
+    assert inc.scope(level).tolist() == [len(level_codes(c, level)) for c in codes]
+
+
+def test_has_any_and_index(toy):
+    inc, codes, _ = toy
+    wanted = ["G06N", "Y02T", "Z99Z"]     # Z99Z is not in the matrix
+    assert inc.has_any("subclass", wanted).tolist() == [bool(c & set(wanted)) for c in codes]
+    assert inc.index("class", ["A01", "Y02"]).tolist() == [0, 6]
+    with pytest.raises(ValueError):
+        inc.index("class", ["Z99"])
+
+
+def test_group_counts(toy):
+    inc, codes, grant_year = toy
+    groups = np.where(grant_year >= 0, (grant_year - 1976) // 10, -1)
+    got = inc.group_counts("section", groups, 5).toarray()
+    labels = inc.labels["section"]
+    expected = np.zeros((5, len(labels)), dtype=np.int64)
+    for g, c in zip(groups, codes):
+        if g >= 0:
+            for code in level_codes(c, "section"):
+                expected[g, labels.index(code)] += 1
+    assert got.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("use_mask, use_columns", [(False, False), (True, False), (True, True)])
+def test_co_occurrence_matches_pair_counts(toy, use_mask, use_columns):
+    inc, codes, grant_year = toy
+    windows = {"early": (1976, 1995), "late": (1996, 2025), "all": (1976, 2025)}
+    mask = np.arange(inc.n) % 3 != 0 if use_mask else None
+    labels = inc.labels["class"]
+    columns = [1, 3, 4, 6] if use_columns else None
+    kept = [labels[j] for j in (columns if use_columns else range(len(labels)))]
+    got = inc.co_occurrence("class", windows, mask=mask, columns=columns, workers=2)
+    for name, (first, last) in windows.items():
+        expected = np.zeros((len(kept), len(kept)), dtype=np.int64)
+        for i, c in enumerate(codes):
+            if first <= grant_year[i] <= last and (mask is None or mask[i]):
+                present = [k for k, label in enumerate(kept) if label in level_codes(c, "class")]
+                for a in present:
+                    for b in present:
+                        expected[a, b] += 1
+        assert got[name].toarray().tolist() == expected.tolist()
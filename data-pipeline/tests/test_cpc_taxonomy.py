@@ -0,0 +1,124 @@
+"""Cross-checks of cpc_taxonomy.PrefixMatcher against naive per-symbol matching."""
+import re
+
+import duckdb
+import numpy as np
+import pytest
+
+import cpc_taxonomy as tax
+
+SYMBOL = re.compile(r"^([A-HY]\d{2}[A-Z])(\d{0,4})(?:/(\d{1,6}))?$")
+
+
+def covers(prefix: str, symbol) -> bool:
+    """Does the rule *prefix* cover *symbol*? Section, class and subclass
+    prefixes match leading characters; a main group matches that group only;
+    subgroup digits match leading subgroup digits."""
+    m = symbol is not None and SYMBOL.match(symbol.replace(" ", ""))
+    if not m:
+        return False
+    subclass, group, subgroup = m.group(1), m.group(2), m.group(3) or ""
+    head = re.match(r"^([A-HY](?:\d{2}(?:[A-Z])?)?)(\d*)(?:/(\d*))?$", prefix)
+    level, p_group, p_sub = head.group(1), head.group(2), head.group(3) or ""
+    if not subclass.startswith(level):
+        return False
+    if not p_group:
+        return True
+    return int(group or 0) == int(p_group) and subgroup.ljust(6, "0").startswith(p_sub)
+
+
+def random_symbols(rng, n: int) -> list:
+    out = []
+    for _ in range(n):
+        s = rng.choice(list("AGY")) + rng.choice(["01", "02", "06"]) + rng.choice(list("BDN"))
+        kind = rng.integers(0, 4)
+        if kind > 0:
+            s += str(rng.choice([1, 2, 10, 21, 210]))
+        if kind > 1:
+            s += "/" + "".join(rng.choice(list("0123456789"), rng.integers(1, 5)))
+        out.append(s)
+    return out + [None, "", "G06", "XYZ", "G06N3/1234567", "G06N 3/08", "g06n3/08"]
+
+
+def random_prefixes(rng, n: int) -> list:
+    out = []
+    for _ in range(n):
+        p = str(rng.choice(list("AGY")))
+        depth = rng.choice([0, 1, 2, 3, 3, 4, 4, 4])
+        if depth > 0:
+            p += rng.choice(["01", "02", "06"])
+        if depth > 1:
+            p += rng.choice(list("BDN"))
+        if depth > 2:
+            p += str(rng.choice([1, 2, 10, 21]))
+        if depth > 3:
+            p += "/" + "".join(rng.choice(list("0123456789"), rng.integers(0, 3)))
+        out.append(p)
+    return out
+
+
+@pytest.fixture(params=[(0, 4, 12), (1, 4, 12), (2, 8, 40), (3, 8, 40)])
+def case(request):
+    seed, n_rules, n_prefixes = request.param
+    rng = np.random.default_rng(seed)
+    prefixes = random_prefixes(rng, n_prefixes)
+    rules = {f"cat{i}": tuple(prefixes[i::n_rules]) for i in range(n_rules)}
+    return rules, random_symbols(rng, 400)
+
+
+def test_first_mode_matches_case_of_prefix_branches(case):
+    rules, symbols = case
+    matcher = tax.PrefixMatcher(rules, default="Other")
+    expected = [next((i for i, ps in enumerate(rules.values()) if any(covers(p, s) for p in ps)), -1)
+                for s in symbols]
+    assert matcher.ids(symbols).tolist() == expected
+    names = list(rules) + ["Other"]
+    assert matcher.labels(symbols) == [names[i] for i in expected]
+
+
+def test_all_mode_matches_or_of_prefix_filters(case):
+    rules, symbols = case
+    matcher = tax.PrefixMatcher(rules, mode="all")
+    expected = [sum(1 << i for i, ps in enumerate(rules.values()) if any(covers(p, s) for p in ps))
+                for s in symbols]
+    assert matcher.masks(symbols).tolist() == expected
+
+
+def test_udf_and_code_table_agree_with_labels(case):
+    rules, symbols = case
+    matcher = tax.PrefixMatcher(rules)
+    con = duckdb.connect()
+    con.execute("CREATE TABLE cpc (cpc_group VARCHAR, cpc_subclass VARCHAR)")
+    con.executemany("INSERT INTO cpc VALUES (?, NULL)", [[s] for s in symbols])
+    matcher.register(con, "category")
+    got = dict(con.execute("SELECT cpc_group, category(cpc_group) FROM cpc WHERE cpc_group IS NOT NULL").fetchall())
+    assert got == {s: label for s, label in zip(symbols, matcher.labels(symbols)) if s is not None}
+    table = matcher.code_table(con, "cpc").to_pydict()
+    assert dict(zip(table["cpc_code"], table["category"])) == \
+        {s: label for s, label in got.items() if label is not None}
+
+
+def test_code_table_falls_back_to_subclass():
+    matcher = tax.PrefixMatcher({"vision": "G06V", "nn": "G06N3"})
+    con = duckdb.connect()
+    con.execute("CREATE TABLE cpc (patent_id VARCHAR, cpc_group VARCHAR, cpc_subclass VARCHAR)")
+    con.executemany("INSERT INTO cpc VALUES (?, ?, ?)", [
+        ["1", None, "G06V"], ["2", "", "G06V"], ["3", "G06N3/08", "G06N"], ["4", None, "G06N"],
+        ["5", None, None]])
+    con.register("codes", matcher.code_table(con, "cpc"))
+    assert con.execute(f"""
+        SELECT cpc.patent_id, codes.category FROM cpc
+        JOIN codes ON {tax.cpc_code('cpc')} = codes.cpc_code ORDER BY 1
+    """).fetchall() == [("1", "vision"), ("2", "vision"), ("3", "nn")]
+
+
+def test_main_group_and_subgroup_boundaries():
+    matcher = tax.PrefixMatcher({"d1": "G05D1", "f213": "G06F21/3", "y02": "Y02"}, mode="all")
+    symbols = ["G05D1/02", "G05D1", "G05D16/00", "G06F21/30", "G06F21/3999", "G06F21/40",
+               "G06F21/03", "Y02E10/50", "Y10S"]
+    assert matcher.masks(symbols).tolist() == [1, 1, 0, 2, 2, 0, 0, 4, 0]
+
+
+def test_invalid_prefix_is_rejected():
+    with pytest.raises(ValueError):
+        tax.prefix_range("G6")